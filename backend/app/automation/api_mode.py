@@ -0,0 +1,238 @@
+"""
+HTTP 直传发布（API 模式）
+
+对能观察到上传接口的平台，不启动 Chromium，直接用已保存的 storage_state 中的 Cookie 调用上传接口：
+    初始化上传 -> 并行 PUT 分片 -> 合并分片 -> 提交发布
+接口由平台类的 API_UPLOAD_SPEC 描述。请求或响应与描述不一致（缺少Cookie、字段缺失、分片校验不符、
+HTTP 错误）时抛出 ApiModeMismatch，由 BrowserAutomationBase.publish 回退到浏览器流程。
+
+所有请求共用一个 httpx.AsyncClient（连接池 + keep-alive），分片并发数由 API_UPLOAD_PARALLELISM 控制，
+分片按需从文件读取，不把整个视频读入内存。
+"""
+
+import asyncio
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+if TYPE_CHECKING:
+    # httpx 只在实际走直传时导入，自动化模块导入时不加载
+    import httpx
+
+logger = get_logger(__name__)
+
+# 单个分片的重试次数（网络错误和 5xx）
+CHUNK_RETRIES = 2
+
+
+class ApiModeMismatch(Exception):
+    """API 模式的前置条件或接口响应与预期不一致，应回退到浏览器流程"""
+
+
+class ApiPublishFailed(Exception):
+    """发布请求已经发出后失败，不能回退（回退可能导致重复发布）"""
+
+
+@dataclass(frozen=True)
+class ApiUploadSpec:
+    """平台上传接口描述"""
+    base_url: str
+    init_path: str  # POST {file_name, file_size, chunk_size} -> {upload_id, chunk_size?}
+    chunk_path: str  # PUT 分片，可用占位符 {upload_id} {index} -> {index, crc32}
+    complete_path: str  # POST {upload_id, chunks} -> {video_id}
+    publish_path: str  # POST {video_id, title, description} -> {status_code: 0}
+    cookie_domain: str  # 从 storage_state 中取该域名（含子域）的 Cookie
+    required_cookies: tuple = ()
+    csrf_cookie: Optional[str] = None  # 该 Cookie 的值放入 csrf_header
+    csrf_header: Optional[str] = None
+    chunk_size: int = 4 * 1024 * 1024
+
+
+def _domain_matches(cookie_domain: str, domain: str) -> bool:
+    cookie_domain = cookie_domain.lstrip(".")
+    return domain == cookie_domain or domain.endswith("." + cookie_domain)
+
+
+def cookies_from_storage_state(state: Optional[Dict[str, Any]], domain: str,
+                               now: Optional[float] = None) -> Dict[str, str]:
+    """取出 storage_state 中对 domain 有效且未过期的 Cookie"""
+    if not state:
+        return {}
+    now = now if now is not None else time.time()
+    cookies = {}
+    for cookie in state.get("cookies", []):
+        expires = cookie.get("expires", -1)
+        if expires not in (-1, None) and expires <= now:
+            continue
+        if _domain_matches(cookie.get("domain", ""), domain):
+            cookies[cookie["name"]] = cookie["value"]
+    return cookies
+
+
+def _require(payload: Any, fields: Iterable[str], step: str) -> Dict[str, Any]:
+    if not isinstance(payload, dict):
+        raise ApiModeMismatch(f"{step} 响应不是 JSON 对象")
+    missing = [name for name in fields if name not in payload]
+    if missing:
+        raise ApiModeMismatch(f"{step} 响应缺少字段: {', '.join(missing)}")
+    return payload
+
+
+class ApiUploader:
+    """按 ApiUploadSpec 执行一次直传发布"""
+
+    def __init__(self, spec: ApiUploadSpec, cookies: Dict[str, str], user_agent: Optional[str] = None,
+                 proxy: Optional[str] = None, parallelism: Optional[int] = None,
+                 transport: Optional["httpx.AsyncBaseTransport"] = None,
+                 on_progress: Optional[Callable[[int], Awaitable[None]]] = None):
+        """
+        Args:
+            spec: 接口描述
+            cookies: 从 storage_state 取出的 Cookie
+            user_agent: 与浏览器配置一致的 User-Agent
+            proxy: 代理地址（如 http://host:port）
+            parallelism: 分片并发数
+            transport: 自定义传输层（测试中指向录制的接口替身）
+            on_progress: 上传百分比（0-100）变化时的回调
+        """
+        import httpx
+
+        missing = [name for name in spec.required_cookies if name not in cookies]
+        if missing:
+            raise ApiModeMismatch(f"存储状态中缺少Cookie: {', '.join(missing)}")
+
+        self.spec = spec
+        self.parallelism = parallelism or settings.API_UPLOAD_PARALLELISM
+        self.on_progress = on_progress
+
+        headers = {"Cookie": "; ".join(f"{name}={value}" for name, value in cookies.items())}
+        if user_agent:
+            headers["User-Agent"] = user_agent
+        if spec.csrf_cookie and spec.csrf_header:
+            if spec.csrf_cookie not in cookies:
+                raise ApiModeMismatch(f"存储状态中缺少CSRF Cookie: {spec.csrf_cookie}")
+            headers[spec.csrf_header] = cookies[spec.csrf_cookie]
+
+        client_options: Dict[str, Any] = {
+            "base_url": spec.base_url,
+            "headers": headers,
+            "timeout": httpx.Timeout(settings.API_UPLOAD_TIMEOUT, connect=10),
+            "limits": httpx.Limits(max_connections=self.parallelism, max_keepalive_connections=self.parallelism),
+        }
+        if transport is not None:
+            client_options["transport"] = transport
+        elif proxy:
+            client_options["proxies"] = proxy
+        self.client = httpx.AsyncClient(**client_options)
+
+        self.bytes_sent = 0
+        self.publish_sent = False
+
+    async def _json(self, response: "httpx.Response", step: str) -> Any:
+        if response.status_code >= 400:
+            raise ApiModeMismatch(f"{step} 返回 HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            raise ApiModeMismatch(f"{step} 响应不是 JSON")
+
+    async def _post(self, path: str, payload: Dict[str, Any], step: str) -> Any:
+        """发送 JSON 请求；网络错误与接口不一致同样处理，由调用方回退浏览器流程"""
+        import httpx
+
+        try:
+            response = await self.client.post(path, json=payload)
+        except httpx.TransportError as e:
+            raise ApiModeMismatch(f"{step} 请求失败: {e}")
+        return await self._json(response, step)
+
+    @staticmethod
+    def _read_chunk(file_path: str, offset: int, size: int) -> bytes:
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    async def _put_chunk(self, file_path: str, upload_id: str, index: int, offset: int, size: int,
+                         file_size: int) -> None:
+        import httpx
+
+        data = await asyncio.to_thread(self._read_chunk, file_path, offset, size)
+        crc = zlib.crc32(data)
+        url = self.spec.chunk_path.format(upload_id=upload_id, index=index)
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": f"bytes {offset}-{offset + size - 1}/{file_size}",
+        }
+        for attempt in range(CHUNK_RETRIES + 1):
+            try:
+                response = await self.client.put(url, content=data, headers=headers)
+                if response.status_code >= 500 and attempt < CHUNK_RETRIES:
+                    continue
+                payload = _require(await self._json(response, f"分片 {index}"), ("index", "crc32"), f"分片 {index}")
+                break
+            except httpx.TransportError as e:
+                if attempt >= CHUNK_RETRIES:
+                    raise ApiModeMismatch(f"分片 {index} 上传失败: {e}")
+                logger.debug(f"分片 {index} 上传出错，重试: {e}")
+
+        if payload["index"] != index or payload["crc32"] != crc:
+            raise ApiModeMismatch(f"分片 {index} 校验不一致")
+
+        self.bytes_sent += size
+        if self.on_progress:
+            await self.on_progress(int(self.bytes_sent * 100 / file_size))
+
+    async def upload(self, file_path: str) -> str:
+        """上传视频，返回平台的 video_id"""
+        file_size = os.path.getsize(file_path)
+        init = _require(
+            await self._post(self.spec.init_path, {
+                "file_name": os.path.basename(file_path), "file_size": file_size, "chunk_size": self.spec.chunk_size,
+            }, "初始化上传"),
+            ("upload_id",), "初始化上传",
+        )
+        upload_id = init["upload_id"]
+        chunk_size = int(init.get("chunk_size") or self.spec.chunk_size)
+        chunks = [(index, offset, min(chunk_size, file_size - offset))
+                  for index, offset in enumerate(range(0, file_size, chunk_size))]
+        logger.info(f"API 模式开始上传 - 文件大小: {file_size}, 分片数: {len(chunks)}, 并发: {self.parallelism}")
+
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def put(index: int, offset: int, size: int) -> None:
+            async with semaphore:
+                await self._put_chunk(file_path, upload_id, index, offset, size, file_size)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(put(*chunk) for chunk in chunks))
+        elapsed = time.perf_counter() - start
+        logger.info(f"API 模式分片上传完成 - 耗时: {elapsed:.2f}s, 吞吐量: {file_size / max(elapsed, 1e-6) / 1024:.1f}KB/s")
+
+        complete = _require(
+            await self._post(self.spec.complete_path, {"upload_id": upload_id, "chunks": len(chunks)}, "合并分片"),
+            ("video_id",), "合并分片",
+        )
+        return complete["video_id"]
+
+    async def publish(self, video_id: str, title: str, description: str) -> None:
+        """提交发布。请求发出后任何失败都抛出 ApiPublishFailed，不再回退"""
+        import httpx
+
+        self.publish_sent = True
+        try:
+            response = await self.client.post(self.spec.publish_path, json={
+                "video_id": video_id, "title": title, "description": description,
+            })
+            payload = _require(await self._json(response, "提交发布"), ("status_code",), "提交发布")
+        except (ApiModeMismatch, httpx.HTTPError) as e:
+            raise ApiPublishFailed(str(e))
+        if payload["status_code"] != 0:
+            raise ApiPublishFailed(f"提交发布失败: {payload}")
+
+    async def close(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,378 @@
+"""
+跨上下文共享的静态资源缓存
+
+每个新建的浏览器上下文都有独立的 HTTP 缓存，抖音、B站、公众号后台每次检查登录状态或发布时
+都要重新下载数 MB 的 JS/CSS；注册了请求拦截的上下文 Chromium 还会直接禁用 HTTP 缓存。
+这里通过 BrowserContext.route 拦截静态资源请求，由所有上下文、所有浏览器共用一个本地磁盘缓存：
+
+- 只缓存 GET 的脚本、样式、字体、图片，且响应为 200、没有 no-store / no-cache / private
+- 带 immutable 或 URL 中带内容指纹（如 main.3f2a1b9c.js）的资源按 ASSET_CACHE_MAX_TTL 缓存（响应给出 max-age 时不超过它），
+  其余资源 max-age 不低于 ASSET_CACHE_MIN_TTL 时按 max-age 缓存
+- 内容寻址：文件名为内容的 SHA-256，不同 URL 的相同内容只存一份；URL 索引保存在 SQLite 中
+- 总大小超过 ASSET_CACHE_MAX_BYTES 时按最近访问时间淘汰（LRU）
+- 同一 URL 的并发未命中只下载一次
+- 不符合条件的请求交给其他拦截器或直接走网络（route.fallback）
+
+默认关闭，ASSET_CACHE_ENABLED=true 时自动化实例启动后自动安装；命中率和节省的流量见 /system/status。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+
+logger = get_logger(__name__)
+
+ASSET_RESOURCE_TYPES = ("script", "stylesheet", "font", "image")
+
+# 拦截的URL：按扩展名预筛，避免每个请求都经过 Python
+_STATIC_PATH = re.compile(r"\.(?:js|mjs|css|woff2?|ttf|otf|eot|png|jpe?g|gif|webp|avif|svg|ico)$", re.IGNORECASE)
+# 路径中的内容指纹：8 位以上的十六进制片段（main.3f2a1b9c.js、chunk-5e8d0a7bc1.css、/static/9f86d081/app.js）
+_FINGERPRINT = re.compile(r"(?:^|[./_\-@~])[0-9a-f]{8,}(?=[./_\-]|$)")
+
+# 回放缓存时保留的响应头（正文已解码，不保留 content-encoding / content-length）
+_KEPT_HEADERS = (
+    "content-type", "cache-control", "etag", "last-modified",
+    "access-control-allow-origin", "access-control-allow-credentials", "timing-allow-origin",
+    "cross-origin-resource-policy",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+
+def is_static_url(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and bool(_STATIC_PATH.search(parts.path))
+
+
+def is_fingerprinted(url: str) -> bool:
+    return bool(_FINGERPRINT.search(urlsplit(url).path))
+
+
+def _cache_control(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def cache_ttl(url: str, status: int, headers: Dict[str, str]) -> Optional[float]:
+    """
+    按响应头计算缓存时长（秒），不可缓存时返回 None
+
+    Args:
+        url: 请求URL
+        status: 响应状态码
+        headers: 响应头（小写键）
+    """
+    if status != 200 or headers.get("vary", "").strip() == "*" or "set-cookie" in headers:
+        return None
+    directives = _cache_control(headers)
+    if any(name in directives for name in ("no-store", "no-cache", "private")):
+        return None
+    try:
+        max_age = int(directives.get("s-maxage") or directives.get("max-age") or -1)
+    except ValueError:
+        max_age = -1
+    if max_age == 0:
+        return None
+    if "immutable" in directives or is_fingerprinted(url):
+        # 内容不变的资源按最长时间缓存，但不超过响应明确给出的 max-age / s-maxage
+        if max_age > 0:
+            return float(min(max_age, settings.ASSET_CACHE_MAX_TTL))
+        return float(settings.ASSET_CACHE_MAX_TTL)
+    if max_age >= settings.ASSET_CACHE_MIN_TTL:
+        return float(min(max_age, settings.ASSET_CACHE_MAX_TTL))
+    return None
+
+
+@dataclass
+class AssetEntry:
+    """URL 索引项"""
+    url: str
+    sha256: str
+    size: int
+    headers: Dict[str, str]
+    expires_at: float
+    last_access: float
+
+
+class AssetCache:
+    """内容寻址的静态资源磁盘缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，默认 ASSET_CACHE_DIR
+            max_bytes: 资源文件总大小上限，默认 ASSET_CACHE_MAX_BYTES
+        """
+        self.cache_dir = cache_dir or settings.ASSET_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.ASSET_CACHE_MAX_BYTES
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, AssetEntry]" = OrderedDict()  # 按最近访问排序
+        self._blob_refs: Dict[str, int] = {}
+        self._blob_sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+        self._db = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        self._load()
+
+    # ---------- 索引 ----------
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, "objects", sha256[:2], sha256)
+
+    def _load(self) -> None:
+        rows = self._db.execute(
+            "SELECT url, sha256, size, headers, expires_at, last_access FROM assets ORDER BY last_access"
+        ).fetchall()
+        missing = []
+        for url, sha256, size, headers, expires_at, last_access in rows:
+            if not os.path.exists(self._blob_path(sha256)):
+                missing.append((url,))
+                continue
+            self._add_locked(AssetEntry(url, sha256, size, json.loads(headers), expires_at, last_access))
+        if missing:
+            self._db.executemany("DELETE FROM assets WHERE url = ?", missing)
+            self._db.commit()
+        if self._entries:
+            logger.info(f"静态资源缓存已加载 - 条目: {len(self._entries)}, 大小: {self.total_bytes} 字节")
+
+    def _add_locked(self, entry: AssetEntry) -> None:
+        self._entries[entry.url] = entry
+        refs = self._blob_refs.get(entry.sha256, 0)
+        if refs == 0:
+            self._blob_sizes[entry.sha256] = entry.size
+            self.total_bytes += entry.size
+        self._blob_refs[entry.sha256] = refs + 1
+
+    def _remove_locked(self, url: str) -> Optional[str]:
+        """移除索引项，返回不再被引用、需要删除的文件"""
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            return None
+        self._db.execute("DELETE FROM assets WHERE url = ?", (url,))
+        refs = self._blob_refs[entry.sha256] - 1
+        if refs:
+            self._blob_refs[entry.sha256] = refs
+            return None
+        del self._blob_refs[entry.sha256]
+        self.total_bytes -= self._blob_sizes.pop(entry.sha256)
+        return entry.sha256
+
+    def _delete_blobs(self, shas: List[str]) -> None:
+        for sha256 in shas:
+            try:
+                os.remove(self._blob_path(sha256))
+            except OSError:
+                pass
+
+    def read(self, url: str) -> Optional[Tuple[AssetEntry, bytes]]:
+        """读取未过期的缓存，不存在时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                stale = self._remove_locked(url)
+                self._db.commit()
+                entry = None
+            else:
+                entry.last_access = now
+                self._entries.move_to_end(url)
+                stale = None
+        if entry is None:
+            self._delete_blobs([stale] if stale else [])
+            return None
+        try:
+            with open(self._blob_path(entry.sha256), "rb") as f:
+                return entry, f.read()
+        except OSError:
+            # 文件被外部删除
+            with self._lock:
+                self._remove_locked(url)
+                self._db.commit()
+            return None
+
+    def put(self, url: str, body: bytes, headers: Dict[str, str], ttl: float) -> None:
+        """写入缓存，超过大小上限时按 LRU 淘汰"""
+        if len(body) > self.max_bytes:
+            return
+        sha256 = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        kept = {name: headers[name] for name in _KEPT_HEADERS if name in headers}
+        entry = AssetEntry(url, sha256, len(body), kept, now + ttl, now)
+        stale: List[str] = []
+        with self._lock:
+            old = self._remove_locked(url)
+            if old and old != sha256:
+                stale.append(old)
+            self._add_locked(entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO assets (url, sha256, size, headers, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sha256, entry.size, json.dumps(kept), entry.expires_at, now),
+            )
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                removed = self._remove_locked(oldest)
+                self.evictions += 1
+                if removed:
+                    stale.append(removed)
+            self._db.commit()
+            self.stores += 1
+            stale = [sha for sha in stale if sha not in self._blob_refs]
+        self._delete_blobs(stale)
+
+    # ---------- 请求拦截 ----------
+
+    async def install(self, context: Any) -> None:
+        """在浏览器上下文上注册静态资源拦截"""
+        await context.route(is_static_url, self.handle)
+
+    async def handle(self, route: Any) -> None:
+        request = route.request
+        if (request.method != "GET" or request.resource_type not in ASSET_RESOURCE_TYPES
+                or "range" in request.headers):
+            await route.fallback()
+            return
+
+        url = request.url
+        if await self._serve_cached(route, url):
+            return
+
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            # 其他上下文正在下载同一资源，等它写入缓存
+            await asyncio.shield(inflight)
+            if await self._serve_cached(route, url):
+                return
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight.setdefault(url, future)
+        try:
+            await self._fetch_and_store(route, url)
+        finally:
+            if self._inflight.get(url) is future:
+                del self._inflight[url]
+            future.set_result(None)
+
+    async def _serve_cached(self, route: Any, url: str) -> bool:
+        cached = await asyncio.to_thread(self.read, url)
+        if cached is None:
+            return False
+        entry, body = cached
+        self.hits += 1
+        self.bytes_saved += len(body)
+        await route.fulfill(status=200, headers=entry.headers, body=body)
+        return True
+
+    async def _fetch_and_store(self, route: Any, url: str) -> None:
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"静态资源下载失败，交给浏览器处理: {url}, {e}")
+            await route.fallback()
+            return
+
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        ttl = cache_ttl(url, response.status, headers)
+        if ttl is not None:
+            try:
+                await asyncio.to_thread(self.put, url, body, headers, ttl)
+            except Exception as e:
+                log_exception(logger, e, f"写入静态资源缓存失败: {url}")
+        await route.fulfill(response=response, body=body)
+
+    # ---------- 统计 ----------
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "blobs": len(self._blob_refs),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "bytes_saved": self.bytes_saved,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        """把最近访问时间写回索引并关闭数据库"""
+        with self._lock:
+            try:
+                self._db.executemany("UPDATE assets SET last_access = ? WHERE url = ?",
+                                     [(entry.last_access, entry.url) for entry in self._entries.values()])
+                self._db.commit()
+            except Exception as e:
+                log_exception(logger, e, "写回静态资源缓存访问时间失败")
+            self._db.close()
+
+
+_asset_cache: Optional[AssetCache] = None
+
+
+def get_asset_cache() -> AssetCache:
+    global _asset_cache
+    if _asset_cache is None:
+        _asset_cache = AssetCache()
+    return _asset_cache
+
+
+def asset_cache_stats() -> Optional[Dict[str, Any]]:
+    """未启用时返回 None"""
+    return _asset_cache.stats() if _asset_cache is not None else None
+
+
+def close_asset_cache() -> None:
+    global _asset_cache
+    if _asset_cache is not None:
+        _asset_cache.close()
+        _asset_cache = None
@@ -1,52 +1,93 @@
-from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional, Tuple
+import asyncio
 import os
 import json
+import time
+
+if TYPE_CHECKING:
+    # playwright 导入较慢，仅在启动浏览器时导入
+    from playwright.async_api import Browser, Page, BrowserContext
 
 from app.core.logger import get_logger, log_exception, log_function_call
+from app.core.config import settings
+from app.core.concurrency import automation_limiter, concurrency_controller
+from app.core.metrics import metrics_registry, track_playwright
+from .asset_cache import get_asset_cache
+from .browser_pool import CHROMIUM_ARGS, get_browser_pool
+from .api_mode import ApiModeMismatch, ApiPublishFailed, ApiUploader, ApiUploadSpec, cookies_from_storage_state
+from .storage_state import get_storage_state_store
+from .tracing import StepRecord, step_stats
+from .upload_tracker import UploadTracker
 
 logger = get_logger(__name__)
 
+@dataclass
+class LoginDetection:
+    """登录检测结果"""
+    reason: str  # cookie: 出现登录Cookie, url: 跳转到登录后页面, page_closed: 用户关闭了页面
+    logged_in: bool
+    url: Optional[str] = None
+
 class BrowserAutomationBase(ABC):
+    # 登录成功后出现的认证Cookie，全部出现即视为已登录，由各平台覆盖
+    LOGIN_COOKIES: Tuple[str, ...] = ()
+    # 上传请求URL包含的片段，为空时按请求体大小识别上传请求
+    UPLOAD_URL_PATTERNS: Tuple[str, ...] = ()
+    # HTTP 直传（API 模式）的接口描述，为 None 时平台只支持浏览器流程
+    API_UPLOAD_SPEC: Optional[ApiUploadSpec] = None
+    
     def __init__(self, platform: str, storage_state_path: str, proxy: dict = None, 
                  user_agent: str = None, viewport_size: dict = None):
         self.platform = platform
         self.storage_state_path = storage_state_path
+        # 保险库后端的存储状态键（profile:{id} / account:{id}），为空时使用存储路径
+        self.storage_key: Optional[str] = None
         self.proxy = proxy
         self.user_agent = user_agent
         self.viewport_size = viewport_size or {"width": 1920, "height": 1080}
         
-        self.browser: Browser = None
-        self.context: BrowserContext = None
-        self.page: Page = None
+        self.browser: "Browser" = None
+        self.context: "BrowserContext" = None
+        self.page: "Page" = None
         self.playwright = None
+        # 是否在共享浏览器池或浏览器农场中创建上下文（都未启用时每个实例启动自己的浏览器）
+        self.use_browser_pool = settings.BROWSER_POOL_SIZE > 0 or bool(settings.BROWSER_FARM_ADDRESS)
+        self._pooled = False
+        # 无头实例占用自适应并发控制的名额，close() 时归还
+        self._holds_slot = False
+        
+        # 步骤追踪
+        self.task_id: Optional[int] = None
+        self.step_records: List[StepRecord] = []
+        self.trace_on_failure = settings.TRACE_ON_FAILURE
+        self._tracing = False
+        
+        # API 模式由 AutomationFactory 按平台设置；api_transport 供测试指向接口替身
+        self.api_mode = False
+        self.api_transport = None
+        
+        # 任务进度（0-100）及其回调
+        self.progress = 0
+        self.on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+        
+        # 最近一次登录检测结果
+        self.login_detection: Optional[LoginDetection] = None
 
     @log_function_call(logger)
     async def start(self, headless: bool = True) -> None:
         """启动浏览器实例"""
         logger.info(f"开始启动浏览器实例 - 平台: {self.platform}, 无头模式: {headless}")
         
+        if headless and not self._holds_slot:
+            # 有头实例（账户激活）由激活会话自己限制数量
+            await automation_limiter.acquire()
+            self._holds_slot = True
+        
         try:
-            self.playwright = await async_playwright().start()
-            logger.debug("Playwright 启动成功")
-            
-            # 准备启动选项
-            launch_options = {
-                "headless": headless,
-                "args": [
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-web-security",
-                    "--disable-features=VizDisplayCompositor"
-                ]
-            }
-            
-            # 添加代理配置
-            if self.proxy:
-                launch_options["proxy"] = self.proxy
-                logger.debug(f"使用代理配置: {self.proxy}")
-            
             # 准备上下文选项
             context_options = {
                 "viewport": self.viewport_size,
@@ -54,37 +95,262 @@ class BrowserAutomationBase(ABC):
             }
             logger.debug(f"浏览器视窗大小: {self.viewport_size}")
             
-            # 如果存在存储状态文件，则加载
-            if os.path.exists(self.storage_state_path):
-                context_options["storage_state"] = self.storage_state_path
+            # 如果存在存储状态，则加载（经内存缓存，直接传入解析后的状态）
+            store, key = self._state_location()
+            storage_state = await asyncio.to_thread(store.load, key)
+            if storage_state is not None:
+                context_options["storage_state"] = storage_state
                 logger.info(f"加载存储状态: {self.storage_state_path}")
             else:
                 logger.debug(f"存储状态文件不存在: {self.storage_state_path}")
             
-            # 启动浏览器
-            self.browser = await self.playwright.chromium.launch(**launch_options)
-            logger.debug("浏览器启动成功")
-            
-            self.context = await self.browser.new_context(**context_options)
-            logger.debug("浏览器上下文创建成功")
+            if self.use_browser_pool:
+                # 在共享浏览器中创建上下文，代理按上下文设置
+                self.context = await get_browser_pool().new_context(headless=headless, proxy=self.proxy,
+                                                                    **context_options)
+                self._pooled = True
+                logger.debug(f"共享浏览器上下文创建成功，代理: {self.proxy['server'] if self.proxy else '直连'}")
+            else:
+                from playwright.async_api import async_playwright
+                
+                async with track_playwright():
+                    self.playwright = await async_playwright().start()
+                logger.debug("Playwright 启动成功")
+                
+                # 准备启动选项
+                launch_options = {"headless": headless, "args": CHROMIUM_ARGS}
+                
+                # 添加代理配置
+                if self.proxy:
+                    launch_options["proxy"] = self.proxy
+                    logger.debug(f"使用代理配置: {self.proxy}")
+                
+                # 启动浏览器
+                async with track_playwright():
+                    self.browser = await self.playwright.chromium.launch(**launch_options)
+                    logger.debug("浏览器启动成功")
+                    
+                    self.context = await self.browser.new_context(**context_options)
+                    logger.debug("浏览器上下文创建成功")
             
-            self.page = await self.context.new_page()
-            logger.debug("浏览器页面创建成功")
+            async with track_playwright():
+                if settings.ASSET_CACHE_ENABLED:
+                    await get_asset_cache().install(self.context)
+                    logger.debug("静态资源共享缓存已安装")
+                
+                self.page = await self.context.new_page()
+                logger.debug("浏览器页面创建成功")
+                
+                if self.trace_on_failure:
+                    await self.context.tracing.start(screenshots=True, snapshots=True)
+                    self._tracing = True
+                    logger.debug("Playwright 追踪已开启，失败时保存 trace 包")
             
             logger.info(f"浏览器启动完成 - 平台: {self.platform}, 无头模式: {headless}")
             
         except Exception as e:
             log_exception(logger, e, f"启动浏览器失败 - 平台: {self.platform}")
+            self._release_slot()
             raise
 
+    def bind_task(self, task_id: Optional[int],
+                  on_progress: Optional[Callable[[int], Awaitable[None]]] = None) -> None:
+        """
+        绑定当前执行的任务，步骤记录会写入该任务的日志
+
+        Args:
+            task_id: 任务ID
+            on_progress: 任务进度（0-100）变化时的回调，例如 task_service.task_progress_reporter(task_id)
+        """
+        self.task_id = task_id
+        self.step_records = []
+        self.progress = 0
+        self.on_progress = on_progress
+
+    async def report_progress(self, progress: int) -> None:
+        """更新任务进度，回调失败只记录日志，不影响自动化流程"""
+        progress = max(0, min(100, int(progress)))
+        if progress == self.progress:
+            return
+        self.progress = progress
+        if self.on_progress:
+            try:
+                await self.on_progress(progress)
+            except Exception as e:
+                log_exception(logger, e, f"更新任务进度失败 - 平台: {self.platform}, 任务: {self.task_id}")
+
+    def track_upload(self, file_path: str, start: int = 0, end: int = 100) -> UploadTracker:
+        """
+        开始追踪文件上传，在 set_input_files 之前调用，之后 await tracker.wait()
+
+        上传百分比映射到任务进度的 start..end 区间。
+        """
+        async def on_upload_progress(percent: int) -> None:
+            await self.report_progress(start + (end - start) * percent / 100)
+
+        return UploadTracker.for_file(
+            self.page, file_path, url_patterns=self.UPLOAD_URL_PATTERNS, on_progress=on_upload_progress
+        ).start()
+
+    @asynccontextmanager
+    async def step(self, name: str):
+        """
+        追踪一个自动化步骤
+
+        记录开始/结束时间、耗时和结果，并计入 (平台, 步骤) 的耗时统计。
+        步骤失败且开启了 trace_on_failure 时保存 Playwright trace 包。
+
+        用法：
+            async with self.step("fill_title"):
+                await self.page.fill(...)
+
+        Args:
+            name: 步骤名称
+        """
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        outcome = "success"
+        error = None
+        trace_path = None
+        try:
+            async with track_playwright():
+                yield
+        except BaseException as e:
+            outcome = "error"
+            error = f"{type(e).__name__}: {e}"
+            trace_path = await self._save_failure_trace(name)
+            raise
+        finally:
+            record = StepRecord(
+                platform=self.platform,
+                step=name,
+                started_at=started_at,
+                ended_at=datetime.utcnow(),
+                duration_ms=round((time.perf_counter() - start) * 1000, 1),
+                outcome=outcome,
+                error=error,
+                trace_path=trace_path,
+            )
+            self.step_records.append(record)
+            step_stats.record(record)
+            if outcome == "success":
+                concurrency_controller.record_step(self.platform, name, record.duration_ms)
+            logger.debug(f"步骤完成 - 平台: {self.platform}, 步骤: {name}, 耗时: {record.duration_ms}ms, 结果: {outcome}")
+
+    async def _save_failure_trace(self, step_name: str) -> Optional[str]:
+        """保存当前追踪分片为 trace 包，返回文件路径"""
+        if not self._tracing or not self.context:
+            return None
+
+        try:
+            os.makedirs(settings.TRACE_DIR, exist_ok=True)
+            file_name = f"{self.platform}_{self.task_id or 'na'}_{step_name}_{datetime.utcnow():%Y%m%d%H%M%S}.zip"
+            trace_path = os.path.join(settings.TRACE_DIR, file_name)
+            await self.context.tracing.stop_chunk(path=trace_path)
+            await self.context.tracing.start_chunk()
+            logger.info(f"步骤失败，trace 包已保存: {trace_path}")
+            return trace_path
+        except Exception as e:
+            log_exception(logger, e, f"保存 trace 包失败 - 平台: {self.platform}, 步骤: {step_name}")
+            return None
+
+    def is_logged_in_url(self, url: str) -> bool:
+        """登录完成后跳转的页面判断，默认不按URL判断，由各平台按需覆盖"""
+        return False
+
+    async def has_login_cookies(self) -> bool:
+        """检查上下文中是否已有全部登录Cookie"""
+        if not self.LOGIN_COOKIES or not self.context:
+            return False
+        cookies = await self.context.cookies()
+        names = {cookie["name"] for cookie in cookies if cookie.get("value")}
+        return all(name in names for name in self.LOGIN_COOKIES)
+
+    @log_function_call(logger)
+    async def detect_login(self, timeout: Optional[float] = None, save_state: bool = True) -> LoginDetection:
+        """
+        事件驱动的登录检测
+
+        同时监听三类 Playwright 事件，任一满足即返回，不做轮询：
+        - 上下文的响应带有 LOGIN_COOKIES 中的 Set-Cookie，且确认Cookie已写入
+        - 主框架导航到 is_logged_in_url 认可的页面（导航后也会检查一次Cookie，覆盖JS写Cookie的情况）
+        - 用户关闭页面（此时再检查一次Cookie决定是否已登录）
+
+        检测到后立即保存存储状态。
+
+        Args:
+            timeout: 超时时间（秒），None 表示一直等待，超时抛出 asyncio.TimeoutError
+            save_state: 检测到后是否保存存储状态
+
+        Returns:
+            登录检测结果
+        """
+        logger.info(f"开始监听登录事件 - 平台: {self.platform}, 登录Cookie: {self.LOGIN_COOKIES}")
+        result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        def resolve(reason: str, logged_in: bool, url: Optional[str] = None) -> None:
+            if not result.done():
+                result.set_result(LoginDetection(reason=reason, logged_in=logged_in, url=url))
+
+        async def check_cookies() -> None:
+            try:
+                if await self.has_login_cookies():
+                    resolve("cookie", True, self.page.url if self.page else None)
+            except Exception as e:
+                logger.debug(f"检查登录Cookie失败: {e}")
+
+        async def on_response(response) -> None:
+            if result.done() or not self.LOGIN_COOKIES:
+                return
+            try:
+                set_cookie = await response.header_value("set-cookie")
+            except Exception:
+                return
+            if set_cookie and any(f"{name}=" in set_cookie for name in self.LOGIN_COOKIES):
+                await check_cookies()
+
+        async def on_navigated(frame) -> None:
+            if result.done() or frame != self.page.main_frame:
+                return
+            if self.is_logged_in_url(frame.url):
+                resolve("url", True, frame.url)
+                return
+            await check_cookies()
+
+        def on_close(page) -> None:
+            resolve("page_closed", False)
+
+        self.context.on("response", on_response)
+        self.page.on("framenavigated", on_navigated)
+        self.page.on("close", on_close)
+        try:
+            # 已加载的存储状态可能本身就是登录态
+            await check_cookies()
+            detection = await asyncio.wait_for(result, timeout=timeout)
+        finally:
+            self.context.remove_listener("response", on_response)
+            self.page.remove_listener("framenavigated", on_navigated)
+            self.page.remove_listener("close", on_close)
+
+        if detection.reason == "page_closed":
+            # 页面关闭后上下文仍在，以Cookie为准
+            detection.logged_in = await self.has_login_cookies() if self.LOGIN_COOKIES else True
+
+        self.login_detection = detection
+        logger.info(f"登录检测完成 - 平台: {self.platform}, 方式: {detection.reason}, 已登录: {detection.logged_in}")
+
+        if save_state:
+            await self._save_storage_state()
+        return detection
+
     @abstractmethod
     def get_login_url(self) -> str:
         """获取登录页面URL"""
         pass
 
     @abstractmethod
-    async def wait_for_login_completion(self) -> None:
-        """等待用户登录完成"""
+    async def wait_for_login_completion(self) -> LoginDetection:
+        """等待用户登录完成并返回登录检测结果；不设超时（由调用方控制），检测出错时抛出异常"""
         pass
 
     @abstractmethod
@@ -107,29 +373,131 @@ class BrowserAutomationBase(ABC):
         """发布视频"""
         pass
 
+    @log_function_call(logger)
+    async def publish(self, video_path: str, title: str, description: str, headless: bool = True) -> bool:
+        """
+        发布视频，调用方不需要先 start()
+
+        开启 API 模式时先走 HTTP 直传，不启动浏览器；前置条件或接口响应不一致时回退到浏览器流程。
+        发布请求已经发出后失败不回退，避免重复发布。
+        """
+        if self.api_mode:
+            try:
+                result = await self.publish_video_api(video_path, title, description)
+                metrics_registry.increment("api_mode_publishes")
+                return result
+            except ApiModeMismatch as e:
+                metrics_registry.increment("api_mode_fallbacks")
+                logger.warning(f"API 模式不可用，回退浏览器流程 - 平台: {self.platform}, 原因: {e}")
+            except ApiPublishFailed as e:
+                log_exception(logger, e, f"API 模式提交发布失败 - 平台: {self.platform}")
+                return False
+
+        if self.page is None:
+            await self.start(headless=headless)
+        return await self.publish_video(video_path, title, description)
+
+    async def publish_video_api(self, video_path: str, title: str, description: str) -> bool:
+        """
+        按 API_UPLOAD_SPEC 直传发布，Cookie 取自已保存的存储状态
+
+        Raises:
+            ApiModeMismatch: 前置条件或接口响应不一致，可以回退浏览器流程
+            ApiPublishFailed: 发布请求发出后失败
+        """
+        spec = self.API_UPLOAD_SPEC
+        if spec is None:
+            raise ApiModeMismatch(f"平台没有上传接口描述: {self.platform}")
+
+        store, key = self._state_location()
+        state = await asyncio.to_thread(store.load, key)
+        cookies = cookies_from_storage_state(state, spec.cookie_domain)
+
+        proxy_url = None
+        if self.proxy:
+            proxy_url = self.proxy["server"]
+            if self.proxy.get("username"):
+                scheme, _, address = proxy_url.partition("://")
+                proxy_url = f"{scheme}://{self.proxy['username']}:{self.proxy.get('password', '')}@{address}"
+
+        async def on_upload_progress(percent: int) -> None:
+            await self.report_progress(10 + 70 * percent / 100)
+
+        uploader = ApiUploader(spec, cookies, user_agent=self.user_agent, proxy=proxy_url,
+                               transport=self.api_transport, on_progress=on_upload_progress)
+        try:
+            async with self.step("api_upload"):
+                video_id = await uploader.upload(video_path)
+            async with self.step("api_publish"):
+                await uploader.publish(video_id, title, description)
+        finally:
+            await uploader.close()
+
+        await self.report_progress(100)
+        logger.info(f"API 模式发布成功 - 平台: {self.platform}, 视频ID: {video_id}")
+        return True
+
     @log_function_call(logger)
     async def close(self) -> None:
         """关闭浏览器"""
         logger.info(f"开始关闭浏览器 - 平台: {self.platform}")
         
         try:
-            if self.page:
-                await self.page.close()
-                logger.debug("浏览器页面已关闭")
-            if self.context:
-                await self.context.close()
+            async with track_playwright():
+                if self._tracing and self.context:
+                    # 未失败的追踪数据直接丢弃
+                    self._tracing = False
+                    await self.context.tracing.stop()
+                if self.page:
+                    await self.page.close()
+                    logger.debug("浏览器页面已关闭")
+        except Exception as e:
+            # 页面已崩溃或关闭失败时，上下文仍要关闭或归还
+            log_exception(logger, e, f"关闭浏览器页面时出错 - 平台: {self.platform}")
+
+        try:
+            if self.context and self._pooled:
+                # 单独归还共享上下文：否则上下文留在池中，排空中的浏览器永远不会关闭
+                try:
+                    await get_browser_pool().release(self.context)
+                    logger.debug("共享浏览器上下文已归还")
+                finally:
+                    self._pooled = False
+            elif self.context:
+                async with track_playwright():
+                    await self.context.close()
                 logger.debug("浏览器上下文已关闭")
-            if self.browser:
-                await self.browser.close()
-                logger.debug("浏览器实例已关闭")
-            if self.playwright:
-                await self.playwright.stop()
-                logger.debug("Playwright 已停止")
+            async with track_playwright():
+                if self.browser:
+                    await self.browser.close()
+                    logger.debug("浏览器实例已关闭")
+                if self.playwright:
+                    await self.playwright.stop()
+                    logger.debug("Playwright 已停止")
             
             logger.info(f"浏览器关闭完成 - 平台: {self.platform}")
             
         except Exception as e:
             log_exception(logger, e, f"关闭浏览器时出错 - 平台: {self.platform}")
+        finally:
+            self._release_slot()
+
+    def _release_slot(self) -> None:
+        if self._holds_slot:
+            self._holds_slot = False
+            automation_limiter.release()
+
+    def _state_location(self):
+        """当前存储状态后端及本实例对应的键：文件后端以路径为键，保险库后端以配置键为键"""
+        store = get_storage_state_store()
+        if store.uses_paths:
+            return store, self.storage_state_path
+        return store, self.storage_key or self.storage_state_path
+
+    async def has_stored_login_cookies(self) -> bool:
+        """不启动浏览器，检查已保存的存储状态中是否有未过期的登录Cookie"""
+        store, key = self._state_location()
+        return await asyncio.to_thread(store.has_cookies, key, self.LOGIN_COOKIES)
 
     @log_function_call(logger)
     async def _save_storage_state(self) -> None:
@@ -138,10 +506,15 @@ class BrowserAutomationBase(ABC):
         
         try:
             if self.context:
-                # 确保目录存在
-                os.makedirs(os.path.dirname(self.storage_state_path), exist_ok=True)
-                await self.context.storage_state(path=self.storage_state_path)
-                logger.info(f"存储状态保存成功: {self.storage_state_path}")
+                async with track_playwright():
+                    state = await self.context.storage_state()
+                # 内容未变化时跳过写入，变化时原子写入并保留历史版本
+                store, key = self._state_location()
+                written = await asyncio.to_thread(store.save, key, state)
+                if written:
+                    logger.info(f"存储状态保存成功: {self.storage_state_path}")
+                else:
+                    logger.debug(f"存储状态未变化: {self.storage_state_path}")
             else:
                 logger.warning("浏览器上下文不存在，无法保存存储状态")
                 
@@ -151,17 +524,25 @@ class BrowserAutomationBase(ABC):
 
     @log_function_call(logger)
     async def _load_storage_state(self) -> bool:
-        """加载浏览器存储状态"""
+        """
+        将存储状态中的 Cookie 加载到已创建的上下文
+
+        localStorage 只能在创建上下文时通过 storage_state 选项注入（start() 中已处理），这里只恢复 Cookie。
+        """
         logger.debug(f"开始加载存储状态: {self.storage_state_path}")
         
-        if os.path.exists(self.storage_state_path):
-            try:
-                await self.context.storage_state(path=self.storage_state_path)
-                logger.info(f"存储状态加载成功: {self.storage_state_path}")
-                return True
-            except Exception as e:
-                log_exception(logger, e, f"加载存储状态失败: {self.storage_state_path}")
+        try:
+            store, key = self._state_location()
+            state = await asyncio.to_thread(store.load, key)
+            if state is None:
+                logger.debug(f"存储状态文件不存在: {self.storage_state_path}")
                 return False
-        else:
-            logger.debug(f"存储状态文件不存在: {self.storage_state_path}")
+            cookies = state.get("cookies", [])
+            if cookies:
+                async with track_playwright():
+                    await self.context.add_cookies(cookies)
+            logger.info(f"存储状态加载成功: {self.storage_state_path}, Cookie数: {len(cookies)}")
+            return True
+        except Exception as e:
+            log_exception(logger, e, f"加载存储状态失败: {self.storage_state_path}")
             return False
\ No newline at end of file
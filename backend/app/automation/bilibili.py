@@ -1,8 +1,15 @@
-from .base import BrowserAutomationBase
-from app.core.logger import logger, log_function_call, log_exception
+from .base import BrowserAutomationBase, LoginDetection
+from app.core.logger import get_logger, log_function_call, log_exception
 import asyncio
 
+logger = get_logger(__name__)
+
 class ExamplePlatformAutomation(BrowserAutomationBase):
+    # 登录成功后下发的会话Cookie
+    LOGIN_COOKIES = ("SESSDATA",)
+    # 上传请求URL片段：投稿视频经 upos 节点分片上传
+    UPLOAD_URL_PATTERNS = ("upos-", "bilivideo.com", "partNumber=")
+
     def __init__(self, platform: str, storage_state_path: str, proxy: dict = None, 
                  user_agent: str = None, viewport_size: dict = None):
         super().__init__(platform, storage_state_path, proxy, user_agent, viewport_size)
@@ -20,22 +27,17 @@ class ExamplePlatformAutomation(BrowserAutomationBase):
         return self.login_url
 
     @log_function_call(logger)
-    async def wait_for_login_completion(self) -> None:
+    async def wait_for_login_completion(self) -> LoginDetection:
         """
         等待用户在有头浏览器中手动完成登录
-        用户关闭浏览器后即认为登录完成
+        出现登录Cookie即认为登录完成，用户关闭浏览器时以Cookie判断是否已登录；
+        超时由调用方控制，检测出错时抛出异常
         """
         logger.info("等待用户在浏览器中完成登录...")
-        logger.info("请在浏览器中完成登录操作，完成后直接关闭浏览器窗口")
-        
-        try:
-            # 等待浏览器被用户关闭
-            await self.page.wait_for_event('close', timeout=600000)  # 最长等待10分钟
-            logger.info("检测到浏览器已关闭，认为用户登录完成")
-        except asyncio.TimeoutError:
-            logger.warning("等待浏览器关闭超时，但继续执行")
-        except Exception as e:
-            log_exception(logger, e, "等待登录完成时出错")
+        detection = await self.detect_login()
+        if not detection.logged_in:
+            logger.warning("页面已关闭，未检测到登录")
+        return detection
 
     @log_function_call(logger)
     async def save_login_state(self) -> None:
@@ -0,0 +1,696 @@
+"""
+浏览器农场守护进程
+
+uvicorn 多 worker 运行时，每个 worker 都有自己的 Playwright 和共享浏览器池，浏览器之间不能共享，
+也没有全局的并发和内存上限。浏览器农场是一个独立进程，持有全部 Chromium：
+
+- 每个浏览器是一个 Playwright 浏览器服务（launch-server），worker 通过 WebSocket 连接（chromium.connect）
+- worker 通过本地 TCP 连接（JSON 行协议）向农场租用上下文：农场选出负载最低的浏览器并返回其 wsEndpoint，
+  worker 在上面创建上下文（代理按上下文设置），用完后归还
+- 全局预算：浏览器数、每个浏览器的上下文数、上下文总数、Chromium 进程树 RSS；超出预算时租用请求排队等待，
+  超时返回 busy
+- worker 断开连接时自动归还它的全部租约；浏览器进程退出后移出农场；空闲超过 FARM_IDLE_TIMEOUT 的浏览器关闭
+- 累计租约数或进程树 RSS 超过回收策略（browser_watchdog.py）的浏览器排空：不再分配租约，最后一个租约归还后关闭
+
+启动农场（在 backend 目录下）：
+    python -m app.automation.browser_farm --address 127.0.0.1:9323
+
+worker 配置 BROWSER_FARM_ADDRESS=127.0.0.1:9323 后，get_browser_pool() 返回 RemoteBrowserPool，
+自动化实例从农场租用上下文；农场统计见 /system/status 的 browser_farm。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.core.metrics import track_playwright
+from app.core.process_stats import process_tree_stats
+from .browser_pool import CHROMIUM_ARGS, PER_CONTEXT_PROXY, PROXY_DIRECT, _start_playwright
+from .browser_watchdog import RecyclePolicy
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext
+
+logger = get_logger(__name__)
+
+DEFAULT_ADDRESS = "127.0.0.1:9323"
+
+# 协议中单行消息的长度上限
+_LINE_LIMIT = 1024 * 1024
+
+
+class FarmBusy(Exception):
+    """超出预算，等待超时"""
+    pass
+
+
+class FarmError(Exception):
+    """农场返回错误或连接失败"""
+    pass
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+@dataclass
+class FarmBudget:
+    """全局预算"""
+    max_browsers: int = 4
+    max_contexts_per_browser: int = 20
+    max_contexts: int = 60
+    memory_budget_mb: int = 4096  # Chromium 进程树 RSS 上限，0 表示不限制
+
+    @classmethod
+    def from_settings(cls) -> "FarmBudget":
+        return cls(
+            max_browsers=settings.FARM_MAX_BROWSERS,
+            max_contexts_per_browser=settings.FARM_MAX_CONTEXTS_PER_BROWSER,
+            max_contexts=settings.FARM_MAX_CONTEXTS,
+            memory_budget_mb=settings.FARM_MEMORY_BUDGET_MB,
+        )
+
+
+# ==================== 浏览器服务 ====================
+
+@dataclass
+class LaunchedServer:
+    """一个浏览器服务进程"""
+    ws_endpoint: str
+    pid: int
+    process: Any = field(default=None, repr=False)
+
+    async def wait(self) -> None:
+        """等待进程退出"""
+        await self.process.wait()
+
+    async def stop(self) -> None:
+        if self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+
+def _driver_command() -> List[str]:
+    from playwright._impl._driver import compute_driver_executable
+
+    driver = compute_driver_executable()
+    # 新版本返回 (node, cli.js)，旧版本返回 playwright.sh / playwright.cmd
+    return list(driver) if isinstance(driver, tuple) else [str(driver)]
+
+
+class BrowserServerLauncher:
+    """用 Playwright 驱动的 launch-server 命令启动浏览器服务"""
+
+    async def launch(self, headless: bool) -> LaunchedServer:
+        options = {"headless": headless, "args": CHROMIUM_ARGS, "proxy": PER_CONTEXT_PROXY}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(options, f)
+            config_path = f.name
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *_driver_command(), "launch-server", "--browser", "chromium", "--config", config_path,
+                stdout=asyncio.subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), timeout=60)
+            except asyncio.TimeoutError:
+                process.kill()
+                raise FarmError("启动浏览器服务超时")
+            ws_endpoint = line.decode().strip()
+            if not ws_endpoint.startswith("ws"):
+                if process.returncode is None:
+                    process.kill()
+                code = await process.wait()
+                raise FarmError(f"启动浏览器服务失败（退出码 {code}）: {ws_endpoint}")
+            return LaunchedServer(ws_endpoint=ws_endpoint, pid=process.pid, process=process)
+        finally:
+            os.unlink(config_path)
+
+
+@dataclass
+class FarmBrowser:
+    """农场中的一个浏览器"""
+    browser_id: str
+    headless: bool
+    server: LaunchedServer
+    leases: Set[str] = field(default_factory=set)
+    leases_total: int = 0
+    rss_bytes: int = 0
+    idle_since: float = field(default_factory=time.monotonic)
+    draining: Optional[str] = None  # 排空原因
+
+
+@dataclass
+class Lease:
+    """上下文租约"""
+    lease_id: str
+    browser_id: str
+    ws_endpoint: str
+    headless: bool
+
+
+# ==================== 农场 ====================
+
+class BrowserFarm:
+    """持有全部浏览器，按全局预算分配上下文租约"""
+
+    def __init__(self, budget: Optional[FarmBudget] = None, launcher: Optional[BrowserServerLauncher] = None,
+                 rss_sampler: Optional[Callable[[int], int]] = None, idle_timeout: Optional[float] = None,
+                 policy: Optional[RecyclePolicy] = None):
+        """
+        Args:
+            budget: 全局预算，默认取配置
+            launcher: 浏览器服务启动器，测试时替换
+            rss_sampler: rss_sampler(pid) 返回浏览器服务进程树的 RSS（字节）
+            idle_timeout: 没有租约的浏览器保留时间（秒），默认 FARM_IDLE_TIMEOUT
+            policy: 浏览器回收策略，默认取配置（农场不持有上下文，只按租约数和 RSS 回收）
+        """
+        self.budget = budget or FarmBudget.from_settings()
+        self.launcher = launcher or BrowserServerLauncher()
+        self.rss_sampler = rss_sampler or (lambda pid: process_tree_stats(pid)["rss_bytes"])
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.FARM_IDLE_TIMEOUT
+        self.policy = policy or RecyclePolicy.from_settings()
+
+        self._browsers: Dict[str, FarmBrowser] = {}
+        self._leases: Dict[str, Lease] = {}
+        self._client_leases: Dict[str, Set[str]] = {}
+        self._cond = asyncio.Condition()
+        self._watchers: List[asyncio.Task] = []
+
+        self.leases_granted = 0
+        self.leases_rejected = 0
+        self.waiting = 0
+        self.browsers_launched = 0
+        self.browsers_exited = 0
+        self.browsers_restarted = 0
+
+    @property
+    def rss_bytes(self) -> int:
+        return sum(browser.rss_bytes for browser in self._browsers.values())
+
+    def _over_memory(self) -> bool:
+        return bool(self.budget.memory_budget_mb) and self.rss_bytes > self.budget.memory_budget_mb * 1024 * 1024
+
+    async def _launch_locked(self, headless: bool) -> FarmBrowser:
+        server = await self.launcher.launch(headless)
+        browser = FarmBrowser(browser_id=uuid.uuid4().hex[:12], headless=headless, server=server)
+        self._browsers[browser.browser_id] = browser
+        self.browsers_launched += 1
+        self._watchers.append(asyncio.create_task(self._watch(browser)))
+        logger.info(f"农场浏览器已启动 - ID: {browser.browser_id}, 无头模式: {headless}, PID: {server.pid}, "
+                    f"当前浏览器数: {len(self._browsers)}")
+        return browser
+
+    async def _watch(self, browser: FarmBrowser) -> None:
+        """浏览器服务进程退出后移出农场，它的租约随之失效"""
+        try:
+            await browser.server.wait()
+        except asyncio.CancelledError:
+            return
+        async with self._cond:
+            if self._browsers.pop(browser.browser_id, None) is None:
+                return
+            for lease_id in browser.leases:
+                self._leases.pop(lease_id, None)
+            self.browsers_exited += 1
+            self._cond.notify_all()
+        logger.warning(f"农场浏览器已退出 - ID: {browser.browser_id}, 丢失租约: {len(browser.leases)}")
+
+    async def _stop_locked(self, browser: FarmBrowser) -> None:
+        self._browsers.pop(browser.browser_id, None)
+        try:
+            await browser.server.stop()
+        except Exception as e:
+            log_exception(logger, e, f"关闭农场浏览器失败 - ID: {browser.browser_id}")
+
+    async def _drain_locked(self, browser: FarmBrowser, reason: str) -> None:
+        """排空浏览器：不再分配租约，租约全部归还后关闭，腾出的名额由新浏览器接替"""
+        if browser.draining:
+            return
+        browser.draining = reason
+        logger.info(f"农场浏览器开始排空 - ID: {browser.browser_id}, 原因: {reason}, 剩余租约: {len(browser.leases)}")
+        if not browser.leases:
+            await self._retire_locked(browser)
+
+    async def _retire_locked(self, browser: FarmBrowser) -> None:
+        await self._stop_locked(browser)
+        self.browsers_restarted += 1
+        logger.info(f"农场浏览器已排空并关闭 - ID: {browser.browser_id}, 累计租约: {browser.leases_total}")
+
+    async def _pick_locked(self, headless: bool) -> Optional[FarmBrowser]:
+        """选出可以承接新上下文的浏览器，必要时启动新浏览器；超出预算时返回 None"""
+        if len(self._leases) >= self.budget.max_contexts or self._over_memory():
+            return None
+        candidates = [b for b in self._browsers.values()
+                      if b.headless == headless and not b.draining
+                      and len(b.leases) < self.budget.max_contexts_per_browser]
+        least = min(candidates, key=lambda b: len(b.leases), default=None)
+        if least is not None and (not least.leases or len(self._browsers) >= self.budget.max_browsers):
+            return least
+        if least is None and len(self._browsers) >= self.budget.max_browsers:
+            # 另一种模式的空闲浏览器让出名额
+            idle = next((b for b in self._browsers.values() if b.headless != headless and not b.leases), None)
+            if idle is not None:
+                await self._stop_locked(idle)
+        if len(self._browsers) < self.budget.max_browsers:
+            return await self._launch_locked(headless)
+        return least
+
+    async def lease(self, client: str, headless: bool = True, timeout: Optional[float] = None) -> Lease:
+        """
+        租用一个上下文
+
+        Args:
+            client: 客户端标识，客户端断开时归还它的全部租约
+            headless: 是否使用无头浏览器
+            timeout: 超出预算时的最长等待时间（秒），默认 FARM_LEASE_TIMEOUT
+
+        Raises:
+            FarmBusy: 等待超时
+        """
+        timeout = settings.FARM_LEASE_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        async with self._cond:
+            while True:
+                browser = await self._pick_locked(headless)
+                if browser is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.leases_rejected += 1
+                    raise FarmBusy(f"浏览器农场已满：上下文 {len(self._leases)}/{self.budget.max_contexts}，"
+                                   f"内存 {self.rss_bytes // 1024 // 1024}/{self.budget.memory_budget_mb}MB")
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self.waiting -= 1
+
+            lease = Lease(lease_id=uuid.uuid4().hex, browser_id=browser.browser_id,
+                          ws_endpoint=browser.server.ws_endpoint, headless=headless)
+            browser.leases.add(lease.lease_id)
+            browser.leases_total += 1
+            reason = self.policy.uses_exceeded(browser.leases_total)
+            if reason is not None:
+                await self._drain_locked(browser, reason)
+            self._leases[lease.lease_id] = lease
+            self._client_leases.setdefault(client, set()).add(lease.lease_id)
+            self.leases_granted += 1
+        return lease
+
+    async def release(self, lease_id: str, client: Optional[str] = None) -> bool:
+        """归还租约，返回租约是否存在"""
+        async with self._cond:
+            lease = self._leases.pop(lease_id, None)
+            if client is not None:
+                self._client_leases.get(client, set()).discard(lease_id)
+            if lease is None:
+                return False
+            browser = self._browsers.get(lease.browser_id)
+            if browser is not None:
+                browser.leases.discard(lease_id)
+                if not browser.leases:
+                    browser.idle_since = time.monotonic()
+                    if browser.draining:
+                        await self._retire_locked(browser)
+            self._cond.notify_all()
+        return True
+
+    async def release_client(self, client: str) -> int:
+        """归还客户端的全部租约"""
+        lease_ids = self._client_leases.pop(client, set())
+        released = 0
+        for lease_id in lease_ids:
+            released += await self.release(lease_id)
+        if released:
+            logger.warning(f"客户端断开，归还租约 {released} 个 - 客户端: {client}")
+        return released
+
+    async def maintain(self) -> None:
+        """采样内存、排空超过回收策略的浏览器、关闭空闲浏览器，释放名额后唤醒等待的租用请求"""
+        browsers = list(self._browsers.values())
+        samples = await asyncio.gather(*(asyncio.to_thread(self.rss_sampler, b.server.pid) for b in browsers),
+                                       return_exceptions=True)
+        async with self._cond:
+            for browser, rss in zip(browsers, samples):
+                if isinstance(rss, int):
+                    browser.rss_bytes = rss
+                    reason = self.policy.rss_exceeded(rss)
+                    if reason is not None and browser.browser_id in self._browsers:
+                        await self._drain_locked(browser, reason)
+            now = time.monotonic()
+            for browser in list(self._browsers.values()):
+                if not browser.leases and now - browser.idle_since >= self.idle_timeout:
+                    logger.info(f"关闭空闲的农场浏览器 - ID: {browser.browser_id}")
+                    await self._stop_locked(browser)
+            self._cond.notify_all()
+
+    async def run_maintenance(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.maintain()
+            except Exception as e:
+                log_exception(logger, e, "浏览器农场维护失败")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": asdict(self.budget),
+            "browsers": [
+                {"id": b.browser_id, "headless": b.headless, "pid": b.server.pid, "leases": len(b.leases),
+                 "leases_total": b.leases_total, "rss_mb": round(b.rss_bytes / 1024 / 1024, 1),
+                 "draining": b.draining}
+                for b in self._browsers.values()
+            ],
+            "leases": len(self._leases),
+            "clients": sum(1 for leases in self._client_leases.values() if leases),
+            "waiting": self.waiting,
+            "rss_mb": round(self.rss_bytes / 1024 / 1024, 1),
+            "leases_granted": self.leases_granted,
+            "leases_rejected": self.leases_rejected,
+            "browsers_launched": self.browsers_launched,
+            "browsers_exited": self.browsers_exited,
+            "browsers_restarted": self.browsers_restarted,
+        }
+
+    async def close(self) -> None:
+        for task in self._watchers:
+            task.cancel()
+        async with self._cond:
+            for browser in list(self._browsers.values()):
+                await self._stop_locked(browser)
+            self._leases.clear()
+            self._client_leases.clear()
+
+
+# ==================== 协议 ====================
+
+class FarmServer:
+    """农场的本地 TCP 服务，每行一个 JSON 请求/响应"""
+
+    def __init__(self, farm: BrowserFarm, host: str = "127.0.0.1", port: int = 9323):
+        self.farm = farm
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._client_ids = itertools.count(1)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=_LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"浏览器农场已监听 {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = f"client-{next(self._client_ids)}"
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+
+        async def respond(message: Dict[str, Any]) -> None:
+            async with write_lock:
+                writer.write(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+
+        async def dispatch(message: Dict[str, Any]) -> None:
+            request_id = message.get("id")
+            try:
+                result = await self._execute(client, message)
+                await respond({"id": request_id, "ok": True, **result})
+            except FarmBusy as e:
+                await respond({"id": request_id, "ok": False, "busy": True, "error": str(e)})
+            except Exception as e:
+                log_exception(logger, e, f"处理农场请求失败 - 客户端: {client}, 操作: {message.get('op')}")
+                try:
+                    await respond({"id": request_id, "ok": False, "error": str(e)})
+                except ConnectionError:
+                    pass
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    await respond({"ok": False, "error": "无效的请求"})
+                    continue
+                # 租用请求可能排队等待，每个请求单独处理
+                task = asyncio.create_task(dispatch(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.farm.release_client(client)
+            writer.close()
+
+    async def _execute(self, client: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        op = message.get("op")
+        if op == "lease":
+            lease = await self.farm.lease(client, headless=bool(message.get("headless", True)),
+                                          timeout=message.get("timeout"))
+            return {"lease": asdict(lease)}
+        if op == "release":
+            return {"released": await self.farm.release(message["lease_id"], client)}
+        if op == "stats":
+            return {"stats": self.farm.stats()}
+        raise ValueError(f"未知操作: {op}")
+
+
+class FarmClient:
+    """worker 端的农场客户端，一条连接上并发多个请求"""
+
+    def __init__(self, address: Optional[str] = None):
+        self.host, self.port = parse_address(address or settings.BROWSER_FARM_ADDRESS)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def _ensure_connected(self) -> None:
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=_LINE_LIMIT)
+            except OSError as e:
+                raise FarmError(f"无法连接浏览器农场 {self.host}:{self.port}: {e}")
+            self._reader_task = asyncio.create_task(self._read_loop(self._reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"浏览器农场连接异常: {e}")
+        finally:
+            # 连接断开后农场已归还本连接的全部租约
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(FarmError("与浏览器农场的连接已断开"))
+
+    async def request(self, op: str, **params: Any) -> Dict[str, Any]:
+        await self._ensure_connected()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "op": op, **params}).encode() + b"\n")
+        await self._writer.drain()
+        message = await future
+        if not message.get("ok"):
+            error = message.get("error", "未知错误")
+            raise FarmBusy(error) if message.get("busy") else FarmError(error)
+        return message
+
+    async def lease(self, headless: bool = True, timeout: Optional[float] = None) -> Lease:
+        message = await self.request("lease", headless=headless, timeout=timeout)
+        return Lease(**message["lease"])
+
+    async def release(self, lease_id: str) -> bool:
+        return (await self.request("release", lease_id=lease_id))["released"]
+
+    async def stats(self) -> Dict[str, Any]:
+        return (await self.request("stats"))["stats"]
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+
+
+def farm_stats(address: Optional[str] = None, timeout: float = 2.0) -> Dict[str, Any]:
+    """同步读取农场统计（供 /system/status 使用）"""
+    host, port = parse_address(address or settings.BROWSER_FARM_ADDRESS)
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(json.dumps({"id": 0, "op": "stats"}).encode() + b"\n")
+        with sock.makefile("rb") as stream:
+            message = json.loads(stream.readline())
+    if not message.get("ok"):
+        raise FarmError(message.get("error", "未知错误"))
+    return message["stats"]
+
+
+# ==================== worker 端浏览器池 ====================
+
+class RemoteBrowserPool:
+    """从浏览器农场租用上下文，接口与 BrowserPool 相同"""
+
+    def __init__(self, client: Optional[FarmClient] = None,
+                 playwright_factory: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.client = client or FarmClient()
+        self._playwright_factory = playwright_factory or _start_playwright
+        self._playwright = None
+        self._connections: Dict[str, "Browser"] = {}  # wsEndpoint -> 已连接的浏览器
+        self._connect_lock = asyncio.Lock()
+        self._leases: Dict[int, str] = {}  # id(context) -> 租约ID
+
+    async def _connect(self, ws_endpoint: str) -> "Browser":
+        async with self._connect_lock:
+            browser = self._connections.get(ws_endpoint)
+            if browser is not None and browser.is_connected():
+                return browser
+            if self._playwright is None:
+                async with track_playwright():
+                    self._playwright = await self._playwright_factory()
+            async with track_playwright():
+                browser = await self._playwright.chromium.connect(ws_endpoint)
+            browser.on("disconnected", lambda _: self._connections.pop(ws_endpoint, None))
+            self._connections[ws_endpoint] = browser
+            return browser
+
+    async def new_context(self, headless: bool = True, proxy: Optional[dict] = None,
+                          **context_options: Any) -> "BrowserContext":
+        lease = await self.client.lease(headless=headless)
+        try:
+            browser = await self._connect(lease.ws_endpoint)
+            async with track_playwright():
+                context = await browser.new_context(proxy=proxy or PROXY_DIRECT, **context_options)
+        except BaseException:
+            await self.client.release(lease.lease_id)
+            raise
+        self._leases[id(context)] = lease.lease_id
+        logger.debug(f"已从浏览器农场租用上下文 - 浏览器: {lease.browser_id}, 租约: {lease.lease_id}")
+        return context
+
+    async def release(self, context: "BrowserContext") -> None:
+        lease_id = self._leases.pop(id(context), None)
+        try:
+            async with track_playwright():
+                await context.close()
+        except Exception as e:
+            logger.debug(f"关闭农场上下文失败: {e}")
+        if lease_id is not None:
+            try:
+                await self.client.release(lease_id)
+            except FarmError as e:
+                # 连接断开时农场已自动归还
+                logger.debug(f"归还租约失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "farm": f"{self.client.host}:{self.client.port}",
+            "contexts": len(self._leases),
+            "connections": len(self._connections),
+        }
+
+    async def close(self) -> None:
+        for browser in list(self._connections.values()):
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"断开农场浏览器失败: {e}")
+        self._connections.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        await self.client.close()
+
+
+# ==================== 守护进程 ====================
+
+async def serve(address: str, budget: FarmBudget, maintenance_interval: float = 5.0) -> None:
+    """运行农场直到收到 SIGINT / SIGTERM"""
+    host, port = parse_address(address)
+    farm = BrowserFarm(budget)
+    server = FarmServer(farm, host, port)
+    await server.start()
+    maintenance = asyncio.create_task(farm.run_maintenance(maintenance_interval))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        logger.info("浏览器农场正在关闭")
+        maintenance.cancel()
+        await server.close()
+        await farm.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="浏览器农场守护进程")
+    parser.add_argument("--address", default=settings.BROWSER_FARM_ADDRESS or DEFAULT_ADDRESS, help="监听地址")
+    parser.add_argument("--max-browsers", type=int, default=settings.FARM_MAX_BROWSERS)
+    parser.add_argument("--max-contexts-per-browser", type=int, default=settings.FARM_MAX_CONTEXTS_PER_BROWSER)
+    parser.add_argument("--max-contexts", type=int, default=settings.FARM_MAX_CONTEXTS)
+    parser.add_argument("--memory-budget-mb", type=int, default=settings.FARM_MEMORY_BUDGET_MB)
+    args = parser.parse_args(argv)
+    budget = FarmBudget(max_browsers=args.max_browsers, max_contexts_per_browser=args.max_contexts_per_browser,
+                        max_contexts=args.max_contexts, memory_budget_mb=args.memory_budget_mb)
+    try:
+        asyncio.run(serve(args.address, budget))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
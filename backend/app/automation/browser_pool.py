@@ -0,0 +1,304 @@
+"""
+共享浏览器池
+
+原来每个自动化实例都启动自己的 Chromium，代理在 chromium.launch() 中指定，
+不同代理的账户必须使用不同的浏览器进程，内存随账户数线性增长。
+Playwright 支持按上下文设置代理，这里只启动少量固定的浏览器（每种有头/无头模式最多 BROWSER_POOL_SIZE 个），
+每个账户在其中创建独立的 BrowserContext，代理和认证信息来自账户的 BrowserProfile.proxy。
+上下文之间 Cookie、存储、缓存互相隔离，内存随上下文数增长，而不是随浏览器数增长。
+
+- 新上下文分配到当前上下文最少的浏览器；已有浏览器都在使用且未达到上限时再启动一个。
+  选中浏览器时在锁内预占名额（pending），并发创建的上下文不会都落到同一个浏览器
+- 浏览器崩溃（disconnected）后移出池，下次创建上下文时重新启动
+- 内存看门狗（browser_watchdog.py）每 BROWSER_WATCHDOG_INTERVAL 秒采样各浏览器的 RSS 和各上下文的 JS 堆，
+  超过回收策略的浏览器排空后重启，正在使用的上下文不受影响
+- 浏览器按全局占位代理启动：Chromium 只有在启动时设置了代理，上下文级代理才生效，
+  所有上下文都会覆盖它（无代理的上下文使用 PROXY_DIRECT）
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.core.concurrency import CRASH_COUNTER
+from app.core.metrics import metrics_registry, track_playwright
+from .browser_watchdog import DRAIN_COUNTER, RESTART_COUNTER, RecyclePolicy, browser_rss, context_js_heap
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext
+
+logger = get_logger(__name__)
+
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-web-security",
+    "--disable-features=VizDisplayCompositor",
+]
+
+# 启动时的全局占位代理，所有上下文都会覆盖
+PER_CONTEXT_PROXY = {"server": "http://per-context"}
+# 没有配置代理的上下文直连
+PROXY_DIRECT = {"server": "direct://"}
+
+
+async def _start_playwright():
+    from playwright.async_api import async_playwright
+
+    return await async_playwright().start()
+
+
+@dataclass
+class PooledBrowser:
+    """池中的一个浏览器"""
+    browser: "Browser"
+    headless: bool
+    contexts: List["BrowserContext"] = field(default_factory=list)
+    launched: int = 0  # 累计创建的上下文数
+    pending: int = 0  # 已分配、正在创建的上下文数
+    draining: Optional[str] = None  # 排空原因，排空中的浏览器不再分配上下文
+    rss_bytes: int = 0
+    js_heap_bytes: int = 0
+
+    @property
+    def load(self) -> int:
+        return len(self.contexts) + self.pending
+
+    @property
+    def idle(self) -> bool:
+        return not self.contexts and not self.pending
+
+
+class BrowserPool:
+    """共享浏览器池"""
+
+    def __init__(self, size: Optional[int] = None,
+                 playwright_factory: Optional[Callable[[], Awaitable[Any]]] = None,
+                 policy: Optional[RecyclePolicy] = None, watchdog_interval: Optional[float] = None):
+        """
+        Args:
+            size: 每种模式（有头/无头）的浏览器数上限，默认 BROWSER_POOL_SIZE
+            playwright_factory: 启动 Playwright 的协程函数，测试时替换
+            policy: 浏览器回收策略，默认取配置
+            watchdog_interval: 内存看门狗周期（秒），默认 BROWSER_WATCHDOG_INTERVAL，0 表示不启动
+        """
+        self.size = max(1, size if size is not None else settings.BROWSER_POOL_SIZE)
+        self._playwright_factory = playwright_factory or _start_playwright
+        self.policy = policy or RecyclePolicy.from_settings()
+        self.watchdog_interval = (settings.BROWSER_WATCHDOG_INTERVAL if watchdog_interval is None
+                                  else watchdog_interval)
+        self._watchdog: Optional[asyncio.Task] = None
+        self._playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._owner: Dict[int, PooledBrowser] = {}  # id(context) -> 浏览器
+        self._lock = asyncio.Lock()
+        self.browsers_launched = 0
+        self.browsers_crashed = 0
+        self.browsers_restarted = 0
+
+    async def _launch(self, headless: bool) -> PooledBrowser:
+        if self._playwright is None:
+            async with track_playwright():
+                self._playwright = await self._playwright_factory()
+        async with track_playwright():
+            browser = await self._playwright.chromium.launch(headless=headless, args=CHROMIUM_ARGS,
+                                                             proxy=PER_CONTEXT_PROXY)
+        pooled = PooledBrowser(browser=browser, headless=headless)
+        browser.on("disconnected", lambda _: self._on_disconnected(pooled))
+        self._browsers.append(pooled)
+        self.browsers_launched += 1
+        if self.watchdog_interval > 0 and (self._watchdog is None or self._watchdog.done()):
+            self._watchdog = asyncio.create_task(self._run_watchdog())
+        logger.info(f"共享浏览器已启动 - 无头模式: {headless}, 当前浏览器数: {len(self._browsers)}")
+        return pooled
+
+    def _on_disconnected(self, pooled: PooledBrowser) -> None:
+        if pooled not in self._browsers:
+            return
+        self._browsers.remove(pooled)
+        for context in pooled.contexts:
+            self._owner.pop(id(context), None)
+        self.browsers_crashed += 1
+        metrics_registry.increment(CRASH_COUNTER)
+        logger.warning(f"共享浏览器已断开 - 无头模式: {pooled.headless}, 丢失上下文: {len(pooled.contexts)}")
+
+    async def _pick(self, headless: bool) -> PooledBrowser:
+        """选择浏览器并预占一个上下文名额，调用方创建完成（或失败）后减回 pending"""
+        async with self._lock:
+            candidates = [b for b in self._browsers
+                          if b.headless == headless and not b.draining and b.browser.is_connected()]
+            least = min(candidates, key=lambda b: b.load, default=None)
+            if least is None or (least.load and len(candidates) < self.size):
+                least = await self._launch(headless)
+            least.pending += 1
+            return least
+
+    async def new_context(self, headless: bool = True, proxy: Optional[dict] = None,
+                          **context_options: Any) -> "BrowserContext":
+        """
+        在共享浏览器中创建上下文
+
+        Args:
+            headless: 是否使用无头浏览器
+            proxy: 上下文代理（server/username/password），为空时直连
+            context_options: 其余 browser.new_context 参数
+        """
+        pooled = await self._pick(headless)
+        try:
+            async with track_playwright():
+                context = await pooled.browser.new_context(proxy=proxy or PROXY_DIRECT, **context_options)
+        except BaseException:
+            pooled.pending -= 1
+            if pooled.draining and pooled.idle:
+                await self._retire(pooled)
+            raise
+        pooled.pending -= 1
+        pooled.contexts.append(context)
+        pooled.launched += 1
+        self._owner[id(context)] = pooled
+        logger.debug(f"共享浏览器上下文已创建 - 代理: {proxy['server'] if proxy else '直连'}, "
+                     f"该浏览器上下文数: {len(pooled.contexts)}")
+        reason = self.policy.uses_exceeded(pooled.launched)
+        if reason is not None:
+            await self.drain(pooled, reason)
+        return context
+
+    async def release(self, context: "BrowserContext") -> None:
+        """关闭上下文并归还浏览器"""
+        pooled = self._owner.pop(id(context), None)
+        if pooled is not None and context in pooled.contexts:
+            pooled.contexts.remove(context)
+        try:
+            async with track_playwright():
+                await context.close()
+        except Exception as e:
+            # 浏览器已崩溃时上下文也随之关闭
+            logger.debug(f"关闭共享浏览器上下文失败: {e}")
+        if pooled is not None and pooled.draining and pooled.idle:
+            await self._retire(pooled)
+
+    async def drain(self, pooled: PooledBrowser, reason: str) -> None:
+        """
+        排空浏览器：不再分配新的上下文，已有上下文全部归还后关闭
+
+        Args:
+            pooled: 池中的浏览器
+            reason: 排空原因
+        """
+        if pooled.draining or pooled not in self._browsers:
+            return
+        pooled.draining = reason
+        metrics_registry.increment(DRAIN_COUNTER)
+        logger.info(f"共享浏览器开始排空 - 原因: {reason}, 剩余上下文: {len(pooled.contexts)}")
+        if pooled.idle:
+            await self._retire(pooled)
+
+    async def _retire(self, pooled: PooledBrowser) -> None:
+        """关闭已排空的浏览器，下次创建上下文时按需启动新的浏览器"""
+        if pooled not in self._browsers:
+            return
+        # 先移出池，关闭触发的 disconnected 不计为崩溃
+        self._browsers.remove(pooled)
+        self.browsers_restarted += 1
+        metrics_registry.increment(RESTART_COUNTER)
+        try:
+            async with track_playwright():
+                await pooled.browser.close()
+        except Exception as e:
+            log_exception(logger, e, "关闭已排空的共享浏览器失败")
+        logger.info(f"共享浏览器已排空并关闭 - 原因: {pooled.draining}, 累计上下文: {pooled.launched}")
+
+    async def inspect(self) -> None:
+        """采样各浏览器的 RSS 和各上下文的 JS 堆，超过回收策略的浏览器开始排空"""
+        for pooled in list(self._browsers):
+            if pooled.draining:
+                continue
+            try:
+                pooled.rss_bytes = await browser_rss(pooled.browser)
+                heaps = [await context_js_heap(context) for context in list(pooled.contexts)]
+            except Exception as e:
+                # 浏览器或页面在采样期间关闭
+                logger.debug(f"采样共享浏览器内存失败: {e}")
+                continue
+            pooled.js_heap_bytes = sum(heaps)
+            reason = self.policy.rss_exceeded(pooled.rss_bytes) or next(
+                (r for r in map(self.policy.context_exceeded, heaps) if r is not None), None)
+            if reason is not None:
+                await self.drain(pooled, reason)
+
+    async def _run_watchdog(self) -> None:
+        while True:
+            await asyncio.sleep(self.watchdog_interval)
+            try:
+                await self.inspect()
+            except Exception as e:
+                log_exception(logger, e, "共享浏览器内存看门狗执行失败")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "browsers": [
+                {"headless": b.headless, "contexts": len(b.contexts), "contexts_created": b.launched,
+                 "rss_mb": round(b.rss_bytes / 1024 / 1024, 1),
+                 "js_heap_mb": round(b.js_heap_bytes / 1024 / 1024, 1), "draining": b.draining}
+                for b in self._browsers
+            ],
+            "contexts": sum(len(b.contexts) for b in self._browsers),
+            "browsers_launched": self.browsers_launched,
+            "browsers_crashed": self.browsers_crashed,
+            "browsers_restarted": self.browsers_restarted,
+        }
+
+    async def close(self) -> None:
+        """关闭全部浏览器和 Playwright"""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        browsers, self._browsers = self._browsers, []
+        self._owner.clear()
+        for pooled in browsers:
+            try:
+                async with track_playwright():
+                    await pooled.browser.close()
+            except Exception as e:
+                log_exception(logger, e, "关闭共享浏览器失败")
+        if self._playwright is not None:
+            try:
+                async with track_playwright():
+                    await self._playwright.stop()
+            except Exception as e:
+                log_exception(logger, e, "停止 Playwright 失败")
+            self._playwright = None
+        if browsers:
+            logger.info(f"共享浏览器池已关闭，浏览器数: {len(browsers)}")
+
+
+_browser_pool: Optional[Any] = None
+
+
+def get_browser_pool() -> Any:
+    """本进程的浏览器池；配置了 BROWSER_FARM_ADDRESS 时从浏览器农场租用上下文（RemoteBrowserPool）"""
+    global _browser_pool
+    if _browser_pool is None:
+        if settings.BROWSER_FARM_ADDRESS:
+            from .browser_farm import RemoteBrowserPool
+
+            _browser_pool = RemoteBrowserPool()
+        else:
+            _browser_pool = BrowserPool()
+    return _browser_pool
+
+
+def browser_pool_stats() -> Optional[Dict[str, Any]]:
+    """浏览器池尚未创建时返回 None"""
+    return _browser_pool.stats() if _browser_pool is not None else None
+
+
+async def close_browser_pool() -> None:
+    global _browser_pool
+    if _browser_pool is not None:
+        await _browser_pool.close()
+        _browser_pool = None
@@ -0,0 +1,93 @@
+"""
+浏览器内存看门狗
+
+长时间运行的 Chromium 内存持续增长，最终会在发布中途崩溃。共享浏览器池和浏览器农场按同一套回收策略处理：
+
+- 浏览器内存：通过浏览器级 CDP 会话（SystemInfo.getProcessInfo）取得该浏览器的全部进程，累加各进程 RSS
+- 上下文内存：通过上下文的 CDP 会话（Performance.getMetrics）读取各页面的 JSHeapUsedSize
+- 浏览器累计承载的上下文数、进程树 RSS 或其中某个上下文的 JS 堆超过上限时，浏览器进入排空状态：
+  不再分配新的上下文（池中另起一个浏览器接替），已有上下文继续运行直到被归还，最后一个归还后关闭浏览器
+- 上下文在本仓库中本来就是一次性的（每个自动化实例创建一个，close 时关闭），回收的对象是承载它们的浏览器
+
+排空不会中断正在执行的 publish_video。重启和崩溃次数计入 metrics_registry（browser_restarts、browser_crashes）。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.process_stats import process_rss
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext
+
+logger = get_logger(__name__)
+
+# metrics_registry 计数器
+RESTART_COUNTER = "browser_restarts"
+DRAIN_COUNTER = "browser_drains"
+
+_MB = 1024 * 1024
+
+
+@dataclass
+class RecyclePolicy:
+    """浏览器回收策略，各上限为 0 时不限制"""
+    max_context_uses: int
+    browser_rss_limit_mb: int
+    context_memory_limit_mb: int
+
+    @classmethod
+    def from_settings(cls) -> "RecyclePolicy":
+        return cls(
+            max_context_uses=settings.BROWSER_MAX_CONTEXT_USES,
+            browser_rss_limit_mb=settings.BROWSER_RSS_LIMIT_MB,
+            context_memory_limit_mb=settings.BROWSER_CONTEXT_MEMORY_LIMIT_MB,
+        )
+
+    def uses_exceeded(self, uses: int) -> Optional[str]:
+        if self.max_context_uses and uses >= self.max_context_uses:
+            return f"uses: 已承载 {uses} 个上下文"
+        return None
+
+    def rss_exceeded(self, rss_bytes: int) -> Optional[str]:
+        if self.browser_rss_limit_mb and rss_bytes > self.browser_rss_limit_mb * _MB:
+            return f"rss: 进程树 RSS {rss_bytes // _MB}MB 超过 {self.browser_rss_limit_mb}MB"
+        return None
+
+    def context_exceeded(self, heap_bytes: int) -> Optional[str]:
+        if self.context_memory_limit_mb and heap_bytes > self.context_memory_limit_mb * _MB:
+            return f"context_memory: 上下文 JS 堆 {heap_bytes // _MB}MB 超过 {self.context_memory_limit_mb}MB"
+        return None
+
+
+async def context_js_heap(context: "BrowserContext") -> int:
+    """上下文中全部页面的 JSHeapUsedSize 之和（字节）"""
+    total = 0
+    for page in list(context.pages):
+        if page.is_closed():
+            continue
+        session = await context.new_cdp_session(page)
+        try:
+            await session.send("Performance.enable")
+            result = await session.send("Performance.getMetrics")
+        finally:
+            await session.detach()
+        metrics = {metric["name"]: metric["value"] for metric in result.get("metrics", [])}
+        total += int(metrics.get("JSHeapUsedSize", 0))
+    return total
+
+
+async def browser_rss(browser: "Browser", rss_of: Optional[Callable[[int], Optional[int]]] = None) -> int:
+    """浏览器全部进程（browser、renderer、gpu 等）的 RSS 之和（字节）"""
+    rss_of = rss_of or process_rss
+    session = await browser.new_browser_cdp_session()
+    try:
+        info: Any = await session.send("SystemInfo.getProcessInfo")
+    finally:
+        await session.detach()
+    pids = [process["id"] for process in info.get("processInfo", [])]
+    samples = await asyncio.to_thread(lambda: [rss_of(pid) for pid in pids])
+    return sum(sample for sample in samples if sample)
@@ -2,12 +2,33 @@ from typing import Optional, Dict, Any, List
 import asyncio
 from pathlib import Path
 
-from .base import BrowserAutomationBase
+from .api_mode import ApiUploadSpec
+from .base import BrowserAutomationBase, LoginDetection
+from app.core.config import settings
 from app.core.logger import get_logger, log_exception, log_function_call
 
 logger = get_logger(__name__)
 
 class DouyinAutomation(BrowserAutomationBase):
+    # 抖音登录成功后下发的会话Cookie
+    LOGIN_COOKIES = ("sessionid",)
+    # 上传请求URL片段：创作者中心分片接口和视频点播上传服务，最后一片再小也计入上传
+    UPLOAD_URL_PATTERNS = ("/web/api/media/upload/chunk/", "vod.bytedanceapi.com", "/upload/v1/")
+    
+    # 创作者中心上传接口描述，与 benchmarks/fixtures/douyin_upload_api.json 中的录制交互一致。
+    # 默认不启用（见 API_MODE_PLATFORMS），接口变化导致校验失败时自动回退浏览器流程。
+    API_UPLOAD_SPEC = ApiUploadSpec(
+        base_url="https://creator.douyin.com",
+        init_path="/web/api/media/upload/init/",
+        chunk_path="/web/api/media/upload/chunk/?upload_id={upload_id}&part_number={index}",
+        complete_path="/web/api/media/upload/complete/",
+        publish_path="/web/api/media/aweme/create/",
+        cookie_domain="creator.douyin.com",
+        required_cookies=("sessionid",),
+        csrf_cookie="passport_csrf_token",
+        csrf_header="x-secsdk-csrf-token",
+    )
+
     def __init__(self, platform: str, storage_state_path: str, proxy: dict = None, 
                  user_agent: str = None, viewport_size: dict = None):
         super().__init__(platform, storage_state_path, proxy, user_agent, viewport_size)
@@ -20,31 +41,15 @@ class DouyinAutomation(BrowserAutomationBase):
         return self.login_url
 
     @log_function_call(logger)
-    async def wait_for_login_completion(self) -> None:
-        """等待用户登录完成"""
+    async def wait_for_login_completion(self) -> LoginDetection:
+        """等待用户登录完成（出现登录Cookie或页面关闭），超时由调用方控制，检测出错时抛出异常"""
         logger.info("等待用户在浏览器中完成抖音登录...")
-        
-        try:
-            # 等待URL变化（从登录页面跳转到主页或个人页面）
-            logger.debug("等待URL变化，检测登录状态")
-            await self.page.wait_for_url(
-                lambda url: not url.startswith(self.login_url) and "douyin.com" in url,
-                timeout=300000  # 5分钟超时
-            )
-            
-            # 等待一些登录成功的标志元素出现
-            logger.debug("等待用户信息元素出现")
-            await asyncio.wait_for(
-                self.page.wait_for_selector('[data-e2e="user-info"]', timeout=10000),
-                timeout=10
-            )
-            
+        detection = await self.detect_login()
+        if detection.logged_in:
             logger.info("用户抖音登录完成")
-            
-        except asyncio.TimeoutError:
-            logger.warning("抖音登录等待超时，但继续执行")
-        except Exception as e:
-            log_exception(logger, e, "等待抖音登录完成时出错")
+        else:
+            logger.warning("页面已关闭，未检测到抖音登录")
+        return detection
 
     @log_function_call(logger)
     async def save_login_state(self) -> None:
@@ -184,7 +189,11 @@ class DouyinAutomation(BrowserAutomationBase):
             
             # 等待登录完成
             logger.debug("等待登录完成")
-            await self.wait_for_login_completion()
+            detection = await asyncio.wait_for(self.wait_for_login_completion(),
+                                               timeout=settings.ACTIVATION_TIMEOUT)
+            if not detection.logged_in:
+                logger.warning("未检测到登录，自动登录失败")
+                return False
             
             # 保存登录状态
             logger.debug("保存登录状态")
@@ -217,56 +226,72 @@ class DouyinAutomation(BrowserAutomationBase):
             # 导航到发布页面
             publish_url = "https://www.douyin.com/creator/upload"
             logger.debug(f"导航到发布页面: {publish_url}")
-            await self.page.goto(publish_url)
+            async with self.step("goto_upload_page"):
+                await self.page.goto(publish_url)
+            await self.report_progress(5)
             
             # 等待页面加载
             logger.debug("等待上传区域加载")
-            await self.page.wait_for_selector('[data-e2e="upload-area"]', timeout=10000)
+            async with self.step("wait_upload_area"):
+                await self.page.wait_for_selector('[data-e2e="upload-area"]', timeout=10000)
             
             # 上传视频文件
             logger.debug("查找文件上传输入框")
-            file_input = await self.page.wait_for_selector('input[type="file"]', timeout=5000)
-            if file_input:
-                logger.debug(f"开始上传视频文件: {video_path}")
-                await file_input.set_input_files(video_path)
-                logger.debug("视频文件上传完成")
-            else:
-                logger.warning("未找到文件上传输入框")
+            async with self.step("set_input_files"):
+                file_input = await self.page.wait_for_selector('input[type="file"]', timeout=5000)
+                if file_input:
+                    logger.debug(f"开始上传视频文件: {video_path}")
+                    # 上传占任务进度的 10%-80%
+                    upload_tracker = self.track_upload(video_path, start=10, end=80)
+                    await file_input.set_input_files(video_path)
+                    logger.debug("视频文件已选择，开始上传")
+                else:
+                    logger.warning("未找到文件上传输入框")
+                    upload_tracker = None
             
-            # 等待视频上传完成
-            logger.debug("等待视频上传进度完成")
-            await self.page.wait_for_selector('[data-e2e="upload-progress"]', timeout=60000)
+            # 等待视频上传完成：按上传请求的已发送字节判断，超时随文件大小和实际吞吐量调整
+            logger.debug("等待视频上传完成")
+            async with self.step("wait_upload_progress"):
+                if upload_tracker:
+                    await upload_tracker.wait(done_selector='[data-e2e="upload-progress"]')
+                else:
+                    await self.page.wait_for_selector('[data-e2e="upload-progress"]', timeout=60000)
             
             # 填写标题
             logger.debug("填写视频标题")
-            title_input = await self.page.wait_for_selector('[data-e2e="title-input"]', timeout=5000)
-            if title_input:
-                await title_input.fill(title)
-                logger.debug("视频标题填写完成")
-            else:
-                logger.warning("未找到标题输入框")
+            async with self.step("fill_title"):
+                title_input = await self.page.wait_for_selector('[data-e2e="title-input"]', timeout=5000)
+                if title_input:
+                    await title_input.fill(title)
+                    logger.debug("视频标题填写完成")
+                else:
+                    logger.warning("未找到标题输入框")
             
             # 填写描述
             logger.debug("填写视频描述")
-            description_input = await self.page.wait_for_selector('[data-e2e="description-input"]', timeout=5000)
-            if description_input:
-                await description_input.fill(description)
-                logger.debug("视频描述填写完成")
-            else:
-                logger.warning("未找到描述输入框")
+            async with self.step("fill_description"):
+                description_input = await self.page.wait_for_selector('[data-e2e="description-input"]', timeout=5000)
+                if description_input:
+                    await description_input.fill(description)
+                    logger.debug("视频描述填写完成")
+                else:
+                    logger.warning("未找到描述输入框")
             
             # 发布视频
             logger.debug("点击发布按钮")
-            publish_button = await self.page.wait_for_selector('[data-e2e="publish-button"]', timeout=5000)
-            if publish_button:
-                await publish_button.click()
-                logger.debug("发布按钮点击完成")
-            else:
-                logger.warning("未找到发布按钮")
+            async with self.step("click_publish"):
+                publish_button = await self.page.wait_for_selector('[data-e2e="publish-button"]', timeout=5000)
+                if publish_button:
+                    await publish_button.click()
+                    logger.debug("发布按钮点击完成")
+                else:
+                    logger.warning("未找到发布按钮")
             
             # 等待发布完成
             logger.debug("等待发布完成")
-            await self.page.wait_for_selector('[data-e2e="publish-success"]', timeout=30000)
+            async with self.step("wait_publish_success"):
+                await self.page.wait_for_selector('[data-e2e="publish-success"]', timeout=30000)
+            await self.report_progress(100)
             
             logger.info(f"视频 '{title}' 发布成功")
             return True
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from .base import BrowserAutomationBase
 from .douyin import DouyinAutomation
+from app.core.config import settings
 from app.core.logger import get_logger, log_exception, log_function_call
 # 导入其他平台的自动化类
 # from .kuaishou import KuaishouAutomation
@@ -25,7 +26,8 @@ class AutomationFactory:
     @classmethod
     @log_function_call
     def create(cls, platform: str, storage_state_path: str, proxy: dict = None,
-               user_agent: str = None, viewport_size: dict = None) -> BrowserAutomationBase:
+               user_agent: str = None, viewport_size: dict = None,
+               storage_key: str = None, mode: str = None) -> BrowserAutomationBase:
         """
         创建自动化实例
         
@@ -35,6 +37,8 @@ class AutomationFactory:
             proxy: 代理配置
             user_agent: 用户代理字符串
             viewport_size: 浏览器视窗大小
+            storage_key: 保险库后端的存储状态键（profile:{id} / account:{id}）
+            mode: 发布模式，"api" 或 "browser"；为空时平台在 API_MODE_PLATFORMS 中即使用 API 模式
             
         Returns:
             对应平台的自动化实例
@@ -67,6 +71,14 @@ class AutomationFactory:
                 user_agent=user_agent,
                 viewport_size=viewport_size
             )
+            instance.storage_key = storage_key
+            
+            # 只有提供了上传接口描述的平台才能使用 API 模式
+            use_api = mode == "api" or (mode is None and platform_lower in settings.API_MODE_PLATFORMS)
+            instance.api_mode = use_api and automation_class.API_UPLOAD_SPEC is not None
+            if use_api and not instance.api_mode:
+                logger.warning(f"平台没有上传接口描述，使用浏览器模式: {platform}")
+            logger.debug(f"发布模式: {'api' if instance.api_mode else 'browser'}")
             
             logger.info(f"自动化实例创建成功，平台: {platform}")
             return instance
@@ -0,0 +1,260 @@
+"""
+浏览器存储状态（storage_state）持久化
+
+- 按 Cookie 和 origins 的规范化内容计算哈希，内容没有变化时跳过写入
+- 原子写入：写临时文件 -> fsync -> rename，写到一半崩溃不会破坏已有的登录状态
+- 保留最近 K 个历史版本（storage_state.json.1 最新 ... storage_state.json.K 最旧），可以回滚
+- 解析后的状态缓存在内存中，按文件的 mtime 和大小校验，登录状态快速检查不需要重复读文件
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+
+logger = get_logger(__name__)
+
+
+def canonical_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """规范化存储状态：Cookie 和 origins 按固定顺序排列，相同内容得到相同的序列化结果"""
+    cookies = sorted(
+        state.get("cookies", []),
+        key=lambda cookie: (cookie.get("domain", ""), cookie.get("path", ""), cookie.get("name", "")),
+    )
+    origins = []
+    for origin in sorted(state.get("origins", []), key=lambda item: item.get("origin", "")):
+        origins.append({
+            "origin": origin.get("origin", ""),
+            "localStorage": sorted(origin.get("localStorage", []), key=lambda item: item.get("name", "")),
+        })
+    return {"cookies": cookies, "origins": origins}
+
+
+def state_hash(state: Dict[str, Any]) -> str:
+    """存储状态的内容哈希"""
+    data = json.dumps(canonical_state(state), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def has_valid_cookies(state: Optional[Dict[str, Any]], names: Iterable[str], now: Optional[float] = None) -> bool:
+    """存储状态中是否包含全部指定 Cookie 且都未过期（expires 为 -1 表示会话 Cookie）"""
+    if not state:
+        return False
+    now = now if now is not None else time.time()
+    valid = {
+        cookie.get("name") for cookie in state.get("cookies", [])
+        if cookie.get("expires", -1) in (-1, None) or cookie.get("expires") > now
+    }
+    return all(name in valid for name in names)
+
+
+def profile_state_key(profile_id: int) -> str:
+    """浏览器配置的存储状态键（保险库后端使用）"""
+    return f"profile:{profile_id}"
+
+
+def account_state_key(account_id: int) -> str:
+    """未绑定浏览器配置的账户的存储状态键（保险库后端使用）"""
+    return f"account:{account_id}"
+
+
+def _fsync_dir(directory: str) -> None:
+    """rename 之后同步目录项，Windows 不支持打开目录，直接跳过"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StorageStateStore:
+    """存储状态文件的读写、版本和内存缓存"""
+
+    # 以文件路径为键
+    uses_paths = True
+
+    def __init__(self, keep_versions: int = 3):
+        self.keep_versions = keep_versions
+        # 路径 -> (mtime_ns, size, 哈希, 状态)
+        self._cache: Dict[str, Tuple[int, int, str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.skipped_writes = 0
+
+    def _read_file(self, path: str) -> Optional[Tuple[int, int, str, Dict[str, Any]]]:
+        stat = os.stat(path)
+        cached = self._cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        entry = (stat.st_mtime_ns, stat.st_size, state_hash(state), state)
+        self._cache[path] = entry
+        return entry
+
+    def load(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        读取存储状态
+
+        文件和历史版本都不存在时返回 None；文件不存在或损坏时依次尝试历史版本。
+        返回的是缓存对象，调用方不要修改。
+        """
+        with self._lock:
+            if os.path.exists(path):
+                try:
+                    return self._read_file(path)[3]
+                except (OSError, ValueError) as e:
+                    log_exception(logger, e, f"存储状态文件损坏: {path}")
+                    self._cache.pop(path, None)
+            elif self.versions(path):
+                # 当前文件丢失（例如其他进程在替换文件时崩溃）时使用最新的历史版本
+                logger.warning(f"存储状态文件不存在，尝试历史版本: {path}")
+            else:
+                return None
+
+            for version_path in self.versions(path):
+                try:
+                    with open(version_path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                    logger.warning(f"使用历史版本的存储状态: {version_path}")
+                    return state
+                except (OSError, ValueError):
+                    continue
+            return None
+
+    def save(self, path: str, state: Dict[str, Any]) -> bool:
+        """
+        保存存储状态
+
+        Returns:
+            是否实际写入了文件，内容没有变化时返回 False
+        """
+        digest = state_hash(state)
+        with self._lock:
+            if os.path.exists(path):
+                try:
+                    if self._read_file(path)[2] == digest:
+                        self.skipped_writes += 1
+                        logger.debug(f"存储状态未变化，跳过写入: {path}")
+                        return False
+                except (OSError, ValueError):
+                    # 已有文件损坏，不参与比较也不进入历史版本
+                    os.remove(path)
+
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+            fd, temp_path = tempfile.mkstemp(prefix=".storage_state.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._rotate(path)
+                os.replace(temp_path, path)
+                _fsync_dir(directory)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            stat = os.stat(path)
+            self._cache[path] = (stat.st_mtime_ns, stat.st_size, digest, state)
+            self.writes += 1
+            logger.debug(f"存储状态已写入: {path}, 哈希: {digest[:12]}")
+            return True
+
+    def _rotate(self, path: str) -> None:
+        """
+        当前文件复制为 .1，原 .1 变为 .2，依此类推，超过 keep_versions 的最旧版本被覆盖
+
+        当前文件不移走（硬链接，不支持时复制），随后由 os.replace 原子替换，
+        并发读取和替换前崩溃都能读到完整的存储状态。
+        """
+        if self.keep_versions <= 0 or not os.path.exists(path):
+            return
+        for index in range(self.keep_versions - 1, 0, -1):
+            older = f"{path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{path}.{index + 1}")
+        link_path = f"{path}.1.tmp"
+        if os.path.exists(link_path):
+            os.remove(link_path)
+        try:
+            os.link(path, link_path)
+        except OSError:
+            shutil.copy2(path, link_path)
+        os.replace(link_path, f"{path}.1")
+
+    def versions(self, path: str) -> List[str]:
+        """历史版本路径，从新到旧"""
+        return [f"{path}.{index}" for index in range(1, self.keep_versions + 1) if os.path.exists(f"{path}.{index}")]
+
+    def rollback(self, path: str, version: int = 1) -> Dict[str, Any]:
+        """
+        回滚到历史版本，当前版本进入历史
+
+        Args:
+            path: 存储状态路径
+            version: 历史版本序号，1 为最近一次
+
+        Returns:
+            回滚后的存储状态
+        """
+        version_path = f"{path}.{version}"
+        if not os.path.exists(version_path):
+            raise FileNotFoundError(f"存储状态历史版本不存在: {version_path}")
+        with open(version_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.save(path, state)
+        logger.info(f"存储状态已回滚到版本 {version}: {path}")
+        return state
+
+    def has_cookies(self, path: str, names: Iterable[str], now: Optional[float] = None) -> bool:
+        """存储状态中是否包含全部指定 Cookie 且都未过期"""
+        return has_valid_cookies(self.load(path), names, now)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """清除内存缓存"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "writes": self.writes, "skipped_writes": self.skipped_writes}
+
+
+# 全局存储状态仓库实例
+storage_state_store = StorageStateStore(keep_versions=settings.STORAGE_STATE_VERSIONS)
+
+_vault = None
+
+
+def get_storage_state_store():
+    """
+    按 STORAGE_STATE_BACKEND 返回当前的存储状态后端
+
+    file（默认）为每个配置一个 JSON 文件的 StorageStateStore；
+    vault 为单文件压缩加密的 StorageStateVault，首次使用时打开。
+    """
+    global _vault
+    if settings.STORAGE_STATE_BACKEND != "vault":
+        return storage_state_store
+    if _vault is None:
+        from .storage_vault import StorageStateVault
+        _vault = StorageStateVault(settings.STORAGE_VAULT_PATH, key=settings.STORAGE_VAULT_KEY or None)
+    return _vault
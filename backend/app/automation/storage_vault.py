@@ -0,0 +1,371 @@
+"""
+存储状态保险库
+
+数千个浏览器配置各自一个 storage_state.json 时，目录遍历和备份都很慢。
+保险库把所有存储状态放在一个 SQLite 文件中，按配置键（profile:{id} / account:{id}）索引：
+- 每条记录先压缩（安装了 zstandard 时用 zstd，否则用 zlib），配置了密钥时再用 AES-GCM 加密
+- 读取时直接解压解密为 dict 交给 Playwright，不落临时文件
+- 内容哈希不变时跳过写入，解码后的状态在内存中做 LRU 缓存
+- 支持整库导出/导入（JSON Lines，保持压缩和加密），以及从现有 storage_state.json 文件迁移
+
+用法（在 backend 目录下，后端配置取自环境变量）：
+    python -m app.automation.storage_vault export vault_backup.jsonl
+    python -m app.automation.storage_vault import vault_backup.jsonl
+    python -m app.automation.storage_vault migrate
+"""
+
+import argparse
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.logger import get_logger, log_exception
+from .storage_state import has_valid_cookies, state_hash
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，未安装时使用 zlib
+    zstandard = None
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # cryptography 为可选依赖，只有配置了加密密钥时才需要
+    AESGCM = None
+
+logger = get_logger(__name__)
+
+NONCE_SIZE = 12
+
+# 内存中缓存的已解码状态数
+DEFAULT_CACHE_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS storage_states (
+    key TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    encrypted INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    raw_size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("该记录使用 zstd 压缩，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"未知的压缩格式: {codec}")
+
+
+class StorageStateVault:
+    """单文件存储状态保险库，接口与 StorageStateStore 一致（load/save/has_cookies/invalidate/stats）"""
+
+    # 以配置键为键，不是文件路径
+    uses_paths = False
+
+    def __init__(self, path: str, key: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            path: SQLite 文件路径，":memory:" 为内存库
+            key: urlsafe base64 编码的32字节密钥，为空时不加密
+            cache_size: 内存缓存的状态数
+        """
+        self.path = path
+        self._aead = None
+        if key:
+            if AESGCM is None:
+                raise RuntimeError("配置了 STORAGE_VAULT_KEY，需要安装 cryptography 才能加密存储状态")
+            raw_key = base64.urlsafe_b64decode(key)
+            if len(raw_key) != 32:
+                raise ValueError("STORAGE_VAULT_KEY 必须是 urlsafe base64 编码的32字节密钥")
+            self._aead = AESGCM(raw_key)
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+
+        self.cache_size = cache_size
+        # 键 -> (哈希, 状态)
+        self._cache: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self.writes = 0
+        self.skipped_writes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        logger.info(f"存储状态保险库已打开: {path}, 加密: {self._aead is not None}, "
+                    f"压缩: {'zstd' if zstandard is not None else 'zlib'}")
+
+    @staticmethod
+    def generate_key() -> str:
+        """生成新的加密密钥"""
+        return base64.urlsafe_b64encode(os.urandom(32)).decode("ascii")
+
+    # ---------- 编解码 ----------
+
+    def _encode(self, key: str, state: Dict[str, Any]) -> Tuple[str, int, int, bytes]:
+        raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        codec, data = _compress(raw)
+        encrypted = 0
+        if self._aead is not None:
+            # 以键作为附加认证数据，记录被挪到其他键下时解密失败
+            nonce = os.urandom(NONCE_SIZE)
+            data = nonce + self._aead.encrypt(nonce, data, key.encode("utf-8"))
+            encrypted = 1
+        return codec, encrypted, len(raw), data
+
+    def _decode(self, key: str, codec: str, encrypted: int, data: bytes) -> Dict[str, Any]:
+        if encrypted:
+            if self._aead is None:
+                raise RuntimeError(f"存储状态已加密，未配置 STORAGE_VAULT_KEY: {key}")
+            data = self._aead.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], key.encode("utf-8"))
+        return json.loads(_decompress(codec, data))
+
+    def _remember(self, key: str, digest: str, state: Dict[str, Any]) -> None:
+        self._cache[key] = (digest, state)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ---------- 读写 ----------
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取存储状态，不存在时返回 None。返回的是缓存对象，调用方不要修改。"""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached[1]
+            self.cache_misses += 1
+            row = self._conn.execute(
+                "SELECT codec, encrypted, hash, data FROM storage_states WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            codec, encrypted, digest, data = row
+            state = self._decode(key, codec, encrypted, data)
+            self._remember(key, digest, state)
+            return state
+
+    def save(self, key: str, state: Dict[str, Any]) -> bool:
+        """
+        保存存储状态
+
+        Returns:
+            是否实际写入，内容没有变化时返回 False
+        """
+        digest = state_hash(state)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                current = cached[0]
+            else:
+                row = self._conn.execute("SELECT hash FROM storage_states WHERE key = ?", (key,)).fetchone()
+                current = row[0] if row else None
+            if current == digest:
+                self.skipped_writes += 1
+                logger.debug(f"存储状态未变化，跳过写入: {key}")
+                return False
+
+            codec, encrypted, raw_size, data = self._encode(key, state)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO storage_states (key, codec, encrypted, hash, raw_size, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, codec, encrypted, digest, raw_size, data, time.time()),
+            )
+            self._remember(key, digest, state)
+            self.writes += 1
+            logger.debug(f"存储状态已写入保险库: {key}, 原始大小: {raw_size}, 压缩后: {len(data)}")
+            return True
+
+    def delete(self, key: str) -> bool:
+        """删除存储状态，返回是否存在"""
+        with self._lock:
+            self._cache.pop(key, None)
+            cursor = self._conn.execute("DELETE FROM storage_states WHERE key = ?", (key,))
+            return cursor.rowcount > 0
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM storage_states ORDER BY key")]
+
+    def has_cookies(self, key: str, names: Iterable[str], now: Optional[float] = None) -> bool:
+        """存储状态中是否包含全部指定 Cookie 且都未过期"""
+        return has_valid_cookies(self.load(key), names, now)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """清除内存缓存"""
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, raw_bytes, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM storage_states"
+            ).fetchone()
+        return {
+            "states": count,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "cached": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "writes": self.writes,
+            "skipped_writes": self.skipped_writes,
+        }
+
+    # ---------- 批量导出/导入 ----------
+
+    def export_records(self) -> Iterator[Dict[str, Any]]:
+        """逐条导出原始记录（保持压缩和加密，导入到使用相同密钥的保险库）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, codec, encrypted, hash, raw_size, data, updated_at FROM storage_states ORDER BY key"
+            ).fetchall()
+        for key, codec, encrypted, digest, raw_size, data, updated_at in rows:
+            yield {
+                "key": key, "codec": codec, "encrypted": encrypted, "hash": digest, "raw_size": raw_size,
+                "data": base64.b64encode(data).decode("ascii"), "updated_at": updated_at,
+            }
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """导入 export_records 产出的记录，已有的键被覆盖，返回导入条数"""
+        rows = [
+            (r["key"], r["codec"], r["encrypted"], r["hash"], r["raw_size"], base64.b64decode(r["data"]),
+             r.get("updated_at", time.time()))
+            for r in records
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO storage_states (key, codec, encrypted, hash, raw_size, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for row in rows:
+                self._cache.pop(row[0], None)
+        logger.info(f"存储状态保险库导入完成: {len(rows)} 条")
+        return len(rows)
+
+    def export_file(self, path: str) -> int:
+        """导出到 JSON Lines 文件，返回条数"""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.export_records():
+                f.write(json.dumps(record) + "\n")
+                count += 1
+        logger.info(f"存储状态保险库导出完成: {count} 条 -> {path}")
+        return count
+
+    def import_file(self, path: str) -> int:
+        """从 JSON Lines 文件导入，返回条数"""
+        with open(path, "r", encoding="utf-8") as f:
+            return self.import_records(json.loads(line) for line in f if line.strip())
+
+    def migrate_files(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        从 storage_state.json 文件迁移
+
+        Args:
+            entries: (键, 文件路径) 列表，文件不存在或损坏的跳过
+
+        Returns:
+            迁移条数
+        """
+        count = 0
+        for key, path in entries:
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                log_exception(logger, e, f"跳过无法读取的存储状态文件: {path}")
+                continue
+            self.save(key, state)
+            count += 1
+        logger.info(f"存储状态迁移完成: {count} 个文件")
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _profile_entries() -> List[Tuple[str, str]]:
+    """数据库中全部浏览器配置和未绑定配置的账户对应的 (键, 文件路径)"""
+    from app.database.session import SessionLocal
+    from app.models.models import Account, BrowserProfile
+    from .storage_state import account_state_key, profile_state_key
+
+    db = SessionLocal()
+    try:
+        entries = [(profile_state_key(p.id), p.storage_path) for p in db.query(BrowserProfile).all()]
+        entries += [
+            (account_state_key(a.id), a.storage_path)
+            for a in db.query(Account).filter(Account.browser_profile_id.is_(None)).all()
+        ]
+        return entries
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="存储状态保险库导出/导入/迁移")
+    parser.add_argument("command", choices=["export", "import", "migrate", "stats", "generate-key"])
+    parser.add_argument("file", nargs="?", help="export/import 的 JSON Lines 文件")
+    parser.add_argument("--vault", default=settings.STORAGE_VAULT_PATH, help="保险库文件路径")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate-key":
+        print(StorageStateVault.generate_key())
+        return
+
+    vault = StorageStateVault(args.vault, key=settings.STORAGE_VAULT_KEY or None)
+    try:
+        if args.command == "export":
+            print(vault.export_file(args.file or "storage_vault_export.jsonl"))
+        elif args.command == "import":
+            if not args.file:
+                parser.error("import 需要指定文件")
+            print(vault.import_file(args.file))
+        elif args.command == "migrate":
+            print(vault.migrate_files(_profile_entries()))
+        else:
+            print(json.dumps(vault.stats(), indent=2))
+    finally:
+        vault.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+自动化步骤追踪
+
+BrowserAutomationBase.step() 为每个自动化步骤生成一条 StepRecord，
+记录开始/结束时间、耗时和结果，并按 (平台, 步骤) 汇总 p50/p95，
+用于判断发布耗时主要花在哪个平台的哪一步。
+"""
+
+import json
+import math
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# 每个 (平台, 步骤) 保留的最近耗时样本数
+MAX_SAMPLES = 500
+
+
+@dataclass
+class StepRecord:
+    """单个自动化步骤的执行记录"""
+    platform: str
+    step: str
+    started_at: datetime
+    ended_at: datetime
+    duration_ms: float
+    outcome: str  # success, error
+    error: Optional[str] = None
+    trace_path: Optional[str] = None
+
+    def to_log_message(self) -> str:
+        """序列化为 TaskLog.message 使用的 JSON 字符串"""
+        data = asdict(self)
+        data["type"] = "step"
+        data["started_at"] = self.started_at.isoformat()
+        data["ended_at"] = self.ended_at.isoformat()
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _percentile(sorted_samples: List[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    index = max(0, math.ceil(q * len(sorted_samples)) - 1)
+    return sorted_samples[index]
+
+
+class StepStats:
+    """按 (平台, 步骤) 汇总步骤耗时"""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def record(self, record: StepRecord) -> None:
+        """记录一个步骤的耗时和结果"""
+        key = (record.platform, record.step)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.max_samples)
+                self._counts[key] = {"success": 0, "error": 0}
+            samples.append(record.duration_ms)
+            self._counts[key][record.outcome] = self._counts[key].get(record.outcome, 0) + 1
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """返回各 (平台, 步骤) 的次数、失败数和 p50/p95，按 p95 倒序"""
+        with self._lock:
+            snapshot = {key: (sorted(samples), dict(self._counts[key])) for key, samples in self._samples.items()}
+
+        result = []
+        for (platform, step), (samples, counts) in snapshot.items():
+            result.append({
+                "platform": platform,
+                "step": step,
+                "count": sum(counts.values()),
+                "errors": counts.get("error", 0),
+                "p50_ms": round(_percentile(samples, 0.5), 1),
+                "p95_ms": round(_percentile(samples, 0.95), 1),
+            })
+        result.sort(key=lambda item: -item["p95_ms"])
+        return result
+
+
+# 全局步骤统计实例
+step_stats = StepStats()
@@ -0,0 +1,262 @@
+"""
+视频上传进度追踪
+
+通过 Playwright 的 request / requestfinished / requestfailed 事件观察上传请求，
+统计已发送字节数和吞吐量，计算上传百分比，并按文件大小和实际吞吐量动态调整超时：
+- 超时从最近一次上传事件起算：宽限时间 + 剩余字节数 / 吞吐量
+- 吞吐量在有已完成的上传请求之前取最低吞吐量，之后取实际吞吐量除以安全系数
+- 已有上传请求完成、但没有上传中的请求时，超过 stall_timeout 没有新请求即视为卡住
+- 页面完成标志在没有上传中的请求、且出现在最后一个上传请求完成之后时视为完成，
+  小于 MIN_UPLOAD_REQUEST_BYTES 又不匹配URL规则的最后一片不会被统计，需要靠它结束
+
+Playwright 不提供单个请求的发送进度，已发送字节按已完成的上传请求体大小累计，
+分片上传（每片一个请求）时进度是连续的，单请求上传时进度在请求完成时跳到100%。
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Request
+
+logger = get_logger(__name__)
+
+# 视为上传请求的方法
+UPLOAD_METHODS = ("POST", "PUT", "PATCH")
+
+# 没有匹配URL规则时，请求体达到该大小即视为上传请求
+MIN_UPLOAD_REQUEST_BYTES = 64 * 1024
+
+# 按实际吞吐量估算剩余时间时的安全系数
+THROUGHPUT_SAFETY_FACTOR = 2.0
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+
+@dataclass
+class UploadStats:
+    """上传结果统计"""
+    file_size: int
+    bytes_sent: int
+    requests: int
+    failed_requests: int
+    duration_ms: float
+    throughput_bps: float
+    completed_by: str  # bytes: 已发送字节达到文件大小, selector: 页面完成标志
+
+
+class UploadTracker:
+    """追踪一次文件上传"""
+
+    def __init__(self, page: "Page", file_size: int, url_patterns: Sequence[str] = (),
+                 on_progress: Optional[ProgressCallback] = None,
+                 min_throughput: Optional[float] = None, stall_timeout: Optional[float] = None,
+                 grace: Optional[float] = None):
+        """
+        Args:
+            page: 上传所在页面
+            file_size: 文件字节数
+            url_patterns: 上传请求URL包含的片段，匹配的写请求无论大小都计入上传
+            on_progress: 上传百分比（0-100）变化时的回调
+            min_throughput: 最低吞吐量（字节/秒），用于估算超时
+            stall_timeout: 没有上传事件的最长时间（秒）
+            grace: 超时估算之外的固定宽限时间（秒）
+        """
+        self.page = page
+        self.file_size = max(file_size, 1)
+        self.url_patterns = tuple(url_patterns)
+        self.on_progress = on_progress
+        self.min_throughput = min_throughput or settings.UPLOAD_MIN_THROUGHPUT
+        self.stall_timeout = stall_timeout or settings.UPLOAD_STALL_TIMEOUT
+        self.grace = grace if grace is not None else settings.UPLOAD_TIMEOUT_GRACE
+
+        self.bytes_sent = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self._in_flight: Dict[int, int] = {}  # id(request) -> 请求体字节数
+        self._started = time.monotonic()
+        self._first_request: Optional[float] = None
+        self._last_finished: Optional[float] = None
+        self._last_event = self._started
+        self._changed = asyncio.Event()
+        self._listening = False
+        self._selector_seen_at: Optional[float] = None
+
+    @classmethod
+    def for_file(cls, page: "Page", file_path: str, **kwargs) -> "UploadTracker":
+        return cls(page, os.path.getsize(file_path), **kwargs)
+
+    # ---------- 事件处理 ----------
+
+    def _is_upload(self, request: "Request", body_size: int) -> bool:
+        if request.method not in UPLOAD_METHODS:
+            return False
+        if any(pattern in request.url for pattern in self.url_patterns):
+            return True
+        return body_size >= MIN_UPLOAD_REQUEST_BYTES
+
+    @staticmethod
+    def _body_size(request: "Request") -> int:
+        try:
+            body = request.post_data_buffer
+        except Exception:
+            return 0
+        return len(body) if body else 0
+
+    def _on_request(self, request: "Request") -> None:
+        size = self._body_size(request)
+        if not self._is_upload(request, size):
+            return
+        now = time.monotonic()
+        if self._first_request is None:
+            self._first_request = now
+        self._in_flight[id(request)] = size
+        self.requests += 1
+        self._touch(now)
+
+    def _on_request_finished(self, request: "Request") -> None:
+        size = self._in_flight.pop(id(request), None)
+        if size is None:
+            return
+        self.bytes_sent += size
+        now = time.monotonic()
+        self._last_finished = now
+        self._touch(now)
+
+    def _on_request_failed(self, request: "Request") -> None:
+        if self._in_flight.pop(id(request), None) is None:
+            return
+        self.failed_requests += 1
+        logger.warning(f"上传请求失败: {request.url}")
+        self._touch(time.monotonic())
+
+    def _touch(self, now: float) -> None:
+        self._last_event = now
+        self._changed.set()
+
+    def start(self) -> "UploadTracker":
+        """开始监听，必须在触发上传（set_input_files）之前调用"""
+        if not self._listening:
+            self.page.on("request", self._on_request)
+            self.page.on("requestfinished", self._on_request_finished)
+            self.page.on("requestfailed", self._on_request_failed)
+            self._listening = True
+            self._started = self._last_event = time.monotonic()
+        return self
+
+    def stop(self) -> None:
+        if self._listening:
+            self.page.remove_listener("request", self._on_request)
+            self.page.remove_listener("requestfinished", self._on_request_finished)
+            self.page.remove_listener("requestfailed", self._on_request_failed)
+            self._listening = False
+
+    # ---------- 进度与超时 ----------
+
+    @property
+    def throughput(self) -> float:
+        """已完成上传请求的平均吞吐量（字节/秒），尚无数据时为0"""
+        if self._first_request is None or not self.bytes_sent:
+            return 0.0
+        elapsed = time.monotonic() - self._first_request
+        return self.bytes_sent / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def percent(self) -> int:
+        return min(100, int(self.bytes_sent * 100 / self.file_size))
+
+    @property
+    def complete(self) -> bool:
+        if self._in_flight:
+            return False
+        if self.bytes_sent >= self.file_size:
+            return True
+        if self._selector_seen_at is None:
+            return False
+        # 没有观察到任何上传请求（上传走了无法识别的通道），或页面标志出现在最后一个上传请求完成之后
+        # （最后一片太小未被识别）；上传开始时就出现的标志不能据此结束
+        if self.requests == 0:
+            return True
+        return self._last_finished is not None and self._selector_seen_at >= self._last_finished
+
+    def deadline(self) -> float:
+        """当前的超时时刻（monotonic）"""
+        remaining = max(self.file_size - self.bytes_sent, 0)
+        observed = self.throughput
+        rate = observed / THROUGHPUT_SAFETY_FACTOR if observed > 0 else self.min_throughput
+        deadline = self._last_event + self.grace + remaining / rate
+        if self.requests and not self._in_flight:
+            # 分片之间没有上传中的请求，不应长时间没有新请求
+            deadline = min(deadline, self._last_event + self.stall_timeout)
+        return deadline
+
+    def stats(self, completed_by: str) -> UploadStats:
+        return UploadStats(
+            file_size=self.file_size,
+            bytes_sent=self.bytes_sent,
+            requests=self.requests,
+            failed_requests=self.failed_requests,
+            duration_ms=round((time.monotonic() - self._started) * 1000, 1),
+            throughput_bps=round(self.throughput, 1),
+            completed_by=completed_by,
+        )
+
+    async def _watch_selector(self, selector: str) -> None:
+        await self.page.wait_for_selector(selector, timeout=0)
+        self._selector_seen_at = time.monotonic()
+        self._changed.set()
+
+    async def wait(self, done_selector: Optional[str] = None) -> UploadStats:
+        """
+        等待上传完成，期间按百分比变化调用 on_progress
+
+        Args:
+            done_selector: 页面上的上传完成标志，在没有观察到上传请求、或出现在最后一个上传请求完成之后时生效
+
+        Raises:
+            asyncio.TimeoutError: 超过动态超时仍未完成
+        """
+        self.start()
+        selector_task = asyncio.create_task(self._watch_selector(done_selector)) if done_selector else None
+        reported = -1
+        try:
+            while True:
+                percent = self.percent
+                if percent != reported and self.on_progress:
+                    await self.on_progress(percent)
+                reported = percent
+
+                if self.complete:
+                    completed_by = "bytes" if self.bytes_sent >= self.file_size else "selector"
+                    if reported != 100 and self.on_progress:
+                        await self.on_progress(100)
+                    stats = self.stats(completed_by)
+                    logger.info(
+                        f"上传完成 - 字节: {stats.bytes_sent}/{self.file_size}, 请求数: {stats.requests}, "
+                        f"耗时: {stats.duration_ms}ms, 吞吐量: {stats.throughput_bps / 1024:.1f}KB/s, 依据: {completed_by}"
+                    )
+                    return stats
+
+                timeout = self.deadline() - time.monotonic()
+                if timeout <= 0:
+                    raise asyncio.TimeoutError(
+                        f"上传超时 - 已发送 {self.bytes_sent}/{self.file_size} 字节, "
+                        f"吞吐量 {self.throughput / 1024:.1f}KB/s, 上传中请求 {len(self._in_flight)}"
+                    )
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if selector_task and selector_task.done() and selector_task.exception():
+                    raise selector_task.exception()
+        finally:
+            if selector_task and not selector_task.done():
+                selector_task.cancel()
+            self.stop()
@@ -1,8 +1,16 @@
-from .base import BrowserAutomationBase
-from app.core.logger import logger, log_function_call, log_exception
+from .base import BrowserAutomationBase, LoginDetection
+from app.core.config import settings
+from app.core.logger import get_logger, log_function_call, log_exception
 import asyncio
 
+logger = get_logger(__name__)
+
 class ExamplePlatformAutomation(BrowserAutomationBase):
+    # 登录成功后下发的会话Cookie
+    LOGIN_COOKIES = ("slave_sid",)
+    # 上传请求URL片段：公众号后台的文件上传接口
+    UPLOAD_URL_PATTERNS = ("/cgi-bin/filetransfer", "/cgi-bin/uploadvideo", "upload_video")
+
     def __init__(self, platform: str, storage_state_path: str, proxy: dict = None, 
                  user_agent: str = None, viewport_size: dict = None):
         super().__init__(platform, storage_state_path, proxy, user_agent, viewport_size)
@@ -19,22 +27,21 @@ class ExamplePlatformAutomation(BrowserAutomationBase):
         return self.login_url
 
     @log_function_call(logger)
-    async def wait_for_login_completion(self) -> None:
+    async def wait_for_login_completion(self) -> LoginDetection:
+        """
+        等待用户在有头浏览器中手动完成登录
+        出现登录Cookie即认为登录完成，用户关闭浏览器时以Cookie判断是否已登录；
+        超时由调用方控制，检测出错时抛出异常
+        """
         logger.info("等待用户在浏览器中完成登录...")
-        logger.info("请在浏览器中完成登录操作，完成后直接关闭浏览器窗口")
-        for t in range(600):
-            try:
-                # 记录当前URL
-                current_url = self.page.url
-                logger.debug(f"当前页面URL: {current_url}")
-                
-                # 等待页面关闭事件，设置较短超时
-                await self.page.wait_for_event('close', timeout=1000)  # 1秒超时
-                break
-            except asyncio.TimeoutError:
-                # 超时说明页面还没关闭，继续循环
-                continue
-            
+        detection = await self.detect_login()
+        if not detection.logged_in:
+            logger.warning("页面已关闭，未检测到登录")
+        return detection
+
+    def is_logged_in_url(self, url: str) -> bool:
+        """登录后跳转到带 token 的后台首页"""
+        return "/cgi-bin/home" in url and "token=" in url
 
     @log_function_call(logger)
     async def save_login_state(self) -> None:
@@ -115,7 +122,11 @@ class ExamplePlatformAutomation(BrowserAutomationBase):
             await self.page.click('button[type="submit"]')
             
             logger.debug("等待登录完成")
-            await self.wait_for_login_completion()
+            detection = await asyncio.wait_for(self.wait_for_login_completion(),
+                                               timeout=settings.ACTIVATION_TIMEOUT)
+            if not detection.logged_in:
+                logger.warning("未检测到登录，自动登录失败")
+                return False
             
             logger.debug("保存登录状态")
             await self.save_login_state()
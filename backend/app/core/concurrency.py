@@ -0,0 +1,259 @@
+"""
+自动化并发自适应控制
+
+固定的并发上限在大机器上太保守，在小机器上又会导致 OOM 和 Chromium 崩溃。
+这里用 AIMD（加性增、乘性减）按主机负载调整同时运行的无头自动化实例数：
+
+- 每个控制周期采样 Chromium 子进程 RSS、系统可用内存、CPU 负载、步骤耗时和浏览器崩溃次数
+- 出现压力（崩溃、可用内存不足、Chromium RSS 超出预算、CPU 过载、步骤耗时明显上升）时上限乘以
+  AUTOMATION_DECREASE_FACTOR
+- 上限被用满且步骤耗时平稳时加 1；减小之后冷却一个周期再增加
+- 步骤耗时按 (平台, 步骤) 与各自的基线（慢速指数平均）相比，取最近样本比值的中位数，
+  不同步骤之间的耗时差异不会互相干扰
+
+当前上限、最近一次采样和每次调整的原因见 /system/status 的 automation_concurrency。
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.core.metrics import metrics_registry
+from app.core.process_stats import cpu_load, process_tree_stats, system_memory
+
+logger = get_logger(__name__)
+
+# 浏览器崩溃计数器（metrics_registry.counters）
+CRASH_COUNTER = "browser_crashes"
+
+
+class AdaptiveLimiter:
+    """上限可以在运行中调整的异步并发限制器（先到先得）"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self.peak_in_use = 0  # 上次 reset_peak 以来的最大占用
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self) -> None:
+        if self.in_use < self.limit and not self.waiting:
+            self._grant()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已分配名额后被取消，归还
+                self.release()
+            raise
+
+    def _grant(self) -> None:
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def release(self) -> None:
+        self.in_use = max(0, self.in_use - 1)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._grant()
+                waiter.set_result(None)
+
+    def set_limit(self, limit: int) -> None:
+        """调整上限；减小时已占用的名额不受影响，归还后才生效"""
+        self.limit = max(1, limit)
+        self._wake()
+
+    def reset_peak(self) -> None:
+        self.peak_in_use = self.in_use
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class LatencyTracker:
+    """按 (平台, 步骤) 与基线比较的步骤耗时"""
+
+    def __init__(self, alpha: float = 0.02, window: int = 200):
+        self.alpha = alpha
+        self._baselines: Dict[str, float] = {}
+        self._ratios: Deque[Tuple[float, float]] = deque(maxlen=window)
+
+    def record(self, key: str, duration_ms: float) -> None:
+        if duration_ms <= 0:
+            return
+        baseline = self._baselines.get(key)
+        if baseline is None:
+            self._baselines[key] = duration_ms
+            return
+        self._ratios.append((time.monotonic(), duration_ms / baseline))
+        self._baselines[key] = baseline + self.alpha * (duration_ms - baseline)
+
+    def ratio(self, since: float) -> Optional[float]:
+        """since（monotonic）之后样本的耗时比值中位数，没有样本时返回 None"""
+        recent = [ratio for at, ratio in self._ratios if at >= since]
+        return statistics.median(recent) if recent else None
+
+
+def default_sampler() -> Dict[str, Any]:
+    tree = process_tree_stats()
+    memory = system_memory()
+    return {
+        "chromium_rss_mb": round(tree["chromium_rss_bytes"] / 1024 / 1024, 1),
+        "chromium_processes": tree["chromium_processes"],
+        "available_memory_mb": round(memory["available_bytes"] / 1024 / 1024, 1) if memory else None,
+        "cpu_load": round(load, 2) if (load := cpu_load()) is not None else None,
+        "crashes": metrics_registry.counters.get(CRASH_COUNTER, 0),
+    }
+
+
+class ConcurrencyController:
+    """AIMD 并发控制器"""
+
+    def __init__(self, limiter: AdaptiveLimiter, sampler: Callable[[], Dict[str, Any]] = default_sampler,
+                 min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+                 interval: Optional[float] = None, history: int = 50):
+        self.limiter = limiter
+        self.sampler = sampler
+        self.min_limit = min_limit or settings.AUTOMATION_MIN_CONCURRENCY
+        self.max_limit = max_limit or settings.AUTOMATION_MAX_CONCURRENCY
+        self.interval = interval or settings.AUTOMATION_CONTROL_INTERVAL
+        self.latency = LatencyTracker()
+        self.changes: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self._last_crashes: Optional[float] = None
+        self._last_tick = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def record_step(self, platform: str, step: str, duration_ms: float) -> None:
+        self.latency.record(f"{platform}:{step}", duration_ms)
+
+    def _pressure(self, sample: Dict[str, Any]) -> Optional[str]:
+        """返回需要减小上限的原因"""
+        if sample["new_crashes"]:
+            return f"crash: 新增 {sample['new_crashes']} 次浏览器崩溃"
+        available = sample.get("available_memory_mb")
+        if available is not None and available < settings.AUTOMATION_MIN_FREE_MEMORY_MB:
+            return f"memory: 可用内存 {available}MB 低于 {settings.AUTOMATION_MIN_FREE_MEMORY_MB}MB"
+        budget = settings.AUTOMATION_CHROMIUM_RSS_BUDGET_MB
+        if budget and sample.get("chromium_rss_mb", 0) > budget:
+            return f"chromium_rss: Chromium RSS {sample['chromium_rss_mb']}MB 超出 {budget}MB"
+        load = sample.get("cpu_load")
+        if load is not None and load > settings.AUTOMATION_MAX_CPU_LOAD:
+            return f"cpu: 负载 {load} 超过 {settings.AUTOMATION_MAX_CPU_LOAD}"
+        ratio = sample.get("latency_ratio")
+        if ratio is not None and ratio > settings.AUTOMATION_LATENCY_TOLERANCE:
+            return f"latency: 步骤耗时为基线的 {ratio:.2f} 倍"
+        return None
+
+    def decide(self, sample: Dict[str, Any], now: float) -> Optional[Tuple[int, str]]:
+        """根据采样计算新的上限和原因，不需要调整时返回 None"""
+        limit = self.limiter.limit
+        reason = self._pressure(sample)
+        if reason is not None:
+            new_limit = max(self.min_limit, int(limit * settings.AUTOMATION_DECREASE_FACTOR))
+            return (new_limit, reason) if new_limit != limit else None
+
+        saturated = sample["peak_in_use"] >= limit or sample["waiting"] > 0
+        cooled = now - self._last_decrease >= 2 * self.interval
+        if saturated and cooled and limit < self.max_limit:
+            ratio = sample.get("latency_ratio")
+            detail = f"步骤耗时为基线的 {ratio:.2f} 倍" if ratio is not None else "暂无步骤耗时样本"
+            return limit + 1, f"increase: 并发已用满，{detail}"
+        return None
+
+    def tick(self, sample: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        执行一次控制周期，在事件循环线程中调用
+
+        Args:
+            sample: 已采集的主机指标，默认调用 sampler
+
+        Returns:
+            本次调整，没有调整时返回 None
+        """
+        now = time.monotonic()
+        sample = dict(sample if sample is not None else self.sampler())
+        crashes = sample.get("crashes", 0)
+        sample["new_crashes"] = crashes - self._last_crashes if self._last_crashes is not None else 0
+        self._last_crashes = crashes
+        sample["latency_ratio"] = self.latency.ratio(self._last_tick)
+        if sample["latency_ratio"] is not None:
+            sample["latency_ratio"] = round(sample["latency_ratio"], 2)
+        sample["peak_in_use"] = self.limiter.peak_in_use
+        sample["waiting"] = self.limiter.waiting
+        self.last_sample = sample
+        self._last_tick = now
+
+        decision = self.decide(sample, now)
+        self.limiter.reset_peak()
+        if decision is None:
+            return None
+
+        new_limit, reason = decision
+        change = {"at": time.time(), "from": self.limiter.limit, "to": new_limit, "reason": reason}
+        if new_limit < self.limiter.limit:
+            self._last_decrease = now
+        self.limiter.set_limit(new_limit)
+        self.changes.append(change)
+        logger.info(f"自动化并发上限调整 {change['from']} -> {new_limit}，原因: {reason}")
+        return change
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # 采样读取 /proc，放到线程中；调整上限会唤醒等待者，必须在事件循环中执行
+                self.tick(await asyncio.to_thread(self.sampler))
+            except Exception as e:
+                log_exception(logger, e, "自动化并发控制周期失败")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._last_tick = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limiter.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_use": self.limiter.in_use,
+            "waiting": self.limiter.waiting,
+            "last_sample": self.last_sample,
+            "changes": list(self.changes),
+        }
+
+
+automation_limiter = AdaptiveLimiter(settings.AUTOMATION_INITIAL_CONCURRENCY)
+concurrency_controller = ConcurrencyController(automation_limiter)
@@ -14,11 +14,100 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
     
+    # 数据库连接（Supabase PostgreSQL 或本地 SQLite）
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+    
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     CORS_ORIGINS: list[str] = ["http://localhost:3000", "http://localhost:3001"]  # 前端端口
     
     # 浏览器配置相关 - 保持本地存储
     BROWSER_PROFILES_DIR: str = os.getenv("BROWSER_PROFILES_DIR", "./browser_profiles")
+    # 每个存储状态文件保留的历史版本数
+    STORAGE_STATE_VERSIONS: int = int(os.getenv("STORAGE_STATE_VERSIONS", "3"))
+    # 存储状态后端：file（每个配置一个JSON文件）或 vault（单个压缩加密的SQLite文件）
+    STORAGE_STATE_BACKEND: str = os.getenv("STORAGE_STATE_BACKEND", "file").lower()
+    STORAGE_VAULT_PATH: str = os.getenv("STORAGE_VAULT_PATH", os.path.join(BROWSER_PROFILES_DIR, "storage_vault.db"))
+    # 保险库加密密钥（urlsafe base64 编码的32字节），为空时只压缩不加密，加密需要安装 cryptography
+    STORAGE_VAULT_KEY: str = os.getenv("STORAGE_VAULT_KEY", "")
+    
+    # 账户激活：同时打开的有头浏览器上限、等待登录的超时（秒）
+    MAX_ACTIVATION_BROWSERS: int = int(os.getenv("MAX_ACTIVATION_BROWSERS", "4"))
+    ACTIVATION_TIMEOUT: int = int(os.getenv("ACTIVATION_TIMEOUT", "600"))
+    
+    # 共享浏览器池：每种模式（有头/无头）的 Chromium 数上限，上下文按账户代理创建；0 表示每个自动化实例独立启动浏览器
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    # 浏览器内存看门狗：检查周期（秒，0 关闭）；浏览器承载的上下文数、进程树 RSS（MB）、
+    # 单个上下文 JS 堆（MB）超过上限时排空并重启浏览器（0 表示不限制）
+    BROWSER_WATCHDOG_INTERVAL: float = float(os.getenv("BROWSER_WATCHDOG_INTERVAL", "30"))
+    BROWSER_MAX_CONTEXT_USES: int = int(os.getenv("BROWSER_MAX_CONTEXT_USES", "200"))
+    BROWSER_RSS_LIMIT_MB: int = int(os.getenv("BROWSER_RSS_LIMIT_MB", "2048"))
+    BROWSER_CONTEXT_MEMORY_LIMIT_MB: int = int(os.getenv("BROWSER_CONTEXT_MEMORY_LIMIT_MB", "512"))
+    
+    # 自动化并发自适应控制（AIMD）：初始/最小/最大并发、控制周期（秒）
+    AUTOMATION_INITIAL_CONCURRENCY: int = int(os.getenv("AUTOMATION_INITIAL_CONCURRENCY", "4"))
+    AUTOMATION_MIN_CONCURRENCY: int = int(os.getenv("AUTOMATION_MIN_CONCURRENCY", "1"))
+    AUTOMATION_MAX_CONCURRENCY: int = int(os.getenv("AUTOMATION_MAX_CONCURRENCY", "32"))
+    AUTOMATION_CONTROL_INTERVAL: float = float(os.getenv("AUTOMATION_CONTROL_INTERVAL", "5"))
+    # 压力阈值：系统可用内存下限（MB）、Chromium RSS 预算（MB，0 不限制）、每核负载上限、步骤耗时相对基线的容忍倍数
+    AUTOMATION_MIN_FREE_MEMORY_MB: int = int(os.getenv("AUTOMATION_MIN_FREE_MEMORY_MB", "1024"))
+    AUTOMATION_CHROMIUM_RSS_BUDGET_MB: int = int(os.getenv("AUTOMATION_CHROMIUM_RSS_BUDGET_MB", "0"))
+    AUTOMATION_MAX_CPU_LOAD: float = float(os.getenv("AUTOMATION_MAX_CPU_LOAD", "0.9"))
+    AUTOMATION_LATENCY_TOLERANCE: float = float(os.getenv("AUTOMATION_LATENCY_TOLERANCE", "1.5"))
+    # 出现压力时上限乘以该系数
+    AUTOMATION_DECREASE_FACTOR: float = float(os.getenv("AUTOMATION_DECREASE_FACTOR", "0.7"))
+    
+    # 浏览器农场：worker 连接的农场地址（host:port），为空时使用本进程的共享浏览器池
+    BROWSER_FARM_ADDRESS: str = os.getenv("BROWSER_FARM_ADDRESS", "")
+    # 农场全局预算：浏览器数、每个浏览器的上下文数、上下文总数、Chromium RSS 上限（MB，0 不限制）
+    FARM_MAX_BROWSERS: int = int(os.getenv("FARM_MAX_BROWSERS", "4"))
+    FARM_MAX_CONTEXTS_PER_BROWSER: int = int(os.getenv("FARM_MAX_CONTEXTS_PER_BROWSER", "20"))
+    FARM_MAX_CONTEXTS: int = int(os.getenv("FARM_MAX_CONTEXTS", "60"))
+    FARM_MEMORY_BUDGET_MB: int = int(os.getenv("FARM_MEMORY_BUDGET_MB", "4096"))
+    # 超出预算时租用请求的最长等待时间、空闲浏览器的保留时间（秒）
+    FARM_LEASE_TIMEOUT: int = int(os.getenv("FARM_LEASE_TIMEOUT", "120"))
+    FARM_IDLE_TIMEOUT: int = int(os.getenv("FARM_IDLE_TIMEOUT", "300"))
+    
+    # 静态资源共享缓存：是否启用、缓存目录、总大小上限（字节）、按 max-age 缓存的最短时间和最长缓存时间（秒）
+    ASSET_CACHE_ENABLED: bool = os.getenv("ASSET_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    ASSET_CACHE_DIR: str = os.getenv("ASSET_CACHE_DIR", "./storage/asset_cache")
+    ASSET_CACHE_MAX_BYTES: int = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    ASSET_CACHE_MIN_TTL: int = int(os.getenv("ASSET_CACHE_MIN_TTL", "3600"))
+    ASSET_CACHE_MAX_TTL: int = int(os.getenv("ASSET_CACHE_MAX_TTL", str(30 * 24 * 3600)))
+    
+    # 自动化步骤追踪：失败时保存 Playwright trace 包
+    TRACE_ON_FAILURE: bool = os.getenv("TRACE_ON_FAILURE", "false").lower() in ("1", "true", "yes")
+    TRACE_DIR: str = os.getenv("TRACE_DIR", "./traces")
+    
+    # 上传超时估算：最低吞吐量（字节/秒）、分片之间的最长间隔（秒）、固定宽限时间（秒）
+    UPLOAD_MIN_THROUGHPUT: int = int(os.getenv("UPLOAD_MIN_THROUGHPUT", "65536"))
+    UPLOAD_STALL_TIMEOUT: int = int(os.getenv("UPLOAD_STALL_TIMEOUT", "120"))
+    UPLOAD_TIMEOUT_GRACE: int = int(os.getenv("UPLOAD_TIMEOUT_GRACE", "30"))
+    
+    # HTTP 直传（API 模式）：启用的平台（逗号分隔）、分片并发数、单个请求超时（秒）
+    API_MODE_PLATFORMS: list[str] = [p.strip().lower() for p in os.getenv("API_MODE_PLATFORMS", "").split(",") if p.strip()]
+    API_UPLOAD_PARALLELISM: int = int(os.getenv("API_UPLOAD_PARALLELISM", "4"))
+    API_UPLOAD_TIMEOUT: int = int(os.getenv("API_UPLOAD_TIMEOUT", "120"))
+    
+    # 微信公众号 API：接口地址、access_token 提前刷新时间（秒）、连接池大小
+    WEIXIN_API_BASE_URL: str = os.getenv("WEIXIN_API_BASE_URL", "https://api.weixin.qq.com")
+    WEIXIN_TOKEN_REFRESH_AHEAD: int = int(os.getenv("WEIXIN_TOKEN_REFRESH_AHEAD", "300"))
+    WEIXIN_API_MAX_CONNECTIONS: int = int(os.getenv("WEIXIN_API_MAX_CONNECTIONS", "20"))
+    # 临时素材在微信侧保存3天，缓存提前1小时过期
+    WEIXIN_TEMP_MEDIA_TTL: int = int(os.getenv("WEIXIN_TEMP_MEDIA_TTL", "255600"))
+    
+    # 图片优化流水线：结果缓存目录、编码进程数
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", "./storage/image_cache")
+    IMAGE_PIPELINE_WORKERS: int = int(os.getenv("IMAGE_PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # 公众号图文组装：原图地址模板（{pid}）、下载和上传阶段并发数（压缩阶段使用 IMAGE_PIPELINE_WORKERS）
+    WEIXIN_IMAGE_SOURCE_URL: str = os.getenv(
+        "WEIXIN_IMAGE_SOURCE_URL", "https://pixiv.chaosyn.com/api?action=proxy-image&pid={pid}&size=original")
+    WEIXIN_ARTICLE_DOWNLOAD_CONCURRENCY: int = int(os.getenv("WEIXIN_ARTICLE_DOWNLOAD_CONCURRENCY", "6"))
+    WEIXIN_ARTICLE_UPLOAD_CONCURRENCY: int = int(os.getenv("WEIXIN_ARTICLE_UPLOAD_CONCURRENCY", "4"))
+    # 图片标签索引：从 Supabase pic 表增量同步和全量同步的间隔（秒），增量间隔为 0 时不同步
+    PIC_CATALOG_SYNC_INTERVAL: float = float(os.getenv("PIC_CATALOG_SYNC_INTERVAL", "300"))
+    PIC_CATALOG_FULL_SYNC_INTERVAL: float = float(os.getenv("PIC_CATALOG_FULL_SYNC_INTERVAL", "21600"))
+    # 感知哈希汉明距离不超过该值视为近似重复（64位）
+    IMAGE_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("IMAGE_DUPLICATE_MAX_DISTANCE", "8"))
     
     # 日志配置相关
     LOG_DIR: str = os.getenv("LOG_DIR", "./logs")
@@ -40,10 +129,6 @@ class Settings:
                 "has_key": bool(self.SUPABASE_SERVICE_ROLE_KEY)
             }
         return {}
-    
-    # 确保必要目录存在
-    def __init__(self):
-        os.makedirs(self.BROWSER_PROFILES_DIR, exist_ok=True)
-        os.makedirs(self.LOG_DIR, exist_ok=True)
+
 
 settings = Settings()
@@ -1,43 +1,65 @@
 from fastapi import FastAPI
-from pathlib import Path
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import asyncio
 import os
+import time
 
 from app.core.config import settings
-from app.core.logger import get_logger, log_exception
+from app.core.logger import get_logger, log_exception, logger_manager
 from app.database.session import SessionLocal
 from app.database.init_db import init_db
+from app.core.system_settings import system_settings
 
 logger = get_logger(__name__)
 
-def init_application(app: FastAPI) -> None:
+
+class StartupState:
     """
-    初始化应用
-    
-    Args:
-        app: FastAPI应用实例
+    应用启动状态
+
+    记录每个启动阶段的耗时和结果，供 /system/ready 查询。
     """
-    logger.info("开始初始化应用")
-    
-    try:
-        # 确保存储目录存在
-        create_directories()
-        
-        # 初始化数据库
-        init_database()
-        
-        # 注册启动和关闭事件
-        register_events(app)
-        
-        logger.info("应用初始化完成")
-        
-    except Exception as e:
-        log_exception(logger, e, "应用初始化失败")
-        raise
+
+    # 失败后服务不可用的阶段；其余阶段失败只记录警告
+    REQUIRED_PHASES = ("logging", "directories", "database")
+
+    def __init__(self):
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        """所有必需阶段都已成功完成"""
+        return all(
+            self.phases.get(name, {}).get("status") == "ok"
+            for name in self.REQUIRED_PHASES
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "finished": self.finished,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "phases": self.phases,
+        }
+
+
+# 全局启动状态实例
+startup_state = StartupState()
+
 
 def create_directories() -> None:
     """创建必要的目录结构"""
     logger.info("开始创建必要的目录结构")
-    
+
     directories = [
         settings.BROWSER_PROFILES_DIR,
         settings.LOG_DIR,
@@ -45,7 +67,7 @@ def create_directories() -> None:
         "./media",
         "./temp"
     ]
-    
+
     for directory in directories:
         try:
             os.makedirs(directory, exist_ok=True)
@@ -53,17 +75,21 @@ def create_directories() -> None:
         except Exception as e:
             log_exception(logger, e, f"创建目录失败: {directory}")
             raise
-    
+
     logger.info("目录结构创建完成")
 
 def init_database() -> None:
     """初始化数据库"""
     logger.info("开始初始化数据库")
-    
+
     db = SessionLocal()
     try:
         init_db(db)
         logger.info("数据库初始化完成")
+
+        # 加载系统设置缓存，后续读取不再查询数据库
+        system_settings.configure(SessionLocal)
+        system_settings.load(db)
     except Exception as e:
         log_exception(logger, e, "数据库初始化失败")
         raise
@@ -71,27 +97,110 @@ def init_database() -> None:
         db.close()
         logger.debug("数据库连接已关闭")
 
-def register_events(app: FastAPI) -> None:
+def check_supabase() -> bool:
+    """检查Supabase连接"""
+    if not settings.is_using_supabase:
+        logger.info("未配置Supabase，使用本地数据库")
+        return False
+
+    logger.info("检测到Supabase配置，连接信息:")
+    for key, value in settings.supabase_connection_info.items():
+        logger.info(f"  {key}: {value}")
+
+    from app.database.supabase_init import test_supabase_connection
+    if test_supabase_connection():
+        logger.info("✅ Supabase连接成功")
+        return True
+
+    logger.warning("⚠️ Supabase连接失败，请检查配置")
+    return False
+
+async def _run_phase(name: str, func: Callable[[], Any]) -> None:
+    """
+    在线程池中执行一个启动阶段并记录耗时
+
+    Args:
+        name: 阶段名称
+        func: 阶段执行的同步函数
+    """
+    phase = {"status": "running", "duration_ms": None, "error": None}
+    startup_state.phases[name] = phase
+    start = time.perf_counter()
+
+    try:
+        await asyncio.to_thread(func)
+        phase["status"] = "ok"
+    except Exception as e:
+        phase["status"] = "failed"
+        phase["error"] = str(e)
+        log_exception(logger, e, f"启动阶段失败: {name}")
+    finally:
+        phase["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"启动阶段 {name} 完成 - 状态: {phase['status']}, 耗时: {phase['duration_ms']}ms")
+
+async def run_startup() -> None:
+    """并发执行所有启动阶段"""
+    startup_state.started_at = datetime.utcnow()
+    start = time.perf_counter()
+    logger.info("开始初始化应用")
+
+    await asyncio.gather(
+        _run_phase("logging", logger_manager.setup_file_handlers),
+        _run_phase("directories", create_directories),
+        _run_phase("database", init_database),
+        _run_phase("supabase", check_supabase),
+    )
+
+    startup_state.finished_at = datetime.utcnow()
+    total_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    if startup_state.ready:
+        logger.info(f"=== LinkMatrix 后端服务启动完成，总耗时: {total_ms}ms ===")
+    else:
+        logger.error(f"=== LinkMatrix 后端服务启动未完成，总耗时: {total_ms}ms，请查看 /system/ready ===")
+    logger.info(f"项目名称: {settings.PROJECT_NAME}")
+    logger.info(f"API前缀: {settings.API_PREFIX}")
+    logger.info(f"日志级别: {settings.LOG_LEVEL}")
+    logger.info(f"数据库URL: {settings.DATABASE_URL}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    注册应用事件
-    
+    应用生命周期
+
+    启动阶段在后台任务中执行，不阻塞服务器绑定端口；
+    就绪状态通过 /system/ready 查询。
+
     Args:
         app: FastAPI应用实例
     """
-    logger.info("注册应用事件处理器")
-    
-    @app.on_event("startup")
-    async def startup_event():
-        logger.info("=== LinkMatrix 后端服务启动完成 ===")
-        logger.info(f"项目名称: {settings.PROJECT_NAME}")
-        logger.info(f"API前缀: {settings.API_PREFIX}")
-        logger.info(f"日志级别: {settings.LOG_LEVEL}")
-        logger.info(f"数据库URL: {settings.DATABASE_URL}")
-    
-    @app.on_event("shutdown")
-    async def shutdown_event():
-        logger.info("=== LinkMatrix 后端服务正在关闭 ===")
-        logger.info("清理资源...")
-        logger.info("服务关闭完成")
-    
-    logger.debug("应用事件处理器注册完成")
\ No newline at end of file
+    # 自动化、图片处理、微信接口模块会加载 numpy、Pillow、httpx，在生命周期内导入，不拖慢 import main
+    from app.core.concurrency import concurrency_controller
+    from app.services.tag_index_service import catalog_sync
+
+    startup_task = asyncio.create_task(run_startup())
+    app.state.startup_task = startup_task
+    concurrency_controller.start()
+    if settings.is_using_supabase and settings.PIC_CATALOG_SYNC_INTERVAL > 0:
+        catalog_sync.start()
+
+    yield
+
+    logger.info("=== LinkMatrix 后端服务正在关闭 ===")
+    if not startup_task.done():
+        startup_task.cancel()
+    logger.info("清理资源...")
+    from app.automation.asset_cache import close_asset_cache
+    from app.automation.browser_pool import close_browser_pool
+    from app.services.activation_service import activation_manager
+    from app.services.image_optimize_service import close_image_optimizer
+    from app.services.weixin_api_service import close_weixin_client
+
+    await concurrency_controller.stop()
+    await catalog_sync.stop()
+    await activation_manager.shutdown()
+    await close_weixin_client()
+    await close_image_optimizer()
+    await close_browser_pool()
+    close_asset_cache()
+    logger.info("服务关闭完成")
@@ -9,6 +9,8 @@
 - 不同级别的日志分离
 """
 
+import asyncio
+import functools
 import logging
 import logging.handlers
 import os
@@ -78,18 +80,13 @@ class LoggerManager:
     def __init__(self):
         """初始化日志管理器"""
         self.log_dir = Path("logs")
-        self.log_dir.mkdir(exist_ok=True)
-        
-        # 创建不同级别的日志目录
-        (self.log_dir / "debug").mkdir(exist_ok=True)
-        (self.log_dir / "info").mkdir(exist_ok=True)
-        (self.log_dir / "warning").mkdir(exist_ok=True)
-        (self.log_dir / "error").mkdir(exist_ok=True)
+        self.console_handler: Optional[logging.Handler] = None
+        self.file_handlers_ready = False
         
         self._setup_root_logger()
     
     def _setup_root_logger(self):
-        """设置根日志记录器"""
+        """设置根日志记录器（导入时只添加控制台处理器，文件处理器在启动阶段创建）"""
         root_logger = logging.getLogger()
         root_logger.setLevel(logging.DEBUG)
         
@@ -99,9 +96,28 @@ class LoggerManager:
         
         # 添加控制台处理器
         self._add_console_handler(root_logger)
+    
+    def setup_file_handlers(self) -> None:
+        """
+        创建日志目录和文件处理器
+        
+        在应用启动阶段调用，避免每次导入（包括 reload 时）都创建文件处理器；
+        重复调用不会重复添加处理器。
+        """
+        if self.file_handlers_ready:
+            return
+        
+        self.log_dir.mkdir(exist_ok=True)
+        
+        # 创建不同级别的日志目录
+        (self.log_dir / "debug").mkdir(exist_ok=True)
+        (self.log_dir / "info").mkdir(exist_ok=True)
+        (self.log_dir / "warning").mkdir(exist_ok=True)
+        (self.log_dir / "error").mkdir(exist_ok=True)
         
         # 添加文件处理器
-        self._add_file_handlers(root_logger)
+        self._add_file_handlers(logging.getLogger())
+        self.file_handlers_ready = True
     
     def _add_console_handler(self, logger: logging.Logger):
         """添加控制台处理器"""
@@ -115,6 +131,7 @@ class LoggerManager:
         console_handler.setFormatter(formatter)
         
         logger.addHandler(console_handler)
+        self.console_handler = console_handler
     
     def _add_file_handlers(self, logger: logging.Logger):
         """添加文件处理器"""
@@ -185,6 +202,25 @@ class LoggerManager:
         
         return handler
     
+    def set_level(self, level: str) -> None:
+        """
+        运行时调整日志级别，无需重启服务
+        
+        文件处理器按级别分文件，级别固定；只有控制台处理器跟随 LOG_LEVEL。
+        
+        Args:
+            level: 日志级别名称，如 DEBUG、INFO
+        """
+        level_name = str(level).upper()
+        level_value = logging.getLevelName(level_name)
+        if not isinstance(level_value, int):
+            raise ValueError(f"无效的日志级别: {level}")
+        
+        if self.console_handler is not None:
+            self.console_handler.setLevel(level_value)
+        settings.LOG_LEVEL = level_name
+        logging.getLogger(__name__).info(f"日志级别已调整为: {level_name}")
+    
     def get_logger(self, name: str) -> logging.Logger:
         """
         获取指定名称的日志记录器
@@ -221,18 +257,45 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
     return logger_manager.get_logger(name)
 
 
-def log_function_call(func):
+def log_function_call(func=None):
     """
     装饰器：记录函数调用日志
     
+    支持 ``@log_function_call`` 和 ``@log_function_call(logger)`` 两种写法，
+    同时支持同步函数和协程函数。
+    
     Args:
-        func: 被装饰的函数
+        func: 被装饰的函数，或用于记录日志的日志记录器
         
     Returns:
         装饰后的函数
     """
+    if func is None or isinstance(func, logging.Logger):
+        bound_logger = func
+        return lambda f: _wrap_function_call(f, bound_logger)
+    return _wrap_function_call(func, None)
+
+
+def _wrap_function_call(func, bound_logger: Optional[logging.Logger]):
+    """为函数包装调用日志"""
+    logger = bound_logger or get_logger(func.__module__)
+    
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            logger.debug(f"调用函数 {func.__name__}，参数: args={args}, kwargs={kwargs}")
+            try:
+                result = await func(*args, **kwargs)
+                logger.debug(f"函数 {func.__name__} 执行成功")
+                return result
+            except Exception as e:
+                logger.error(f"函数 {func.__name__} 执行失败: {str(e)}")
+                raise
+        
+        return async_wrapper
+    
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
         logger.debug(f"调用函数 {func.__name__}，参数: args={args}, kwargs={kwargs}")
         
         try:
@@ -0,0 +1,307 @@
+"""
+请求指标模块
+
+按路由模板统计每个请求的：
+- 请求数（按方法、路由、状态码）
+- 延迟直方图
+- SQL语句数和耗时（通过 SQLAlchemy 事件钩子）
+- 等待 Playwright 的耗时（自动化层通过 track_playwright() 上报）
+
+指标以 Prometheus 文本格式在 /system/metrics 暴露，并在 /system/status 中汇总。
+中间件为纯 ASGI 实现，每个请求只做计时和几次字典操作，开销保持在微秒级。
+"""
+
+import bisect
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 未匹配到路由的请求统一使用该标签，避免按原始路径产生大量标签
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestMetrics:
+    """单个请求的运行时指标"""
+
+    __slots__ = ("sql_count", "sql_time", "playwright_time")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.playwright_time = 0.0
+
+
+# 当前请求的指标，同步接口在线程池中执行时也会继承该上下文
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+
+class RouteStats:
+    """单个路由的累计指标"""
+
+    __slots__ = ("count", "status_counts", "buckets", "latency_sum",
+                 "sql_count", "sql_time", "playwright_time")
+
+    def __init__(self):
+        self.count = 0
+        self.status_counts: Dict[int, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.playwright_time = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """根据直方图估算分位数（取所在桶的上界）"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    """全局指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.started_at = time.time()
+        self.playwright_time_total = 0.0
+        self.counters: Dict[str, float] = {}
+
+    def record_request(self, method: str, route: str, status: int, duration: float,
+                       request_metrics: RequestMetrics) -> None:
+        """记录一个已完成的请求"""
+        key = (method, route)
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.count += 1
+            stats.status_counts[status] = stats.status_counts.get(status, 0) + 1
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            stats.latency_sum += duration
+            stats.sql_count += request_metrics.sql_count
+            stats.sql_time += request_metrics.sql_time
+            stats.playwright_time += request_metrics.playwright_time
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        累加一个全局计数器，以 linkmatrix_<name> 的名称导出
+
+        Args:
+            name: 计数器名称
+            value: 增量
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_playwright_time(self, seconds: float) -> None:
+        """累加等待 Playwright 的总耗时"""
+        with self._lock:
+            self.playwright_time_total += seconds
+
+    def reset(self) -> None:
+        """清空全部指标"""
+        with self._lock:
+            self._routes.clear()
+            self.counters.clear()
+            self.playwright_time_total = 0.0
+
+    def render_prometheus(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            routes = {key: stats for key, stats in self._routes.items()}
+            counters = dict(self.counters)
+            playwright_total = self.playwright_time_total
+
+        lines: List[str] = []
+
+        lines.append("# HELP linkmatrix_http_requests_total HTTP请求数")
+        lines.append("# TYPE linkmatrix_http_requests_total counter")
+        for (method, route), stats in routes.items():
+            for status, count in stats.status_counts.items():
+                lines.append(
+                    f'linkmatrix_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}'
+                )
+
+        lines.append("# HELP linkmatrix_http_request_duration_seconds HTTP请求延迟")
+        lines.append("# TYPE linkmatrix_http_request_duration_seconds histogram")
+        for (method, route), stats in routes.items():
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += bucket_count
+                lines.append(f'linkmatrix_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'linkmatrix_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f"linkmatrix_http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}")
+            lines.append(f"linkmatrix_http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+        lines.append("# HELP linkmatrix_http_sql_statements_total 请求中执行的SQL语句数")
+        lines.append("# TYPE linkmatrix_http_sql_statements_total counter")
+        for (method, route), stats in routes.items():
+            lines.append(f'linkmatrix_http_sql_statements_total{{method="{method}",route="{route}"}} {stats.sql_count}')
+
+        lines.append("# HELP linkmatrix_http_sql_duration_seconds_total 请求中执行SQL的耗时")
+        lines.append("# TYPE linkmatrix_http_sql_duration_seconds_total counter")
+        for (method, route), stats in routes.items():
+            lines.append(
+                f'linkmatrix_http_sql_duration_seconds_total{{method="{method}",route="{route}"}} {stats.sql_time:.6f}'
+            )
+
+        lines.append("# HELP linkmatrix_http_playwright_wait_seconds_total 请求中等待Playwright的耗时")
+        lines.append("# TYPE linkmatrix_http_playwright_wait_seconds_total counter")
+        for (method, route), stats in routes.items():
+            lines.append(
+                f'linkmatrix_http_playwright_wait_seconds_total{{method="{method}",route="{route}"}} {stats.playwright_time:.6f}'
+            )
+
+        lines.append("# HELP linkmatrix_playwright_wait_seconds_total 等待Playwright的总耗时（含后台任务）")
+        lines.append("# TYPE linkmatrix_playwright_wait_seconds_total counter")
+        lines.append(f"linkmatrix_playwright_wait_seconds_total {playwright_total:.6f}")
+
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE linkmatrix_{name} counter")
+            lines.append(f"linkmatrix_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总各路由指标，用于 /system/status"""
+        with self._lock:
+            routes = {key: stats for key, stats in self._routes.items()}
+            counters = dict(self.counters)
+            playwright_total = self.playwright_time_total
+
+        route_summaries = []
+        for (method, route), stats in sorted(routes.items(), key=lambda item: -item[1].count):
+            p50 = stats.quantile(0.5)
+            p95 = stats.quantile(0.95)
+            route_summaries.append({
+                "method": method,
+                "route": route,
+                "count": stats.count,
+                "errors": sum(c for s, c in stats.status_counts.items() if s >= 500),
+                "avg_ms": round(stats.latency_sum / stats.count * 1000, 2),
+                "p50_ms_le": p50 * 1000 if p50 is not None else None,
+                "p95_ms_le": p95 * 1000 if p95 is not None else None,
+                "avg_sql_statements": round(stats.sql_count / stats.count, 2),
+                "avg_sql_ms": round(stats.sql_time / stats.count * 1000, 2),
+                "avg_playwright_ms": round(stats.playwright_time / stats.count * 1000, 2),
+            })
+
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "total_requests": sum(stats.count for stats in routes.values()),
+            "playwright_wait_seconds": round(playwright_total, 3),
+            "counters": counters,
+            "routes": route_summaries,
+        }
+
+
+# 全局指标注册表实例
+metrics_registry = MetricsRegistry()
+
+
+# ==================== SQL 钩子 ====================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current_request.get()
+    if current is None:
+        return
+    starts = conn.info.get("metrics_query_start")
+    if starts:
+        current.sql_time += time.perf_counter() - starts.pop()
+    current.sql_count += 1
+
+
+_sql_hooks_installed = False
+
+
+def install_sql_hooks() -> None:
+    """在所有 SQLAlchemy 引擎上注册SQL计时钩子（只注册一次）"""
+    global _sql_hooks_installed
+    if _sql_hooks_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _sql_hooks_installed = True
+    logger.debug("SQL计时钩子注册完成")
+
+
+# ==================== Playwright 计时 ====================
+
+@asynccontextmanager
+async def track_playwright():
+    """
+    统计一段等待 Playwright 的耗时
+
+    用法：
+        async with track_playwright():
+            await page.goto(url)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics_registry.add_playwright_time(elapsed)
+        current = _current_request.get()
+        if current is not None:
+            current.playwright_time += elapsed
+
+
+# ==================== 中间件 ====================
+
+class RequestMetricsMiddleware:
+    """按路由模板记录请求延迟、SQL和Playwright耗时的 ASGI 中间件"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+        install_sql_hooks()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        token = _current_request.set(request_metrics)
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            self.registry.record_request(scope["method"], route_path, status_holder[0], duration, request_metrics)
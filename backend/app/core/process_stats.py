@@ -0,0 +1,144 @@
+"""
+进程资源统计
+
+统计当前进程及其全部子进程（Playwright 驱动、Chromium 各进程）的 RSS 和进程数。
+安装了 psutil 时使用 psutil，否则在 Linux 上直接读取 /proc。
+"""
+
+import os
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖
+    psutil = None
+
+# Chromium 进程名特征（chrome、chromium、headless_shell）
+CHROMIUM_NAMES = ("chrom", "headless_shell")
+
+
+def _is_chromium(name: str) -> bool:
+    name = name.lower()
+    return any(marker in name for marker in CHROMIUM_NAMES)
+
+
+def _proc_children_map() -> Dict[int, List[int]]:
+    """读取 /proc 构建 父进程 -> 子进程 映射"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格，从最后一个右括号之后解析
+        fields = stat[stat.rfind(b")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+
+def _proc_rss_and_name(pid: int):
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    with open(f"/proc/{pid}/statm") as f:
+        rss = int(f.read().split()[1]) * page_size
+    with open(f"/proc/{pid}/comm") as f:
+        name = f.read().strip()
+    return rss, name
+
+
+def process_tree_stats(pid: Optional[int] = None) -> Dict[str, int]:
+    """
+    统计进程树的资源占用
+
+    Args:
+        pid: 根进程ID，默认为当前进程
+
+    Returns:
+        {"rss_bytes": 进程树RSS总和, "processes": 进程数,
+         "chromium_processes": Chromium进程数, "chromium_rss_bytes": Chromium进程RSS总和}
+    """
+    pid = pid or os.getpid()
+    result = {"rss_bytes": 0, "processes": 0, "chromium_processes": 0, "chromium_rss_bytes": 0}
+
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return result
+        for process in processes:
+            try:
+                rss = process.memory_info().rss
+                name = process.name()
+            except psutil.Error:
+                continue
+            result["rss_bytes"] += rss
+            result["processes"] += 1
+            if _is_chromium(name):
+                result["chromium_processes"] += 1
+                result["chromium_rss_bytes"] += rss
+        return result
+
+    if not os.path.isdir("/proc"):
+        return result
+
+    children = _proc_children_map()
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, ()))
+        try:
+            rss, name = _proc_rss_and_name(current)
+        except OSError:
+            continue
+        result["rss_bytes"] += rss
+        result["processes"] += 1
+        if _is_chromium(name):
+            result["chromium_processes"] += 1
+            result["chromium_rss_bytes"] += rss
+    return result
+
+
+def system_memory() -> Dict[str, int]:
+    """
+    系统内存
+
+    Returns:
+        {"total_bytes": 总内存, "available_bytes": 可用内存}，无法读取时为空字典
+    """
+    if psutil is not None:
+        memory = psutil.virtual_memory()
+        return {"total_bytes": memory.total, "available_bytes": memory.available}
+    try:
+        values: Dict[str, int] = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                values[name] = int(rest.split()[0]) * 1024
+        return {"total_bytes": values["MemTotal"], "available_bytes": values["MemAvailable"]}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def cpu_load() -> Optional[float]:
+    """1 分钟平均负载除以 CPU 数（1.0 表示全部核心满载），无法读取时返回 None"""
+    try:
+        load = psutil.getloadavg()[0] if psutil is not None else os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+    return load / (os.cpu_count() or 1)
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """单个进程的 RSS（字节），进程不存在时返回 None"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        return _proc_rss_and_name(pid)[0]
+    except OSError:
+        return None
@@ -0,0 +1,196 @@
+"""
+流式分阶段异步流水线
+
+每个阶段有自己的并发上限和有界输入队列，条目处理完立即进入下一阶段，不等整批完成：
+下载第 3 张图时第 1 张可能已经在压缩、上传。队列满时上游阻塞（背压），内存占用有上限。
+
+- 单个条目在某阶段失败时记录异常并跳过后续阶段，其他条目继续
+- stats() 返回各阶段的排队数、处理中数、完成/失败数、吞吐量和平均耗时，可在运行中随时读取
+- on_item_done 在条目离开流水线（完成或失败）时回调，用于写任务进度；回调异常只记录日志，不影响流水线
+- 流水线自身出错（或被取消）时取消全部阶段，不会留下阻塞在队列上的 worker
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.logger import get_logger, log_exception
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """流水线阶段"""
+    name: str
+    handler: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: Optional[int] = None  # 输入队列长度，默认 concurrency * 2
+
+
+@dataclass
+class StageStats:
+    """阶段统计"""
+    name: str
+    concurrency: int
+    processed: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    peak_queue: int = 0
+    busy_seconds: float = 0.0
+    first_started: Optional[float] = None
+    last_finished: Optional[float] = None
+    queue: Optional[asyncio.Queue] = field(default=None, repr=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = (self.last_finished - self.first_started) if self.first_started and self.last_finished else 0.0
+        done = self.processed + self.failed
+        return {
+            "stage": self.name,
+            "concurrency": self.concurrency,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "peak_queue": self.peak_queue,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_s": round(done / elapsed, 2) if elapsed > 0 else None,
+            "avg_ms": round(self.busy_seconds / done * 1000, 1) if done else None,
+        }
+
+
+@dataclass
+class PipelineResult:
+    """单个条目的结果"""
+    index: int
+    value: Any = None
+    error: Optional[BaseException] = None
+    stage: Optional[str] = None  # 失败的阶段
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class StagePipeline:
+    """流式分阶段异步流水线"""
+
+    def __init__(self, stages: List[Stage],
+                 on_item_done: Optional[Callable[[PipelineResult, int, int], Awaitable[None]]] = None):
+        """
+        Args:
+            stages: 按顺序排列的阶段
+            on_item_done: on_item_done(result, done, total)，条目离开流水线时调用
+        """
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.on_item_done = on_item_done
+        self._stats = [StageStats(name=stage.name, concurrency=stage.concurrency) for stage in stages]
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [stats.snapshot() for stats in self._stats]
+
+    async def run(self, items: Iterable[Any]) -> List[PipelineResult]:
+        """
+        处理全部条目
+
+        Returns:
+            与输入顺序一致的结果列表
+        """
+        items = list(items)
+        total = len(items)
+        results: List[Optional[PipelineResult]] = [None] * total
+        done = 0
+        done_lock = asyncio.Lock()
+
+        queues = [asyncio.Queue(maxsize=stage.queue_size or stage.concurrency * 2) for stage in self.stages]
+        for stats, queue in zip(self._stats, queues):
+            stats.queue = queue
+
+        async def finish(result: PipelineResult) -> None:
+            nonlocal done
+            results[result.index] = result
+            async with done_lock:
+                done += 1
+                current = done
+            if self.on_item_done is not None:
+                try:
+                    await self.on_item_done(result, current, total)
+                except Exception as e:
+                    log_exception(logger, e, f"流水线条目回调失败 - 第 {result.index} 项")
+
+        async def worker(position: int) -> None:
+            stage = self.stages[position]
+            stats = self._stats[position]
+            queue = queues[position]
+            next_queue = queues[position + 1] if position + 1 < len(queues) else None
+            while True:
+                entry = await queue.get()
+                if entry is _DONE:
+                    return
+                index, value = entry
+                stats.in_flight += 1
+                started = time.monotonic()
+                if stats.first_started is None:
+                    stats.first_started = started
+                try:
+                    output = await stage.handler(value)
+                except Exception as e:
+                    error: Optional[Exception] = e
+                else:
+                    error = None
+                finally:
+                    finished = time.monotonic()
+                    stats.in_flight -= 1
+                    stats.busy_seconds += finished - started
+                    stats.last_finished = finished
+
+                if error is not None:
+                    stats.failed += 1
+                    logger.warning(f"流水线阶段 {stage.name} 处理第 {index} 项失败: {error}")
+                    await finish(PipelineResult(index=index, error=error, stage=stage.name))
+                    continue
+                stats.processed += 1
+                if next_queue is None:
+                    await finish(PipelineResult(index=index, value=output))
+                else:
+                    await next_queue.put((index, output))
+                    next_stats = self._stats[position + 1]
+                    next_stats.peak_queue = max(next_stats.peak_queue, next_queue.qsize())
+
+        async def run_stage(position: int) -> None:
+            workers = [asyncio.create_task(worker(position)) for _ in range(self.stages[position].concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+            # 本阶段全部完成后通知下一阶段的每个 worker 退出
+            if position + 1 < len(queues):
+                for _ in range(self.stages[position + 1].concurrency):
+                    await queues[position + 1].put(_DONE)
+
+        async def feed() -> None:
+            for index, item in enumerate(items):
+                await queues[0].put((index, item))
+                self._stats[0].peak_queue = max(self._stats[0].peak_queue, queues[0].qsize())
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        self.started_at = time.monotonic()
+        tasks = [asyncio.create_task(feed())]
+        tasks += [asyncio.create_task(run_stage(position)) for position in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # 某个阶段异常退出时，其余阶段会一直等待队列，全部取消
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.finished_at = time.monotonic()
+        return results
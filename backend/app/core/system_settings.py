@@ -0,0 +1,327 @@
+"""
+系统设置缓存模块
+
+将 system_settings 表中的配置在进程内缓存，提供：
+- 启动时一次性加载，按 value_type 转换为对应的Python类型
+- 以属性方式访问常用设置（如 system_settings.ffmpeg_path）
+- 通过版本号行（settings_version）实现跨进程失效
+- 设置变更通知，log_level 变更时实时调整日志处理器级别
+"""
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import Integer, String, cast
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception, logger_manager
+from app.models.models import SystemSetting
+
+logger = get_logger(__name__)
+
+# 版本号行的键名，每次更新设置时自增，其他进程据此判断缓存是否过期
+VERSION_KEY = "settings_version"
+
+
+def _to_bool(value: str) -> bool:
+    """将字符串转换为布尔值"""
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+# value_type -> (反序列化函数, 序列化函数)
+_VALUE_TYPES: Dict[str, tuple] = {
+    "string": (str, str),
+    "int": (int, str),
+    "bool": (_to_bool, lambda v: "true" if v else "false"),
+    "json": (json.loads, lambda v: json.dumps(v, ensure_ascii=False)),
+}
+
+
+def coerce_value(raw: Optional[str], value_type: Optional[str]) -> Any:
+    """
+    按 value_type 将数据库中的字符串值转换为Python值
+
+    Args:
+        raw: 数据库中存储的字符串
+        value_type: 值类型（string, int, bool, json）
+
+    Returns:
+        转换后的值，转换失败时返回原始字符串
+    """
+    if raw is None:
+        return None
+    parse, _ = _VALUE_TYPES.get(value_type or "string", _VALUE_TYPES["string"])
+    try:
+        return parse(raw)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"系统设置值类型转换失败，按字符串处理: {raw!r} ({value_type}) - {e}")
+        return raw
+
+
+def serialize_value(value: Any, value_type: Optional[str]) -> Optional[str]:
+    """按 value_type 将Python值序列化为数据库字符串"""
+    if value is None:
+        return None
+    _, dump = _VALUE_TYPES.get(value_type or "string", _VALUE_TYPES["string"])
+    return dump(value)
+
+
+class SystemSettingsStore:
+    """进程内系统设置缓存"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 check_interval: float = 5.0):
+        """
+        初始化设置缓存
+
+        Args:
+            session_factory: 创建数据库会话的工厂，用于跨进程版本检查
+            check_interval: 两次版本检查之间的最小间隔（秒）
+        """
+        self._session_factory = session_factory
+        self._check_interval = check_interval
+        self._lock = threading.RLock()
+        self._values: Dict[str, Any] = {}
+        self._types: Dict[str, str] = {}
+        self._version: Optional[int] = None
+        self._last_check = 0.0
+        self._stale = True
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    # ==================== 常用设置的类型化属性 ====================
+
+    @property
+    def ffmpeg_path(self) -> str:
+        return self.get("ffmpeg_path", "") or ""
+
+    @property
+    def ai_api_key(self) -> str:
+        return self.get("ai_api_key", "") or ""
+
+    @property
+    def log_level(self) -> str:
+        return self.get("log_level", settings.LOG_LEVEL) or settings.LOG_LEVEL
+
+    @property
+    def storage_path(self) -> str:
+        return self.get("storage_path", "./storage") or "./storage"
+
+    @property
+    def proxy_selection_strategy(self) -> str:
+        return self.get("proxy_selection_strategy", "random") or "random"
+
+    @property
+    def version(self) -> Optional[int]:
+        """当前缓存对应的设置版本号"""
+        return self._version
+
+    # ==================== 读取 ====================
+
+    def configure(self, session_factory: Callable[[], Session]) -> None:
+        """设置数据库会话工厂"""
+        self._session_factory = session_factory
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        获取设置值
+
+        Args:
+            key: 设置键名
+            default: 设置不存在时的默认值
+
+        Returns:
+            按 value_type 转换后的设置值
+        """
+        self._ensure_fresh()
+        return self._values.get(key, default)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """获取全部设置的副本"""
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._values)
+
+    def load(self, db: Optional[Session] = None) -> None:
+        """
+        从数据库加载全部设置
+
+        Args:
+            db: 数据库会话，为空时使用会话工厂创建
+        """
+        with self._session(db) as session:
+            rows = session.query(SystemSetting).all()
+
+        values: Dict[str, Any] = {}
+        types: Dict[str, str] = {}
+        version = 0
+        for row in rows:
+            if row.key == VERSION_KEY:
+                version = coerce_value(row.value, "int") or 0
+                continue
+            values[row.key] = coerce_value(row.value, row.value_type)
+            types[row.key] = row.value_type or "string"
+
+        with self._lock:
+            changed = {k: v for k, v in values.items() if self._values.get(k) != v}
+            self._values = values
+            self._types = types
+            self._version = version
+            self._stale = False
+            self._last_check = time.monotonic()
+
+        logger.info(f"系统设置已加载，共 {len(values)} 项，版本: {version}")
+        if changed:
+            self._notify(changed)
+
+    def invalidate(self) -> None:
+        """使本进程缓存失效，下次读取时重新加载"""
+        with self._lock:
+            self._stale = True
+        logger.debug("系统设置缓存已失效")
+
+    # ==================== 写入 ====================
+
+    def update(self, db: Session, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        更新设置并递增版本号，使所有进程的缓存失效
+
+        Args:
+            db: 数据库会话
+            values: 需要更新的设置，None 值会被忽略
+
+        Returns:
+            更新后的全部设置
+        """
+        logger.info(f"开始更新系统设置: {list(values.keys())}")
+
+        try:
+            rows = {row.key: row for row in db.query(SystemSetting).all()}
+            for key, value in values.items():
+                if value is None:
+                    continue
+                row = rows.get(key)
+                if row is None:
+                    row = SystemSetting(key=key, value_type=self._infer_type(value))
+                    db.add(row)
+                row.value = serialize_value(value, row.value_type)
+
+            if VERSION_KEY not in rows:
+                db.add(SystemSetting(key=VERSION_KEY, value="0", value_type="int",
+                                     description="系统设置版本号，用于跨进程缓存失效"))
+                db.flush()
+            # 在数据库中原子自增，不能读出后加一再写回：并发更新的进程会写入相同的版本号，互相看不到对方的变更
+            db.query(SystemSetting).filter(SystemSetting.key == VERSION_KEY).update(
+                {SystemSetting.value: cast(cast(SystemSetting.value, Integer) + 1, String)},
+                synchronize_session=False,
+            )
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log_exception(logger, e, "更新系统设置失败")
+            raise
+
+        self.invalidate()
+        self.load(db)
+        return self.as_dict()
+
+    # ==================== 变更通知 ====================
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        注册设置变更监听器
+
+        Args:
+            listener: 回调函数，参数为发生变化的设置 {key: 新值}
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, changed: Dict[str, Any]) -> None:
+        """通知监听器设置已变化"""
+        logger.info(f"系统设置发生变化: {list(changed.keys())}")
+        for listener in list(self._listeners):
+            try:
+                listener(changed)
+            except Exception as e:
+                log_exception(logger, e, f"系统设置变更监听器执行失败: {listener}")
+
+    # ==================== 内部方法 ====================
+
+    def _ensure_fresh(self) -> None:
+        """确保缓存有效：本进程失效时重新加载，否则按间隔检查跨进程版本号"""
+        if self._session_factory is None:
+            return
+
+        if self._stale:
+            self.load()
+            return
+
+        now = time.monotonic()
+        if now - self._last_check < self._check_interval:
+            return
+
+        with self._lock:
+            # 双重检查，避免并发线程重复查询
+            if now - self._last_check < self._check_interval:
+                return
+            self._last_check = now
+
+        try:
+            with self._session() as session:
+                row = session.query(SystemSetting.value).filter(SystemSetting.key == VERSION_KEY).first()
+            remote_version = coerce_value(row[0], "int") if row else 0
+            if remote_version != self._version:
+                logger.info(f"检测到系统设置版本变化: {self._version} -> {remote_version}")
+                self.load()
+        except Exception as e:
+            log_exception(logger, e, "检查系统设置版本失败，继续使用缓存")
+
+    def _session(self, db: Optional[Session] = None):
+        """获取数据库会话的上下文管理器，外部传入的会话不会被关闭"""
+        return _SessionScope(db, self._session_factory)
+
+    @staticmethod
+    def _infer_type(value: Any) -> str:
+        """根据Python值推断 value_type"""
+        if isinstance(value, bool):
+            return "bool"
+        if isinstance(value, int):
+            return "int"
+        if isinstance(value, (dict, list)):
+            return "json"
+        return "string"
+
+
+class _SessionScope:
+    """数据库会话上下文，只关闭自己创建的会话"""
+
+    def __init__(self, db: Optional[Session], factory: Optional[Callable[[], Session]]):
+        if db is None and factory is None:
+            raise RuntimeError("系统设置缓存未配置数据库会话工厂")
+        self._db = db
+        self._factory = factory
+        self._owned: Optional[Session] = None
+
+    def __enter__(self) -> Session:
+        if self._db is not None:
+            return self._db
+        self._owned = self._factory()
+        return self._owned
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._owned is not None:
+            self._owned.close()
+
+
+def _apply_log_level(changed: Dict[str, Any]) -> None:
+    """log_level 变化时调整日志处理器级别"""
+    if "log_level" in changed and changed["log_level"]:
+        logger_manager.set_level(changed["log_level"])
+
+
+# 全局系统设置缓存实例
+system_settings = SystemSettingsStore()
+system_settings.subscribe(_apply_log_level)
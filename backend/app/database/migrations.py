@@ -0,0 +1,240 @@
+"""
+数据库版本化迁移
+
+启动时只读取 schema_version 表中的一个版本号，低于最新版本时才依次执行未应用的迁移。
+每个迁移与版本号更新在同一个事务中提交。
+
+新增迁移的约定：
+- 只能在 MIGRATIONS 末尾追加，已发布的迁移不要修改
+- 迁移必须可重复执行（建表/建索引使用 checkfirst），多个进程同时启动时不会出错
+- 新表使用 Model.__table__.create(checkfirst=True)，不要依赖 create_all
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.database.session import Base
+from app.models import models
+
+logger = get_logger(__name__)
+
+# schema_version 表不属于业务模型，单独使用一个 MetaData
+_version_metadata = MetaData()
+
+schema_version_table = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, default=datetime.utcnow),
+)
+
+# 默认系统设置
+DEFAULT_SYSTEM_SETTINGS = [
+    {
+        "key": "ffmpeg_path",
+        "value": "",
+        "value_type": "string",
+        "description": "FFmpeg可执行文件路径"
+    },
+    {
+        "key": "ai_api_key",
+        "value": "",
+        "value_type": "string",
+        "description": "AI API密钥"
+    },
+    {
+        "key": "log_level",
+        "value": settings.LOG_LEVEL,
+        "value_type": "string",
+        "description": "日志级别"
+    },
+    {
+        "key": "storage_path",
+        "value": "./storage",
+        "value_type": "string",
+        "description": "存储路径"
+    },
+    {
+        "key": "proxy_selection_strategy",
+        "value": "random",
+        "value_type": "string",
+        "description": "代理IP选择策略"
+    },
+    {
+        "key": "settings_version",
+        "value": "0",
+        "value_type": "int",
+        "description": "系统设置版本号，用于跨进程缓存失效"
+    },
+]
+
+
+@dataclass
+class Migration:
+    """单个迁移"""
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def seed_system_settings(conn: Connection) -> None:
+    """
+    使用一条 INSERT ... ON CONFLICT DO NOTHING 写入默认系统设置，已存在的键保持不变
+
+    Args:
+        conn: 数据库连接
+    """
+    table = models.SystemSetting.__table__
+    dialect = conn.dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # 其他数据库不支持 ON CONFLICT，先查出已有键再一次性插入缺失的设置
+        existing = set(conn.execute(select(table.c.key)).scalars())
+        rows = [row for row in DEFAULT_SYSTEM_SETTINGS if row["key"] not in existing]
+        if rows:
+            conn.execute(table.insert(), rows)
+        logger.info(f"默认系统设置写入完成，新增 {len(rows)} 个设置")
+        return
+
+    stmt = insert(table).values(DEFAULT_SYSTEM_SETTINGS).on_conflict_do_nothing(index_elements=["key"])
+    result = conn.execute(stmt)
+    logger.info(f"默认系统设置写入完成，新增 {max(result.rowcount, 0)} 个设置")
+
+
+def _create_initial_tables(conn: Connection) -> None:
+    """创建初始表结构（已有数据库中表已存在时跳过）"""
+    tables = [
+        models.Proxy.__table__,
+        models.BrowserProfile.__table__,
+        models.Account.__table__,
+        models.Task.__table__,
+        models.TaskLog.__table__,
+        models.PublishTask.__table__,
+        models.AccountPublishTask.__table__,
+        models.VideoTranslation.__table__,
+        models.SystemSetting.__table__,
+        models.ApiAccountWx.__table__,
+    ]
+    Base.metadata.create_all(bind=conn, tables=tables, checkfirst=True)
+
+
+def _create_indexes(conn: Connection, *tables) -> None:
+    """为指定表创建模型中声明的全部索引"""
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _add_api_accounts_wx_indexes(conn: Connection) -> None:
+    """微信公众号API账户表的状态、创建时间索引（替代 supabase_init 中的原始DDL）"""
+    _create_indexes(conn, models.ApiAccountWx.__table__)
+
+
+def _add_hot_filter_indexes(conn: Connection) -> None:
+    """任务列表、任务日志、发布账户状态的查询索引"""
+    _create_indexes(
+        conn,
+        models.Task.__table__,
+        models.TaskLog.__table__,
+        models.AccountPublishTask.__table__,
+    )
+
+
+def _create_weixin_media_cache(conn: Connection) -> None:
+    """微信公众号已上传媒体缓存表"""
+    models.WeixinMediaCache.__table__.create(bind=conn, checkfirst=True)
+    _create_indexes(conn, models.WeixinMediaCache.__table__)
+
+
+def _create_published_image_hashes(conn: Connection) -> None:
+    """已发布图片感知哈希表"""
+    models.PublishedImageHash.__table__.create(bind=conn, checkfirst=True)
+    _create_indexes(conn, models.PublishedImageHash.__table__)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建初始表结构", _create_initial_tables),
+    Migration(2, "写入默认系统设置", seed_system_settings),
+    Migration(3, "微信公众号API账户表索引", _add_api_accounts_wx_indexes),
+    Migration(4, "任务、任务日志、发布账户状态索引", _add_hot_filter_indexes),
+    Migration(5, "微信公众号媒体缓存表", _create_weixin_media_cache),
+    Migration(6, "已发布图片感知哈希表", _create_published_image_hashes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(engine: Engine) -> Optional[int]:
+    """
+    读取当前数据库结构版本
+
+    Returns:
+        版本号；schema_version 表不存在时返回 None
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version_table.c.version)).scalar() or 0
+    except SQLAlchemyError:
+        return None
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    执行未应用的迁移
+
+    Args:
+        engine: 数据库引擎
+
+    Returns:
+        执行后的数据库结构版本
+    """
+    current = get_schema_version(engine)
+    if current is not None and current >= LATEST_VERSION:
+        logger.info(f"数据库结构已是最新版本: {current}")
+        return current
+
+    if current is None:
+        logger.info("schema_version 表不存在，开始创建")
+        _version_metadata.create_all(bind=engine, checkfirst=True)
+        current = 0
+
+    logger.info(f"数据库结构版本: {current}，最新版本: {LATEST_VERSION}，开始迁移")
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        logger.info(f"执行迁移 {migration.version}: {migration.description}")
+        try:
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+                _set_version(conn, migration.version)
+        except Exception as e:
+            log_exception(logger, e, f"迁移 {migration.version} 执行失败: {migration.description}")
+            raise
+        current = migration.version
+
+    logger.info(f"数据库迁移完成，当前版本: {current}")
+    return current
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    """更新版本号，schema_version 表只保留一行"""
+    updated = conn.execute(
+        schema_version_table.update().values(version=version, updated_at=datetime.utcnow())
+    )
+    if updated.rowcount == 0:
+        conn.execute(
+            schema_version_table.insert().values(version=version, updated_at=datetime.utcnow())
+        )
@@ -0,0 +1,70 @@
+"""
+SQL语句计数工具
+
+通过 SQLAlchemy 事件统计代码块内执行的SQL语句数量，用于在测试中限制接口的查询预算，
+防止懒加载导致的 N+1 查询回归。
+
+用法：
+    with assert_max_queries(3, engine=engine):
+        client.get("/api/v1/publish/tasks")
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database.session import engine as default_engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """执行的SQL语句数超出预算"""
+
+
+class QueryCounter:
+    """统计指定引擎上执行的SQL语句"""
+
+    def __init__(self, engine: Optional[Engine] = None):
+        """
+        Args:
+            engine: 需要统计的数据库引擎，默认为应用引擎
+        """
+        self.engine = engine or default_engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, engine: Optional[Engine] = None) -> Iterator[QueryCounter]:
+    """
+    断言代码块内执行的SQL语句数不超过预算
+
+    Args:
+        max_queries: 允许的最大SQL语句数
+        engine: 需要统计的数据库引擎，默认为应用引擎
+
+    Raises:
+        QueryBudgetExceeded: 语句数超出预算时抛出，错误信息中包含全部语句
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+
+    if counter.count > max_queries:
+        statements = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise QueryBudgetExceeded(
+            f"执行了 {counter.count} 条SQL语句，超出预算 {max_queries} 条:\n{statements}"
+        )
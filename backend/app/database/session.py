@@ -1,13 +1,24 @@
 """
 数据库会话管理
-使用Supabase客户端进行数据库操作
+使用Supabase客户端进行数据库操作，ORM模型通过SQLAlchemy引擎访问同一数据库
 """
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
 from app.core.config import settings
 from app.core.logger import get_logger
 from app.database.supabase_client import get_supabase_client
 
 logger = get_logger(__name__)
 
+# SQLAlchemy引擎，SQLite需要关闭同线程检查
+_connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(settings.DATABASE_URL, connect_args=_connect_args, pool_pre_ping=True)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base = declarative_base()
+
 def get_db():
     """获取Supabase数据库客户端"""
     if not settings.is_using_supabase:
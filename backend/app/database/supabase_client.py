@@ -2,21 +2,25 @@
 Supabase客户端配置
 用于直接与Supabase API交互的场景
 """
-from supabase import create_client, Client
 from app.core.config import settings
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # supabase 导入较慢，仅在首次创建客户端时导入
+    from supabase import Client
 
 class SupabaseClient:
     """Supabase客户端单例"""
-    _instance: Optional[Client] = None
+    _instance: Optional["Client"] = None
     
     @classmethod
-    def get_client(cls) -> Optional[Client]:
+    def get_client(cls) -> Optional["Client"]:
         """获取Supabase客户端实例"""
         if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE_KEY:
             return None
             
         if cls._instance is None:
+            from supabase import create_client
             cls._instance = create_client(
                 settings.SUPABASE_URL,
                 settings.SUPABASE_SERVICE_ROLE_KEY
@@ -29,6 +33,6 @@ class SupabaseClient:
         return bool(settings.SUPABASE_URL and settings.SUPABASE_SERVICE_ROLE_KEY)
 
 # 便捷函数
-def get_supabase_client() -> Optional[Client]:
+def get_supabase_client() -> Optional["Client"]:
     """获取Supabase客户端"""
     return SupabaseClient.get_client()
\ No newline at end of file
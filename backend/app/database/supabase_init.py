@@ -5,6 +5,7 @@ Supabase数据库初始化脚本
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from app.database.session import get_db, engine
+from app.database.migrations import run_migrations
 from app.core.config import settings
 from app.core.logger import get_logger, log_exception
 
@@ -32,46 +33,12 @@ def init_supabase_tables():
         raise
 
 def create_api_accounts_wx_table():
-    """创建微信公众号API账户表"""
+    """创建微信公众号API账户表（表结构和索引由版本化迁移维护）"""
     logger.info("创建微信公众号API账户表")
     
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS api_accounts_wx (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        appid VARCHAR(255) UNIQUE NOT NULL,
-        app_secret VARCHAR(255) NOT NULL,
-        wx_id VARCHAR(255) NOT NULL,
-        title VARCHAR(255) NOT NULL,
-        author VARCHAR(255) NOT NULL,
-        thumb_media_id TEXT,
-        illust_tag JSONB,
-        status VARCHAR(50) DEFAULT 'active',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
-    
-    # 创建索引
-    create_indexes_sql = [
-        "CREATE INDEX IF NOT EXISTS idx_api_accounts_wx_name ON api_accounts_wx(name);",
-        "CREATE INDEX IF NOT EXISTS idx_api_accounts_wx_appid ON api_accounts_wx(appid);",
-        "CREATE INDEX IF NOT EXISTS idx_api_accounts_wx_wx_id ON api_accounts_wx(wx_id);",
-        "CREATE INDEX IF NOT EXISTS idx_api_accounts_wx_status ON api_accounts_wx(status);",
-        "CREATE INDEX IF NOT EXISTS idx_api_accounts_wx_created_at ON api_accounts_wx(created_at);"
-    ]
-    
     try:
-        with engine.connect() as conn:
-            # 创建表
-            conn.execute(text(create_table_sql))
-            
-            # 创建索引
-            for index_sql in create_indexes_sql:
-                conn.execute(text(index_sql))
-            
-            conn.commit()
-            logger.info("微信公众号API账户表创建成功")
+        version = run_migrations(engine)
+        logger.info(f"微信公众号API账户表创建成功，数据库结构版本: {version}")
             
     except Exception as e:
         log_exception(logger, e, "创建微信公众号API账户表失败")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, JSON
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Integer, String, Text, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -68,6 +68,10 @@ class Proxy(Base):
 class Task(Base):
     """任务基础模型"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # 任务列表按状态、类型筛选并按创建时间排序
+        Index("ix_tasks_status_type_created", "status", "task_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_type = Column(String, index=True)  # publish, translate, etc.
@@ -86,6 +90,10 @@ class Task(Base):
 class TaskLog(Base):
     """任务日志模型"""
     __tablename__ = "task_logs"
+    __table_args__ = (
+        # 按任务查询日志并按时间排序
+        Index("ix_task_logs_task_id_timestamp", "task_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
@@ -111,6 +119,7 @@ class PublishTask(Base):
     cover_image_path = Column(String, nullable=True)  # 封面图片路径
     
     # 关联
+    task = relationship("Task")
     accounts = relationship("Account", secondary="account_publish_tasks", back_populates="publish_tasks")
 
 
@@ -121,7 +130,7 @@ class AccountPublishTask(Base):
 
     account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
     publish_task_id = Column(Integer, ForeignKey("publish_tasks.id"), primary_key=True)
-    status = Column(String, default="pending")  # pending, completed, failed
+    status = Column(String, default="pending", index=True)  # pending, completed, failed
     result_url = Column(String, nullable=True)  # 发布成功后的URL
 
 
@@ -137,6 +146,9 @@ class VideoTranslation(Base):
     translation_path = Column(String, nullable=True)  # 翻译后文本路径
     subtitle_path = Column(String, nullable=True)  # 字幕文件路径
     output_video_path = Column(String, nullable=True)  # 带字幕的视频路径
+    
+    # 关联
+    task = relationship("Task")
 
 
 class SystemSetting(Base):
@@ -163,6 +175,39 @@ class ApiAccountWx(Base):
     author = Column(String)  # 作者名称
     thumb_media_id = Column(String, nullable=True)  # 默认封面媒体ID
     illust_tag = Column(JSON, nullable=True)  # 插图标签，JSON格式
-    status = Column(String, default="active")  # 账户状态
+    status = Column(String, default="active", index=True)  # 账户状态
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WeixinMediaCache(Base):
+    """微信公众号已上传媒体缓存，按 (AppID, 图片SHA-256, 类型) 复用 media_id / URL"""
+    __tablename__ = "weixin_media_cache"
+    __table_args__ = (
+        Index("ix_weixin_media_cache_key", "appid", "sha256", "kind", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    appid = Column(String, nullable=False)  # 微信公众号AppID
+    sha256 = Column(String(64), nullable=False)  # 图片内容SHA-256
+    kind = Column(String, nullable=False)  # image_url / material / temp
+    media_id = Column(String, nullable=True)  # 素材ID（uploadimg 没有）
+    url = Column(String, nullable=True)  # 图片URL（临时素材没有）
+    size = Column(Integer, default=0)  # 图片字节数
+    hits = Column(Integer, default=0)  # 命中次数
+    expires_at = Column(DateTime, nullable=True, index=True)  # 过期时间，永久素材为空
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PublishedImageHash(Base):
+    """已发布图片（含视频封面帧）的感知哈希，用于过滤近似重复的图片"""
+    __tablename__ = "published_image_hashes"
+    __table_args__ = (
+        Index("ix_published_image_hashes_owner", "owner_type", "owner_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_type = Column(String, nullable=False)  # wx（ApiAccountWx）/ account（Account）
+    owner_id = Column(Integer, nullable=False)  # 账户ID
+    hash = Column(BigInteger, nullable=False)  # 64位感知哈希（按有符号整数存储）
+    source = Column(String, nullable=True)  # 来源（pid、文件路径等）
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
@@ -37,6 +37,16 @@ class AccountResponse(BaseResponse, AccountBase):
     storage_path: Optional[str] = None
     browser_profile_id: int
 
+# 账户激活会话模型
+class ActivationSessionResponse(BaseModel):
+    session_id: str
+    account_id: int
+    platform: str
+    status: str  # queued, launching, waiting_login, saving, completed, failed, timeout, cancelled
+    message: str
+    created_at: datetime
+    updated_at: datetime
+
 # 浏览器配置模型
 class BrowserProfileBase(BaseModel):
     name: str
@@ -139,7 +149,7 @@ class PublishTaskResponse(BaseModel):
     tags: Optional[str] = None
     file_path: Optional[str] = None
     cover_image_path: Optional[str] = None
-    accounts: List[Dict[str, Any]]
+    accounts: List[Account]
     task: TaskResponse
 
     class Config:
@@ -221,4 +231,14 @@ class ApiAccountWx(BaseResponse, ApiAccountWxBase):
     status: str
 
 class ApiAccountWxResponse(BaseResponse, ApiAccountWxBase):
-    status: str
\ No newline at end of file
+    status: str
+
+class WeixinArticleCreate(BaseModel):
+    pids: Optional[List[int]] = None  # 指定图片，为空时按 illust_tag 选图
+    count: int = Field(20, ge=1, le=100)
+    unsupport_tags: List[str] = []
+    popularity: float = 0.0
+    publish: bool = False  # 新建草稿后是否提交发布
+
+class WeixinArticleTaskResponse(BaseModel):
+    task_id: int
\ No newline at end of file
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
+import json
 
 from app.database.session import get_db
 from app.models import schemas
-from app.services import account_service
+from app.services import account_service, task_service
+from app.services.activation_service import activation_manager
 from app.core.logger import get_logger, log_exception
 
 router = APIRouter()
@@ -178,6 +181,36 @@ def delete_api_account_wx(account_id: int, request: Request, db: Session = Depen
         log_exception(logger, e, f"删除微信公众号API账户失败 - IP: {client_ip}, 账户ID: {account_id}")
         raise HTTPException(status_code=500, detail=f"删除微信公众号API账户失败: {str(e)}")
 
+@router.post("/api/wx/{account_id}/articles", response_model=schemas.WeixinArticleTaskResponse)
+def create_weixin_article(account_id: int, article: schemas.WeixinArticleCreate, background_tasks: BackgroundTasks,
+                          request: Request, db: Session = Depends(get_db)):
+    """组装公众号图文并新建草稿（后台任务，进度见任务接口）"""
+    # 图文组装依赖 numpy、Pillow，首次调用时再导入
+    from app.services import weixin_article_service
+
+    client_ip = request.client.host
+    logger.info(f"组装公众号图文请求 - IP: {client_ip}, 账户ID: {account_id}, 指定图片: {len(article.pids or [])}, "
+                f"数量: {article.count}")
+
+    try:
+        account = account_service.get_api_account_wx(db, account_id)
+        if account is None:
+            logger.warning(f"微信公众号API账户不存在 - IP: {client_ip}, 账户ID: {account_id}")
+            raise HTTPException(status_code=404, detail="微信公众号API账户不存在")
+
+        task = task_service.create_task(db, weixin_article_service.TASK_TYPE)
+        background_tasks.add_task(
+            weixin_article_service.run_article_task, task.id, account_id, pids=article.pids, count=article.count,
+            exclude=article.unsupport_tags, min_popularity=article.popularity, publish=article.publish,
+        )
+        logger.info(f"公众号图文任务已创建 - IP: {client_ip}, 账户: {account.name}, 任务ID: {task.id}")
+        return {"task_id": task.id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_exception(logger, e, f"创建公众号图文任务失败 - IP: {client_ip}, 账户ID: {account_id}")
+        raise HTTPException(status_code=500, detail=f"创建公众号图文任务失败: {str(e)}")
+
 # ==================== 兼容性路由（保留原有接口） ====================
 
 @router.post("/", response_model=schemas.Account)
@@ -262,16 +295,17 @@ def delete_account(account_id: int, request: Request, db: Session = Depends(get_
         log_exception(logger, e, f"删除账户失败 - IP: {client_ip}, 账户ID: {account_id}")
         raise HTTPException(status_code=500, detail=f"删除账户失败: {str(e)}")
 
-@router.post("/{account_id}/activate", response_model=schemas.Account)
+@router.post("/{account_id}/activate", response_model=schemas.ActivationSessionResponse,
+             status_code=status.HTTP_202_ACCEPTED)
 async def activate_account(account_id: int, request: Request, db: Session = Depends(get_db)):
-    """激活账户 - 启动有头浏览器让用户手动登录"""
+    """激活账户 - 在后台启动有头浏览器等待用户手动登录，立即返回激活会话"""
     client_ip = request.client.host
     logger.info(f"激活账户请求 - IP: {client_ip}, 账户ID: {account_id}")
     
     try:
-        result = await account_service.activate_account(db, account_id)
-        logger.info(f"账户激活成功 - IP: {client_ip}, 账户: {result.username}@{result.platform}")
-        return result
+        session = await account_service.activate_account(db, account_id)
+        logger.info(f"账户激活会话已创建 - IP: {client_ip}, 账户ID: {account_id}, 会话: {session.session_id}")
+        return session.as_dict()
     except ValueError as e:
         logger.warning(f"激活账户参数错误 - IP: {client_ip}, 账户ID: {account_id}, 错误: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -279,6 +313,51 @@ async def activate_account(account_id: int, request: Request, db: Session = Depe
         log_exception(logger, e, f"激活账户失败 - IP: {client_ip}, 账户ID: {account_id}")
         raise HTTPException(status_code=500, detail=f"激活账户失败: {str(e)}")
 
+@router.get("/activation-sessions/{session_id}", response_model=schemas.ActivationSessionResponse)
+def get_activation_session(session_id: str, request: Request):
+    """获取激活会话状态"""
+    client_ip = request.client.host
+    logger.info(f"获取激活会话请求 - IP: {client_ip}, 会话: {session_id}")
+    
+    session = activation_manager.get(session_id)
+    if session is None:
+        logger.warning(f"激活会话不存在 - IP: {client_ip}, 会话: {session_id}")
+        raise HTTPException(status_code=404, detail="激活会话不存在")
+    return session.as_dict()
+
+@router.get("/activation-sessions/{session_id}/events")
+async def stream_activation_events(session_id: str, request: Request):
+    """以 SSE 推送激活会话进度，会话结束后关闭连接"""
+    client_ip = request.client.host
+    logger.info(f"订阅激活会话进度 - IP: {client_ip}, 会话: {session_id}")
+    
+    if activation_manager.get(session_id) is None:
+        logger.warning(f"激活会话不存在 - IP: {client_ip}, 会话: {session_id}")
+        raise HTTPException(status_code=404, detail="激活会话不存在")
+    
+    async def event_stream():
+        async for event in activation_manager.subscribe(session_id):
+            if event is None:
+                # 心跳，防止代理断开空闲连接
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.delete("/activation-sessions/{session_id}", response_model=schemas.ActivationSessionResponse)
+async def cancel_activation_session(session_id: str, request: Request):
+    """取消激活会话并关闭浏览器"""
+    client_ip = request.client.host
+    logger.info(f"取消激活会话请求 - IP: {client_ip}, 会话: {session_id}")
+    
+    session = activation_manager.cancel(session_id)
+    if session is None:
+        logger.warning(f"激活会话不存在 - IP: {client_ip}, 会话: {session_id}")
+        raise HTTPException(status_code=404, detail="激活会话不存在")
+    return session.as_dict()
+
 @router.get("/{account_id}/check-login")
 async def check_login_status(account_id: int, request: Request, db: Session = Depends(get_db)):
     """检查账户登录状态"""
@@ -139,4 +139,38 @@ async def generate_titles(
         
     except Exception as e:
         log_exception(logger, e, f"标题生成失败 - IP: {client_ip}")
-        raise HTTPException(status_code=500, detail="标题生成失败")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="标题生成失败")
+
+@router.get("/translations", response_model=List[VideoTranslationResponse])
+def get_video_translations(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """获取视频翻译列表"""
+    client_ip = request.client.host
+    logger.info(f"获取视频翻译列表请求 - IP: {client_ip}, skip: {skip}, limit: {limit}")
+    
+    try:
+        translations = media_tool_service.get_video_translations(db, skip, limit)
+        logger.info(f"视频翻译列表获取成功 - IP: {client_ip}, 返回 {len(translations)} 条")
+        return translations
+    except Exception as e:
+        log_exception(logger, e, f"获取视频翻译列表失败 - IP: {client_ip}")
+        raise HTTPException(status_code=500, detail=f"获取视频翻译列表失败: {str(e)}")
+
+@router.get("/translations/{translation_id}", response_model=VideoTranslationResponse)
+def get_video_translation(translation_id: int, request: Request, db: Session = Depends(get_db)):
+    """获取视频翻译详情"""
+    client_ip = request.client.host
+    logger.info(f"获取视频翻译详情请求 - IP: {client_ip}, 翻译ID: {translation_id}")
+    
+    try:
+        translation = media_tool_service.get_video_translation(db, translation_id)
+        if not translation:
+            logger.warning(f"视频翻译不存在 - IP: {client_ip}, 翻译ID: {translation_id}")
+            raise HTTPException(status_code=404, detail="视频翻译不存在")
+        
+        logger.info(f"视频翻译详情获取成功 - IP: {client_ip}, 翻译ID: {translation_id}")
+        return translation
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_exception(logger, e, f"获取视频翻译详情失败 - IP: {client_ip}, 翻译ID: {translation_id}")
+        raise HTTPException(status_code=500, detail=f"获取视频翻译详情失败: {str(e)}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Form, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -15,6 +15,7 @@ logger = get_logger(__name__)
 @router.post("/video", response_model=PublishTaskResponse)
 async def publish_video(
     request: Request,
+    background_tasks: BackgroundTasks,
     video: UploadFile = File(...),
     title: str = Form(...),
     description: str = Form(...),
@@ -39,10 +40,14 @@ async def publish_video(
             account_ids, 
             cover_image
         )
+        background_tasks.add_task(publish_service.run_video_publish_task, result.id)
         
         logger.info(f"视频发布任务创建成功 - IP: {client_ip}, 任务ID: {result.id}")
         return result
         
+    except ValueError as e:
+        logger.warning(f"创建视频发布任务失败 - IP: {client_ip}, 原因: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         log_exception(logger, e, f"创建视频发布任务失败 - IP: {client_ip}, 标题: {title}")
         raise HTTPException(status_code=500, detail="创建视频发布任务失败")
@@ -78,4 +83,38 @@ async def publish_article(
         
     except Exception as e:
         log_exception(logger, e, f"创建文章发布任务失败 - IP: {client_ip}, 标题: {title}")
-        raise HTTPException(status_code=500, detail="创建文章发布任务失败")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="创建文章发布任务失败")
+
+@router.get("/tasks", response_model=List[PublishTaskResponse])
+def get_publish_tasks(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """获取发布任务列表"""
+    client_ip = request.client.host
+    logger.info(f"获取发布任务列表请求 - IP: {client_ip}, skip: {skip}, limit: {limit}")
+    
+    try:
+        tasks = publish_service.get_publish_tasks(db, skip, limit)
+        logger.info(f"发布任务列表获取成功 - IP: {client_ip}, 返回 {len(tasks)} 个任务")
+        return tasks
+    except Exception as e:
+        log_exception(logger, e, f"获取发布任务列表失败 - IP: {client_ip}")
+        raise HTTPException(status_code=500, detail=f"获取发布任务列表失败: {str(e)}")
+
+@router.get("/tasks/{publish_task_id}", response_model=PublishTaskResponse)
+def get_publish_task(publish_task_id: int, request: Request, db: Session = Depends(get_db)):
+    """获取发布任务详情"""
+    client_ip = request.client.host
+    logger.info(f"获取发布任务详情请求 - IP: {client_ip}, 发布任务ID: {publish_task_id}")
+    
+    try:
+        task = publish_service.get_publish_task(db, publish_task_id)
+        if not task:
+            logger.warning(f"发布任务不存在 - IP: {client_ip}, 发布任务ID: {publish_task_id}")
+            raise HTTPException(status_code=404, detail="发布任务不存在")
+        
+        logger.info(f"发布任务详情获取成功 - IP: {client_ip}, 发布任务ID: {publish_task_id}")
+        return task
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_exception(logger, e, f"获取发布任务详情失败 - IP: {client_ip}, 发布任务ID: {publish_task_id}")
+        raise HTTPException(status_code=500, detail=f"获取发布任务详情失败: {str(e)}")
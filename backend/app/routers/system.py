@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import Dict, Any
 
 from app.database.session import get_db
 from app.models.schemas import SystemSettings
 from app.services import system_service
+from app.core.init_app import startup_state
+from app.core.metrics import metrics_registry
 from app.core.logger import get_logger, log_exception
 
 router = APIRouter()
@@ -52,6 +55,22 @@ def get_system_status(request: Request, db: Session = Depends(get_db)):
         log_exception(logger, e, f"获取系统状态失败 - IP: {client_ip}")
         raise HTTPException(status_code=500, detail=f"获取系统状态失败: {str(e)}")
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """以 Prometheus 文本格式导出请求指标"""
+    return PlainTextResponse(
+        metrics_registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+@router.get("/ready", response_model=Dict[str, Any])
+def get_ready_status(response: Response):
+    """获取服务就绪状态，启动未完成或失败时返回503"""
+    state = startup_state.as_dict()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
 @router.post("/check-update", response_model=Dict[str, Any])
 def check_update(request: Request, db: Session = Depends(get_db)):
     """检查软件更新"""
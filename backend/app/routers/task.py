@@ -43,7 +43,7 @@ def get_task(task_id: int, request: Request, db: Session = Depends(get_db)):
             logger.warning(f"任务不存在 - IP: {client_ip}, 任务ID: {task_id}")
             raise HTTPException(status_code=404, detail="任务不存在")
         
-        logger.info(f"任务详情获取成功 - IP: {client_ip}, 任务: {task.name} (ID: {task_id})")
+        logger.info(f"任务详情获取成功 - IP: {client_ip}, 类型: {task.task_type}, 状态: {task.status}")
         return task
     except HTTPException:
         raise
@@ -85,7 +85,7 @@ def pause_task(task_id: int, request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="任务不存在")
         
         result = task_service.pause_task(db, task_id)
-        logger.info(f"任务暂停成功 - IP: {client_ip}, 任务: {result.name} (ID: {task_id})")
+        logger.info(f"任务暂停成功 - IP: {client_ip}, 任务ID: {task_id}, 状态: {result.status}")
         return result
     except HTTPException:
         raise
@@ -106,7 +106,7 @@ def resume_task(task_id: int, request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="任务不存在")
         
         result = task_service.resume_task(db, task_id)
-        logger.info(f"任务恢复成功 - IP: {client_ip}, 任务: {result.name} (ID: {task_id})")
+        logger.info(f"任务恢复成功 - IP: {client_ip}, 任务ID: {task_id}, 状态: {result.status}")
         return result
     except HTTPException:
         raise
@@ -127,7 +127,7 @@ def cancel_task(task_id: int, request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="任务不存在")
         
         result = task_service.cancel_task(db, task_id)
-        logger.info(f"任务取消成功 - IP: {client_ip}, 任务: {result.name} (ID: {task_id})")
+        logger.info(f"任务取消成功 - IP: {client_ip}, 任务ID: {task_id}, 状态: {result.status}")
         return result
     except HTTPException:
         raise
@@ -148,7 +148,7 @@ def retry_task(task_id: int, request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="任务不存在")
         
         result = task_service.retry_task(db, task_id)
-        logger.info(f"任务重试成功 - IP: {client_ip}, 任务: {result.name} (ID: {task_id})")
+        logger.info(f"任务重试成功 - IP: {client_ip}, 任务ID: {task_id}, 状态: {result.status}")
         return result
     except HTTPException:
         raise
@@ -0,0 +1,274 @@
+"""
+账户激活会话管理
+
+激活账户需要打开有头浏览器等待用户手动登录，可能持续数分钟。
+激活接口只创建会话并立即返回会话ID，登录等待在后台协程中进行，
+进度通过 SSE（/accounts/activation-sessions/{session_id}/events）推送。
+同时打开的有头浏览器数量由信号量限制，超出的会话排队等待。
+"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.automation.factory import AutomationFactory
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+
+logger = get_logger(__name__)
+
+# 会话状态
+QUEUED = "queued"  # 等待浏览器名额
+LAUNCHING = "launching"  # 正在启动浏览器
+WAITING_LOGIN = "waiting_login"  # 等待用户登录
+SAVING = "saving"  # 保存登录状态
+COMPLETED = "completed"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+TERMINAL_STATUSES = (COMPLETED, FAILED, TIMEOUT, CANCELLED)
+
+# 已结束的会话保留时间（秒），供客户端查询最终结果
+FINISHED_SESSION_TTL = 3600
+
+
+@dataclass
+class ActivationSession:
+    """一次账户激活"""
+    session_id: str
+    account_id: int
+    platform: str
+    status: str = QUEUED
+    message: str = "等待浏览器资源"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    finished_monotonic: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _subscribers: List[asyncio.Queue] = field(default_factory=list, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "account_id": self.account_id,
+            "platform": self.platform,
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def set_status(self, status: str, message: str) -> None:
+        """更新状态并通知所有订阅者"""
+        self.status = status
+        self.message = message
+        self.updated_at = datetime.utcnow()
+        if self.finished:
+            self.finished_monotonic = time.monotonic()
+
+        event = {"status": status, "message": message, "timestamp": self.updated_at.isoformat()}
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+        logger.info(f"激活会话状态变更 - 会话: {self.session_id}, 账户ID: {self.account_id}, 状态: {status}, {message}")
+
+
+@dataclass
+class ActivationRequest:
+    """启动激活所需的浏览器参数"""
+    account_id: int
+    platform: str
+    storage_state_path: str
+    proxy: Optional[dict] = None
+    user_agent: Optional[str] = None
+    viewport_size: Optional[dict] = None
+    storage_key: Optional[str] = None
+
+
+# 激活结束回调，参数为会话（用于回写账户状态）
+FinishCallback = Callable[[ActivationSession], Awaitable[None]]
+
+
+class ActivationManager:
+    """激活会话管理器"""
+
+    def __init__(self, max_browsers: int = None, timeout: float = None):
+        self.max_browsers = max_browsers or settings.MAX_ACTIVATION_BROWSERS
+        self.timeout = timeout or settings.ACTIVATION_TIMEOUT
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._sessions: Dict[str, ActivationSession] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # 信号量在首次使用时创建，绑定到当前事件循环
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_browsers)
+        return self._semaphore
+
+    def get(self, session_id: str) -> Optional[ActivationSession]:
+        """获取会话"""
+        return self._sessions.get(session_id)
+
+    def active_session_for(self, account_id: int) -> Optional[ActivationSession]:
+        """获取账户正在进行的激活会话"""
+        for session in self._sessions.values():
+            if session.account_id == account_id and not session.finished:
+                return session
+        return None
+
+    def start(self, request: ActivationRequest, on_finish: Optional[FinishCallback] = None) -> ActivationSession:
+        """
+        创建激活会话并在后台开始激活，立即返回
+
+        同一账户已有进行中的会话时直接返回该会话。
+
+        Args:
+            request: 浏览器参数
+            on_finish: 会话结束后的回调
+
+        Returns:
+            激活会话
+        """
+        self._prune()
+
+        existing = self.active_session_for(request.account_id)
+        if existing:
+            logger.info(f"账户已有进行中的激活会话 - 账户ID: {request.account_id}, 会话: {existing.session_id}")
+            return existing
+
+        session = ActivationSession(session_id=uuid.uuid4().hex, account_id=request.account_id,
+                                    platform=request.platform)
+        session.set_status(QUEUED, "等待浏览器资源")
+        self._sessions[session.session_id] = session
+        session.task = asyncio.create_task(self._run(session, request, on_finish))
+        return session
+
+    async def _run(self, session: ActivationSession, request: ActivationRequest,
+                   on_finish: Optional[FinishCallback]) -> None:
+        automation = None
+        try:
+            async with self.semaphore:
+                session.set_status(LAUNCHING, "正在启动浏览器")
+                automation = AutomationFactory.create(
+                    platform=request.platform,
+                    storage_state_path=request.storage_state_path,
+                    proxy=request.proxy,
+                    user_agent=request.user_agent,
+                    viewport_size=request.viewport_size,
+                    storage_key=request.storage_key,
+                )
+                await automation.start(headless=False)
+                await automation.page.goto(automation.get_login_url())
+
+                session.set_status(WAITING_LOGIN, "请在浏览器中完成登录")
+                detection = await asyncio.wait_for(automation.wait_for_login_completion(), timeout=self.timeout)
+                detection = detection or automation.login_detection
+                # 没有检测结果不能视为登录成功
+                if detection is None or not detection.logged_in:
+                    session.set_status(FAILED, "页面已关闭，未检测到登录" if detection else "未检测到登录")
+                    return
+
+                session.set_status(SAVING, "正在保存登录状态")
+                await automation.save_login_state()
+                session.set_status(COMPLETED, "登录完成")
+
+        except asyncio.TimeoutError:
+            session.set_status(TIMEOUT, f"等待登录超过 {self.timeout} 秒")
+        except asyncio.CancelledError:
+            session.set_status(CANCELLED, "激活已取消")
+        except Exception as e:
+            log_exception(logger, e, f"账户激活失败 - 会话: {session.session_id}, 账户ID: {session.account_id}")
+            session.set_status(FAILED, f"激活失败: {str(e)}")
+        finally:
+            if automation:
+                await automation.close()
+            if on_finish:
+                try:
+                    await on_finish(session)
+                except Exception as e:
+                    log_exception(logger, e, f"激活结束回调失败 - 会话: {session.session_id}")
+
+    def cancel(self, session_id: str) -> Optional[ActivationSession]:
+        """
+        取消会话，会话不存在时返回None
+
+        可以在其他线程调用：此时通过 call_soon_threadsafe 把取消交给会话所在的事件循环，
+        直接调用 task.cancel() 不会唤醒空闲的事件循环。
+        """
+        session = self._sessions.get(session_id)
+        if session and not session.finished and session.task:
+            loop = session.task.get_loop()
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                session.task.cancel()
+            else:
+                loop.call_soon_threadsafe(session.task.cancel)
+        return session
+
+    async def subscribe(self, session_id: str, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        订阅会话事件：先回放已有事件，再推送新事件，会话结束后停止
+
+        超过 keepalive 秒没有事件时产出 None，供调用方发送心跳。
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in session.events:
+            queue.put_nowait(event)
+        session._subscribers.append(queue)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            session._subscribers.remove(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """会话统计，用于 /system/status"""
+        counts: Dict[str, int] = {}
+        for session in self._sessions.values():
+            counts[session.status] = counts.get(session.status, 0) + 1
+        return {"max_browsers": self.max_browsers, "sessions": counts}
+
+    async def shutdown(self) -> None:
+        """取消所有进行中的会话并等待浏览器关闭"""
+        tasks = [s.task for s in self._sessions.values() if s.task and not s.finished]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"已取消 {len(tasks)} 个进行中的激活会话")
+
+    def _prune(self) -> None:
+        """清理超过保留时间的已结束会话"""
+        now = time.monotonic()
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.finished_monotonic is not None and now - session.finished_monotonic > FINISHED_SESSION_TTL
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+
+# 全局激活会话管理器实例
+activation_manager = ActivationManager()
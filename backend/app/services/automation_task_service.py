@@ -0,0 +1,74 @@
+"""
+自动化任务执行
+
+在 Task 中执行一个浏览器自动化实例：运行前 bind_task 绑定任务和进度回调，
+结束后把步骤记录（StepRecord）写入任务日志并更新任务状态。
+视频发布任务（publish_service）和登录状态检查（account_service）通过 run_automation_task 执行自动化实例，
+步骤耗时和失败原因可在任务日志中查看。
+
+浏览器由 action 按需启动：publish() 在 API 模式下直接走 HTTP 直传，只有回退到浏览器流程时才 start()。
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from app.automation.base import BrowserAutomationBase
+from app.automation.tracing import StepRecord
+from app.core.logger import get_logger, log_exception
+from app.database.session import SessionLocal
+from app.services import task_service
+
+logger = get_logger(__name__)
+
+
+def _finish(task_id: int, records: List[StepRecord], error: Optional[str], finish: bool) -> None:
+    db = SessionLocal()
+    try:
+        if records:
+            task_service.add_step_logs(db, task_id, records)
+        if finish:
+            task_service.finish_task(db, task_id, error)
+        elif error:
+            task_service.add_task_log(db, task_id, "error", error)
+    finally:
+        db.close()
+
+
+async def run_automation_task(task_id: int, automation: BrowserAutomationBase,
+                              action: Callable[[BrowserAutomationBase], Awaitable[bool]],
+                              on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+                              finish: bool = True) -> bool:
+    """
+    用自动化实例执行 action，步骤记录和结果写入任务，结束后关闭实例
+
+    Args:
+        task_id: 任务ID（task_service.create_task 创建）
+        automation: 自动化实例
+        action: 实际执行的流程，例如 lambda a: a.publish(...)，返回是否成功；需要浏览器时由 action 启动
+        on_progress: 进度回调，默认直接写入任务进度
+        finish: 是否结束任务；一个任务依次执行多个实例时为 False，失败原因只写入任务日志，由调用方结束任务
+
+    Returns:
+        是否成功
+    """
+    automation.bind_task(task_id, on_progress or task_service.task_progress_reporter(task_id))
+    succeeded = False
+    error: Optional[str] = None
+    try:
+        succeeded = bool(await action(automation))
+        if not succeeded:
+            failed = next((r for r in reversed(automation.step_records) if r.outcome != "success"), None)
+            error = f"步骤 {failed.step} 失败: {failed.error}" if failed else "自动化流程执行失败"
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        log_exception(logger, e, f"自动化任务执行失败 - 任务ID: {task_id}, 平台: {automation.platform}")
+    finally:
+        await automation.close()
+
+    try:
+        await asyncio.to_thread(_finish, task_id, list(automation.step_records), error, finish)
+    except Exception as e:
+        log_exception(logger, e, f"写入自动化任务结果失败 - 任务ID: {task_id}")
+    logger.info(f"自动化任务结束 - 任务ID: {task_id}, 平台: {automation.platform}, 成功: {succeeded}, "
+                f"步骤数: {len(automation.step_records)}")
+    return succeeded
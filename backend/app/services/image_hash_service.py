@@ -0,0 +1,307 @@
+"""
+图片感知哈希与近似重复检测
+
+原来只按 pid 记录已发布的图片，同一张图的不同 pid、裁剪/压缩版本、相同的视频封面帧仍会重复发布到同一个账户。
+这里为图片计算 64 位感知哈希（pHash / dHash），把每个账户（ApiAccountWx / Account）已发布的哈希记录在
+published_image_hashes 表中，发布前一次批量调用过滤掉与已发布图片汉明距离不超过阈值的候选。
+
+- 哈希以 uint64 数组存放在内存索引中（按账户加载，LRU），距离计算是 NumPy 向量化的 XOR + popcount，
+  批量查询按块计算，内存占用有上限
+- 候选之间也会去重，同一批中近似的图片只保留第一张
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception, log_function_call
+from app.models.models import PublishedImageHash
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 未安装时无法建立哈希索引
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时无法计算哈希
+    Image = None
+
+logger = get_logger(__name__)
+
+OWNER_WEIXIN = "wx"
+OWNER_ACCOUNT = "account"
+
+# 批量查询时每块的 (查询数 x 索引条数) 上限，约 32MB 的 uint64 中间结果
+_BLOCK_ELEMENTS = 4 * 1024 * 1024
+
+ImageSource = Union[bytes, str, Any]
+
+
+# ---------- 哈希计算 ----------
+
+def hashing_available() -> bool:
+    """是否可以计算哈希并建立索引（需要 NumPy 和 Pillow）"""
+    return np is not None and Image is not None
+
+
+def _open_gray(source: ImageSource, size: Tuple[int, int]):
+    if Image is None:
+        raise RuntimeError("计算图片哈希需要安装 Pillow")
+    if isinstance(source, bytes):
+        image = Image.open(io.BytesIO(source))
+    elif isinstance(source, str):
+        image = Image.open(source)
+    else:
+        image = source
+    return image.convert("L").resize(size, Image.LANCZOS)
+
+
+def _bits_to_int(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def dhash(source: ImageSource) -> int:
+    """差值哈希：9x8 灰度图中每行相邻像素的明暗关系"""
+    pixels = _open_gray(source, (9, 8)).tobytes()
+    bits = [pixels[row * 9 + col] > pixels[row * 9 + col + 1] for row in range(8) for col in range(8)]
+    return _bits_to_int(bits)
+
+
+_dct_matrices: Dict[int, Any] = {}
+
+
+def _dct_matrix(n: int):
+    matrix = _dct_matrices.get(n)
+    if matrix is None:
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+        matrix[0, :] = np.sqrt(1.0 / n)
+        _dct_matrices[n] = matrix
+    return matrix
+
+
+def phash(source: ImageSource) -> int:
+    """感知哈希：32x32 灰度图做二维 DCT，取左上 8x8 低频系数与中位数比较（不含直流分量）"""
+    if np is None:
+        raise RuntimeError("计算 pHash 需要安装 NumPy")
+    pixels = np.asarray(_open_gray(source, (32, 32)), dtype=np.float64)
+    matrix = _dct_matrix(32)
+    low = (matrix @ pixels @ matrix.T)[:8, :8].flatten()
+    median = np.median(low[1:])
+    return _bits_to_int(low > median)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """uint64 -> int64（数据库 BIGINT 按有符号存储）"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+# ---------- 索引 ----------
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy 2.0 之前没有 bitwise_count：按字节查表
+    return _POPCOUNT8[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if np is not None else None
+
+
+class HashIndex:
+    """uint64 感知哈希索引"""
+
+    def __init__(self, capacity: int = 1024):
+        if np is None:
+            raise RuntimeError("哈希索引需要安装 NumPy")
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._labels: List[Any] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def hashes(self):
+        return self._hashes[:self.size]
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.size + extra
+        if needed > len(self._hashes):
+            grown = np.zeros(max(needed, len(self._hashes) * 2), dtype=np.uint64)
+            grown[:self.size] = self._hashes[:self.size]
+            self._hashes = grown
+
+    def add(self, value: int, label: Any = None) -> None:
+        self.add_many([value], [label])
+
+    def add_many(self, values: Sequence[int], labels: Optional[Sequence[Any]] = None) -> None:
+        """批量追加哈希（Python 整数或 uint64 数组）"""
+        values = np.asarray(values, dtype=np.uint64)
+        self._reserve(len(values))
+        self._hashes[self.size:self.size + len(values)] = values
+        self._labels.extend(labels if labels is not None else [None] * len(values))
+        self.size += len(values)
+
+    def distances(self, value: int):
+        """查询哈希到索引中每一项的汉明距离"""
+        return _popcount(self.hashes ^ np.uint64(value))
+
+    def nearest(self, value: int, max_distance: int) -> List[Tuple[Any, int]]:
+        """距离不超过 max_distance 的项，按距离升序"""
+        distances = self.distances(value)
+        positions = np.nonzero(distances <= max_distance)[0]
+        order = positions[np.argsort(distances[positions], kind="stable")]
+        return [(self._labels[i], int(distances[i])) for i in order]
+
+    def min_distances(self, values: Sequence[int]):
+        """批量查询：每个查询哈希到索引的最小汉明距离（索引为空时为 65）"""
+        queries = np.asarray(values, dtype=np.uint64)
+        result = np.full(len(queries), 65, dtype=np.uint8)
+        if not len(queries) or not self.size:
+            return result
+        block = max(1, _BLOCK_ELEMENTS // len(queries))
+        hashes = self.hashes
+        for start in range(0, self.size, block):
+            chunk = hashes[start:start + block]
+            distances = _popcount(queries[:, None] ^ chunk[None, :])
+            np.minimum(result, distances.min(axis=1), out=result)
+        return result
+
+
+class PublishedHashRegistry:
+    """按账户缓存已发布图片的哈希索引（LRU）"""
+
+    def __init__(self, max_owners: int = 256):
+        self.max_owners = max_owners
+        self._indexes: "OrderedDict[Tuple[str, int], HashIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_index(self, db: Session, owner_type: str, owner_id: int) -> HashIndex:
+        key = (owner_type, owner_id)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        rows = db.query(PublishedImageHash.hash, PublishedImageHash.source).filter(
+            PublishedImageHash.owner_type == owner_type,
+            PublishedImageHash.owner_id == owner_id,
+        ).all()
+        index = HashIndex(capacity=max(1024, len(rows)))
+        if rows:
+            index.add_many(np.array([row.hash for row in rows], dtype=np.int64).view(np.uint64),
+                           [row.source for row in rows])
+
+        with self._lock:
+            existing = self._indexes.get(key)
+            if existing is not None:
+                return existing
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_owners:
+                self._indexes.popitem(last=False)
+        return index
+
+    def append(self, owner_type: str, owner_id: int, values: Sequence[int], labels: Sequence[Any]) -> None:
+        """已加载的索引追加新记录（未加载的下次从数据库读取）"""
+        with self._lock:
+            index = self._indexes.get((owner_type, owner_id))
+            if index is not None:
+                index.add_many(values, labels)
+
+    def invalidate(self, owner_type: Optional[str] = None, owner_id: Optional[int] = None) -> None:
+        with self._lock:
+            if owner_type is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop((owner_type, owner_id), None)
+
+
+published_hash_registry = PublishedHashRegistry()
+
+
+@log_function_call(logger)
+def filter_near_duplicates(db: Session, owner_type: str, owner_id: int, candidates: Dict[Hashable, int],
+                           max_distance: Optional[int] = None) -> List[Hashable]:
+    """
+    过滤掉与账户已发布图片近似的候选，候选之间近似的只保留第一张
+
+    Args:
+        db: 数据库会话
+        owner_type: OWNER_WEIXIN / OWNER_ACCOUNT
+        owner_id: 账户ID
+        candidates: 候选标识（pid、路径等）-> 感知哈希，按优先级排序
+        max_distance: 汉明距离阈值，默认 IMAGE_DUPLICATE_MAX_DISTANCE
+
+    Returns:
+        保留的候选标识，顺序与输入一致
+    """
+    if max_distance is None:
+        max_distance = settings.IMAGE_DUPLICATE_MAX_DISTANCE
+    if not candidates:
+        return []
+    try:
+        keys = list(candidates)
+        values = np.array([candidates[key] for key in keys], dtype=np.uint64)
+        index = published_hash_registry.get_index(db, owner_type, owner_id)
+        fresh = index.min_distances(values) > max_distance
+
+        kept: List[Hashable] = []
+        batch = HashIndex(capacity=max(16, len(keys)))
+        for key, value, is_fresh in zip(keys, values, fresh):
+            if not is_fresh:
+                continue
+            if len(batch) and int(batch.distances(value).min()) <= max_distance:
+                continue
+            batch.add(value, key)
+            kept.append(key)
+
+        logger.info(f"近似重复过滤完成 - 账户: {owner_type}:{owner_id}, 候选: {len(keys)}, 保留: {len(kept)}, "
+                    f"已发布: {len(index)}")
+        return kept
+    except Exception as e:
+        log_exception(logger, e, f"近似重复过滤失败 - 账户: {owner_type}:{owner_id}")
+        raise
+
+
+@log_function_call(logger)
+def record_published_hashes(db: Session, owner_type: str, owner_id: int, items: Dict[Hashable, int]) -> int:
+    """
+    记录已发布图片的哈希
+
+    Args:
+        items: 来源标识（pid、路径等）-> 感知哈希
+
+    Returns:
+        写入条数
+    """
+    try:
+        db.add_all([
+            PublishedImageHash(owner_type=owner_type, owner_id=owner_id, hash=to_signed(value), source=str(source))
+            for source, value in items.items()
+        ])
+        db.commit()
+        published_hash_registry.append(owner_type, owner_id, list(items.values()), [str(s) for s in items])
+        return len(items)
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"记录已发布图片哈希失败 - 账户: {owner_type}:{owner_id}")
+        raise
@@ -0,0 +1,351 @@
+"""
+图片优化流水线（微信公众号发布）
+
+原来的 Node 服务按 original -> regular -> small 依次下载，直到某个尺寸小于 9.5MB，一张图最多下载三次。
+这里只下载一次原图，在本地重新编码：先在质量上二分，质量降到下限仍超限时再在缩放比例上二分，
+得到不超过目标字节数的最高质量结果。
+
+- 编码在进程池中执行（IMAGE_PIPELINE_WORKERS），不占用事件循环，也不受 GIL 限制
+- 结果按 (原图SHA-256, 目标配置) 缓存在 IMAGE_CACHE_DIR，重复发布不再下载或编码
+- 原图已满足配置（格式、尺寸、大小）时直接使用，不重新编码
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时无法优化图片
+    Image = None
+
+logger = get_logger(__name__)
+
+# 下载原图使用的请求头（与 Node 服务一致）
+DOWNLOAD_HEADERS = {
+    "Referer": "https://www.pixiv.net/",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+}
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """目标配置"""
+    name: str
+    max_bytes: int  # 字节上限
+    max_side: int = 4096  # 最长边上限（像素）
+    format: str = "JPEG"  # 输出格式
+    min_quality: int = 60  # 质量下限
+    max_quality: int = 92  # 质量上限
+    min_scale: float = 0.1  # 缩放下限
+
+    @property
+    def key(self) -> str:
+        """缓存键中的配置部分，任何参数变化都会使旧缓存失效"""
+        raw = f"{self.name}:{self.max_bytes}:{self.max_side}:{self.format}:{self.min_quality}:" \
+              f"{self.max_quality}:{self.min_scale}"
+        return f"{self.name}-{hashlib.sha1(raw.encode()).hexdigest()[:8]}"
+
+    @property
+    def extension(self) -> str:
+        return ".png" if self.format == "PNG" else ".jpg"
+
+
+# 图文消息内图片（media/uploadimg）上限 1MB；永久素材图片上限 10MB，沿用 Node 服务的 9.5MB
+WEIXIN_CONTENT_IMAGE = ImageProfile(name="weixin_content", max_bytes=1000 * 1024, max_side=2560)
+WEIXIN_MATERIAL_IMAGE = ImageProfile(name="weixin_material", max_bytes=int(9.5 * 1024 * 1024))
+
+PROFILES: Dict[str, ImageProfile] = {
+    profile.name: profile for profile in (WEIXIN_CONTENT_IMAGE, WEIXIN_MATERIAL_IMAGE)
+}
+
+
+@dataclass
+class OptimizedImage:
+    """优化结果"""
+    path: str
+    size: int
+    width: int
+    height: int
+    quality: Optional[int]  # 未重新编码时为空
+    scale: float
+    source_sha256: str
+    cached: bool = False
+
+
+# ---------- 编码（在进程池中执行，必须是模块级函数） ----------
+
+def _encode(image, profile: ImageProfile, quality: int, scale: float) -> bytes:
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    if profile.format == "JPEG":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, profile.format, optimize=True)
+    return buffer.getvalue()
+
+
+def _search_quality(image, profile: ImageProfile, scale: float) -> Optional[Tuple[int, bytes]]:
+    """在 [min_quality, max_quality] 上二分，返回不超限的最高质量及编码结果"""
+    low, high = profile.min_quality, profile.max_quality
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(image, profile, quality, scale)
+        if len(data) <= profile.max_bytes:
+            best = (quality, data)
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best
+
+
+def _prepare(image, profile: ImageProfile):
+    """转换色彩模式（JPEG 不支持透明通道，透明部分填白色）并限制最长边"""
+    if profile.format == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    longest = max(image.width, image.height)
+    if longest > profile.max_side:
+        ratio = profile.max_side / longest
+        image = image.resize((max(1, round(image.width * ratio)), max(1, round(image.height * ratio))),
+                             Image.LANCZOS)
+    return image
+
+
+def optimize_image_bytes(data: bytes, profile: ImageProfile) -> Dict[str, object]:
+    """
+    把图片压到 profile.max_bytes 以内
+
+    Returns:
+        {data, width, height, quality, scale}；原图已满足配置时 data 为原始字节、quality 为空
+
+    Raises:
+        ValueError: 缩放到下限仍超限
+    """
+    if Image is None:
+        raise RuntimeError("图片优化需要安装 Pillow")
+
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        if (source.format == profile.format and len(data) <= profile.max_bytes
+                and max(source.width, source.height) <= profile.max_side):
+            return {"data": data, "width": source.width, "height": source.height, "quality": None, "scale": 1.0}
+        image = _prepare(source, profile)
+
+    result = _search_quality(image, profile, 1.0)
+    scale = 1.0
+    if result is None:
+        # 质量下限仍超限：在缩放比例上二分（字节数大致与面积成正比，精度 2%）
+        low, high = profile.min_scale, 1.0
+        while high - low > 0.02:
+            scale = (low + high) / 2
+            if len(_encode(image, profile, profile.min_quality, scale)) <= profile.max_bytes:
+                low = scale
+            else:
+                high = scale
+        scale = low
+        result = _search_quality(image, profile, scale)
+        if result is None:
+            raise ValueError(f"图片无法压缩到 {profile.max_bytes} 字节以内")
+
+    quality, encoded = result
+    width = max(1, round(image.width * scale)) if scale < 1.0 else image.width
+    height = max(1, round(image.height * scale)) if scale < 1.0 else image.height
+    return {"data": encoded, "width": width, "height": height, "quality": quality, "scale": scale}
+
+
+# ---------- 流水线 ----------
+
+class ImageOptimizer:
+    """下载 + 进程池编码 + 按 (原图哈希, 配置) 缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, executor: Optional[Executor] = None,
+                 max_workers: Optional[int] = None, download_concurrency: int = 8,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，默认 IMAGE_CACHE_DIR
+            executor: 编码使用的执行器，默认首次使用时创建进程池
+            max_workers: 进程池大小，默认 IMAGE_PIPELINE_WORKERS
+            download_concurrency: 同时下载的图片数
+            transport: 下载使用的传输层（测试用）
+        """
+        self.cache_dir = cache_dir or settings.IMAGE_CACHE_DIR
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.max_workers = max_workers or settings.IMAGE_PIPELINE_WORKERS
+        self._download_semaphore = asyncio.Semaphore(download_concurrency)
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.downloads = 0
+        self.encodes = 0
+        self.cache_hits = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            options = {"headers": DOWNLOAD_HEADERS, "timeout": httpx.Timeout(60, connect=10),
+                       "follow_redirects": True}
+            if self._transport is not None:
+                options["transport"] = self._transport
+            self._http = httpx.AsyncClient(**options)
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def cache_path(self, source_sha256: str, profile: ImageProfile) -> str:
+        return os.path.join(self.cache_dir, source_sha256[:2], f"{source_sha256}_{profile.key}{profile.extension}")
+
+    async def download(self, url: str) -> bytes:
+        """下载原图（只下载一次）"""
+        async with self._download_semaphore:
+            response = await self._get_http().get(url)
+            response.raise_for_status()
+            self.downloads += 1
+            return response.content
+
+    async def optimize(self, data: bytes, profile: ImageProfile) -> OptimizedImage:
+        """优化图片字节，结果写入缓存目录；同一 (原图, 配置) 的并发请求只编码一次"""
+        source_sha256 = hashlib.sha256(data).hexdigest()
+        path = self.cache_path(source_sha256, profile)
+        cached = await asyncio.to_thread(_read_cached, path, source_sha256)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._encode_to_cache(data, profile, source_sha256, path))
+            future.add_done_callback(lambda f: self._inflight.pop(path, None))
+            self._inflight[path] = future
+        return await asyncio.shield(future)
+
+    async def _encode_to_cache(self, data: bytes, profile: ImageProfile, source_sha256: str,
+                               path: str) -> OptimizedImage:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._get_executor(), optimize_image_bytes, data, profile)
+        self.encodes += 1
+        encoded: bytes = result["data"]
+        await asyncio.to_thread(_write_atomic, path, encoded)
+        logger.info(f"图片优化完成 - 配置: {profile.name}, 原图: {len(data)} 字节, 结果: {len(encoded)} 字节, "
+                    f"质量: {result['quality']}, 缩放: {result['scale']:.2f}")
+        return OptimizedImage(path=path, size=len(encoded), width=result["width"], height=result["height"],
+                              quality=result["quality"], scale=result["scale"], source_sha256=source_sha256)
+
+    async def fetch_and_optimize(self, source: Union[str, bytes], profile: ImageProfile) -> OptimizedImage:
+        """
+        处理一张图片
+
+        Args:
+            source: 图片URL、本地路径或图片字节
+            profile: 目标配置
+        """
+        if isinstance(source, bytes):
+            data = source
+        elif source.startswith(("http://", "https://")):
+            data = await self.download(source)
+        else:
+            data = await asyncio.to_thread(_read_file, source)
+        return await self.optimize(data, profile)
+
+    async def optimize_batch(self, sources: Sequence[Union[str, bytes]],
+                             profile: ImageProfile) -> List[Union[OptimizedImage, Exception]]:
+        """
+        并发处理一批图片，单张失败不影响其他图片
+
+        Returns:
+            与 sources 一一对应的结果，失败的位置为异常对象
+        """
+        results = await asyncio.gather(*(self.fetch_and_optimize(source, profile) for source in sources),
+                                       return_exceptions=True)
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                label = source if isinstance(source, str) else f"{len(source)} 字节"
+                log_exception(logger, result, f"图片优化失败: {label}")
+        return list(results)
+
+    def stats(self) -> Dict[str, int]:
+        return {"downloads": self.downloads, "encodes": self.encodes, "cache_hits": self.cache_hits}
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_cached(path: str, source_sha256: str) -> Optional[OptimizedImage]:
+    if Image is None or not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception:
+        # 缓存文件损坏时重新编码
+        return None
+    return OptimizedImage(path=path, size=os.path.getsize(path), width=width, height=height, quality=None,
+                          scale=1.0, source_sha256=source_sha256, cached=True)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+_optimizer: Optional[ImageOptimizer] = None
+
+
+def get_image_optimizer() -> ImageOptimizer:
+    """进程内共用的图片优化器（首次使用时创建）"""
+    global _optimizer
+    if _optimizer is None:
+        _optimizer = ImageOptimizer()
+    return _optimizer
+
+
+async def close_image_optimizer() -> None:
+    """关闭共用优化器（应用关闭时调用）"""
+    global _optimizer
+    if _optimizer is not None:
+        try:
+            await _optimizer.close()
+        except Exception as e:
+            log_exception(logger, e, "关闭图片优化器失败")
+        _optimizer = None
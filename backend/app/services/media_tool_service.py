@@ -0,0 +1,71 @@
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+
+from app.models.models import VideoTranslation
+from app.core.logger import get_logger, log_exception, log_function_call
+
+logger = get_logger(__name__)
+
+# ==================== 视频翻译查询 ====================
+
+@log_function_call(logger)
+def get_video_translations(db: Session, skip: int = 0, limit: int = 100) -> List[VideoTranslation]:
+    """
+    获取视频翻译列表
+
+    Args:
+        db: 数据库会话
+        skip: 跳过的记录数
+        limit: 返回的最大记录数
+
+    Returns:
+        视频翻译列表（已通过 joinedload 预加载任务）
+    """
+    logger.debug(f"开始获取视频翻译列表，skip: {skip}, limit: {limit}")
+
+    try:
+        translations = (
+            db.query(VideoTranslation)
+            .options(joinedload(VideoTranslation.task))
+            .order_by(VideoTranslation.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        logger.info(f"成功获取 {len(translations)} 个视频翻译")
+        return translations
+
+    except Exception as e:
+        log_exception(logger, e, "获取视频翻译列表失败")
+        raise
+
+@log_function_call(logger)
+def get_video_translation(db: Session, translation_id: int) -> Optional[VideoTranslation]:
+    """
+    获取特定视频翻译详情
+
+    Args:
+        db: 数据库会话
+        translation_id: 视频翻译ID
+
+    Returns:
+        视频翻译对象或None
+    """
+    logger.debug(f"开始获取视频翻译详情，ID: {translation_id}")
+
+    try:
+        translation = (
+            db.query(VideoTranslation)
+            .options(joinedload(VideoTranslation.task))
+            .filter(VideoTranslation.id == translation_id)
+            .first()
+        )
+        if translation:
+            logger.info(f"视频翻译获取成功，ID: {translation_id}")
+        else:
+            logger.warning(f"视频翻译不存在，ID: {translation_id}")
+        return translation
+
+    except Exception as e:
+        log_exception(logger, e, f"获取视频翻译详情失败，ID: {translation_id}")
+        raise
@@ -0,0 +1,281 @@
+from sqlalchemy.orm import Session, Query, joinedload, selectinload
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import os
+import shutil
+
+from fastapi import UploadFile
+
+from app.automation.factory import AutomationFactory
+from app.models.models import Account, AccountPublishTask, PublishTask
+from app.core.logger import get_logger, log_exception, log_function_call
+from app.database.session import SessionLocal
+from app.services import task_service
+from app.services.account_service import browser_options
+from app.services.automation_task_service import run_automation_task
+
+logger = get_logger(__name__)
+
+TASK_TYPE = "publish"
+
+# 上传的视频和封面保存目录（启动时 create_directories 创建 ./media）
+MEDIA_DIR = "./media"
+
+def _publish_task_query(db: Session) -> Query:
+    """
+    发布任务查询，预加载 PublishTaskResponse 需要的关联
+
+    task 为多对一，使用 joinedload 随主查询一起取出；
+    accounts 为多对多集合，使用 selectinload 一次性批量加载，避免 JOIN 导致行数膨胀。
+    """
+    return db.query(PublishTask).options(
+        joinedload(PublishTask.task),
+        selectinload(PublishTask.accounts),
+    )
+
+# ==================== 发布任务查询 ====================
+
+@log_function_call(logger)
+def get_publish_tasks(db: Session, skip: int = 0, limit: int = 100) -> List[PublishTask]:
+    """
+    获取发布任务列表
+
+    Args:
+        db: 数据库会话
+        skip: 跳过的记录数
+        limit: 返回的最大记录数
+
+    Returns:
+        发布任务列表（已预加载任务和账户）
+    """
+    logger.debug(f"开始获取发布任务列表，skip: {skip}, limit: {limit}")
+
+    try:
+        tasks = (
+            _publish_task_query(db)
+            .order_by(PublishTask.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        logger.info(f"成功获取 {len(tasks)} 个发布任务")
+        return tasks
+
+    except Exception as e:
+        log_exception(logger, e, "获取发布任务列表失败")
+        raise
+
+@log_function_call(logger)
+def get_publish_task(db: Session, publish_task_id: int) -> Optional[PublishTask]:
+    """
+    获取特定发布任务详情
+
+    Args:
+        db: 数据库会话
+        publish_task_id: 发布任务ID
+
+    Returns:
+        发布任务对象或None
+    """
+    logger.debug(f"开始获取发布任务详情，ID: {publish_task_id}")
+
+    try:
+        task = _publish_task_query(db).filter(PublishTask.id == publish_task_id).first()
+        if task:
+            logger.info(f"发布任务获取成功: {task.title} (ID: {publish_task_id})")
+        else:
+            logger.warning(f"发布任务不存在，ID: {publish_task_id}")
+        return task
+
+    except Exception as e:
+        log_exception(logger, e, f"获取发布任务详情失败，ID: {publish_task_id}")
+        raise
+
+# ==================== 视频发布 ====================
+
+def _save_upload(upload: UploadFile, directory: str) -> str:
+    path = os.path.join(directory, os.path.basename(upload.filename or "upload"))
+    upload.file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    return path
+
+@log_function_call(logger)
+async def create_video_publish_task(db: Session, video: UploadFile, title: str, description: str,
+                                    tags: List[str], account_ids: List[int],
+                                    cover_image: Optional[UploadFile] = None) -> PublishTask:
+    """
+    创建视频发布任务：保存上传的文件，记录发布任务和目标账户
+
+    发布本身由 run_video_publish_task 在后台执行。
+
+    Raises:
+        ValueError: 账户不存在
+    """
+    logger.info(f"开始创建视频发布任务，标题: {title}, 账户: {account_ids}")
+
+    accounts = db.query(Account).filter(Account.id.in_(account_ids)).all()
+    missing = set(account_ids) - {account.id for account in accounts}
+    if missing:
+        raise ValueError(f"账户不存在，ID: {sorted(missing)}")
+
+    task = task_service.create_task(db, TASK_TYPE)
+    try:
+        directory = os.path.join(MEDIA_DIR, "publish", f"task_{task.id}")
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        file_path = await asyncio.to_thread(_save_upload, video, directory)
+        cover_image_path = await asyncio.to_thread(_save_upload, cover_image, directory) if cover_image else None
+
+        publish_task = PublishTask(
+            task_id=task.id,
+            content_type="video",
+            title=title,
+            description=description,
+            tags=",".join(tag.strip() for tag in tags if tag.strip()),
+            file_path=file_path,
+            cover_image_path=cover_image_path,
+            accounts=accounts,
+        )
+        db.add(publish_task)
+        db.commit()
+        logger.info(f"视频发布任务创建成功，ID: {publish_task.id}, 任务ID: {task.id}")
+        return get_publish_task(db, publish_task.id)
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"创建视频发布任务失败，标题: {title}")
+        task_service.finish_task(db, task.id, f"创建发布任务失败: {e}")
+        raise
+
+def _load_publish_targets(publish_task_id: int) -> Tuple[PublishTask, List[Tuple[int, str, Dict[str, Any]]]]:
+    """读取发布任务和每个目标账户的平台、自动化实例参数"""
+    db = SessionLocal()
+    try:
+        publish_task = _publish_task_query(db).filter(PublishTask.id == publish_task_id).first()
+        if publish_task is None:
+            raise ValueError(f"发布任务不存在，ID: {publish_task_id}")
+        targets = [(account.id, account.platform, browser_options(account)) for account in publish_task.accounts]
+        db.expunge(publish_task)
+        return publish_task, targets
+    finally:
+        db.close()
+
+def _set_account_publish_status(publish_task_id: int, account_id: int, status: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(AccountPublishTask).filter(
+            AccountPublishTask.publish_task_id == publish_task_id,
+            AccountPublishTask.account_id == account_id,
+        ).update({AccountPublishTask.status: status}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"更新账户发布状态失败，发布任务ID: {publish_task_id}, 账户ID: {account_id}")
+        raise
+    finally:
+        db.close()
+
+def _finish_task(task_id: int, error: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        task_service.finish_task(db, task_id, error)
+    finally:
+        db.close()
+
+def _cover_hash(cover_image_path: Optional[str]) -> Optional[int]:
+    """封面的感知哈希，没有封面或无法计算（未安装 NumPy / Pillow）时返回 None"""
+    from app.services import image_hash_service
+
+    if not cover_image_path or not image_hash_service.hashing_available():
+        return None
+    try:
+        return image_hash_service.phash(cover_image_path)
+    except Exception as e:
+        log_exception(logger, e, f"计算封面哈希失败: {cover_image_path}")
+        return None
+
+def _cover_is_duplicate(account_id: int, cover_hash: int) -> bool:
+    """封面是否与账户已发布视频的封面近似"""
+    from app.services.image_hash_service import OWNER_ACCOUNT, filter_near_duplicates
+
+    db = SessionLocal()
+    try:
+        return not filter_near_duplicates(db, OWNER_ACCOUNT, account_id, {"cover": cover_hash})
+    finally:
+        db.close()
+
+def _record_cover_hash(account_id: int, cover_hash: int, source: str) -> None:
+    from app.services.image_hash_service import OWNER_ACCOUNT, record_published_hashes
+
+    db = SessionLocal()
+    try:
+        record_published_hashes(db, OWNER_ACCOUNT, account_id, {source: cover_hash})
+    finally:
+        db.close()
+
+async def run_video_publish_task(publish_task_id: int) -> bool:
+    """
+    依次在每个目标账户上发布视频（后台任务）
+
+    每个账户的自动化实例通过 run_automation_task 执行 publish()：API 模式直传不启动浏览器，
+    步骤记录写入任务日志，账户发布状态写入 account_publish_tasks，全部结束后更新任务状态。
+    有封面时按感知哈希跳过封面与该账户已发布视频近似的账户，发布成功后记录封面哈希。
+
+    Returns:
+        是否全部成功
+    """
+    try:
+        publish_task, targets = await asyncio.to_thread(_load_publish_targets, publish_task_id)
+    except Exception as e:
+        log_exception(logger, e, f"读取发布任务失败，ID: {publish_task_id}")
+        return False
+
+    task_id = publish_task.task_id
+    report = task_service.task_progress_reporter(task_id)
+    cover_hash = await asyncio.to_thread(_cover_hash, publish_task.cover_image_path)
+    failed: List[str] = []
+    for position, (account_id, platform, options) in enumerate(targets):
+        async def on_progress(percent: int, position: int = position) -> None:
+            # 各账户平分任务进度
+            await report((position * 100 + percent) // len(targets))
+
+        if cover_hash is not None:
+            try:
+                duplicate = await asyncio.to_thread(_cover_is_duplicate, account_id, cover_hash)
+            except Exception as e:
+                log_exception(logger, e, f"封面近似检查失败，继续发布 - 账户ID: {account_id}")
+                duplicate = False
+            if duplicate:
+                logger.warning(f"封面与已发布的视频近似，跳过 - 发布任务ID: {publish_task_id}, 账户ID: {account_id}")
+                failed.append(f"账户 {account_id}: 封面与已发布的视频近似")
+                await asyncio.to_thread(_set_account_publish_status, publish_task_id, account_id, "failed")
+                continue
+
+        try:
+            automation = AutomationFactory.create(platform=platform, **options)
+        except Exception as e:
+            failed.append(f"账户 {account_id}: {e}")
+            await asyncio.to_thread(_set_account_publish_status, publish_task_id, account_id, "failed")
+            continue
+
+        succeeded = await run_automation_task(
+            task_id, automation,
+            lambda a: a.publish(publish_task.file_path, publish_task.title, publish_task.description or ""),
+            on_progress=on_progress, finish=False,
+        )
+        if not succeeded:
+            failed.append(f"账户 {account_id}")
+        elif cover_hash is not None:
+            try:
+                await asyncio.to_thread(_record_cover_hash, account_id, cover_hash, publish_task.cover_image_path)
+            except Exception as e:
+                log_exception(logger, e, f"记录封面哈希失败 - 账户ID: {account_id}")
+        await asyncio.to_thread(_set_account_publish_status, publish_task_id, account_id,
+                                "completed" if succeeded else "failed")
+
+    error = f"{len(failed)}/{len(targets)} 个账户发布失败: {'; '.join(failed)}" if failed else None
+    try:
+        await asyncio.to_thread(_finish_task, task_id, error)
+    except Exception as e:
+        log_exception(logger, e, f"写入发布任务结果失败，任务ID: {task_id}")
+    logger.info(f"视频发布任务结束，ID: {publish_task_id}, 账户数: {len(targets)}, 失败: {len(failed)}")
+    return not failed
@@ -8,6 +8,7 @@ from app.models.models import BrowserProfile, Proxy
 from app.models.schemas import BrowserProfileCreate, BrowserProfileUpdate, ProxyCreate, ProxyUpdate
 from app.core.config import settings
 from app.core.logger import get_logger, log_exception, log_function_call
+from app.automation.storage_state import get_storage_state_store, profile_state_key
 
 logger = get_logger(__name__)
 
@@ -88,7 +89,9 @@ def create_browser_profile(db: Session, profile: BrowserProfileCreate) -> Browse
         
         # 生成存储路径
         storage_dir = os.path.join(settings.BROWSER_PROFILES_DIR, f"profile_{profile.name}")
-        os.makedirs(storage_dir, exist_ok=True)
+        if settings.STORAGE_STATE_BACKEND != "vault":
+            # 保险库后端不使用配置目录，避免数千个空目录
+            os.makedirs(storage_dir, exist_ok=True)
         storage_path = os.path.join(storage_dir, "storage_state.json")
         logger.debug(f"浏览器配置存储路径: {storage_path}")
         
@@ -197,6 +200,10 @@ def delete_browser_profile(db: Session, profile_id: int) -> None:
                 except Exception as e:
                     logger.warning(f"删除存储目录失败: {e}")
         
+        store = get_storage_state_store()
+        if not store.uses_paths and store.delete(profile_state_key(profile_id)):
+            logger.debug(f"已删除保险库中的存储状态，配置ID: {profile_id}")
+        
         db.delete(db_profile)
         db.commit()
         
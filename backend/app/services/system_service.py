@@ -0,0 +1,112 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+
+from app.models.schemas import SystemSettings
+from app.core.system_settings import system_settings
+from app.core.init_app import startup_state
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.concurrency import concurrency_controller
+from app.automation.asset_cache import asset_cache_stats
+from app.automation.browser_farm import farm_stats
+from app.automation.browser_pool import browser_pool_stats
+from app.automation.tracing import step_stats
+from app.services.activation_service import activation_manager
+from app.core.logger import get_logger, log_exception, log_function_call
+
+logger = get_logger(__name__)
+
+# ==================== 系统设置相关函数 ====================
+
+@log_function_call(logger)
+def get_settings(db: Session) -> SystemSettings:
+    """
+    获取系统设置（读取进程内缓存，不查询数据库）
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        系统设置
+    """
+    logger.debug("开始获取系统设置")
+
+    try:
+        values = system_settings.as_dict()
+        result = SystemSettings(**{
+            key: value for key, value in values.items()
+            if key in SystemSettings.model_fields and value is not None
+        })
+        logger.info(f"系统设置获取成功，版本: {system_settings.version}")
+        return result
+
+    except Exception as e:
+        log_exception(logger, e, "获取系统设置失败")
+        raise
+
+@log_function_call(logger)
+def update_settings(db: Session, new_settings: SystemSettings) -> SystemSettings:
+    """
+    更新系统设置，并使所有进程的设置缓存失效
+
+    Args:
+        db: 数据库会话
+        new_settings: 新的系统设置
+
+    Returns:
+        更新后的系统设置
+    """
+    logger.info("开始更新系统设置")
+
+    try:
+        system_settings.update(db, new_settings.model_dump(exclude_none=True))
+        logger.info(f"系统设置更新成功，版本: {system_settings.version}")
+        return get_settings(db)
+
+    except Exception as e:
+        log_exception(logger, e, "更新系统设置失败")
+        raise
+
+# ==================== 系统状态相关函数 ====================
+
+def _browser_farm_status() -> Optional[Dict[str, Any]]:
+    """浏览器农场统计，未配置农场时返回 None，农场不可用时返回错误信息"""
+    if not settings.BROWSER_FARM_ADDRESS:
+        return None
+    try:
+        return farm_stats(settings.BROWSER_FARM_ADDRESS)
+    except Exception as e:
+        logger.warning(f"获取浏览器农场统计失败: {e}")
+        return {"error": str(e)}
+
+@log_function_call(logger)
+def get_system_status(db: Session) -> Dict[str, Any]:
+    """
+    获取系统状态：启动阶段、设置版本、请求指标和自动化步骤耗时汇总
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        系统状态
+    """
+    logger.debug("开始获取系统状态")
+
+    try:
+        result = {
+            "startup": startup_state.as_dict(),
+            "settings_version": system_settings.version,
+            "metrics": metrics_registry.summary(),
+            "automation_steps": step_stats.summary(),
+            "activation": activation_manager.stats(),
+            "asset_cache": asset_cache_stats(),
+            "browser_pool": browser_pool_stats(),
+            "browser_farm": _browser_farm_status(),
+            "automation_concurrency": concurrency_controller.stats(),
+        }
+        logger.info(f"系统状态获取成功，累计请求数: {result['metrics']['total_requests']}")
+        return result
+
+    except Exception as e:
+        log_exception(logger, e, "获取系统状态失败")
+        raise
@@ -0,0 +1,550 @@
+"""
+图片标签倒排索引
+
+ApiAccountWx.illust_tag 是由 OR 组构成的 AND 表达式，例如 [["黑裤袜", "黑丝"], ["碧蓝档案"]]
+表示 (黑裤袜 OR 黑丝) AND 碧蓝档案。原来每次发布都要带着 ilike 条件查询远程 pic 表，这里在内存中维护
+标签 -> 图片位图 的倒排索引，表达式、排除标签（unsupport_tags）、热度阈值、已用公众号过滤都转成位运算。
+
+- 位图用 Python 整数表示，第 i 位对应内部文档号 i（pid 映射为连续文档号），百万张图片的位图约 125KB，
+  一次与/或运算在微秒级
+- 标签匹配沿用 ilike '%tag%' 的子串语义（不区分大小写）：查询词先展开成包含它的所有已索引标签，结果缓存
+- 热度按 POPULARITY_BUCKET 分桶，阈值以上的整桶直接取并集，只有阈值所在的桶逐张比较
+- 支持增量更新：upsert / remove / mark_used，可按 pid 游标从 pic 表增量同步；pid 游标看不到已有行的修改和删除，
+  需要定期全量同步（full=True）
+- 位图是不可变的大整数，每次置位都要复制整个位图：load_rows 把一批新图片先写进按标签分开的 bytearray，
+  每批每个位图只合并一次；内容没有变化的 upsert 直接跳过，全量同步大多是这种行
+- catalog_sync 在应用启动时全量同步一次，之后定期增量同步、间隔更长地全量同步
+- 图片发布后 persist_used_by 把公众号追加到 pic.wx_name（与 Node 服务相同的逗号分隔格式），重启后仍能排除
+"""
+
+import asyncio
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.database.supabase_client import get_supabase_client
+
+logger = get_logger(__name__)
+
+# 热度分桶宽度
+POPULARITY_BUCKET = 0.01
+
+# pic.tag 为字符串时的分隔符
+_TAG_SEPARATORS = re.compile(r"[,，、|#\n]+")
+
+
+def parse_tags(value: Any) -> List[str]:
+    """解析 pic.tag：列表或逗号分隔的字符串"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        items = _TAG_SEPARATORS.split(value)
+    else:
+        items = value
+    return [item.strip() for item in items if item and item.strip()]
+
+
+# 每个字节值中置位的位置
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def iter_bits(bitmap: int) -> Iterable[int]:
+    """
+    按从小到大的顺序遍历位图中的文档号
+
+    位图只转换一次字节串，再逐个非零字节展开；不在大整数上反复做位运算（每次都会复制整个整数）。
+    """
+    if not bitmap:
+        return
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for match in _NONZERO_BYTE.finditer(data):
+        offset = match.start()
+        base = offset << 3
+        for bit in _BYTE_BITS[data[offset]]:
+            yield base + bit
+
+
+def bitmap_of(docs: Iterable[int]) -> int:
+    """由文档号构造位图"""
+    docs = list(docs)
+    if not docs:
+        return 0
+    data = bytearray((max(docs) >> 3) + 1)
+    for doc in docs:
+        data[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(data, "little")
+
+
+class TagIndex:
+    """标签倒排索引"""
+
+    def __init__(self, popularity_bucket: float = POPULARITY_BUCKET):
+        self.popularity_bucket = popularity_bucket
+        self._lock = threading.RLock()
+
+        self._doc_by_pid: Dict[int, int] = {}
+        self._pids: List[Optional[int]] = []  # 文档号 -> pid，删除后为 None
+        self._tags: List[List[str]] = []  # 文档号 -> 小写标签
+        self._popularity: List[float] = []
+        self._unfit_flags: List[bool] = []
+        self._used_names: List[frozenset] = []  # 文档号 -> 已发布过的公众号
+
+        self._live = 0  # 未删除
+        self._unfit = 0  # 标记为不适合发布
+        self._tag_bitmaps: Dict[str, int] = {}  # 小写标签 -> 位图
+        self._popularity_buckets: Dict[int, int] = {}  # 热度桶 -> 位图
+        self._used_by: Dict[str, int] = {}  # 公众号 -> 已用过的图片位图
+
+        self._term_cache: Dict[str, int] = {}  # 查询词 -> 展开后的位图
+        self.cursor = 0  # 增量同步游标（已同步的最大 pid）
+
+    def __len__(self) -> int:
+        return bin(self._live).count("1")
+
+    # ---------- 写入 ----------
+
+    def _bucket(self, popularity: float) -> int:
+        return int(popularity / self.popularity_bucket)
+
+    def _clear_doc(self, doc: int) -> None:
+        bit = 1 << doc
+        mask = ~bit
+        for tag in self._tags[doc]:
+            remaining = self._tag_bitmaps[tag] & mask
+            if remaining:
+                self._tag_bitmaps[tag] = remaining
+            else:
+                del self._tag_bitmaps[tag]
+        bucket = self._bucket(self._popularity[doc])
+        self._popularity_buckets[bucket] &= mask
+        self._unfit &= mask
+        self._live &= mask
+
+    def upsert(self, pid: int, tags: Any, popularity: Optional[float] = 0.0, unfit: bool = False,
+               used_by: Iterable[str] = ()) -> None:
+        """
+        新增或更新一张图片
+
+        Args:
+            pid: 图片ID
+            tags: 标签列表或逗号分隔的字符串
+            popularity: 热度
+            unfit: 是否不适合发布
+            used_by: 已发布过该图片的公众号
+        """
+        with self._lock:
+            lowered = sorted({tag.lower() for tag in parse_tags(tags)})
+            popularity = float(popularity or 0.0)
+            unfit = bool(unfit)
+            used_by = frozenset(used_by)
+            doc = self._doc_by_pid.get(pid)
+            if doc is None:
+                doc = self._append_doc(pid)
+            elif self._unchanged(doc, lowered, popularity, unfit, used_by):
+                self.cursor = max(self.cursor, pid)
+                return
+            else:
+                self._clear_doc(doc)
+
+            bit = 1 << doc
+            for tag in lowered:
+                self._tag_bitmaps[tag] = self._tag_bitmaps.get(tag, 0) | bit
+            self._set_doc(doc, lowered, popularity, unfit, used_by)
+            bucket = self._bucket(popularity)
+            self._popularity_buckets[bucket] = self._popularity_buckets.get(bucket, 0) | bit
+            if unfit:
+                self._unfit |= bit
+            for name in used_by:
+                self._used_by[name] = self._used_by.get(name, 0) | bit
+            self._live |= bit
+            # 位图内容和标签集合都变了，查询词缓存失效
+            self._term_cache.clear()
+            self.cursor = max(self.cursor, pid)
+
+    def _append_doc(self, pid: int) -> int:
+        doc = len(self._pids)
+        self._doc_by_pid[pid] = doc
+        self._pids.append(pid)
+        self._tags.append([])
+        self._popularity.append(0.0)
+        self._unfit_flags.append(False)
+        self._used_names.append(frozenset())
+        return doc
+
+    def _set_doc(self, doc: int, tags: List[str], popularity: float, unfit: bool, used_by: frozenset) -> None:
+        self._tags[doc] = tags
+        self._popularity[doc] = popularity
+        self._unfit_flags[doc] = unfit
+        if used_by:
+            # used_by 只追加，与 mark_used 一致
+            self._used_names[doc] = self._used_names[doc] | used_by
+
+    def _unchanged(self, doc: int, tags: List[str], popularity: float, unfit: bool, used_by: frozenset) -> bool:
+        """文档的标签、热度、unfit 与写入值相同，且 used_by 都已记录"""
+        return (self._tags[doc] == tags and self._popularity[doc] == popularity
+                and self._unfit_flags[doc] == unfit and used_by <= self._used_names[doc])
+
+    def remove(self, pid: int) -> bool:
+        """删除图片，返回是否存在"""
+        with self._lock:
+            doc = self._doc_by_pid.pop(pid, None)
+            if doc is None:
+                return False
+            self._clear_doc(doc)
+            mask = ~(1 << doc)
+            for name in list(self._used_by):
+                self._used_by[name] &= mask
+            self._pids[doc] = None
+            self._tags[doc] = []
+            self._unfit_flags[doc] = False
+            self._used_names[doc] = frozenset()
+            self._term_cache.clear()
+            return True
+
+    def retain(self, pids: Iterable[int]) -> int:
+        """删除不在 pids 中的图片（全量同步后清理远程已删除的行），返回删除数"""
+        keep = set(pids)
+        with self._lock:
+            stale = [pid for pid in self._doc_by_pid if pid not in keep]
+        for pid in stale:
+            self.remove(pid)
+        return len(stale)
+
+    def mark_used(self, pids: Iterable[int], wx_name: str) -> None:
+        """记录图片已发布到某个公众号"""
+        with self._lock:
+            bitmap = self._used_by.get(wx_name, 0)
+            docs = [doc for doc in map(self._doc_by_pid.get, pids) if doc is not None]
+            for doc in docs:
+                self._used_names[doc] = self._used_names[doc] | {wx_name}
+            self._used_by[wx_name] = bitmap | bitmap_of(docs)
+
+    def load_rows(self, rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """
+        批量写入 pic 表的行（pid, tag, popularity, unfit, wx_name）
+
+        新图片按批写入：每批先在 bytearray 中置位，批末每个位图只合并一次；已有图片走 upsert
+        （内容未变时跳过）。合并一个位图的开销与索引大小成正比，批大小随索引增长
+        （至少 batch_size，约为已有图片数的 1/16），构建的总开销与行数成线性。
+
+        Returns:
+            写入的行数
+        """
+        count = 0
+        batch: List[Dict[str, Any]] = []
+        limit = max(batch_size, len(self._pids) >> 4)
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= limit:
+                self._load_batch(batch)
+                batch = []
+                limit = max(batch_size, len(self._pids) >> 4)
+        if batch:
+            self._load_batch(batch)
+        return count
+
+    def _load_batch(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            base = 0
+            pending: Dict[str, Dict[Any, bytearray]] = {}
+
+            def set_bit(kind: str, key: Any, doc: int) -> None:
+                data = pending.setdefault(kind, {}).get(key)
+                if data is None:
+                    # 覆盖本批最多能新增的文档号
+                    data = pending[kind][key] = bytearray(((len(rows) + 8) >> 3) + 1)
+                offset = doc - base
+                data[offset >> 3] |= 1 << (offset & 7)
+
+            def flush() -> None:
+                targets = {"tag": self._tag_bitmaps, "bucket": self._popularity_buckets, "used": self._used_by}
+                for kind, bitmaps in pending.items():
+                    for key, data in bitmaps.items():
+                        bitmap = int.from_bytes(data, "little") << base
+                        if kind == "live":
+                            self._live |= bitmap
+                        elif kind == "unfit":
+                            self._unfit |= bitmap
+                        else:
+                            targets[kind][key] = targets[kind].get(key, 0) | bitmap
+                if pending:
+                    self._term_cache.clear()
+                pending.clear()
+
+            for row in rows:
+                pid = int(row["pid"])
+                if pid in self._doc_by_pid:
+                    # 已有图片（或本批重复的 pid）：先合并本批位图，再逐行更新
+                    flush()
+                    self.upsert(pid, row.get("tag"), popularity=row.get("popularity"),
+                                unfit=bool(row.get("unfit")), used_by=parse_tags(row.get("wx_name")))
+                    continue
+                if not pending:
+                    base = len(self._pids) & ~7
+                doc = self._append_doc(pid)
+                lowered = sorted({tag.lower() for tag in parse_tags(row.get("tag"))})
+                popularity = float(row.get("popularity") or 0.0)
+                unfit = bool(row.get("unfit"))
+                used_by = frozenset(parse_tags(row.get("wx_name")))
+                self._set_doc(doc, lowered, popularity, unfit, used_by)
+                for tag in lowered:
+                    set_bit("tag", tag, doc)
+                set_bit("bucket", self._bucket(popularity), doc)
+                if unfit:
+                    set_bit("unfit", None, doc)
+                for name in used_by:
+                    set_bit("used", name, doc)
+                set_bit("live", None, doc)
+                self.cursor = max(self.cursor, pid)
+            flush()
+
+    # ---------- 查询 ----------
+
+    def _term_bitmap(self, term: str) -> int:
+        """查询词的位图：所有包含该词的标签位图的并集（ilike '%term%'）"""
+        term = term.strip().lower()
+        bitmap = self._term_cache.get(term)
+        if bitmap is None:
+            bitmap = 0
+            for tag, tag_bitmap in self._tag_bitmaps.items():
+                if term in tag:
+                    bitmap |= tag_bitmap
+            self._term_cache[term] = bitmap
+        return bitmap
+
+    def _popularity_bitmap(self, candidates: int, min_popularity: float) -> int:
+        """在候选中保留热度不低于阈值的图片"""
+        boundary = self._bucket(min_popularity)
+        full = 0
+        for bucket, bitmap in self._popularity_buckets.items():
+            if bucket > boundary:
+                full |= bitmap
+        edge = candidates & self._popularity_buckets.get(boundary, 0)
+        kept = bitmap_of(doc for doc in iter_bits(edge) if self._popularity[doc] >= min_popularity)
+        return (candidates & full) | kept
+
+    def match(self, groups: Optional[Sequence[Sequence[str]]] = None, exclude: Iterable[str] = (),
+              min_popularity: float = 0.0, exclude_used_by: Optional[str] = None,
+              include_unfit: bool = False) -> int:
+        """
+        计算候选位图
+
+        Args:
+            groups: illust_tag 表达式（OR 组的 AND），为空时不按标签过滤
+            exclude: 排除标签（unsupport_tags）
+            min_popularity: 热度下限，<= 0 时不过滤
+            exclude_used_by: 排除已发布到该公众号的图片
+            include_unfit: 是否包含标记为不适合的图片
+        """
+        with self._lock:
+            result = self._live
+            if not include_unfit:
+                result &= ~self._unfit
+            for group in groups or []:
+                terms = [term for term in group if term and term.strip()]
+                if not terms:
+                    continue
+                group_bitmap = 0
+                for term in terms:
+                    group_bitmap |= self._term_bitmap(term)
+                result &= group_bitmap
+                if not result:
+                    return 0
+            for term in exclude:
+                if term and term.strip():
+                    result &= ~self._term_bitmap(term)
+            if exclude_used_by:
+                result &= ~self._used_by.get(exclude_used_by, 0)
+            if min_popularity > 0 and result:
+                result = self._popularity_bitmap(result, min_popularity)
+            return result
+
+    def query(self, groups: Optional[Sequence[Sequence[str]]] = None, exclude: Iterable[str] = (),
+              min_popularity: float = 0.0, exclude_used_by: Optional[str] = None,
+              limit: Optional[int] = None, include_unfit: bool = False) -> List[int]:
+        """
+        查询符合条件的图片ID（按写入顺序）
+
+        Returns:
+            pid 列表，最多 limit 个
+        """
+        bitmap = self.match(groups, exclude, min_popularity, exclude_used_by, include_unfit)
+        pids: List[int] = []
+        for doc in iter_bits(bitmap):
+            pids.append(self._pids[doc])
+            if limit is not None and len(pids) >= limit:
+                break
+        return pids
+
+    def count(self, groups: Optional[Sequence[Sequence[str]]] = None, exclude: Iterable[str] = (),
+              min_popularity: float = 0.0, exclude_used_by: Optional[str] = None) -> int:
+        """符合条件的图片数"""
+        return bin(self.match(groups, exclude, min_popularity, exclude_used_by)).count("1")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "images": len(self),
+            "tags": len(self._tag_bitmaps),
+            "accounts": len(self._used_by),
+            "cursor": self.cursor,
+        }
+
+
+def sync_pic_catalog(index: TagIndex, fetch_page: Callable[[int, int], List[Dict[str, Any]]],
+                     page_size: int = 1000, full: bool = False) -> int:
+    """
+    从图片目录同步（按 pid 游标分页）
+
+    增量同步只读取 pid 大于索引游标的新行；已有行的标签、热度、unfit、wx_name 修改和删除需要全量同步：
+    从头读取全部行覆盖写入，并删除目录中已不存在的图片。
+
+    Args:
+        index: 标签索引
+        fetch_page: fetch_page(after_pid, limit)，返回 pid 大于 after_pid 的行，按 pid 升序
+        page_size: 每页行数
+        full: 是否全量同步
+
+    Returns:
+        同步的行数
+    """
+    after = 0 if full else index.cursor
+    seen: List[int] = []
+    total = 0
+    try:
+        while True:
+            rows = fetch_page(after, page_size)
+            if not rows:
+                break
+            total += index.load_rows(rows)
+            after = int(rows[-1]["pid"])
+            if full:
+                seen.extend(int(row["pid"]) for row in rows)
+            if len(rows) < page_size:
+                break
+    except Exception as e:
+        log_exception(logger, e, f"同步图片目录失败，游标: {after}")
+        raise
+    removed = index.retain(seen) if full else 0
+    if total or removed:
+        logger.info(f"图片标签索引{'全量' if full else '增量'}同步完成，写入 {total} 张，删除 {removed} 张，"
+                    f"当前 {len(index)} 张")
+    return total
+
+
+def supabase_pic_page(after_pid: int, limit: int) -> List[Dict[str, Any]]:
+    """从 Supabase pic 表读取一页（sync_pic_catalog 的 fetch_page）"""
+    client = get_supabase_client()
+    if not client:
+        raise RuntimeError("无法获取Supabase客户端")
+    response = (
+        client.table("pic")
+        .select("pid, tag, popularity, unfit, wx_name")
+        .gt("pid", after_pid)
+        .order("pid")
+        .limit(limit)
+        .execute()
+    )
+    return response.data or []
+
+
+def persist_used_by(pids: Iterable[int], wx_name: str, client: Any = None) -> int:
+    """
+    把公众号追加到 pic.wx_name（已包含的跳过）
+
+    Args:
+        pids: 已发布的图片ID
+        wx_name: 公众号名称
+        client: Supabase 客户端，默认全局客户端；未配置 Supabase 时不写入
+
+    Returns:
+        更新的行数
+    """
+    pids = list(pids)
+    client = client or get_supabase_client()
+    if not pids or client is None:
+        return 0
+    updated = 0
+    try:
+        rows = client.table("pic").select("pid, wx_name").in_("pid", pids).execute().data or []
+        for row in rows:
+            names = parse_tags(row.get("wx_name"))
+            if wx_name in names:
+                continue
+            client.table("pic").update({"wx_name": ",".join(names + [wx_name])}).eq("pid", row["pid"]).execute()
+            updated += 1
+    except Exception as e:
+        log_exception(logger, e, f"更新图片 wx_name 失败 - 公众号: {wx_name}, 已更新: {updated}/{len(pids)}")
+        raise
+    logger.info(f"已更新 {updated}/{len(pids)} 张图片的 wx_name，追加: {wx_name}")
+    return updated
+
+
+class CatalogSync:
+    """
+    后台图片目录同步
+
+    启动后立即全量同步，之后每 interval 秒增量同步一次，距上次全量同步超过 full_interval 秒时改为全量同步。
+    """
+
+    def __init__(self, index: TagIndex, fetch_page: Callable[[int, int], List[Dict[str, Any]]],
+                 interval: float, full_interval: float):
+        self.index = index
+        self.fetch_page = fetch_page
+        self.interval = interval
+        self.full_interval = full_interval
+        self.last_full: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync_once(self) -> int:
+        full = self.last_full is None or time.monotonic() - self.last_full >= self.full_interval
+        count = await asyncio.to_thread(sync_pic_catalog, self.index, self.fetch_page, full=full)
+        if full:
+            self.last_full = time.monotonic()
+        return count
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync_once()
+            except Exception as e:
+                # sync_pic_catalog 已记录异常，下个周期重试
+                logger.warning(f"图片目录同步失败，{self.interval}s 后重试: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+tag_index = TagIndex()
+
+catalog_sync = CatalogSync(tag_index, supabase_pic_page, interval=settings.PIC_CATALOG_SYNC_INTERVAL,
+                           full_interval=settings.PIC_CATALOG_FULL_SYNC_INTERVAL)
+
+
+def select_images_for_account(account: Any, wx_name: str, limit: int = 10, exclude: Iterable[str] = (),
+                              min_popularity: float = 0.0, index: Optional[TagIndex] = None) -> List[int]:
+    """
+    按公众号账户的 illust_tag 选图，排除已发布到该公众号的图片
+
+    Args:
+        account: ApiAccountWx
+        wx_name: pic.wx_name 中记录的公众号名称
+    """
+    index = index or tag_index
+    return index.query(account.illust_tag or [], exclude=exclude, min_popularity=min_popularity,
+                       exclude_used_by=wx_name, limit=limit)
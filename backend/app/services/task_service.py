@@ -0,0 +1,320 @@
+from sqlalchemy.orm import Session
+from typing import Awaitable, Callable, Iterable, List, Optional
+from datetime import datetime
+import asyncio
+import time
+
+from app.models.models import Task, TaskLog
+from app.automation.tracing import StepRecord
+from app.core.logger import get_logger, log_exception, log_function_call
+from app.database.session import SessionLocal
+
+logger = get_logger(__name__)
+
+# ==================== 任务查询 ====================
+
+@log_function_call(logger)
+def get_tasks(db: Session, task_type: Optional[str] = None, status: Optional[str] = None,
+              skip: int = 0, limit: int = 100) -> List[Task]:
+    """
+    获取任务列表，可按类型和状态筛选，按创建时间倒序
+
+    Args:
+        db: 数据库会话
+        task_type: 任务类型
+        status: 任务状态
+        skip: 跳过的记录数
+        limit: 返回的最大记录数
+
+    Returns:
+        任务列表
+    """
+    logger.debug(f"开始获取任务列表，类型: {task_type}, 状态: {status}, skip: {skip}, limit: {limit}")
+
+    try:
+        query = db.query(Task)
+        if status:
+            query = query.filter(Task.status == status)
+        if task_type:
+            query = query.filter(Task.task_type == task_type)
+
+        tasks = query.order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
+        logger.info(f"成功获取 {len(tasks)} 个任务")
+        return tasks
+
+    except Exception as e:
+        log_exception(logger, e, "获取任务列表失败")
+        raise
+
+@log_function_call(logger)
+def get_task(db: Session, task_id: int) -> Optional[Task]:
+    """
+    获取特定任务详情
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+
+    Returns:
+        任务对象或None
+    """
+    logger.debug(f"开始获取任务详情，ID: {task_id}")
+
+    try:
+        task = db.query(Task).filter(Task.id == task_id).first()
+        if not task:
+            logger.warning(f"任务不存在，ID: {task_id}")
+        return task
+
+    except Exception as e:
+        log_exception(logger, e, f"获取任务详情失败，ID: {task_id}")
+        raise
+
+@log_function_call(logger)
+def get_task_logs(db: Session, task_id: int) -> List[TaskLog]:
+    """
+    获取任务日志，按时间顺序
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+
+    Returns:
+        任务日志列表
+    """
+    logger.debug(f"开始获取任务日志，任务ID: {task_id}")
+
+    try:
+        logs = (
+            db.query(TaskLog)
+            .filter(TaskLog.task_id == task_id)
+            .order_by(TaskLog.timestamp)
+            .all()
+        )
+        logger.info(f"成功获取任务 {task_id} 的 {len(logs)} 条日志")
+        return logs
+
+    except Exception as e:
+        log_exception(logger, e, f"获取任务日志失败，任务ID: {task_id}")
+        raise
+
+@log_function_call(logger)
+def add_step_logs(db: Session, task_id: int, records: Iterable[StepRecord]) -> int:
+    """
+    将自动化步骤记录写入任务日志，message 为 JSON 格式（type=step）
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        records: 步骤记录
+
+    Returns:
+        写入的日志条数
+    """
+    logger.debug(f"开始写入步骤日志，任务ID: {task_id}")
+
+    try:
+        logs = [
+            TaskLog(
+                task_id=task_id,
+                level="info" if record.outcome == "success" else "error",
+                message=record.to_log_message(),
+                timestamp=record.started_at,
+            )
+            for record in records
+        ]
+        db.add_all(logs)
+        db.commit()
+        logger.info(f"成功写入任务 {task_id} 的 {len(logs)} 条步骤日志")
+        return len(logs)
+
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"写入步骤日志失败，任务ID: {task_id}")
+        raise
+
+# ==================== 任务进度 ====================
+
+def update_task_progress(db: Session, task_id: int, progress: int) -> None:
+    """
+    更新任务进度（0-100）
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        progress: 进度
+    """
+    try:
+        updated = (
+            db.query(Task)
+            .filter(Task.id == task_id)
+            .update({Task.progress: progress, Task.updated_at: datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        if not updated:
+            logger.warning(f"任务不存在，无法更新进度，ID: {task_id}")
+        else:
+            logger.debug(f"任务进度已更新，ID: {task_id}, 进度: {progress}")
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"更新任务进度失败，任务ID: {task_id}")
+        raise
+
+def _update_task_progress_in_session(task_id: int, progress: int) -> None:
+    db = SessionLocal()
+    try:
+        update_task_progress(db, task_id, progress)
+    finally:
+        db.close()
+
+def task_progress_reporter(task_id: int, min_interval: float = 1.0) -> Callable[[int], Awaitable[None]]:
+    """
+    生成自动化实例的进度回调（BrowserAutomationBase.bind_task 的 on_progress）
+
+    上传期间进度变化频繁，两次写库至少间隔 min_interval 秒，100% 总是立即写入。
+    写库在线程中使用独立的数据库会话完成，不阻塞事件循环。
+    """
+    last_write: Optional[float] = None
+
+    async def report(progress: int) -> None:
+        nonlocal last_write
+        now = time.monotonic()
+        if progress < 100 and last_write is not None and now - last_write < min_interval:
+            return
+        last_write = now
+        await asyncio.to_thread(_update_task_progress_in_session, task_id, progress)
+
+    return report
+
+# ==================== 任务状态变更 ====================
+
+def _change_status(db: Session, task_id: int, allowed: tuple, new_status: str, action: str,
+                   reset: bool = False) -> Task:
+    """
+    变更任务状态
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        allowed: 允许变更的当前状态
+        new_status: 新状态
+        action: 操作名称（用于日志）
+        reset: 是否清空进度、错误信息和完成时间（重试时使用）
+
+    Returns:
+        更新后的任务对象
+    """
+    logger.info(f"开始{action}任务，ID: {task_id}")
+
+    try:
+        task = get_task(db, task_id)
+        if not task:
+            error_msg = f"任务不存在，ID: {task_id}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        if task.status not in allowed:
+            error_msg = f"任务当前状态为 {task.status}，无法{action}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        task.status = new_status
+        task.updated_at = datetime.utcnow()
+        if new_status == "cancelled":
+            task.completed_at = datetime.utcnow()
+        if reset:
+            task.progress = 0
+            task.error_message = None
+            task.completed_at = None
+
+        db.commit()
+        db.refresh(task)
+
+        logger.info(f"任务{action}成功，ID: {task_id}, 状态: {new_status}")
+        return task
+
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"{action}任务失败，ID: {task_id}")
+        raise
+
+@log_function_call(logger)
+def pause_task(db: Session, task_id: int) -> Task:
+    """暂停任务"""
+    return _change_status(db, task_id, ("pending", "running"), "paused", "暂停")
+
+@log_function_call(logger)
+def resume_task(db: Session, task_id: int) -> Task:
+    """恢复任务"""
+    return _change_status(db, task_id, ("paused",), "pending", "恢复")
+
+@log_function_call(logger)
+def cancel_task(db: Session, task_id: int) -> Task:
+    """取消任务"""
+    return _change_status(db, task_id, ("pending", "running", "paused"), "cancelled", "取消")
+
+@log_function_call(logger)
+def retry_task(db: Session, task_id: int) -> Task:
+    """重试失败的任务"""
+    return _change_status(db, task_id, ("failed", "cancelled"), "pending", "重试", reset=True)
+
+# ==================== 任务创建与完成 ====================
+
+@log_function_call(logger)
+def create_task(db: Session, task_type: str) -> Task:
+    """
+    创建运行中的任务（后台流程开始时调用）
+
+    Args:
+        db: 数据库会话
+        task_type: 任务类型
+
+    Returns:
+        新建的任务对象
+    """
+    try:
+        now = datetime.utcnow()
+        task = Task(task_type=task_type, status="running", progress=0, started_at=now)
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+        logger.info(f"任务创建成功，ID: {task.id}, 类型: {task_type}")
+        return task
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"创建任务失败，类型: {task_type}")
+        raise
+
+@log_function_call(logger)
+def finish_task(db: Session, task_id: int, error_message: Optional[str] = None) -> None:
+    """
+    结束任务：没有错误信息时为 completed（进度 100），否则为 failed
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        error_message: 错误信息
+    """
+    try:
+        now = datetime.utcnow()
+        values = {Task.status: "failed" if error_message else "completed", Task.error_message: error_message,
+                  Task.completed_at: now, Task.updated_at: now}
+        if not error_message:
+            values[Task.progress] = 100
+        db.query(Task).filter(Task.id == task_id).update(values, synchronize_session=False)
+        db.commit()
+        logger.info(f"任务结束，ID: {task_id}, 状态: {values[Task.status]}")
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"结束任务失败，ID: {task_id}")
+        raise
+
+def add_task_log(db: Session, task_id: int, level: str, message: str) -> None:
+    """写入一条任务日志"""
+    try:
+        db.add(TaskLog(task_id=task_id, level=level, message=message))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log_exception(logger, e, f"写入任务日志失败，任务ID: {task_id}")
+        raise
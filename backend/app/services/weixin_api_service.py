@@ -0,0 +1,406 @@
+"""
+微信公众号 API 客户端
+
+- 所有请求共用一个 httpx.AsyncClient（连接池 + keep-alive）
+- access_token 按 appid 缓存：过期前 WEIXIN_TOKEN_REFRESH_AHEAD 秒进入提前刷新窗口，窗口内的请求继续使用
+  旧令牌并在后台刷新；已过期时等待刷新。同一 appid 同时只有一个刷新请求（single-flight），
+  并发发布不会挤爆令牌接口
+- 接口返回令牌失效（40001/40014/42001）时强制刷新并重试一次
+- 上传过的图片按 (AppID, 图片SHA-256, 类型) 记录在 weixin_media_cache 表中，重复发布、多账户发布同一图片时
+  直接复用 media_id / URL，不再上传；临时素材按有效期过期
+
+与 nodejs_backend/src/services/weixinAPI.ts 中的接口调用保持一致（上传图文图片、永久素材、草稿）。
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.database.session import SessionLocal
+from app.models.models import WeixinMediaCache
+
+logger = get_logger(__name__)
+
+# 表示 access_token 无效或过期的错误码
+TOKEN_ERROR_CODES = (40001, 40014, 42001)
+
+# 媒体缓存类型：图文内图片URL（uploadimg）、永久素材、临时素材
+MEDIA_IMAGE_URL = "image_url"
+MEDIA_MATERIAL = "material"
+MEDIA_TEMP = "temp"
+
+
+class WeixinApiError(Exception):
+    """微信接口返回错误"""
+
+    def __init__(self, errcode: int, errmsg: str, path: str = ""):
+        super().__init__(f"微信接口错误 {errcode}: {errmsg} ({path})")
+        self.errcode = errcode
+        self.errmsg = errmsg
+        self.path = path
+
+
+@dataclass
+class _TokenEntry:
+    token: str
+    expires_at: float  # monotonic
+    refresh_at: float  # monotonic，进入提前刷新窗口的时刻
+
+
+class AccessTokenCache:
+    """按 appid 缓存 access_token，提前刷新 + single-flight"""
+
+    def __init__(self, refresh_ahead: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.refresh_ahead = refresh_ahead if refresh_ahead is not None else settings.WEIXIN_TOKEN_REFRESH_AHEAD
+        self.clock = clock
+        self._entries: Dict[str, _TokenEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.fetches = 0
+        self.hits = 0
+
+    def _store(self, appid: str, token: str, expires_in: float) -> _TokenEntry:
+        now = self.clock()
+        entry = _TokenEntry(
+            token=token,
+            expires_at=now + expires_in,
+            # 有效期比提前刷新窗口还短时，在有效期过半时刷新
+            refresh_at=now + max(expires_in - self.refresh_ahead, expires_in / 2),
+        )
+        self._entries[appid] = entry
+        return entry
+
+    def _refresh(self, appid: str, fetch: Callable[[], Any]) -> asyncio.Task:
+        """启动（或复用进行中的）刷新任务"""
+        task = self._inflight.get(appid)
+        if task is None:
+            async def run() -> str:
+                try:
+                    self.fetches += 1
+                    token, expires_in = await fetch()
+                    return self._store(appid, token, expires_in).token
+                finally:
+                    self._inflight.pop(appid, None)
+
+            task = asyncio.create_task(run())
+            # 后台刷新失败时避免 "Task exception was never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[appid] = task
+        return task
+
+    async def get(self, appid: str, fetch: Callable[[], Any], force: bool = False) -> str:
+        """
+        获取 appid 的 access_token
+
+        Args:
+            appid: 公众号 AppID
+            fetch: 无参协程函数，返回 (access_token, expires_in)
+            force: 忽略缓存强制刷新（令牌被接口判定失效时）
+        """
+        entry = self._entries.get(appid)
+        now = self.clock()
+        if entry and not force:
+            if now < entry.refresh_at:
+                self.hits += 1
+                return entry.token
+            if now < entry.expires_at:
+                # 提前刷新窗口：继续使用旧令牌，后台刷新
+                self.hits += 1
+                self._refresh(appid, fetch)
+                return entry.token
+        if force:
+            self._entries.pop(appid, None)
+        # shield：某个等待者被取消不影响其他等待同一次刷新的请求
+        return await asyncio.shield(self._refresh(appid, fetch))
+
+    def invalidate(self, appid: str, token: Optional[str] = None) -> None:
+        """作废缓存；指定 token 时只在缓存的仍是该令牌时作废（避免作废别人刚刷新的新令牌）"""
+        entry = self._entries.get(appid)
+        if entry and (token is None or entry.token == token):
+            del self._entries[appid]
+
+    def stats(self) -> Dict[str, int]:
+        return {"appids": len(self._entries), "fetches": self.fetches, "hits": self.hits,
+                "refreshing": len(self._inflight)}
+
+
+class WeixinMediaCacheStore:
+    """已上传媒体缓存：(AppID, 图片SHA-256, 类型) -> media_id / URL，存储在 weixin_media_cache 表"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            session_factory: 数据库会话工厂，默认 SessionLocal
+        """
+        self._session_factory = session_factory
+
+    def _session(self):
+        return (self._session_factory or SessionLocal)()
+
+    def get(self, appid: str, sha256: str, kind: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，未命中或已过期返回 None（过期记录顺带删除）"""
+        db = self._session()
+        try:
+            entry = db.query(WeixinMediaCache).filter(
+                WeixinMediaCache.appid == appid,
+                WeixinMediaCache.sha256 == sha256,
+                WeixinMediaCache.kind == kind,
+            ).first()
+            if entry is None:
+                return None
+            if entry.expires_at is not None and entry.expires_at <= datetime.utcnow():
+                db.delete(entry)
+                db.commit()
+                return None
+            entry.hits = (entry.hits or 0) + 1
+            db.commit()
+            return {"media_id": entry.media_id, "url": entry.url}
+        finally:
+            db.close()
+
+    def put(self, appid: str, sha256: str, kind: str, media_id: Optional[str] = None, url: Optional[str] = None,
+            size: int = 0, ttl: Optional[float] = None) -> None:
+        """写入（或覆盖）缓存；ttl 为空表示永久有效"""
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl) if ttl is not None else None
+        db = self._session()
+        try:
+            entry = db.query(WeixinMediaCache).filter(
+                WeixinMediaCache.appid == appid,
+                WeixinMediaCache.sha256 == sha256,
+                WeixinMediaCache.kind == kind,
+            ).first()
+            if entry is None:
+                entry = WeixinMediaCache(appid=appid, sha256=sha256, kind=kind, hits=0)
+                db.add(entry)
+            entry.media_id = media_id
+            entry.url = url
+            entry.size = size
+            entry.expires_at = expires_at
+            entry.created_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def invalidate(self, appid: str, sha256: Optional[str] = None, kind: Optional[str] = None) -> int:
+        """删除缓存（素材在公众号后台被删除时），返回删除条数"""
+        db = self._session()
+        try:
+            query = db.query(WeixinMediaCache).filter(WeixinMediaCache.appid == appid)
+            if sha256 is not None:
+                query = query.filter(WeixinMediaCache.sha256 == sha256)
+            if kind is not None:
+                query = query.filter(WeixinMediaCache.kind == kind)
+            deleted = query.delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+class WeixinApiClient:
+    """微信公众号 API 异步客户端"""
+
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 token_cache: Optional[AccessTokenCache] = None, max_connections: Optional[int] = None,
+                 timeout: float = 30.0, media_cache: Optional[WeixinMediaCacheStore] = None):
+        """
+        Args:
+            base_url: 接口地址，默认 WEIXIN_API_BASE_URL（测试中指向本地替身）
+            transport: 自定义传输层
+            token_cache: access_token 缓存
+            media_cache: 已上传媒体缓存，为空时每次都上传
+            max_connections: 连接池大小
+            timeout: 请求超时（秒）
+        """
+        max_connections = max_connections or settings.WEIXIN_API_MAX_CONNECTIONS
+        client_options: Dict[str, Any] = {
+            "base_url": base_url or settings.WEIXIN_API_BASE_URL,
+            "timeout": httpx.Timeout(timeout, connect=10),
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        }
+        if transport is not None:
+            client_options["transport"] = transport
+        self._http = httpx.AsyncClient(**client_options)
+        self.tokens = token_cache or AccessTokenCache()
+        self.media_cache = media_cache
+        self._uploads_inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self.uploads = 0
+        self.upload_cache_hits = 0
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    # ---------- 令牌 ----------
+
+    async def _fetch_token(self, appid: str, secret: str) -> Tuple[str, float]:
+        response = await self._http.get("/cgi-bin/token", params={
+            "grant_type": "client_credential", "appid": appid, "secret": secret,
+        })
+        data = self._parse(response, "/cgi-bin/token")
+        if "access_token" not in data:
+            raise WeixinApiError(-1, f"响应缺少 access_token: {data}", "/cgi-bin/token")
+        logger.info(f"获取微信访问令牌成功 - AppID: {appid}, 有效期: {data.get('expires_in')}s")
+        return data["access_token"], float(data.get("expires_in", 7200))
+
+    async def get_access_token(self, appid: str, secret: str, force: bool = False) -> str:
+        """获取 access_token（走缓存）"""
+        return await self.tokens.get(appid, lambda: self._fetch_token(appid, secret), force=force)
+
+    # ---------- 请求 ----------
+
+    @staticmethod
+    def _parse(response: httpx.Response, path: str) -> Dict[str, Any]:
+        response.raise_for_status()
+        data = response.json()
+        errcode = data.get("errcode", 0)
+        if errcode:
+            raise WeixinApiError(errcode, data.get("errmsg", ""), path)
+        return data
+
+    async def _call(self, appid: str, secret: str, method: str, path: str,
+                    params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """带 access_token 调用接口，令牌失效时作废缓存并重试一次"""
+        token = await self.get_access_token(appid, secret)
+        for attempt in range(2):
+            try:
+                response = await self._http.request(method, path, params={**(params or {}), "access_token": token},
+                                                    **kwargs)
+                return self._parse(response, path)
+            except WeixinApiError as e:
+                if e.errcode not in TOKEN_ERROR_CODES or attempt:
+                    raise
+                logger.warning(f"微信访问令牌失效，重新获取 - AppID: {appid}, 错误码: {e.errcode}")
+                self.tokens.invalidate(appid, token)
+                token = await self.get_access_token(appid, secret)
+
+    # ---------- 接口 ----------
+
+    @staticmethod
+    def _file_part(file_name: str, content: bytes) -> Dict[str, Tuple[str, bytes, str]]:
+        content_type = mimetypes.guess_type(file_name)[0] or "image/jpeg"
+        return {"media": (file_name, content, content_type)}
+
+    async def _upload_cached(self, appid: str, kind: str, content: bytes,
+                             upload: Callable[[], Any], ttl: Optional[float] = None) -> Dict[str, Any]:
+        """
+        先查媒体缓存，未命中时上传并写入缓存。同一图片的并发上传只发一次请求。
+
+        Args:
+            upload: 无参协程函数，返回 {media_id, url}
+        """
+        if self.media_cache is None:
+            self.uploads += 1
+            return await upload()
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        key = (appid, sha256, kind)
+        task = self._uploads_inflight.get(key)
+        if task is None:
+            async def run() -> Dict[str, Any]:
+                try:
+                    cached = await asyncio.to_thread(self.media_cache.get, appid, sha256, kind)
+                    if cached is not None:
+                        self.upload_cache_hits += 1
+                        logger.debug(f"微信媒体缓存命中 - AppID: {appid}, 类型: {kind}, SHA-256: {sha256[:12]}")
+                        return cached
+                    self.uploads += 1
+                    result = await upload()
+                    try:
+                        await asyncio.to_thread(self.media_cache.put, appid, sha256, kind, result.get("media_id"),
+                                                result.get("url"), len(content), ttl)
+                    except Exception as e:
+                        log_exception(logger, e, f"写入微信媒体缓存失败 - AppID: {appid}")
+                    return result
+                finally:
+                    self._uploads_inflight.pop(key, None)
+
+            task = asyncio.create_task(run())
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._uploads_inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def upload_image(self, appid: str, secret: str, content: bytes, file_name: str) -> str:
+        """上传图文消息内的图片（media/uploadimg），返回图片URL"""
+        async def upload() -> Dict[str, Any]:
+            data = await self._call(appid, secret, "POST", "/cgi-bin/media/uploadimg",
+                                    files=self._file_part(file_name, content))
+            return {"media_id": None, "url": data["url"]}
+
+        return (await self._upload_cached(appid, MEDIA_IMAGE_URL, content, upload))["url"]
+
+    async def add_image_material(self, appid: str, secret: str, content: bytes, file_name: str) -> Dict[str, str]:
+        """上传永久图片素材（material/add_material），返回 {media_id, url}，可作为封面 thumb_media_id"""
+        async def upload() -> Dict[str, Any]:
+            data = await self._call(appid, secret, "POST", "/cgi-bin/material/add_material",
+                                    params={"type": "image"}, files=self._file_part(file_name, content))
+            return {"media_id": data["media_id"], "url": data.get("url", "")}
+
+        result = await self._upload_cached(appid, MEDIA_MATERIAL, content, upload)
+        return {"media_id": result["media_id"], "url": result.get("url") or ""}
+
+    async def upload_temp_image(self, appid: str, secret: str, content: bytes, file_name: str) -> str:
+        """上传临时图片素材（media/upload），返回 media_id；微信侧保存3天，缓存按 WEIXIN_TEMP_MEDIA_TTL 过期"""
+        async def upload() -> Dict[str, Any]:
+            data = await self._call(appid, secret, "POST", "/cgi-bin/media/upload",
+                                    params={"type": "image"}, files=self._file_part(file_name, content))
+            return {"media_id": data["media_id"], "url": None}
+
+        result = await self._upload_cached(appid, MEDIA_TEMP, content, upload, ttl=settings.WEIXIN_TEMP_MEDIA_TTL)
+        return result["media_id"]
+
+    async def add_draft(self, appid: str, secret: str, articles: List[Dict[str, Any]]) -> str:
+        """新建草稿（draft/add），返回草稿 media_id"""
+        data = await self._call(appid, secret, "POST", "/cgi-bin/draft/add", json={"articles": articles})
+        logger.info(f"微信草稿创建成功 - AppID: {appid}, media_id: {data['media_id']}")
+        return data["media_id"]
+
+    async def submit_publish(self, appid: str, secret: str, media_id: str) -> str:
+        """发布草稿（freepublish/submit），返回 publish_id"""
+        data = await self._call(appid, secret, "POST", "/cgi-bin/freepublish/submit", json={"media_id": media_id})
+        return str(data["publish_id"])
+
+    async def batchget_material(self, appid: str, secret: str, material_type: str = "image",
+                                offset: int = 0, count: int = 20) -> Dict[str, Any]:
+        """获取永久素材列表"""
+        return await self._call(appid, secret, "POST", "/cgi-bin/material/batchget_material",
+                                json={"type": material_type, "offset": offset, "count": count})
+
+    async def upload_image_file(self, appid: str, secret: str, file_path: str) -> str:
+        """上传本地图片文件（media/uploadimg），返回图片URL"""
+        content = await asyncio.to_thread(_read_file, file_path)
+        return await self.upload_image(appid, secret, content, os.path.basename(file_path))
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+_client: Optional[WeixinApiClient] = None
+
+
+def get_weixin_client() -> WeixinApiClient:
+    """进程内共用的微信 API 客户端（首次使用时创建）"""
+    global _client
+    if _client is None:
+        _client = WeixinApiClient(media_cache=WeixinMediaCacheStore())
+    return _client
+
+
+async def close_weixin_client() -> None:
+    """关闭共用客户端（应用关闭时调用）"""
+    global _client
+    if _client is not None:
+        try:
+            await _client.close()
+        except Exception as e:
+            log_exception(logger, e, "关闭微信 API 客户端失败")
+        _client = None
@@ -0,0 +1,343 @@
+"""
+微信公众号图文组装
+
+按账户的 illust_tag 选图 -> 下载 -> 去重 -> 压缩 -> 上传图文图片 -> 生成正文 -> 新建草稿（可选发布）。
+下载、去重、压缩、上传是流式流水线（app/core/stage_pipeline.py）的各个阶段，各有并发上限，
+一张图下载完立即进入后续阶段，不等整批下载完成；20 张图的文章中各阶段是重叠执行的。
+
+去重阶段用下载后计算的感知哈希过滤与该公众号已发布图片、或本篇中已保留图片近似的图片，
+近似图片不再压缩和上传；新建草稿后把保留图片的哈希写入 published_image_hashes。
+
+正文模板与 nodejs_backend/src/services/weixinAPI.ts 的 generateArticleContent 相同（templates/weixin_article.html）。
+运行时把进度写入 Task，结束时把各阶段的吞吐量、队列深度写入任务日志。
+"""
+
+import asyncio
+import html
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.core.stage_pipeline import PipelineResult, Stage, StagePipeline
+from app.database.session import SessionLocal
+from app.models.models import ApiAccountWx
+from app.services import task_service
+from app.services.image_hash_service import (
+    OWNER_WEIXIN,
+    filter_near_duplicates,
+    hashing_available,
+    phash,
+    record_published_hashes,
+)
+from app.services.image_optimize_service import (
+    WEIXIN_CONTENT_IMAGE,
+    ImageOptimizer,
+    ImageProfile,
+    OptimizedImage,
+    get_image_optimizer,
+)
+from app.services.tag_index_service import TagIndex, persist_used_by, select_images_for_account, tag_index
+from app.services.weixin_api_service import WeixinApiClient, get_weixin_client
+
+logger = get_logger(__name__)
+
+TASK_TYPE = "weixin_article"
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "weixin_article.html")
+
+# 图片插入在模板中第一个居中段落之后
+IMAGE_ANCHOR = '<p style="text-align: center;">'
+
+DEFAULT_TITLE = "每日萌图"
+DEFAULT_AUTHOR = "编辑部"
+DEFAULT_DIGEST = "喜欢的话就点个在看吧"
+
+# 流水线阶段占任务进度的比例，其余为生成正文和新建草稿
+PIPELINE_PROGRESS = 90
+
+_template: Optional[str] = None
+
+
+def _load_template() -> str:
+    global _template
+    if _template is None:
+        with open(TEMPLATE_PATH, encoding="utf-8") as f:
+            _template = f.read().rstrip("\n")
+    return _template
+
+
+@dataclass
+class ArticleImage:
+    """文章中的一张图片，随流水线逐步填充"""
+    pid: int
+    author_name: Optional[str] = None
+    source: Optional[str] = None  # 原图URL或本地路径，默认按 WEIXIN_IMAGE_SOURCE_URL 生成
+    data: Optional[bytes] = field(default=None, repr=False)
+    optimized: Optional[OptimizedImage] = None
+    url: Optional[str] = None  # 上传后的微信图片URL
+    hash: Optional[int] = None  # 原图的感知哈希（去重阶段使用）
+
+    @property
+    def caption(self) -> str:
+        """图片说明，与 Node 服务的文件名格式一致"""
+        return f"@{self.author_name} pid_{self.pid}" if self.author_name else f"pid_{self.pid}"
+
+
+@dataclass
+class ArticleBuildResult:
+    """组装结果"""
+    media_id: str
+    title: str
+    pids: List[int]
+    failed: Dict[int, str]
+    stages: List[Dict[str, Any]]
+    publish_id: Optional[str] = None
+
+
+def render_article_content(images: Sequence[ArticleImage]) -> str:
+    """生成正文HTML：在模板的图片位置依次插入图片和说明"""
+    image_html = "".join(
+        f'<img class="rich_pages wxw-img" data-galleryid="" data-imgfileid="100003080" '
+        f'data-ratio="1.3508333333333333" data-s="300,640" data-src="{html.escape(image.url, quote=True)}" '
+        f'data-type="jpeg" data-w="1200" style=""></p><p style="text-align: center;"><span style="outline: 0px;'
+        f'color: rgb(136, 136, 136);font-size: 12px;letter-spacing: 0.578px;">{html.escape(image.caption)}<br  />'
+        f'</span></p><p style="text-align: center;">'
+        for image in images
+    )
+    template = _load_template()
+    index = template.find(IMAGE_ANCHOR)
+    if index == -1:
+        logger.warning("文章模板中未找到图片插入位置")
+        return template
+    index += len(IMAGE_ANCHOR)
+    return template[:index] + image_html + template[index:]
+
+
+def article_title(account: ApiAccountWx, now: Optional[datetime] = None) -> str:
+    return f"{account.title or DEFAULT_TITLE} {(now or datetime.now()).strftime('%Y%m%d')}"
+
+
+def select_article_images(account: ApiAccountWx, count: int = 20, exclude: Iterable[str] = (),
+                          min_popularity: float = 0.0, index: Optional[TagIndex] = None) -> List[ArticleImage]:
+    """按 illust_tag 从标签索引选图，排除已发布到该公众号（pic.wx_name 记录 wx_id）的图片"""
+    pids = select_images_for_account(account, account.wx_id, limit=count, exclude=exclude,
+                                     min_popularity=min_popularity, index=index or tag_index)
+    return [ArticleImage(pid=pid) for pid in pids]
+
+
+class WeixinArticleBuilder:
+    """公众号图文组装"""
+
+    def __init__(self, client: Optional[WeixinApiClient] = None, optimizer: Optional[ImageOptimizer] = None,
+                 profile: ImageProfile = WEIXIN_CONTENT_IMAGE, source_url: Optional[str] = None,
+                 download_concurrency: Optional[int] = None, optimize_concurrency: Optional[int] = None,
+                 upload_concurrency: Optional[int] = None, dedupe: Optional[bool] = None):
+        """
+        Args:
+            client: 微信 API 客户端，默认共用客户端
+            optimizer: 图片优化器，默认共用优化器
+            profile: 图片压缩目标
+            source_url: 原图地址模板（{pid}），默认 WEIXIN_IMAGE_SOURCE_URL
+            download_concurrency / optimize_concurrency / upload_concurrency: 各阶段并发上限
+            dedupe: 是否过滤近似重复的图片，默认在安装了 NumPy 和 Pillow 时启用
+        """
+        self.client = client or get_weixin_client()
+        self.optimizer = optimizer or get_image_optimizer()
+        self.profile = profile
+        self.source_url = source_url or settings.WEIXIN_IMAGE_SOURCE_URL
+        self.download_concurrency = download_concurrency or settings.WEIXIN_ARTICLE_DOWNLOAD_CONCURRENCY
+        self.optimize_concurrency = optimize_concurrency or settings.IMAGE_PIPELINE_WORKERS
+        self.upload_concurrency = upload_concurrency or settings.WEIXIN_ARTICLE_UPLOAD_CONCURRENCY
+        self.dedupe = hashing_available() if dedupe is None else dedupe
+
+    def _stages(self, account: ApiAccountWx) -> List[Stage]:
+        async def download(image: ArticleImage) -> ArticleImage:
+            source = image.source or self.source_url.format(pid=image.pid)
+            if source.startswith(("http://", "https://")):
+                image.data = await self.optimizer.download(source)
+            else:
+                image.data = await asyncio.to_thread(_read_file, source)
+            if self.dedupe:
+                image.hash = await asyncio.to_thread(phash, image.data)
+            return image
+
+        accepted: Dict[int, int] = {}  # 本篇已保留图片的哈希，按保留顺序
+
+        async def dedupe(image: ArticleImage) -> ArticleImage:
+            # 已保留的图片排在前面，近似时丢弃当前图片
+            kept = await asyncio.to_thread(_filter_duplicates, account.id, {**accepted, image.pid: image.hash})
+            if image.pid not in kept:
+                raise ValueError("与已发布或本篇中的图片近似")
+            accepted[image.pid] = image.hash
+            return image
+
+        async def optimize(image: ArticleImage) -> ArticleImage:
+            image.optimized = await self.optimizer.optimize(image.data, self.profile)
+            image.data = None  # 原图不再需要，释放内存
+            return image
+
+        async def upload(image: ArticleImage) -> ArticleImage:
+            content = await asyncio.to_thread(_read_file, image.optimized.path)
+            image.url = await self.client.upload_image(account.appid, account.app_secret, content,
+                                                       f"pid_{image.pid}{self.profile.extension}")
+            return image
+
+        stages = [Stage("download", download, concurrency=self.download_concurrency)]
+        if self.dedupe:
+            # 串行执行，保证同一篇中近似的两张图不会同时通过
+            stages.append(Stage("dedupe", dedupe, concurrency=1))
+        stages += [
+            Stage("optimize", optimize, concurrency=self.optimize_concurrency),
+            Stage("upload", upload, concurrency=self.upload_concurrency),
+        ]
+        return stages
+
+    async def build(self, account: ApiAccountWx, images: Sequence[ArticleImage], task_id: Optional[int] = None,
+                    publish: bool = False) -> ArticleBuildResult:
+        """
+        组装并新建草稿
+
+        Args:
+            account: 公众号账户
+            images: 按文章顺序排列的图片
+            task_id: 写入进度的任务ID
+            publish: 新建草稿后是否提交发布
+
+        Raises:
+            ValueError: 没有图片处理成功
+        """
+        report = task_service.task_progress_reporter(task_id) if task_id is not None else None
+
+        async def on_item_done(result: PipelineResult, done: int, total: int) -> None:
+            if report is not None:
+                await report(done * PIPELINE_PROGRESS // total)
+
+        pipeline = StagePipeline(self._stages(account), on_item_done=on_item_done)
+        results = await pipeline.run(images)
+        stages = pipeline.stats()
+        logger.info(f"公众号图片流水线完成 - 账户: {account.name}, 阶段统计: {stages}")
+
+        succeeded = [result.value for result in results if result.ok]
+        failed = {images[result.index].pid: f"{result.stage}: {result.error}" for result in results if not result.ok}
+        if not succeeded:
+            raise ValueError(f"没有可用的图片（失败 {len(failed)} 张）")
+
+        title = article_title(account)
+        article = {
+            "title": title,
+            "author": account.author or DEFAULT_AUTHOR,
+            "digest": DEFAULT_DIGEST,
+            "content": render_article_content(succeeded),
+            "thumb_media_id": account.thumb_media_id or "",
+            "need_open_comment": 1,
+            "only_fans_can_comment": 1,
+        }
+        media_id = await self.client.add_draft(account.appid, account.app_secret, [article])
+        publish_id = await self.client.submit_publish(account.appid, account.app_secret, media_id) if publish else None
+
+        pids = [image.pid for image in succeeded]
+        tag_index.mark_used(pids, account.wx_id)
+        try:
+            await asyncio.to_thread(persist_used_by, pids, account.wx_id)
+        except Exception as e:
+            # 草稿已经建好；本进程的索引已标记，只有重启后会丢失这次记录
+            logger.warning(f"记录图片已发布到公众号失败 - 账户: {account.name}, 错误: {e}")
+        hashes = {image.pid: image.hash for image in succeeded if image.hash is not None}
+        if hashes:
+            try:
+                await asyncio.to_thread(_record_hashes, account.id, hashes)
+            except Exception as e:
+                # 草稿已经建好，哈希记录失败只影响以后的去重
+                logger.warning(f"记录已发布图片哈希失败 - 账户: {account.name}, 错误: {e}")
+        if report is not None:
+            await report(100)
+        return ArticleBuildResult(media_id=media_id, title=title, pids=pids, failed=failed, stages=stages,
+                                  publish_id=publish_id)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _filter_duplicates(account_id: int, candidates: Dict[int, int]) -> List[int]:
+    db = SessionLocal()
+    try:
+        return filter_near_duplicates(db, OWNER_WEIXIN, account_id, candidates)
+    finally:
+        db.close()
+
+
+def _record_hashes(account_id: int, hashes: Dict[int, int]) -> None:
+    db = SessionLocal()
+    try:
+        record_published_hashes(db, OWNER_WEIXIN, account_id, hashes)
+    finally:
+        db.close()
+
+
+def _load_account(account_id: int) -> Optional[ApiAccountWx]:
+    db = SessionLocal()
+    try:
+        account = db.query(ApiAccountWx).filter(ApiAccountWx.id == account_id).first()
+        if account is not None:
+            db.expunge(account)
+        return account
+    finally:
+        db.close()
+
+
+def _finish(task_id: int, result: Optional[ArticleBuildResult], error: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        if result is not None:
+            for stage in result.stages:
+                task_service.add_task_log(db, task_id, "info", json.dumps({"type": "pipeline_stage", **stage},
+                                                                          ensure_ascii=False))
+            task_service.add_task_log(db, task_id, "info" if not result.failed else "warning", json.dumps({
+                "type": "weixin_article", "media_id": result.media_id, "publish_id": result.publish_id,
+                "title": result.title, "pids": result.pids, "failed": result.failed,
+            }, ensure_ascii=False))
+        task_service.finish_task(db, task_id, error)
+    finally:
+        db.close()
+
+
+async def run_article_task(task_id: int, account_id: int, pids: Optional[List[int]] = None, count: int = 20,
+                           exclude: Iterable[str] = (), min_popularity: float = 0.0, publish: bool = False,
+                           builder: Optional[WeixinArticleBuilder] = None) -> Optional[ArticleBuildResult]:
+    """
+    后台执行图文组装任务，结果和错误写入 Task
+
+    Args:
+        task_id: 任务ID（task_service.create_task 创建）
+        account_id: 公众号账户ID
+        pids: 指定图片；为空时按 illust_tag 选 count 张
+    """
+    result: Optional[ArticleBuildResult] = None
+    error: Optional[str] = None
+    try:
+        account = await asyncio.to_thread(_load_account, account_id)
+        if account is None:
+            raise ValueError(f"微信公众号账户不存在，ID: {account_id}")
+        if pids:
+            images = [ArticleImage(pid=pid) for pid in pids]
+        else:
+            images = select_article_images(account, count, exclude, min_popularity)
+        if not images:
+            raise ValueError("没有符合 illust_tag 条件的图片")
+        logger.info(f"开始组装公众号图文 - 任务ID: {task_id}, 账户: {account.name}, 图片: {len(images)} 张")
+        result = await (builder or WeixinArticleBuilder()).build(account, images, task_id=task_id, publish=publish)
+        logger.info(f"公众号图文组装完成 - 任务ID: {task_id}, media_id: {result.media_id}")
+    except Exception as e:
+        error = str(e)
+        log_exception(logger, e, f"公众号图文组装失败 - 任务ID: {task_id}")
+    try:
+        await asyncio.to_thread(_finish, task_id, result, error)
+    except Exception as e:
+        log_exception(logger, e, f"写入图文任务结果失败 - 任务ID: {task_id}")
+    return result
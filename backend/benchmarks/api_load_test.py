@@ -0,0 +1,266 @@
+"""
+HTTP 接口压测
+
+在进程内运行 FastAPI 应用（httpx ASGITransport，不经过网络），数据库为预先造好数据的 SQLite 文件：
+默认 1万账户、1千浏览器配置、5千代理、10万任务和10万任务日志。
+按场景和并发度压测 /accounts、/resources/*、/tasks、/tasks/{id}/logs，统计吞吐量、尾延迟、错误数，
+以及每个请求的平均SQL语句数（来自请求指标中间件），结果写入 JSON，可以用 --baseline 对比。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.api_load_test --concurrency 1 8 32 --requests 300 --output load_results.json
+    python -m benchmarks.api_load_test --db ./loadtest.db --baseline load_results.json --output new_results.json
+
+指定 --db 时造好的数据库会保留，再次运行直接复用，保证多次结果可比。
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.report import build_report, compare_with_baseline, percentile, write_report
+
+DEFAULT_CONCURRENCY = [1, 8, 32]
+
+# 每批插入的行数
+SEED_BATCH = 10000
+
+COMPARE_METRICS = ("requests_per_second", "p50_ms", "p95_ms", "p99_ms", "errors", "avg_sql_statements")
+
+TASK_TYPES = ("publish", "translate")
+TASK_STATUSES = ("pending", "running", "completed", "failed", "paused", "cancelled")
+PLATFORMS = ("douyin", "bilibili", "kuaishou", "weibo")
+
+
+class Dataset:
+    """造数规模"""
+
+    def __init__(self, accounts: int, profiles: int, proxies: int, tasks: int, logs: int):
+        self.accounts = accounts
+        self.profiles = profiles
+        self.proxies = proxies
+        self.tasks = tasks
+        self.logs = logs
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+# 场景名 -> 根据随机数和造数规模生成请求路径
+SCENARIOS: Dict[str, Callable[[random.Random, Dataset], str]] = {
+    "accounts_list": lambda rng, data: "/accounts/",
+    "account_detail": lambda rng, data: f"/accounts/{rng.randint(1, data.accounts)}",
+    "browser_profiles": lambda rng, data: "/resources/browser-profiles",
+    "proxies": lambda rng, data: "/resources/proxies",
+    "tasks_list": lambda rng, data: "/tasks/?limit=100",
+    "tasks_filtered": lambda rng, data: f"/tasks/?status={rng.choice(TASK_STATUSES)}&task_type=publish&limit=100",
+    "task_logs": lambda rng, data: f"/tasks/{rng.randint(1, data.tasks)}/logs",
+}
+
+
+def seed_database(engine, data: Dataset, seed: int = 42) -> None:
+    """执行迁移并批量写入压测数据"""
+    from app.database.migrations import run_migrations
+    from app.models.models import Account, BrowserProfile, Proxy, Task, TaskLog
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    run_migrations(engine)
+
+    def insert(table, rows):
+        with engine.begin() as conn:
+            for start in range(0, len(rows), SEED_BATCH):
+                conn.execute(table.insert(), rows[start:start + SEED_BATCH])
+
+    insert(Proxy.__table__, [
+        {"id": i, "name": f"proxy_{i}", "protocol": "http", "host": f"10.0.{i // 256 % 256}.{i % 256}",
+         "port": 8000 + i % 1000, "is_available": rng.random() > 0.1, "last_checked": now,
+         "created_at": now, "updated_at": now}
+        for i in range(1, data.proxies + 1)
+    ])
+    insert(BrowserProfile.__table__, [
+        {"id": i, "name": f"profile_{i}", "user_agent": "Mozilla/5.0", "screen_width": 1920, "screen_height": 1080,
+         "storage_path": f"./browser_profiles/profile_{i}/storage_state.json",
+         "proxy_id": (i - 1) % data.proxies + 1 if data.proxies else None, "created_at": now, "updated_at": now}
+        for i in range(1, data.profiles + 1)
+    ])
+    insert(Account.__table__, [
+        {"id": i, "platform": rng.choice(PLATFORMS), "name": f"account_{i}", "username": f"user_{i}",
+         "status": "active", "browser_profile_id": (i - 1) % data.profiles + 1 if data.profiles else None,
+         "last_login": now, "created_at": now, "updated_at": now}
+        for i in range(1, data.accounts + 1)
+    ])
+    insert(Task.__table__, [
+        {"id": i, "task_type": rng.choice(TASK_TYPES), "status": rng.choice(TASK_STATUSES), "progress": rng.randint(0, 100),
+         "created_at": now - timedelta(minutes=data.tasks - i), "updated_at": now}
+        for i in range(1, data.tasks + 1)
+    ])
+    insert(TaskLog.__table__, [
+        {"id": i, "task_id": rng.randint(1, data.tasks), "level": "info", "message": f"任务日志 {i}",
+         "timestamp": now - timedelta(seconds=data.logs - i)}
+        for i in range(1, data.logs + 1)
+    ])
+
+
+async def run_level(client, scenario: str, concurrency: int, total_requests: int, data: Dataset,
+                    api_prefix: str, seed: int, verbose: bool = True) -> Dict[str, Any]:
+    """在一个并发度下压测一个场景"""
+    from app.core.metrics import metrics_registry
+
+    rng = random.Random(seed)
+    paths = [api_prefix + SCENARIOS[scenario](rng, data) for _ in range(total_requests)]
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < len(paths):
+            path = paths[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    metrics_registry.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - start
+
+    routes = metrics_registry.summary()["routes"]
+    sql_per_request = (
+        sum(route["avg_sql_statements"] * route["count"] for route in routes) / sum(route["count"] for route in routes)
+        if routes else None
+    )
+
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "requests_per_second": round(len(latencies) / wall_seconds, 1) if wall_seconds else 0,
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(max(latencies), 1) if latencies else None,
+        "avg_sql_statements": round(sql_per_request, 2) if sql_per_request is not None else None,
+    }
+    if verbose:
+        print(
+            f"{scenario:<18} 并发 {concurrency:>3}  {result['requests_per_second']:>8} req/s  "
+            f"p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  "
+            f"错误 {errors}  SQL/请求 {result['avg_sql_statements']}"
+        )
+    return result
+
+
+async def run_load_test(args: argparse.Namespace, data: Dataset) -> List[Dict[str, Any]]:
+    import httpx
+
+    from main import app
+    from app.core.config import settings
+    from app.database.session import SessionLocal, get_db
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            for scenario in args.scenarios:
+                # 预热：建立连接池、加载 SQLite 页缓存
+                await run_level(client, scenario, 1, args.warmup, data, settings.API_PREFIX, args.seed, verbose=False)
+                for concurrency in args.concurrency:
+                    results.append(await run_level(client, scenario, concurrency, args.requests, data,
+                                                   settings.API_PREFIX, args.seed))
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP 接口进程内压测")
+    parser.add_argument("--db", help="SQLite 数据库文件路径，已存在时直接复用；不指定则使用临时文件")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="压测场景")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY, help="并发度列表")
+    parser.add_argument("--requests", type=int, default=200, help="每个 (场景, 并发度) 的请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景的预热请求数")
+    parser.add_argument("--accounts", type=int, default=10000, help="账户数")
+    parser.add_argument("--profiles", type=int, default=1000, help="浏览器配置数")
+    parser.add_argument("--proxies", type=int, default=5000, help="代理数")
+    parser.add_argument("--tasks", type=int, default=100000, help="任务数")
+    parser.add_argument("--logs", type=int, default=100000, help="任务日志数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--log-level", default="WARNING", help="压测期间的控制台日志级别")
+    parser.add_argument("--output", default="load_results.json", help="结果JSON路径")
+    parser.add_argument("--baseline", help="上一次的结果JSON，用于对比")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    data = Dataset(args.accounts, args.profiles, args.proxies, args.tasks, args.logs)
+
+    temp_dir = None
+    db_path = args.db
+    if not db_path:
+        temp_dir = tempfile.TemporaryDirectory(prefix="linkmatrix_load_")
+        db_path = os.path.join(temp_dir.name, "loadtest.db")
+    reuse = os.path.exists(db_path)
+
+    # 应用的数据库引擎在导入时按 DATABASE_URL 创建，必须在导入应用模块之前设置
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    from app.core.logger import logger_manager
+    from app.database.session import engine
+
+    logger_manager.set_level(args.log_level)
+
+    try:
+        if reuse:
+            print(f"复用已有数据库: {db_path}")
+        else:
+            start = time.perf_counter()
+            seed_database(engine, data, args.seed)
+            print(f"造数完成: {data.as_dict()}，耗时 {time.perf_counter() - start:.1f}s")
+
+        results = asyncio.run(run_load_test(args, data))
+    finally:
+        engine.dispose()
+        if temp_dir:
+            temp_dir.cleanup()
+
+    config = {
+        "dataset": data.as_dict(),
+        "scenarios": args.scenarios,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "log_level": args.log_level,
+        "database": "sqlite",
+    }
+    report = build_report(config, results)
+    if args.baseline:
+        report["comparison"] = compare_with_baseline(results, args.baseline, ("scenario", "concurrency"),
+                                                     COMPARE_METRICS)
+    write_report(report, args.output)
+    print(f"压测结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+基准测试用的平台页面替身
+
+通过 BrowserContext.route 拦截浏览器的全部请求：抖音、B站、公众号的登录、个人中心和发布页面
+返回 fake_pages/ 下的本地 HTML（与真实页面使用相同的 data-e2e 选择器），其余请求一律中止，
+整个基准测试不访问外网。页面响应、登录跳转、上传和发布都可以配置人为延迟。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+PAGES_DIR = Path(__file__).parent / "fake_pages"
+
+
+@dataclass
+class FakeLatency:
+    """替身页面的人为延迟（毫秒）"""
+    page_ms: int = 100  # 页面响应延迟
+    login_ms: int = 200  # 点击登录到跳转个人中心
+    upload_ms: int = 1000  # 选择文件到上传完成
+    publish_ms: int = 300  # 点击发布到出现发布成功
+
+
+# 平台 -> [(URL前缀, 页面模板)]，前缀越长越优先匹配
+PLATFORM_PAGES: Dict[str, List[Tuple[str, str]]] = {
+    "douyin": [
+        ("https://www.douyin.com/login", "login.html"),
+        ("https://www.douyin.com/user", "profile.html"),
+        ("https://www.douyin.com/creator/upload", "upload.html"),
+    ],
+    "bilibili": [
+        ("https://www.bilibili.com/", "login.html"),
+        ("https://space.bilibili.com", "profile.html"),
+        ("https://member.bilibili.com/platform/upload/video/frame", "upload.html"),
+    ],
+    "weixingongzhonghao": [
+        ("https://mp.weixin.qq.com/cgi-bin/loginpage", "login.html"),
+        ("https://mp.weixin.qq.com/cgi-bin/home", "profile.html"),
+        ("https://mp.weixin.qq.com/cgi-bin/appmsg", "upload.html"),
+    ],
+}
+
+# 登录成功后跳转的个人中心地址
+PROFILE_URLS = {
+    "douyin": "https://www.douyin.com/user/benchmark",
+    "bilibili": "https://space.bilibili.com/benchmark",
+    "weixingongzhonghao": "https://mp.weixin.qq.com/cgi-bin/home?t=benchmark",
+}
+
+
+class FakePlatformSite:
+    """单个平台的页面替身"""
+
+    def __init__(self, platform: str, latency: Optional[FakeLatency] = None):
+        if platform not in PLATFORM_PAGES:
+            supported = ", ".join(PLATFORM_PAGES)
+            raise ValueError(f"没有该平台的页面替身: {platform}。支持的平台: {supported}")
+
+        self.platform = platform
+        self.latency = latency or FakeLatency()
+        self.requests_served = 0
+        self.requests_blocked = 0
+
+        values = {
+            "platform": platform,
+            "profile_url": PROFILE_URLS[platform],
+            "login_ms": self.latency.login_ms,
+            "upload_ms": self.latency.upload_ms,
+            "publish_ms": self.latency.publish_ms,
+        }
+        self._pages = sorted(
+            ((prefix, self._render(template, values)) for prefix, template in PLATFORM_PAGES[platform]),
+            key=lambda item: -len(item[0]),
+        )
+
+    @staticmethod
+    def _render(template: str, values: Dict[str, object]) -> str:
+        html = (PAGES_DIR / template).read_text(encoding="utf-8")
+        for key, value in values.items():
+            html = html.replace("{{" + key + "}}", str(value))
+        return html
+
+    def match(self, url: str) -> Optional[str]:
+        """返回URL对应的页面HTML，没有替身时返回None"""
+        parts = urlsplit(url)
+        normalized = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        for prefix, html in self._pages:
+            if normalized.startswith(prefix):
+                return html
+        return None
+
+    async def install(self, context) -> None:
+        """在浏览器上下文上注册请求拦截"""
+        await context.route("**/*", self._handle)
+
+    async def _handle(self, route) -> None:
+        request = route.request
+        html = self.match(request.url) if request.resource_type == "document" else None
+        if html is None:
+            self.requests_blocked += 1
+            await route.abort()
+            return
+
+        if self.latency.page_ms:
+            await asyncio.sleep(self.latency.page_ms / 1000)
+        self.requests_served += 1
+        await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
@@ -0,0 +1,160 @@
+"""
+平台上传接口替身
+
+按 fixtures/ 下录制的交互回放平台直传接口（初始化 -> 分片 -> 合并 -> 发布），用于测试和基准测试 API 模式，
+不访问真实平台。替身会校验 Cookie / CSRF 请求头、请求字段和分片内容，并统计分片并发峰值。
+可以通过 drop_field / fail_step 模拟接口变化，检查回退到浏览器流程的逻辑。
+
+进程内使用：
+    api = FakeUploadApi("douyin")
+    automation.api_transport = httpx.ASGITransport(app=api.app)
+
+独立运行（在 backend 目录下）：
+    python -m benchmarks.fake_upload_api --platform douyin --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class FakeUploadApi:
+    """单个平台的上传接口替身"""
+
+    def __init__(self, platform: str, chunk_delay: float = 0.0, drop_field: Optional[str] = None,
+                 fail_step: Optional[str] = None):
+        """
+        Args:
+            platform: 平台名称，对应 fixtures/{platform}_upload_api.json
+            chunk_delay: 每个分片的处理延迟（秒），用于观察并发
+            drop_field: 从响应中删除该字段（模拟接口变化）
+            fail_step: 该步骤返回 HTTP 500（init / chunk / complete / publish）
+        """
+        fixture_path = FIXTURES_DIR / f"{platform}_upload_api.json"
+        if not fixture_path.exists():
+            raise ValueError(f"没有该平台的接口录制: {platform}")
+        self.fixture = json.loads(fixture_path.read_text(encoding="utf-8"))
+        self.chunk_delay = chunk_delay
+        self.drop_field = drop_field
+        self.fail_step = fail_step
+
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.published = []
+        self.requests = 0
+        self.active_chunks = 0
+        self.peak_concurrent_chunks = 0
+
+        self.app = FastAPI()
+        exchanges = self.fixture["exchanges"]
+        for step, exchange in exchanges.items():
+            self.app.add_api_route(exchange["path"], self._handler(step, exchange), methods=[exchange["method"]])
+
+    def _check_headers(self, request: Request) -> Optional[JSONResponse]:
+        required = self.fixture.get("required_headers", {})
+        cookies = request.cookies
+        missing = [name for name in required.get("cookie", []) if name not in cookies]
+        if missing:
+            return JSONResponse({"status_code": 8, "message": f"missing cookies: {missing}"}, status_code=401)
+        for header, expected in required.items():
+            if header == "cookie":
+                continue
+            value = request.headers.get(header)
+            if expected is True and not value:
+                return JSONResponse({"status_code": 8, "message": f"missing header: {header}"}, status_code=403)
+        return None
+
+    def _render(self, template: Dict[str, Any], values: Dict[str, Any]) -> Dict[str, Any]:
+        body = {}
+        for key, value in template.items():
+            if key == self.drop_field:
+                continue
+            if isinstance(value, str) and value.startswith("{{") and value.endswith("}}"):
+                value = values[value[2:-2]]
+            body[key] = value
+        return body
+
+    def _handler(self, step: str, exchange: Dict[str, Any]):
+        async def handle(request: Request):
+            self.requests += 1
+            error = self._check_headers(request)
+            if error is not None:
+                return error
+            if step == self.fail_step:
+                return JSONResponse({"status_code": 500, "message": "injected failure"}, status_code=500)
+
+            if step == "chunk":
+                return await self._chunk(request, exchange)
+
+            payload = await request.json()
+            missing = [name for name in exchange.get("request_fields", []) if name not in payload]
+            if missing:
+                return JSONResponse({"status_code": 2, "message": f"missing fields: {missing}"}, status_code=400)
+
+            values: Dict[str, Any] = {}
+            if step == "init":
+                upload_id = uuid.uuid4().hex
+                self.uploads[upload_id] = {}
+                values["upload_id"] = upload_id
+            elif step == "complete":
+                chunks = self.uploads.get(payload["upload_id"])
+                if chunks is None or len(chunks) != payload["chunks"]:
+                    return JSONResponse({"status_code": 3, "message": "chunk count mismatch"}, status_code=400)
+                values["video_id"] = f"v_{payload['upload_id']}"
+            elif step == "publish":
+                self.published.append(payload)
+                values["aweme_id"] = str(len(self.published))
+            return JSONResponse(self._render(exchange["response"], values))
+
+        return handle
+
+    async def _chunk(self, request: Request, exchange: Dict[str, Any]) -> JSONResponse:
+        params = request.query_params
+        upload_id = params.get("upload_id")
+        if upload_id not in self.uploads:
+            return JSONResponse({"status_code": 4, "message": "unknown upload_id"}, status_code=404)
+        index = int(params.get("part_number"))
+
+        self.active_chunks += 1
+        self.peak_concurrent_chunks = max(self.peak_concurrent_chunks, self.active_chunks)
+        try:
+            data = await request.body()
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+        finally:
+            self.active_chunks -= 1
+
+        self.uploads[upload_id][index] = data
+        return JSONResponse(self._render(exchange["response"], {"index": index, "crc32": zlib.crc32(data)}))
+
+    def uploaded_bytes(self, upload_id: Optional[str] = None) -> bytes:
+        """按分片顺序拼接上传内容（默认最近一次上传）"""
+        upload_id = upload_id or list(self.uploads)[-1]
+        chunks = self.uploads[upload_id]
+        return b"".join(chunks[index] for index in sorted(chunks))
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="平台上传接口替身")
+    parser.add_argument("--platform", default="douyin")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="每个分片的处理延迟（秒）")
+    args = parser.parse_args(argv)
+
+    api = FakeUploadApi(args.platform, chunk_delay=args.chunk_delay)
+    uvicorn.run(api.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
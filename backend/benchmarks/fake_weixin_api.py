@@ -0,0 +1,159 @@
+"""
+微信公众号 API 替身
+
+实现后端用到的接口（token、media/uploadimg、media/upload、material/add_material、draft/add、freepublish/submit、
+material/batchget_material），返回与微信相同结构的 JSON，用于测试和基准测试，不访问真实接口。
+可以配置令牌有效期、令牌接口延迟，并能主动作废令牌（模拟 40001），统计令牌接口调用次数。
+
+进程内使用：
+    api = FakeWeixinApi()
+    client = WeixinApiClient(base_url="http://weixin.test", transport=httpx.ASGITransport(app=api.app))
+
+独立运行（在 backend 目录下）：
+    python -m benchmarks.fake_weixin_api --port 8766
+"""
+
+import argparse
+import asyncio
+import hashlib
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+
+class FakeWeixinApi:
+    """微信公众号 API 替身"""
+
+    def __init__(self, apps: Optional[Dict[str, str]] = None, expires_in: int = 7200, token_delay: float = 0.0,
+                 upload_delay: float = 0.0):
+        """
+        Args:
+            apps: appid -> secret，默认接受任意 appid/secret
+            expires_in: 下发令牌的有效期（秒）
+            token_delay: 令牌接口延迟（秒）
+            upload_delay: 图片上传接口延迟（秒）
+        """
+        self.apps = apps
+        self.expires_in = expires_in
+        self.token_delay = token_delay
+        self.upload_delay = upload_delay
+
+        self.tokens: Dict[str, str] = {}  # token -> appid
+        self.token_requests = 0
+        self.uploads: List[Dict[str, object]] = []
+        self.drafts: List[Dict[str, object]] = []
+        self.published: List[str] = []
+        self.concurrent_uploads = 0
+        self.peak_concurrent_uploads = 0
+
+        self.app = FastAPI()
+        self.app.add_api_route("/cgi-bin/token", self.token, methods=["GET"])
+        self.app.add_api_route("/cgi-bin/media/uploadimg", self.upload_image, methods=["POST"])
+        self.app.add_api_route("/cgi-bin/media/upload", self.upload_temp_media, methods=["POST"])
+        self.app.add_api_route("/cgi-bin/material/add_material", self.add_material, methods=["POST"])
+        self.app.add_api_route("/cgi-bin/material/batchget_material", self.batchget_material, methods=["POST"])
+        self.app.add_api_route("/cgi-bin/draft/add", self.add_draft, methods=["POST"])
+        self.app.add_api_route("/cgi-bin/freepublish/submit", self.submit_publish, methods=["POST"])
+
+    def revoke_tokens(self) -> None:
+        """作废所有已下发的令牌，之后的接口调用返回 40001"""
+        self.tokens.clear()
+
+    def _check_token(self, request: Request) -> Optional[JSONResponse]:
+        token = request.query_params.get("access_token")
+        if not token:
+            return JSONResponse({"errcode": 41001, "errmsg": "access_token missing"})
+        if token not in self.tokens:
+            return JSONResponse({"errcode": 40001, "errmsg": "invalid credential, access_token is invalid"})
+        return None
+
+    async def token(self, grant_type: str, appid: str, secret: str):
+        self.token_requests += 1
+        if self.token_delay:
+            await asyncio.sleep(self.token_delay)
+        if grant_type != "client_credential":
+            return JSONResponse({"errcode": 40002, "errmsg": "invalid grant_type"})
+        if self.apps is not None and self.apps.get(appid) != secret:
+            return JSONResponse({"errcode": 40125, "errmsg": "invalid appsecret"})
+        token = f"token_{appid}_{uuid.uuid4().hex}"
+        self.tokens[token] = appid
+        return {"access_token": token, "expires_in": self.expires_in}
+
+    async def _receive_upload(self, media: UploadFile) -> Dict[str, object]:
+        self.concurrent_uploads += 1
+        self.peak_concurrent_uploads = max(self.peak_concurrent_uploads, self.concurrent_uploads)
+        try:
+            content = await media.read()
+            if self.upload_delay:
+                await asyncio.sleep(self.upload_delay)
+        finally:
+            self.concurrent_uploads -= 1
+        digest = hashlib.sha256(content).hexdigest()
+        upload = {"file_name": media.filename, "size": len(content), "sha256": digest}
+        self.uploads.append(upload)
+        return upload
+
+    async def upload_image(self, request: Request, media: UploadFile = File(...)):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        upload = await self._receive_upload(media)
+        return {"url": f"http://mmbiz.qpic.cn/fake/{upload['sha256'][:16]}/0"}
+
+    async def upload_temp_media(self, request: Request, type: str, media: UploadFile = File(...)):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        upload = await self._receive_upload(media)
+        return {"type": type, "media_id": f"temp_{upload['sha256'][:16]}", "created_at": int(time.time())}
+
+    async def add_material(self, request: Request, media: UploadFile = File(...)):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        upload = await self._receive_upload(media)
+        return {"media_id": f"media_{upload['sha256'][:16]}", "url": f"http://mmbiz.qpic.cn/fake/{upload['sha256'][:16]}/0"}
+
+    async def batchget_material(self, request: Request):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        return {"total_count": len(self.uploads), "item_count": 0, "item": []}
+
+    async def add_draft(self, request: Request):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        payload = await request.json()
+        if not payload.get("articles"):
+            return JSONResponse({"errcode": 44003, "errmsg": "empty news data"})
+        media_id = f"draft_{uuid.uuid4().hex[:16]}"
+        self.drafts.append({"media_id": media_id, "articles": payload["articles"]})
+        return {"media_id": media_id}
+
+    async def submit_publish(self, request: Request):
+        error = self._check_token(request)
+        if error is not None:
+            return error
+        payload = await request.json()
+        self.published.append(payload["media_id"])
+        return {"errcode": 0, "errmsg": "ok", "publish_id": len(self.published)}
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="微信公众号 API 替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--expires-in", type=int, default=7200, help="令牌有效期（秒）")
+    args = parser.parse_args(argv)
+
+    uvicorn.run(FakeWeixinApi(expires_in=args.expires_in).app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
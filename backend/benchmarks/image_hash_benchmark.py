@@ -0,0 +1,111 @@
+"""
+感知哈希索引基准测试
+
+在随机 64 位哈希构成的索引（默认 100 万条）上测量：
+- 单个哈希的近邻查询耗时（nearest）
+- 一批候选的最小距离查询耗时（min_distances，过滤近似重复时的调用方式）
+
+每轮查询后向索引加入与查询哈希相差 max_distance 个比特的近似项，确认这些查询能够命中。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.image_hash_benchmark --index-size 1000000 --batch 1 10 100 --output hash_results.json
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.logger import get_logger
+from app.services.image_hash_service import HashIndex
+from benchmarks.report import build_report, compare_with_baseline, percentile, write_report
+
+logger = get_logger(__name__)
+
+COMPARE_METRICS = ("p50_ms", "p95_ms", "per_candidate_us")
+
+
+def _flip_bits(rng: np.random.Generator, values: np.ndarray, bits: int) -> np.ndarray:
+    """每个哈希随机翻转 bits 个比特"""
+    result = values.copy()
+    for i in range(len(result)):
+        for bit in rng.choice(64, size=bits, replace=False):
+            result[i] ^= np.uint64(1) << np.uint64(bit)
+    return result
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    rng = np.random.default_rng(args.seed)
+    index = HashIndex(capacity=args.index_size)
+    index.add_many(rng.integers(0, 2 ** 64, args.index_size, dtype=np.uint64))
+
+    results = []
+    for batch in args.batch:
+        timings: List[float] = []
+        for _ in range(args.repeat):
+            queries = rng.integers(0, 2 ** 64, batch, dtype=np.uint64)
+            start = time.perf_counter()
+            index.min_distances(queries)
+            timings.append((time.perf_counter() - start) * 1000)
+            # 校验：加入与一半查询相差 max_distance 个比特的近似项后，这些查询都能命中
+            planted = _flip_bits(rng, queries[: batch // 2 or 1], args.max_distance)
+            index.add_many(planted)
+            assert (index.min_distances(queries[: len(planted)]) <= args.max_distance).all()
+
+        results.append({
+            "index_size": len(index),
+            "batch": batch,
+            "p50_ms": percentile(timings, 0.5),
+            "p95_ms": percentile(timings, 0.95),
+            "per_candidate_us": round(sum(timings) / len(timings) * 1000 / batch, 1),
+        })
+        logger.info(f"批量 {batch}: p50 {results[-1]['p50_ms']}ms, p95 {results[-1]['p95_ms']}ms")
+
+    single: List[float] = []
+    for _ in range(args.repeat):
+        query = int(rng.integers(0, 2 ** 64, dtype=np.uint64))
+        start = time.perf_counter()
+        index.nearest(query, args.max_distance)
+        single.append((time.perf_counter() - start) * 1000)
+    results.append({
+        "index_size": len(index),
+        "batch": "nearest",
+        "p50_ms": percentile(single, 0.5),
+        "p95_ms": percentile(single, 0.95),
+        "per_candidate_us": round(sum(single) / len(single) * 1000, 1),
+    })
+
+    config = {"index_size": args.index_size, "batch": args.batch, "repeat": args.repeat,
+              "max_distance": args.max_distance, "numpy": np.__version__}
+    report = build_report(config, results)
+    if args.baseline:
+        report["comparison"] = compare_with_baseline(results, args.baseline, ("batch",), COMPARE_METRICS)
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="感知哈希索引基准测试")
+    parser.add_argument("--index-size", type=int, default=1_000_000, help="索引条数")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 10, 100], help="每次查询的候选数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种批量的重复次数")
+    parser.add_argument("--max-distance", type=int, default=8, help="近似重复的汉明距离阈值")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="hash_results.json", help="结果JSON路径")
+    parser.add_argument("--baseline", help="上一次的结果JSON，用于对比")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    write_report(report, args.output)
+    logger.info(f"基准测试结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
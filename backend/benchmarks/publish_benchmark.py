@@ -0,0 +1,233 @@
+"""
+发布自动化基准测试
+
+用 AutomationFactory 创建各平台的自动化实例，对本地页面替身（见 fake_platforms.py）执行
+完整的 启动浏览器 -> 发布视频 -> 关闭浏览器 流程，在不同并发度下统计：
+- 每分钟发布数
+- 发布耗时和各步骤耗时的 p95
+- 进程树 RSS 峰值和 Chromium 进程数峰值
+
+结果写入 JSON，可以用 --baseline 与上一次的结果对比。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.publish_benchmark --concurrency 1 4 16 64 --output benchmark_results.json
+    python -m benchmarks.publish_benchmark --baseline benchmark_results.json --output new_results.json
+    # 每个实例独立启动浏览器（对比共享浏览器池）
+    python -m benchmarks.publish_benchmark --browser-pool-size 0 --output no_pool_results.json
+    # 由 AIMD 控制器决定实际并发（并发度列表为发起发布的 worker 数）
+    python -m benchmarks.publish_benchmark --adaptive --concurrency 64 --output adaptive_results.json
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automation.browser_pool import close_browser_pool
+from app.automation.factory import AutomationFactory
+from app.automation.tracing import StepRecord
+from app.core.concurrency import automation_limiter, concurrency_controller
+from app.core.config import settings
+from app.core.logger import get_logger, log_exception
+from app.core.process_stats import process_tree_stats
+from benchmarks.fake_platforms import PLATFORM_PAGES, FakeLatency, FakePlatformSite
+from benchmarks.report import build_report, compare_with_baseline, percentile, write_report
+
+logger = get_logger(__name__)
+
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+
+COMPARE_METRICS = ("publishes_per_minute", "step_p95_ms", "publish_p95_ms", "peak_rss_mb", "peak_chromium_processes")
+
+
+class ResourceSampler:
+    """后台定时采样进程树，记录 RSS 和 Chromium 进程数的峰值"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak_rss_bytes = 0
+        self.peak_chromium_processes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        stats = process_tree_stats()
+        self.peak_rss_bytes = max(self.peak_rss_bytes, stats["rss_bytes"])
+        self.peak_chromium_processes = max(self.peak_chromium_processes, stats["chromium_processes"])
+
+    async def _run(self) -> None:
+        while True:
+            # /proc 遍历是阻塞IO，放到线程中执行
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+
+
+async def publish_once(platform: str, latency: FakeLatency, video_path: str, storage_dir: str,
+                       headless: bool) -> Dict[str, Any]:
+    """执行一次完整的发布流程，返回耗时、结果和步骤记录"""
+    automation = AutomationFactory.create(
+        platform, storage_state_path=os.path.join(storage_dir, f"{platform}_storage_state.json")
+    )
+    site = FakePlatformSite(platform, latency)
+    start = time.perf_counter()
+    success = False
+    try:
+        await automation.start(headless=headless)
+        await site.install(automation.context)
+        success = await automation.publish_video(video_path, "基准测试标题", "基准测试描述")
+    except Exception as e:
+        log_exception(logger, e, f"基准测试发布失败 - 平台: {platform}")
+    finally:
+        await automation.close()
+
+    return {
+        "success": success,
+        "duration_ms": (time.perf_counter() - start) * 1000,
+        "steps": list(automation.step_records),
+    }
+
+
+async def run_level(platform: str, concurrency: int, publishes_per_worker: int, latency: FakeLatency,
+                    video_path: str, storage_dir: str, headless: bool, adaptive: bool = False) -> Dict[str, Any]:
+    """在一个并发度下运行基准测试"""
+    logger.info(f"开始基准测试 - 平台: {platform}, 并发: {concurrency}, 每个worker发布: {publishes_per_worker}")
+    results: List[Dict[str, Any]] = []
+    if adaptive:
+        concurrency_controller.changes.clear()
+        concurrency_controller.start()
+    else:
+        # 固定并发：自适应上限不应成为瓶颈
+        automation_limiter.set_limit(concurrency)
+
+    async def worker():
+        for _ in range(publishes_per_worker):
+            results.append(await publish_once(platform, latency, video_path, storage_dir, headless))
+
+    sampler = ResourceSampler()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        wall_seconds = time.perf_counter() - start
+        await sampler.stop()
+        if adaptive:
+            await concurrency_controller.stop()
+
+    succeeded = sum(1 for result in results if result["success"])
+    step_durations: Dict[str, List[float]] = {}
+    all_steps: List[StepRecord] = [step for result in results for step in result["steps"]]
+    for step in all_steps:
+        step_durations.setdefault(step.step, []).append(step.duration_ms)
+
+    level = {
+        "platform": platform,
+        "concurrency": concurrency,
+        "publishes": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "wall_seconds": round(wall_seconds, 2),
+        "publishes_per_minute": round(succeeded / wall_seconds * 60, 2) if wall_seconds else 0,
+        "publish_p95_ms": percentile([result["duration_ms"] for result in results], 0.95),
+        "step_p95_ms": percentile([step.duration_ms for step in all_steps], 0.95),
+        "steps": {
+            name: {"count": len(durations), "p50_ms": percentile(durations, 0.5), "p95_ms": percentile(durations, 0.95)}
+            for name, durations in step_durations.items()
+        },
+        "peak_rss_mb": round(sampler.peak_rss_bytes / 1024 / 1024, 1),
+        "peak_chromium_processes": sampler.peak_chromium_processes,
+    }
+    if adaptive:
+        level["final_limit"] = automation_limiter.limit
+        level["limit_changes"] = list(concurrency_controller.changes)
+    logger.info(
+        f"基准测试完成 - 平台: {platform}, 并发: {concurrency}, 每分钟发布: {level['publishes_per_minute']}, "
+        f"步骤p95: {level['step_p95_ms']}ms, RSS峰值: {level['peak_rss_mb']}MB, "
+        f"Chromium进程峰值: {level['peak_chromium_processes']}"
+    )
+    return level
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    latency = FakeLatency(page_ms=args.page_ms, login_ms=args.login_ms,
+                          upload_ms=args.upload_ms, publish_ms=args.publish_ms)
+    platforms = args.platforms or [
+        name for name in AutomationFactory.get_supported_platforms() if name in PLATFORM_PAGES
+    ]
+
+    if args.browser_pool_size is not None:
+        settings.BROWSER_POOL_SIZE = args.browser_pool_size
+
+    with tempfile.TemporaryDirectory(prefix="linkmatrix_bench_") as work_dir:
+        video_path = os.path.join(work_dir, "video.mp4")
+        with open(video_path, "wb") as f:
+            f.write(os.urandom(args.video_kb * 1024))
+
+        results = []
+        try:
+            for platform in platforms:
+                for concurrency in args.concurrency:
+                    results.append(await run_level(platform, concurrency, args.publishes_per_worker, latency,
+                                                   video_path, work_dir, not args.headed, args.adaptive))
+        finally:
+            await close_browser_pool()
+
+    config = {
+        "platforms": platforms,
+        "concurrency": args.concurrency,
+        "publishes_per_worker": args.publishes_per_worker,
+        "latency_ms": vars(latency),
+        "video_kb": args.video_kb,
+        "browser_pool_size": settings.BROWSER_POOL_SIZE,
+        "adaptive": args.adaptive,
+    }
+    report = build_report(config, results)
+    if args.baseline:
+        report["comparison"] = compare_with_baseline(results, args.baseline, ("platform", "concurrency"),
+                                                     COMPARE_METRICS)
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="发布自动化离线基准测试")
+    parser.add_argument("--platforms", nargs="*", help="要测试的平台，默认为已注册且有页面替身的平台")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY, help="并发度列表")
+    parser.add_argument("--publishes-per-worker", type=int, default=2, help="每个worker执行的发布次数")
+    parser.add_argument("--page-ms", type=int, default=100, help="页面响应延迟（毫秒）")
+    parser.add_argument("--login-ms", type=int, default=200, help="登录跳转延迟（毫秒）")
+    parser.add_argument("--upload-ms", type=int, default=1000, help="上传耗时（毫秒）")
+    parser.add_argument("--publish-ms", type=int, default=300, help="发布耗时（毫秒）")
+    parser.add_argument("--video-kb", type=int, default=512, help="测试视频文件大小（KB）")
+    parser.add_argument("--headed", action="store_true", help="使用有头浏览器")
+    parser.add_argument("--adaptive", action="store_true", help="由自适应并发控制器决定同时运行的发布数")
+    parser.add_argument("--browser-pool-size", type=int, help="共享浏览器数，0 表示每个实例独立启动浏览器，默认 BROWSER_POOL_SIZE")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果JSON路径")
+    parser.add_argument("--baseline", help="上一次的结果JSON，用于对比")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    write_report(report, args.output)
+    logger.info(f"基准测试结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
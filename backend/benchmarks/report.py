@@ -0,0 +1,83 @@
+"""
+基准测试报告工具
+
+各基准测试的结果JSON格式一致：{"created_at", "environment", "config", "results": [...]}，
+results 中每一项由若干键字段（如平台、并发度）标识，可以与上一次的结果逐项对比。
+"""
+
+import json
+import math
+import os
+import platform
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """最近秩法计算分位数，保留一位小数"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 1)
+
+
+def environment() -> Dict[str, Any]:
+    """运行环境信息，便于判断两次结果是否可比"""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def build_report(config: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """组装结果报告"""
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline_path: str, keys: Iterable[str],
+                          metrics: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    与上一次的结果对比
+
+    Args:
+        results: 本次结果
+        baseline_path: 上一次的结果JSON路径
+        keys: 标识一项结果的键字段
+        metrics: 需要对比的指标
+
+    Returns:
+        每项结果各指标的 baseline/current/change（变化比例）
+    """
+    keys = tuple(keys)
+    metrics = tuple(metrics)
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {tuple(item.get(k) for k in keys): item for item in json.load(f)["results"]}
+
+    comparison = []
+    for item in results:
+        previous = baseline.get(tuple(item.get(k) for k in keys))
+        if not previous:
+            continue
+        row = {k: item.get(k) for k in keys}
+        for metric in metrics:
+            old, new = previous.get(metric), item.get(metric)
+            row[metric] = {
+                "baseline": old,
+                "current": new,
+                "change": round((new - old) / old, 3) if old and new is not None else None,
+            }
+        comparison.append(row)
+    return comparison
+
+
+def write_report(report: Dict[str, Any], output_path: str) -> None:
+    """写入结果JSON"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,108 @@
+"""
+标签倒排索引构建基准测试
+
+按不同的图片数（默认 10 万、50 万、100 万）生成随机 pic 行，测量：
+- 全量构建（load_rows）的总耗时和每行耗时
+- 用同样的行再同步一次（全量同步时行都没有变化）的每行耗时
+- 一次 AND-of-OR 查询的耗时
+
+每行耗时应与图片数无关；随图片数增长说明写入路径又在逐行复制整个位图。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.tag_index_benchmark --rows 100000 500000 1000000 --output tag_index_results.json
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.logger import get_logger
+from app.services.tag_index_service import TagIndex
+from benchmarks.report import build_report, compare_with_baseline, percentile, write_report
+
+logger = get_logger(__name__)
+
+COMPARE_METRICS = ("build_us_per_row", "resync_us_per_row", "query_p50_ms")
+
+
+def _rows(rng: random.Random, count: int, vocabulary: List[str], tags_per_row: int) -> List[Dict[str, Any]]:
+    return [
+        {"pid": pid, "tag": rng.sample(vocabulary, tags_per_row), "popularity": rng.random(),
+         "unfit": rng.random() < 0.02, "wx_name": "公众号A" if rng.random() < 0.1 else None}
+        for pid in range(1, count + 1)
+    ]
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    vocabulary = [f"tag{i}" for i in range(args.vocabulary)]
+
+    results = []
+    for count in args.rows:
+        rows = _rows(rng, count, vocabulary, args.tags_per_row)
+        index = TagIndex()
+        start = time.perf_counter()
+        index.load_rows(rows, batch_size=args.batch_size)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.load_rows(rows, batch_size=args.batch_size)
+        resync = time.perf_counter() - start
+
+        timings: List[float] = []
+        for _ in range(args.repeat):
+            groups = [rng.sample(vocabulary, 2), rng.sample(vocabulary, 1)]
+            start = time.perf_counter()
+            index.match(groups, exclude=rng.sample(vocabulary, 1), min_popularity=0.5,
+                        exclude_used_by="公众号A")
+            timings.append((time.perf_counter() - start) * 1000)
+            index._term_cache.clear()
+
+        results.append({
+            "rows": count,
+            "build_s": round(build, 2),
+            "build_us_per_row": round(build * 1e6 / count, 1),
+            "resync_us_per_row": round(resync * 1e6 / count, 1),
+            "query_p50_ms": percentile(timings, 0.5),
+            "query_p95_ms": percentile(timings, 0.95),
+        })
+        logger.info(
+            f"{count} 行: 构建 {results[-1]['build_s']}s（{results[-1]['build_us_per_row']}us/行）, "
+            f"重复同步 {results[-1]['resync_us_per_row']}us/行, 查询 p50 {results[-1]['query_p50_ms']}ms"
+        )
+
+    config = {"rows": args.rows, "vocabulary": args.vocabulary, "tags_per_row": args.tags_per_row,
+              "batch_size": args.batch_size, "repeat": args.repeat}
+    report = build_report(config, results)
+    if args.baseline:
+        report["comparison"] = compare_with_baseline(results, args.baseline, ("rows",), COMPARE_METRICS)
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="标签倒排索引构建基准测试")
+    parser.add_argument("--rows", nargs="+", type=int, default=[100_000, 500_000, 1_000_000], help="图片数")
+    parser.add_argument("--vocabulary", type=int, default=2000, help="标签总数")
+    parser.add_argument("--tags-per-row", type=int, default=8, help="每张图片的标签数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="load_rows 每批行数")
+    parser.add_argument("--repeat", type=int, default=20, help="查询重复次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="tag_index_results.json", help="结果JSON路径")
+    parser.add_argument("--baseline", help="上一次的结果JSON，用于对比")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    write_report(report, args.output)
+    logger.info(f"基准测试结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+账户激活会话测试
+
+用假的平台自动化类代替真实浏览器，检查：
+- 激活接口立即返回会话，登录等待在后台进行
+- SSE 推送完整的状态变化，结束后回写账户状态
+- 同时打开的浏览器数量受限，超出的会话排队
+- 登录检测超时、没有检测结果或页面关闭时会话失败，账户不会被标记为已激活
+- 通过接口或在其他线程取消进行中的会话，会话立即结束
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.automation.base import BrowserAutomationBase, LoginDetection
+from app.automation.factory import AutomationFactory
+from app.core.config import settings
+from app.database.migrations import run_migrations
+from app.database.session import get_db
+from app.models.models import Account, BrowserProfile
+from app.services import account_service
+from app.services.activation_service import (
+    CANCELLED,
+    FAILED,
+    QUEUED,
+    TIMEOUT,
+    WAITING_LOGIN,
+    ActivationManager,
+    ActivationRequest,
+)
+
+
+class FakePage:
+    url = "https://fake.example.com/login"
+
+    def __init__(self):
+        self.main_frame = object()
+
+    async def goto(self, url):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+
+class FakeContext(FakePage):
+    async def cookies(self):
+        return []
+
+
+class FakeAutomation(BrowserAutomationBase):
+    """登录完成时机由测试通过 login_done 控制，检测结果为 detection"""
+    login_done: asyncio.Event = None
+    detection = LoginDetection(reason="cookie", logged_in=True)
+    started = 0
+
+    async def start(self, headless: bool = True) -> None:
+        FakeAutomation.started += 1
+        self.page = FakePage()
+        self.context = FakeContext()
+
+    def get_login_url(self) -> str:
+        return "https://fake.example.com/login"
+
+    async def wait_for_login_completion(self) -> LoginDetection:
+        await FakeAutomation.login_done.wait()
+        return FakeAutomation.detection
+
+    async def save_login_state(self) -> None:
+        pass
+
+    async def check_login_status(self) -> dict:
+        return {"is_logged_in": True}
+
+    async def login(self, username: str, password: str) -> bool:
+        return True
+
+    async def publish_video(self, video_path: str, title: str, description: str) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+class DetectingAutomation(FakeAutomation):
+    """使用真实的 detect_login 等待登录事件，用户始终没有登录"""
+    LOGIN_COOKIES = ("sessionid",)
+
+    async def wait_for_login_completion(self) -> LoginDetection:
+        return await self.detect_login(save_state=False)
+
+
+@pytest.fixture()
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    profile = BrowserProfile(name="profile", storage_path="./storage_state.json")
+    db.add(profile)
+    db.flush()
+    db.add(Account(platform="fake", name="account", username="user", browser_profile_id=profile.id,
+                   status="inactive"))
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    AutomationFactory.register_platform("fake", FakeAutomation)
+    monkeypatch.setattr(account_service, "SessionLocal", Session)
+    app.dependency_overrides[get_db] = override_get_db
+    yield Session
+    app.dependency_overrides.pop(get_db, None)
+    AutomationFactory._platforms.pop("fake", None)
+    AutomationFactory._platforms.pop("detecting", None)
+
+
+def test_activation_returns_immediately_and_streams_progress(session_factory):
+    async def scenario():
+        FakeAutomation.login_done = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(f"{settings.API_PREFIX}/accounts/1/activate")
+            assert response.status_code == 202
+            session = response.json()
+            await asyncio.sleep(0.05)
+
+            status = await client.get(f"{settings.API_PREFIX}/accounts/activation-sessions/{session['session_id']}")
+            assert status.json()["status"] == WAITING_LOGIN
+
+            # 同一账户重复激活返回同一会话
+            again = await client.post(f"{settings.API_PREFIX}/accounts/1/activate")
+            assert again.json()["session_id"] == session["session_id"]
+
+            FakeAutomation.login_done.set()
+            events = await client.get(
+                f"{settings.API_PREFIX}/accounts/activation-sessions/{session['session_id']}/events"
+            )
+            return events.text
+
+    body = asyncio.run(scenario())
+    statuses = [json.loads(line[len("data: "):])["status"] for line in body.splitlines() if line.startswith("data: ")]
+    assert statuses == ["queued", "launching", "waiting_login", "saving", "completed"]
+
+    db = session_factory()
+    account = db.query(Account).first()
+    assert account.status == "active"
+    assert account.last_login is not None
+    db.close()
+
+
+def test_cancel_running_session_through_route(session_factory):
+    async def scenario():
+        FakeAutomation.login_done = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(f"{settings.API_PREFIX}/accounts/1/activate")
+            session_id = response.json()["session_id"]
+            await asyncio.sleep(0.05)
+
+            cancelled = await client.delete(f"{settings.API_PREFIX}/accounts/activation-sessions/{session_id}")
+            assert cancelled.status_code == 200
+            # 登录一直没有完成，会话只能因取消而结束
+            events = await asyncio.wait_for(
+                client.get(f"{settings.API_PREFIX}/accounts/activation-sessions/{session_id}/events"), timeout=2
+            )
+            missing = await client.delete(f"{settings.API_PREFIX}/accounts/activation-sessions/missing")
+            return events.text, missing.status_code
+
+    body, missing = asyncio.run(scenario())
+    statuses = [json.loads(line[len("data: "):])["status"] for line in body.splitlines() if line.startswith("data: ")]
+    assert statuses[-1] == CANCELLED
+    assert missing == 404
+    db = session_factory()
+    assert db.query(Account).first().status != "active"
+    db.close()
+
+
+def test_cancel_from_another_thread_wakes_the_event_loop():
+    manager = ActivationManager(max_browsers=1)
+    AutomationFactory.register_platform("fake", FakeAutomation)
+
+    async def scenario():
+        FakeAutomation.login_done = asyncio.Event()
+        session = manager.start(ActivationRequest(account_id=1, platform="fake", storage_state_path="./state.json"))
+        await asyncio.sleep(0.05)
+        assert session.status == WAITING_LOGIN
+        # 事件循环空闲地等待最多 2 秒，只有取消能提前唤醒它
+        started = time.monotonic()
+        threading.Timer(0.05, manager.cancel, args=(session.session_id,)).start()
+        await asyncio.wait({session.task}, timeout=2)
+        return session, time.monotonic() - started
+
+    try:
+        session, elapsed = asyncio.run(scenario())
+    finally:
+        AutomationFactory._platforms.pop("fake", None)
+    assert session.status == CANCELLED
+    assert elapsed < 1
+
+
+def test_browser_count_is_bounded(session_factory):
+    async def scenario():
+        FakeAutomation.login_done = asyncio.Event()
+        FakeAutomation.started = 0
+        manager = ActivationManager(max_browsers=2, timeout=5)
+        sessions = [
+            manager.start(ActivationRequest(account_id=i, platform="fake", storage_state_path="./state.json"))
+            for i in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        waiting = [s.status for s in sessions]
+        started = FakeAutomation.started
+
+        FakeAutomation.login_done.set()
+        await asyncio.gather(*(s.task for s in sessions))
+        return waiting, started, [s.status for s in sessions]
+
+    waiting, started, final = asyncio.run(scenario())
+    assert started == 2
+    assert waiting.count(WAITING_LOGIN) == 2
+    assert waiting.count(QUEUED) == 3
+    assert final == ["completed"] * 5
+
+
+@pytest.mark.parametrize("platform, detection, done, status", [
+    ("detecting", None, False, TIMEOUT),  # detect_login 一直没有结果，ACTIVATION_TIMEOUT 到期
+    ("fake", None, True, FAILED),  # 返回了但没有检测结果
+    ("fake", LoginDetection(reason="page_closed", logged_in=False), True, FAILED),
+])
+def test_activation_without_login_is_not_completed(session_factory, monkeypatch, platform, detection, done, status):
+    AutomationFactory.register_platform("detecting", DetectingAutomation)
+    monkeypatch.setattr(FakeAutomation, "detection", detection)
+    saved = []
+
+    async def save_login_state(self):
+        saved.append(self)
+
+    monkeypatch.setattr(FakeAutomation, "save_login_state", save_login_state)
+
+    async def scenario():
+        FakeAutomation.login_done = asyncio.Event()
+        if done:
+            FakeAutomation.login_done.set()
+        manager = ActivationManager(max_browsers=1, timeout=0.05)
+        finished = []
+
+        async def on_finish(session):
+            finished.append(session.status)
+            await account_service._finish_activation(session)
+
+        session = manager.start(ActivationRequest(account_id=1, platform=platform, storage_state_path="./state.json"),
+                                on_finish=on_finish)
+        await session.task
+        return session, finished
+
+    session, finished = asyncio.run(scenario())
+    assert session.status == status and finished == [status]
+    assert saved == []
+    db = session_factory()
+    assert db.query(Account).first().status == "need_activation"
+    db.close()
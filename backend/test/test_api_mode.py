@@ -0,0 +1,146 @@
+"""
+API 模式发布测试
+
+用 benchmarks/fake_upload_api.py 的接口替身（按录制交互回放）代替平台接口，检查：
+- Cookie 取自存储状态，分片并行上传，内容完整，不启动浏览器
+- 响应与录制不一致、缺少Cookie或初始化/合并请求网络出错时回退浏览器流程
+- 发布请求发出后失败不回退
+- AutomationFactory 按平台选择模式
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+
+from app.automation.api_mode import cookies_from_storage_state
+from app.automation.factory import AutomationFactory
+from app.automation.storage_state import storage_state_store
+from app.core.config import settings
+from benchmarks.fake_upload_api import FakeUploadApi
+
+
+def logged_in_state(with_csrf=True):
+    cookies = [
+        {"name": "sessionid", "value": "s1", "domain": ".douyin.com", "path": "/", "expires": time.time() + 3600},
+        {"name": "expired", "value": "x", "domain": ".douyin.com", "path": "/", "expires": time.time() - 10},
+        {"name": "other", "value": "y", "domain": ".example.com", "path": "/", "expires": -1},
+    ]
+    if with_csrf:
+        cookies.append({"name": "passport_csrf_token", "value": "csrf", "domain": "creator.douyin.com",
+                        "path": "/", "expires": -1})
+    return {"cookies": cookies, "origins": []}
+
+
+def make_automation(tmp_path, api, state=None, mode="api"):
+    path = str(tmp_path / "storage_state.json")
+    storage_state_store.save(path, state or logged_in_state())
+    automation = AutomationFactory.create("douyin", storage_state_path=path, mode=mode)
+    automation.api_transport = httpx.ASGITransport(app=api.app)
+    automation.browser_publishes = 0
+
+    async def start(headless=True):
+        automation.page = object()
+
+    async def publish_video(video_path, title, description):
+        automation.browser_publishes += 1
+        return True
+
+    automation.start = start
+    automation.publish_video = publish_video
+    return automation
+
+
+@pytest.fixture()
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(262144 * 5 + 1000))
+    return str(path)
+
+
+def test_cookies_from_storage_state():
+    cookies = cookies_from_storage_state(logged_in_state(), "creator.douyin.com")
+    assert cookies == {"sessionid": "s1", "passport_csrf_token": "csrf"}
+
+
+def test_api_upload_in_parallel_without_browser(tmp_path, video):
+    api = FakeUploadApi("douyin", chunk_delay=0.02)
+    automation = make_automation(tmp_path, api)
+    progress = []
+
+    async def on_progress(value):
+        progress.append(value)
+
+    automation.bind_task(1, on_progress=on_progress)
+    assert asyncio.run(automation.publish(video, "标题", "描述")) is True
+
+    assert automation.page is None
+    assert automation.browser_publishes == 0
+    with open(video, "rb") as f:
+        assert api.uploaded_bytes() == f.read()
+    assert api.peak_concurrent_chunks > 1
+    assert api.published == [{"video_id": api.published[0]["video_id"], "title": "标题", "description": "描述"}]
+    assert progress[-1] == 100
+    assert [record.step for record in automation.step_records] == ["api_upload", "api_publish"]
+
+
+@pytest.mark.parametrize("api_options,state", [
+    ({"drop_field": "upload_id"}, None),
+    ({"fail_step": "chunk"}, None),
+    ({}, logged_in_state(with_csrf=False)),
+])
+def test_mismatch_falls_back_to_browser(tmp_path, video, api_options, state):
+    api = FakeUploadApi("douyin", **api_options)
+    automation = make_automation(tmp_path, api, state=state)
+
+    assert asyncio.run(automation.publish(video, "标题", "描述")) is True
+    assert automation.browser_publishes == 1
+    assert api.published == []
+
+
+class FailingTransport(httpx.AsyncBaseTransport):
+    """指定路径的请求抛出网络错误，其余转发给接口替身"""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+
+    async def handle_async_request(self, request):
+        if request.url.path == self.path:
+            raise httpx.ConnectError("connection reset", request=request)
+        return await self.inner.handle_async_request(request)
+
+
+@pytest.mark.parametrize("step", ["init_path", "complete_path"])
+def test_network_error_on_init_or_complete_falls_back(tmp_path, video, step):
+    api = FakeUploadApi("douyin")
+    automation = make_automation(tmp_path, api)
+    path = getattr(automation.API_UPLOAD_SPEC, step)
+    automation.api_transport = FailingTransport(automation.api_transport, path)
+
+    assert asyncio.run(automation.publish(video, "标题", "描述")) is True
+    assert automation.browser_publishes == 1
+    assert api.published == []
+
+
+def test_failure_after_publish_request_does_not_fall_back(tmp_path, video):
+    api = FakeUploadApi("douyin", fail_step="publish")
+    automation = make_automation(tmp_path, api)
+
+    assert asyncio.run(automation.publish(video, "标题", "描述")) is False
+    assert automation.browser_publishes == 0
+
+
+def test_factory_selects_mode_per_platform(tmp_path, monkeypatch):
+    path = str(tmp_path / "storage_state.json")
+    assert AutomationFactory.create("douyin", storage_state_path=path).api_mode is False
+
+    monkeypatch.setattr(settings, "API_MODE_PLATFORMS", ["douyin"])
+    assert AutomationFactory.create("douyin", storage_state_path=path).api_mode is True
+    assert AutomationFactory.create("douyin", storage_state_path=path, mode="browser").api_mode is False
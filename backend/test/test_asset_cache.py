@@ -0,0 +1,174 @@
+"""
+静态资源共享缓存测试
+
+用假的 Route / Request / Response 对象驱动请求拦截，检查缓存策略、跨上下文命中、
+并发未命中只下载一次、内容寻址去重、LRU 淘汰和重启后从索引恢复。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automation.asset_cache import AssetCache, cache_ttl, is_fingerprinted, is_static_url
+from app.core.config import settings
+
+BUNDLE = "https://lf-cdn.example.com/obj/static/main.3f2a1b9c.js"
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type="script", method="GET", headers=None):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+        self.headers = headers or {}
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class Origin:
+    """模拟源站，记录下载次数"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fetches = 0
+        self.resources = {}
+
+    def add(self, url, body, cache_control="public, max-age=31536000"):
+        self.resources[url] = (body, {"Content-Type": "application/javascript", "Cache-Control": cache_control,
+                                      "Content-Encoding": "gzip"})
+
+
+class FakeRoute:
+    def __init__(self, origin, request):
+        self.origin = origin
+        self.request = request
+        self.fulfilled = None
+        self.fell_back = False
+
+    async def fetch(self):
+        self.origin.fetches += 1
+        await asyncio.sleep(self.origin.delay)
+        body, headers = self.origin.resources[self.request.url]
+        return FakeResponse(200, headers, body)
+
+    async def fulfill(self, status=None, headers=None, body=None, response=None):
+        self.fulfilled = {"status": status or response.status, "headers": headers, "body": body,
+                          "from_network": response is not None}
+
+    async def fallback(self):
+        self.fell_back = True
+
+
+async def request(cache, origin, url, **kwargs):
+    route = FakeRoute(origin, FakeRequest(url, **kwargs))
+    await cache.handle(route)
+    return route
+
+
+def test_cache_policy():
+    assert is_static_url(BUNDLE) and not is_static_url("https://creator.douyin.com/upload")
+    assert is_fingerprinted(BUNDLE) and is_fingerprinted("https://s.example.com/static/9f86d081/app.css")
+    assert not is_fingerprinted("https://s.example.com/static/app.css")
+
+    assert cache_ttl(BUNDLE, 200, {}) == settings.ASSET_CACHE_MAX_TTL
+    assert cache_ttl("https://s.example.com/app.css", 200, {"cache-control": "max-age=31536000, immutable"}) \
+        == settings.ASSET_CACHE_MAX_TTL
+    assert cache_ttl("https://s.example.com/app.css", 200, {"cache-control": "max-age=86400"}) == 86400
+    assert cache_ttl("https://s.example.com/app.css", 200, {"cache-control": "max-age=60"}) is None
+    assert cache_ttl("https://s.example.com/app.css", 200, {}) is None
+    assert cache_ttl(BUNDLE, 200, {"cache-control": "no-store"}) is None
+    assert cache_ttl(BUNDLE, 200, {"cache-control": "private, max-age=31536000"}) is None
+    assert cache_ttl(BUNDLE, 200, {"cache-control": "max-age=0"}) is None
+    # 明确的 max-age / s-maxage 限制指纹资源和 immutable 的缓存时长
+    assert cache_ttl("https://s.example.com/obj/20241019/app.js", 200, {"cache-control": "max-age=60"}) == 60
+    assert cache_ttl(BUNDLE, 200, {"cache-control": "max-age=600, s-maxage=7200"}) == 7200
+    assert cache_ttl("https://s.example.com/app.css", 200, {"cache-control": "max-age=120, immutable"}) == 120
+    assert cache_ttl(BUNDLE, 206, {}) is None
+    assert cache_ttl(BUNDLE, 200, {"set-cookie": "a=1"}) is None
+
+
+def test_contexts_share_cached_assets(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=1024 * 1024)
+    origin = Origin()
+    origin.add(BUNDLE, b"console.log(1);" * 100)
+
+    async def scenario():
+        first = await request(cache, origin, BUNDLE)
+        second = await request(cache, origin, BUNDLE)
+        document = await request(cache, origin, "https://creator.douyin.com/a.js", resource_type="document")
+        post = await request(cache, origin, BUNDLE, method="POST")
+        ranged = await request(cache, origin, BUNDLE, headers={"range": "bytes=0-10"})
+        return first, second, document, post, ranged
+
+    first, second, document, post, ranged = asyncio.run(scenario())
+    assert first.fulfilled["from_network"] and not second.fulfilled["from_network"]
+    assert second.fulfilled["body"] == b"console.log(1);" * 100
+    assert second.fulfilled["headers"] == {"content-type": "application/javascript",
+                                           "cache-control": "public, max-age=31536000"}
+    assert document.fell_back and post.fell_back and ranged.fell_back
+    assert origin.fetches == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_ratio"] == 0.5
+    assert stats["bytes_saved"] == 1500
+    cache.close()
+
+
+def test_concurrent_misses_download_once(tmp_path):
+    cache = AssetCache(str(tmp_path))
+    origin = Origin(delay=0.05)
+    origin.add(BUNDLE, b"x" * 4096)
+
+    async def scenario():
+        return await asyncio.gather(*(request(cache, origin, BUNDLE) for _ in range(8)))
+
+    routes = asyncio.run(scenario())
+    assert origin.fetches == 1
+    assert all(route.fulfilled["body"] == b"x" * 4096 for route in routes)
+    assert cache.stats()["hits"] == 7
+    cache.close()
+
+
+def test_content_addressed_lru_eviction_and_reload(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=3000)
+    origin = Origin()
+    urls = [f"https://s.example.com/chunk-{i:08x}.js" for i in range(4)]
+    origin.add(urls[0], b"a" * 1000)
+    origin.add(urls[1], b"a" * 1000)  # 与 urls[0] 内容相同
+    origin.add(urls[2], b"b" * 1000)
+    origin.add(urls[3], b"c" * 1500)
+
+    async def scenario():
+        for url in urls[:3]:
+            await request(cache, origin, url)
+        assert cache.stats()["blobs"] == 2 and cache.total_bytes == 2000
+        # 访问 urls[2]，使 urls[0]/urls[1] 成为最久未访问
+        await request(cache, origin, urls[2])
+        await request(cache, origin, urls[3])
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert stats["evictions"] == 2 and stats["entries"] == 2 and cache.total_bytes == 2500
+    assert len([name for _, _, files in os.walk(tmp_path / "objects") for name in files]) == 2
+    cache.close()
+
+    reopened = AssetCache(str(tmp_path), max_bytes=3000)
+    assert reopened.stats()["entries"] == 2
+
+    async def hit_after_restart():
+        return await request(reopened, origin, urls[3])
+
+    fetches = origin.fetches
+    route = asyncio.run(hit_after_restart())
+    assert not route.fulfilled["from_network"] and origin.fetches == fetches
+    reopened.close()
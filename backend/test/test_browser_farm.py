@@ -0,0 +1,230 @@
+"""
+浏览器农场测试
+
+用假的浏览器服务启动器代替 launch-server，检查全局预算（浏览器数、上下文数、内存）、排队与超时、
+浏览器退出和空闲回收，以及通过本地 TCP 协议租用/归还、客户端断开自动归还和 RemoteBrowserPool。
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.automation.browser_farm import (
+    BrowserFarm,
+    FarmBudget,
+    FarmBusy,
+    FarmClient,
+    FarmServer,
+    LaunchedServer,
+    RemoteBrowserPool,
+    farm_stats,
+)
+from app.automation.browser_pool import PROXY_DIRECT
+
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+        self.exited = asyncio.Event()
+
+    async def wait(self):
+        await self.exited.wait()
+        return self.returncode
+
+    def terminate(self):
+        self.exit()
+
+    def kill(self):
+        self.exit()
+
+    def exit(self, code=0):
+        self.returncode = code
+        self.exited.set()
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.servers = []
+        self._pids = itertools.count(1000)
+
+    async def launch(self, headless):
+        pid = next(self._pids)
+        server = LaunchedServer(ws_endpoint=f"ws://127.0.0.1:{pid}/farm", pid=pid, process=FakeProcess())
+        server.headless = headless
+        self.servers.append(server)
+        return server
+
+
+def make_farm(rss=lambda pid: 100 * 1024 * 1024, idle_timeout=300, **budget):
+    launcher = FakeLauncher()
+    farm = BrowserFarm(FarmBudget(**budget), launcher=launcher, rss_sampler=rss, idle_timeout=idle_timeout)
+    return farm, launcher
+
+
+def test_leases_spread_and_wait_for_budget():
+    farm, launcher = make_farm(max_browsers=2, max_contexts_per_browser=2, max_contexts=3, memory_budget_mb=0)
+
+    async def scenario():
+        leases = [await farm.lease("a") for _ in range(3)]
+        waiter = asyncio.create_task(farm.lease("b", timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and farm.stats()["waiting"] == 1
+        await farm.release(leases[0].lease_id, "a")
+        fourth = await waiter
+        with pytest.raises(FarmBusy):
+            await farm.lease("b", timeout=0.05)
+        return leases, fourth
+
+    leases, fourth = asyncio.run(scenario())
+    assert len(launcher.servers) == 2
+    assert {lease.ws_endpoint for lease in leases[:2]} == {s.ws_endpoint for s in launcher.servers}
+    assert fourth.browser_id == leases[0].browser_id
+    stats = farm.stats()
+    assert stats["leases"] == 3 and stats["leases_granted"] == 4 and stats["leases_rejected"] == 1
+    assert sorted(b["leases"] for b in stats["browsers"]) == [1, 2]
+
+
+def test_memory_budget_blocks_new_leases():
+    usage = {"rss": 100 * 1024 * 1024}
+    farm, _ = make_farm(rss=lambda pid: usage["rss"], max_browsers=2, memory_budget_mb=500)
+
+    async def scenario():
+        first = await farm.lease("a")
+        usage["rss"] = 600 * 1024 * 1024
+        await farm.maintain()
+        with pytest.raises(FarmBusy):
+            await farm.lease("a", timeout=0)
+        waiter = asyncio.create_task(farm.lease("a", timeout=5))
+        await asyncio.sleep(0.02)
+        usage["rss"] = 200 * 1024 * 1024
+        await farm.maintain()
+        return first, await waiter
+
+    first, second = asyncio.run(scenario())
+    assert farm.stats()["rss_mb"] > 0 and farm.stats()["leases"] == 2
+
+
+def test_exited_and_idle_browsers_leave_the_farm():
+    farm, launcher = make_farm(max_browsers=2, idle_timeout=0)
+
+    async def scenario():
+        crashed = await farm.lease("a")
+        launcher.servers[0].process.exit(1)
+        await asyncio.sleep(0.01)
+        assert farm.stats()["leases"] == 0 and farm.stats()["browsers_exited"] == 1
+        idle = await farm.lease("a", headless=False)
+        await farm.release(idle.lease_id)
+        await farm.maintain()
+        return crashed
+
+    asyncio.run(scenario())
+    assert farm.stats()["browsers"] == []
+    assert launcher.servers[1].process.returncode == 0
+
+
+def test_headed_request_reclaims_idle_headless_browser():
+    farm, launcher = make_farm(max_browsers=1)
+
+    async def scenario():
+        lease = await farm.lease("a")
+        await farm.release(lease.lease_id)
+        return await farm.lease("a", headless=False)
+
+    headed = asyncio.run(scenario())
+    assert launcher.servers[0].process.returncode == 0
+    assert headed.ws_endpoint == launcher.servers[1].ws_endpoint and launcher.servers[1].headless is False
+
+
+class FakeRemoteContext:
+    def __init__(self, options):
+        self.options = options
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeRemoteBrowser:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def on(self, event, handler):
+        pass
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **options):
+        return FakeRemoteContext(options)
+
+    async def close(self):
+        pass
+
+
+class FakeChromium:
+    def __init__(self):
+        self.connects = []
+
+    async def connect(self, endpoint):
+        self.connects.append(endpoint)
+        return FakeRemoteBrowser(endpoint)
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def stop(self):
+        pass
+
+
+def test_workers_lease_over_local_socket():
+    farm, launcher = make_farm(max_browsers=1, max_contexts=4)
+
+    async def scenario():
+        server = FarmServer(farm, "127.0.0.1", 0)
+        await server.start()
+        address = f"127.0.0.1:{server.port}"
+        playwright = FakePlaywright()
+
+        async def factory():
+            return playwright
+
+        pool = RemoteBrowserPool(FarmClient(address), playwright_factory=factory)
+        other = FarmClient(address)
+        try:
+            proxy = {"server": "http://10.0.0.1:8000", "username": "u", "password": "p"}
+            first = await pool.new_context(proxy=proxy, viewport={"width": 1, "height": 1})
+            second = await pool.new_context()
+            leased = [await other.lease() for _ in range(2)]
+            stats = await asyncio.to_thread(farm_stats, address)
+            assert stats["leases"] == 4 and stats["clients"] == 2
+
+            with pytest.raises(FarmBusy):
+                await other.lease(timeout=0)
+            # 连接断开后农场归还该 worker 的全部租约
+            await other.close()
+            await asyncio.sleep(0.05)
+            assert farm.stats()["leases"] == 2
+
+            await pool.release(first)
+            assert first.closed and farm.stats()["leases"] == 1
+            return first, second, playwright, pool.stats(), leased
+        finally:
+            await pool.close()
+            await server.close()
+
+    first, second, playwright, pool_stats, leased = asyncio.run(scenario())
+    assert first.options["proxy"]["server"] == "http://10.0.0.1:8000"
+    assert first.options["viewport"] == {"width": 1, "height": 1}
+    assert second.options["proxy"] == PROXY_DIRECT
+    # 同一浏览器服务只连接一次
+    assert playwright.chromium.connects == [launcher.servers[0].ws_endpoint]
+    assert pool_stats["contexts"] == 1 and pool_stats["connections"] == 1
+    assert farm.stats()["leases"] == 0
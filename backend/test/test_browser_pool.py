@@ -0,0 +1,236 @@
+"""
+共享浏览器池测试
+
+用假的 Playwright 对象代替 Chromium，检查上下文按账户代理创建、浏览器数不超过上限、
+上下文分配到负载最低的浏览器（含并发创建）、浏览器断开后重新启动，以及自动化实例的 start()/close() 走浏览器池。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automation import base as automation_base
+from app.automation.browser_pool import PER_CONTEXT_PROXY, PROXY_DIRECT, BrowserPool
+from app.automation.douyin import DouyinAutomation
+
+
+class FakeContext:
+    def __init__(self, browser, options):
+        self.browser = browser
+        self.options = options
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, options):
+        self.options = options
+        self.contexts = []
+        self.connected = True
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = FakeContext(self, options)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+    def crash(self):
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+
+class FakeChromium:
+    def __init__(self):
+        self.browsers = []
+
+    async def launch(self, **options):
+        browser = FakeBrowser(options)
+        self.browsers.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+        self.stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+def make_pool(size=2):
+    playwright = FakePlaywright()
+
+    async def factory():
+        return playwright
+
+    return BrowserPool(size=size, playwright_factory=factory), playwright
+
+
+def proxy(port):
+    return {"server": f"http://10.0.0.1:{port}", "username": f"user{port}", "password": "secret"}
+
+
+def test_contexts_get_their_own_proxy_on_few_browsers():
+    pool, playwright = make_pool(size=2)
+
+    async def scenario():
+        contexts = [await pool.new_context(proxy=proxy(8000 + i), viewport={"width": 1, "height": 1})
+                    for i in range(10)]
+        contexts.append(await pool.new_context())
+        return contexts
+
+    contexts = asyncio.run(scenario())
+    browsers = playwright.chromium.browsers
+    assert len(browsers) == 2
+    assert all(b.options["proxy"] == PER_CONTEXT_PROXY and b.options["headless"] for b in browsers)
+    assert [c.options["proxy"] for c in contexts[:10]] == [proxy(8000 + i) for i in range(10)]
+    assert contexts[10].options["proxy"] == PROXY_DIRECT
+    assert contexts[0].options["viewport"] == {"width": 1, "height": 1}
+    # 上下文均匀分配
+    assert sorted(len(b.contexts) for b in browsers) == [5, 6]
+    assert pool.stats()["contexts"] == 11
+
+
+class SlowBrowser(FakeBrowser):
+    """new_context 需要等待，并发创建时多个请求同时处于创建中"""
+
+    fail_next = False
+
+    async def new_context(self, **options):
+        await asyncio.sleep(0.01)
+        if SlowBrowser.fail_next:
+            SlowBrowser.fail_next = False
+            raise RuntimeError("Target closed")
+        return await super().new_context(**options)
+
+
+def test_concurrent_contexts_spread_across_browsers(monkeypatch):
+    pool, playwright = make_pool(size=3)
+
+    async def launch(**options):
+        browser = SlowBrowser(options)
+        playwright.chromium.browsers.append(browser)
+        return browser
+
+    monkeypatch.setattr(playwright.chromium, "launch", launch)
+
+    async def scenario():
+        contexts = await asyncio.gather(*(pool.new_context(proxy=proxy(i)) for i in range(9)))
+        SlowBrowser.fail_next = True
+        try:
+            await pool.new_context(proxy=proxy(99))
+        except RuntimeError:
+            pass
+        return contexts
+
+    contexts = asyncio.run(scenario())
+    assert len(contexts) == 9
+    assert sorted(len(b.contexts) for b in playwright.chromium.browsers) == [3, 3, 3]
+    # 创建失败后预占的名额归还
+    assert [b.pending for b in pool._browsers] == [0, 0, 0]
+    assert pool.stats()["contexts"] == 9
+
+
+def test_headed_and_headless_use_separate_browsers_and_release_rebalances():
+    pool, playwright = make_pool(size=1)
+
+    async def scenario():
+        headless = await pool.new_context(proxy=proxy(1))
+        headed = await pool.new_context(headless=False, proxy=proxy(2))
+        await pool.release(headless)
+        again = await pool.new_context(proxy=proxy(3))
+        return headless, headed, again
+
+    headless, headed, again = asyncio.run(scenario())
+    assert headless.closed and not headed.closed
+    assert headless.browser is again.browser and headed.browser is not headless.browser
+    assert len(playwright.chromium.browsers) == 2
+    stats = pool.stats()
+    assert {b["headless"]: b["contexts"] for b in stats["browsers"]} == {True: 1, False: 1}
+
+
+def test_crashed_browser_is_replaced():
+    pool, playwright = make_pool(size=1)
+
+    async def scenario():
+        first = await pool.new_context(proxy=proxy(1))
+        first.browser.crash()
+        second = await pool.new_context(proxy=proxy(2))
+        await pool.release(first)
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.browser is not second.browser
+    assert pool.stats()["browsers_crashed"] == 1 and pool.stats()["browsers_launched"] == 2
+    assert playwright.stopped and not second.browser.connected
+
+
+def test_automation_start_uses_shared_pool(tmp_path, monkeypatch):
+    pool, playwright = make_pool(size=1)
+    monkeypatch.setattr(automation_base, "get_browser_pool", lambda: pool)
+
+    async def scenario():
+        automations = []
+        for i in range(3):
+            automation = DouyinAutomation("douyin", str(tmp_path / f"state_{i}.json"), proxy=proxy(9000 + i))
+            automation.use_browser_pool = True
+            await automation.start(headless=True)
+            automations.append(automation)
+        contexts = [a.context for a in automations]
+        for automation in automations:
+            await automation.close()
+        return automations, contexts
+
+    automations, contexts = asyncio.run(scenario())
+    assert len(playwright.chromium.browsers) == 1
+    assert [c.options["proxy"] for c in contexts] == [proxy(9000 + i) for i in range(3)]
+    assert all(c.closed for c in contexts)
+    assert automations[0].browser is None and automations[0].playwright is None
+    assert pool.stats()["contexts"] == 0
+
+
+def test_close_releases_pooled_context_when_page_close_fails(tmp_path, monkeypatch):
+    pool, playwright = make_pool(size=1)
+    monkeypatch.setattr(automation_base, "get_browser_pool", lambda: pool)
+
+    async def crashed_close(self):
+        raise RuntimeError("Target page, context or browser has been closed")
+
+    async def scenario():
+        automation = DouyinAutomation("douyin", str(tmp_path / "state.json"), proxy=proxy(1))
+        automation.use_browser_pool = True
+        await automation.start(headless=True)
+        await pool.drain(pool._browsers[0], "test")
+        monkeypatch.setattr(FakePage, "close", crashed_close)
+        await automation.close()
+        return automation
+
+    automation = asyncio.run(scenario())
+    assert automation.context.closed
+    # 排空中的浏览器在上下文归还后关闭
+    assert not playwright.chromium.browsers[0].connected
+    assert pool.stats()["contexts"] == 0 and pool.stats()["browsers_restarted"] == 1
@@ -0,0 +1,242 @@
+"""
+浏览器内存看门狗测试
+
+用带假 CDP 会话的 Playwright 对象代替 Chromium，检查浏览器按累计上下文数、进程树 RSS、上下文 JS 堆排空后重启，
+排空期间已有上下文不受影响、新上下文分配到新浏览器，重启计入指标；以及浏览器农场按租约数和 RSS 排空。
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automation import browser_watchdog
+from app.automation.browser_farm import BrowserFarm, FarmBudget, LaunchedServer
+from app.automation.browser_pool import BrowserPool
+from app.automation.browser_watchdog import RESTART_COUNTER, RecyclePolicy
+from app.core.metrics import metrics_registry
+
+MB = 1024 * 1024
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.detached = False
+
+    async def send(self, method, params=None):
+        return self.responses.get(method, {})
+
+    async def detach(self):
+        self.detached = True
+
+
+class FakePage:
+    def __init__(self, heap):
+        self.heap = heap
+
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = [FakePage(10 * MB)]
+        self.closed = False
+
+    async def new_cdp_session(self, page):
+        metrics = [{"name": "Nodes", "value": 100}, {"name": "JSHeapUsedSize", "value": page.heap}]
+        return FakeSession({"Performance.getMetrics": {"metrics": metrics}})
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    _pids = itertools.count(100, 10)
+
+    def __init__(self):
+        self.pids = [next(self._pids) + i for i in range(3)]
+        self.connected = True
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        return FakeContext(self)
+
+    async def new_browser_cdp_session(self):
+        processes = [{"type": kind, "id": pid, "cpuTime": 0}
+                     for kind, pid in zip(("browser", "renderer", "gpu-process"), self.pids)]
+        return FakeSession({"SystemInfo.getProcessInfo": {"processInfo": processes}})
+
+    async def close(self):
+        # 与 Playwright 一样，关闭时也会触发 disconnected
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.chromium = self
+
+    async def launch(self, **options):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+    async def stop(self):
+        pass
+
+
+def make_pool(**policy):
+    playwright = FakePlaywright()
+
+    async def factory():
+        return playwright
+
+    limits = {"max_context_uses": 0, "browser_rss_limit_mb": 0, "context_memory_limit_mb": 0, **policy}
+    pool = BrowserPool(size=1, playwright_factory=factory, policy=RecyclePolicy(**limits), watchdog_interval=0)
+    return pool, playwright
+
+
+def test_browser_restarts_after_context_uses():
+    pool, playwright = make_pool(max_context_uses=3)
+    restarts = metrics_registry.counters.get(RESTART_COUNTER, 0)
+
+    async def scenario():
+        old = [await pool.new_context() for _ in range(3)]
+        assert pool.stats()["browsers"][0]["draining"].startswith("uses")
+        fresh = await pool.new_context()
+        await pool.release(old[0])
+        await pool.release(old[1])
+        assert old[2].browser.connected and not old[2].closed  # 仍有上下文在使用，浏览器不关闭
+        await pool.release(old[2])
+        return old, fresh
+
+    old, fresh = asyncio.run(scenario())
+    assert fresh.browser is not old[0].browser and not old[0].browser.connected
+    stats = pool.stats()
+    assert stats["browsers_restarted"] == 1 and stats["browsers_crashed"] == 0
+    assert [b["contexts"] for b in stats["browsers"]] == [1]
+    assert metrics_registry.counters[RESTART_COUNTER] == restarts + 1
+
+
+def test_watchdog_drains_browser_over_rss(monkeypatch):
+    pool, playwright = make_pool(browser_rss_limit_mb=1000)
+    rss = {}
+    monkeypatch.setattr(browser_watchdog, "process_rss", lambda pid: rss.get(pid))
+
+    async def scenario():
+        busy = await pool.new_context()
+        browser = playwright.browsers[0]
+        rss.update({pid: 200 * MB for pid in browser.pids})
+        await pool.inspect()
+        assert pool.stats()["browsers"][0]["rss_mb"] == 600 and not pool.stats()["browsers"][0]["draining"]
+
+        rss[browser.pids[1]] = 900 * MB
+        await pool.inspect()
+        replacement = await pool.new_context()
+        assert replacement.browser is not browser
+        assert browser.connected and not busy.closed  # 正在发布的上下文不受影响
+        await pool.release(busy)
+        return browser
+
+    browser = asyncio.run(scenario())
+    assert not browser.connected
+    assert pool.stats()["browsers_restarted"] == 1
+
+
+def test_watchdog_drains_browser_with_bloated_context(monkeypatch):
+    pool, playwright = make_pool(context_memory_limit_mb=256)
+    monkeypatch.setattr(browser_watchdog, "process_rss", lambda pid: 50 * MB)
+
+    async def scenario():
+        small, large = await pool.new_context(), await pool.new_context()
+        await pool.inspect()
+        assert not pool.stats()["browsers"][0]["draining"]
+        large.pages.append(FakePage(300 * MB))
+        await pool.inspect()
+        return small
+
+    small = asyncio.run(scenario())
+    browser = pool.stats()["browsers"][0]
+    assert browser["draining"].startswith("context_memory") and browser["js_heap_mb"] == 320
+    assert browser["contexts"] == 2 and not small.closed
+
+
+class FakeProcess:
+    def __init__(self):
+        self.exited = asyncio.Event()
+
+    async def wait(self):
+        await self.exited.wait()
+
+    def terminate(self):
+        self.exited.set()
+
+    def kill(self):
+        self.exited.set()
+
+
+class FakeLauncher:
+    def __init__(self):
+        self._pids = itertools.count(1000)
+
+    async def launch(self, headless):
+        pid = next(self._pids)
+        return LaunchedServer(ws_endpoint=f"ws://127.0.0.1:{pid}/farm", pid=pid, process=FakeProcess())
+
+
+def make_farm(rss, **policy):
+    limits = {"max_context_uses": 0, "browser_rss_limit_mb": 0, "context_memory_limit_mb": 0, **policy}
+    budget = FarmBudget(max_browsers=2, max_contexts_per_browser=10, max_contexts=10, memory_budget_mb=0)
+    return BrowserFarm(budget, launcher=FakeLauncher(), rss_sampler=lambda pid: rss.get(pid, 0),
+                       policy=RecyclePolicy(**limits))
+
+
+def test_farm_drains_browser_after_lease_uses():
+    farm = make_farm({}, max_context_uses=2)
+
+    async def scenario():
+        first, second, third = [await farm.lease("a") for _ in range(3)]
+        assert first.browser_id == third.browser_id != second.browser_id
+        # 第一个浏览器排空后，新租约只分配到另一个浏览器
+        fourth = await farm.lease("a")
+        assert fourth.browser_id == second.browser_id
+        await farm.release(first.lease_id, "a")
+        assert farm.stats()["browsers_restarted"] == 0
+        await farm.release(third.lease_id, "a")
+        return farm.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["browsers_restarted"] == 1 and len(stats["browsers"]) == 1
+
+
+def test_farm_drains_browser_over_rss():
+    rss = {}
+    farm = make_farm(rss, browser_rss_limit_mb=500)
+
+    async def scenario():
+        busy = await farm.lease("a")
+        rss[1000] = 800 * MB
+        await farm.maintain()
+        assert farm.stats()["browsers"][0]["draining"].startswith("rss")
+        replacement = await farm.lease("a")
+        assert replacement.browser_id != busy.browser_id
+        await farm.release(busy.lease_id, "a")
+        stats = farm.stats()
+        await farm.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["browsers_restarted"] == 1 and [b["leases"] for b in stats["browsers"]] == [1]
@@ -0,0 +1,153 @@
+"""
+自适应并发控制测试
+
+检查可调上限的限制器、AIMD 决策（用满且耗时平稳时加 1，崩溃/内存/CPU/耗时上升时乘性减小、减小后冷却），
+调整原因记录，以及自动化实例启动失败时归还名额。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.automation import base as automation_base
+from app.automation.douyin import DouyinAutomation
+from app.core.concurrency import AdaptiveLimiter, ConcurrencyController
+
+
+def test_limiter_follows_limit_changes():
+    limiter = AdaptiveLimiter(2)
+
+    async def scenario():
+        order = []
+
+        async def worker(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.05)
+
+        tasks = [asyncio.create_task(worker(i)) for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert limiter.in_use == 2 and limiter.waiting == 3
+        limiter.set_limit(4)
+        assert limiter.in_use == 4 and limiter.waiting == 1
+        limiter.set_limit(1)
+        # 减小上限不影响已占用的名额
+        assert limiter.in_use == 4
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert limiter.in_use == 0 and limiter.peak_in_use == 4
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    limiter = AdaptiveLimiter(1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert limiter.in_use == 0 and limiter.waiting == 0
+
+
+class Host:
+    def __init__(self):
+        self.sample = {"chromium_rss_mb": 500.0, "available_memory_mb": 8000.0, "cpu_load": 0.3, "crashes": 0}
+
+    def __call__(self):
+        return dict(self.sample)
+
+
+def make_controller(limit=4):
+    host = Host()
+    limiter = AdaptiveLimiter(limit)
+    controller = ConcurrencyController(limiter, sampler=host, min_limit=1, max_limit=6, interval=0.001)
+    return controller, limiter, host
+
+
+def saturate(limiter):
+    limiter.peak_in_use = limiter.limit
+
+
+def test_additive_increase_while_latency_flat():
+    controller, limiter, _ = make_controller(limit=4)
+    assert controller.tick() is None  # 没有用满，不调整
+
+    for _ in range(5):
+        controller.record_step("douyin", "fill_title", 100)
+    saturate(limiter)
+    change = controller.tick()
+    assert change["from"] == 4 and change["to"] == 5 and change["reason"].startswith("increase")
+    saturate(limiter)
+    controller.tick()
+    saturate(limiter)
+    assert controller.tick() is None and limiter.limit == 6  # 不超过上限
+
+
+@pytest.mark.parametrize("update, reason", [
+    ({"crashes": 2}, "crash"),
+    ({"available_memory_mb": 200.0}, "memory"),
+    ({"cpu_load": 3.5}, "cpu"),
+])
+def test_multiplicative_decrease_on_pressure(update, reason):
+    controller, limiter, host = make_controller(limit=6)
+    controller.tick()
+    host.sample.update(update)
+    change = controller.tick()
+    assert change["to"] == 4 and change["reason"].startswith(reason)
+    assert controller.stats()["changes"][-1] == change
+    assert controller.stats()["last_sample"]["waiting"] == 0
+
+
+def test_latency_rise_backs_off_and_cools_down():
+    controller, limiter, host = make_controller(limit=5)
+    controller.interval = 60
+    controller.record_step("douyin", "click_publish", 100)
+    for _ in range(5):
+        controller.record_step("douyin", "click_publish", 400)
+    saturate(limiter)
+    change = controller.tick()
+    assert change["to"] == 3 and change["reason"].startswith("latency")
+
+    # 减小后的冷却期内即使用满也不增加
+    controller.record_step("douyin", "click_publish", 100)
+    saturate(limiter)
+    assert controller.tick() is None and limiter.limit == 3
+
+    host.sample["crashes"] = 1
+    controller.tick()
+    controller.tick()
+    assert limiter.limit == 2
+    for _ in range(3):
+        host.sample["crashes"] += 1
+        controller.tick()
+    assert limiter.limit == 1  # 不低于下限
+
+
+def test_failed_start_returns_slot(monkeypatch, tmp_path):
+    limiter = AdaptiveLimiter(1)
+    monkeypatch.setattr(automation_base, "automation_limiter", limiter)
+
+    class BrokenPool:
+        async def new_context(self, **options):
+            assert limiter.in_use == 1
+            raise RuntimeError("浏览器启动失败")
+
+    monkeypatch.setattr(automation_base, "get_browser_pool", lambda: BrokenPool())
+    automation = DouyinAutomation("douyin", str(tmp_path / "state.json"))
+    automation.use_browser_pool = True
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(automation.start(headless=True))
+    assert limiter.in_use == 0
@@ -0,0 +1,113 @@
+"""
+感知哈希与近似重复过滤测试
+
+检查缩放/压缩后的图片哈希距离小、不同图片距离大，索引批量查询与逐项计算一致，
+按账户过滤已发布图片的近似项以及同批候选之间的近似项。
+"""
+
+import io
+import os
+import random
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database.migrations import run_migrations
+from app.services.image_hash_service import (
+    OWNER_WEIXIN,
+    HashIndex,
+    dhash,
+    filter_near_duplicates,
+    hamming,
+    phash,
+    published_hash_registry,
+    record_published_hashes,
+    to_signed,
+    to_unsigned,
+)
+
+
+def blocky_image(seed, size=(256, 192)):
+    """随机色块放大得到的图片，低频结构随 seed 变化"""
+    rng = random.Random(seed)
+    small = Image.new("RGB", (6, 5))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(30)])
+    return small.resize(size, Image.BILINEAR)
+
+
+def jpeg_bytes(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("hash_function", [phash, dhash])
+def test_hash_is_robust_to_resize_and_recompression(hash_function):
+    original = blocky_image(1)
+    variant = jpeg_bytes(original.resize((128, 96)), quality=40)
+    other = blocky_image(2)
+    assert hamming(hash_function(original), hash_function(variant)) <= 8
+    assert hamming(hash_function(original), hash_function(other)) > 8
+
+
+def test_signed_roundtrip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert to_unsigned(to_signed(value)) == value
+        assert -(1 << 63) <= to_signed(value) < 1 << 63
+
+
+def test_index_matches_pairwise_hamming():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(3000)]
+    queries = [values[5] ^ 0b111, rng.getrandbits(64)]
+    index = HashIndex(capacity=16)
+    index.add_many(values, list(range(len(values))))
+
+    expected = [min(hamming(query, value) for value in values) for query in queries]
+    assert index.min_distances(queries).tolist() == expected
+    assert index.nearest(queries[0], 3) == [(5, 3)]
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    session = sessionmaker(bind=engine)()
+    published_hash_registry.invalidate()
+    yield session
+    session.close()
+    published_hash_registry.invalidate()
+
+
+def test_filter_against_published_and_within_batch(db):
+    rng = random.Random(1)
+    published = rng.getrandbits(64) | (1 << 63)  # 最高位为 1，检查有符号存储
+    record_published_hashes(db, OWNER_WEIXIN, 1, {"pid_1": published})
+
+    fresh = rng.getrandbits(64)
+    candidates = {
+        "near_published": published ^ 0b1011,
+        "fresh": fresh,
+        "near_fresh": fresh ^ 0b1,
+        "other": rng.getrandbits(64),
+    }
+    assert filter_near_duplicates(db, OWNER_WEIXIN, 1, candidates, max_distance=6) == ["fresh", "other"]
+    # 其他账户不受影响
+    assert filter_near_duplicates(db, OWNER_WEIXIN, 2, candidates, max_distance=6) == [
+        "near_published", "fresh", "other"]
+
+    # 新记录追加到已加载的索引，并能从数据库重新加载
+    record_published_hashes(db, OWNER_WEIXIN, 1, {"fresh": fresh})
+    assert filter_near_duplicates(db, OWNER_WEIXIN, 1, {"again": fresh}, max_distance=6) == []
+    published_hash_registry.invalidate()
+    assert filter_near_duplicates(db, OWNER_WEIXIN, 1, {"again": fresh ^ 0b11}, max_distance=6) == []
@@ -0,0 +1,111 @@
+"""
+图片优化流水线测试
+
+检查压缩结果不超过目标字节数且质量尽量高、超大图片会缩放、原图满足配置时不重新编码、
+同一原图只下载和编码一次（缓存按原图哈希和配置区分）、批量处理中单张失败不影响其他图片。
+"""
+
+import asyncio
+import io
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from app.services.image_optimize_service import (
+    ImageOptimizer,
+    ImageProfile,
+    WEIXIN_CONTENT_IMAGE,
+    optimize_image_bytes,
+)
+
+
+def noisy_png(width, height, seed=0):
+    """随机噪声图，JPEG 压缩效果差，容易超限"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(width * height)])
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def small_jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def test_quality_search_lands_under_limit():
+    profile = ImageProfile(name="test", max_bytes=120 * 1024)
+    result = optimize_image_bytes(noisy_png(300, 300), profile)
+    assert len(result["data"]) <= profile.max_bytes
+    assert result["scale"] == 1.0
+    assert profile.min_quality <= result["quality"] <= profile.max_quality
+    # 质量再高一级就会超限（或已是上限）
+    if result["quality"] < profile.max_quality:
+        image = Image.open(io.BytesIO(noisy_png(300, 300)))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=result["quality"] + 1, optimize=True, progressive=True)
+        assert len(buffer.getvalue()) > profile.max_bytes
+
+
+def test_scale_search_when_quality_floor_is_not_enough():
+    profile = ImageProfile(name="tiny", max_bytes=20 * 1024, max_side=1000)
+    result = optimize_image_bytes(noisy_png(400, 200), profile)
+    assert len(result["data"]) <= profile.max_bytes
+    assert result["scale"] < 1.0
+    decoded = Image.open(io.BytesIO(result["data"]))
+    assert decoded.format == "JPEG"
+    assert decoded.size == (result["width"], result["height"])
+    assert abs(decoded.width / decoded.height - 2) < 0.05
+
+
+def test_fitting_source_is_not_reencoded():
+    data = small_jpeg()
+    result = optimize_image_bytes(data, WEIXIN_CONTENT_IMAGE)
+    assert result["data"] == data and result["quality"] is None
+
+
+def test_pipeline_downloads_once_and_caches(tmp_path):
+    image = noisy_png(200, 200, seed=1)
+    requests = []
+
+    def handler(request):
+        requests.append(str(request.url))
+        if request.url.path == "/missing.png":
+            return httpx.Response(404)
+        return httpx.Response(200, content=image)
+
+    profile = ImageProfile(name="test", max_bytes=40 * 1024)
+
+    async def scenario():
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            optimizer = ImageOptimizer(cache_dir=str(tmp_path), executor=executor,
+                                       transport=httpx.MockTransport(handler))
+            try:
+                batch = await optimizer.optimize_batch(
+                    ["https://img.test/a.png", "https://img.test/b.png", "https://img.test/missing.png"], profile)
+                again = await optimizer.fetch_and_optimize(image, profile)
+                other_profile = await optimizer.fetch_and_optimize(image, ImageProfile(name="other", max_bytes=30 * 1024))
+            finally:
+                await optimizer.close()
+            return batch, again, other_profile, optimizer.stats()
+
+    batch, again, other_profile, stats = asyncio.run(scenario())
+    first, second, missing = batch
+    assert isinstance(missing, httpx.HTTPStatusError)
+    assert first.path == second.path == again.path
+    assert again.cached and os.path.getsize(again.path) <= profile.max_bytes
+    assert other_profile.path != first.path
+    # 每个URL只下载一次；同一原图同一配置只编码一次
+    assert len(requests) == 3
+    assert stats["encodes"] == 2
@@ -0,0 +1,159 @@
+"""
+事件驱动登录检测测试
+
+用可以手动触发事件的假页面和假上下文驱动 BrowserAutomationBase.detect_login，
+检查 Set-Cookie、导航、页面关闭三种触发方式，以及检测后立即保存存储状态、监听器被移除。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.automation.douyin import DouyinAutomation
+from app.automation.weixingongzhonghao import ExamplePlatformAutomation
+
+
+class WeixinAutomation(ExamplePlatformAutomation):
+    """公众号示例类尚未实现账号密码登录，测试中补一个空实现"""
+
+    async def login(self, username: str, password: str) -> bool:
+        return False
+
+
+class FakeEmitter:
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    async def emit(self, event, arg):
+        for handler in list(self.listeners.get(event, [])):
+            result = handler(arg)
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class FakeFrame:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakePage(FakeEmitter):
+    def __init__(self):
+        super().__init__()
+        self.main_frame = FakeFrame("https://login.example.com")
+        self.url = self.main_frame.url
+
+
+class FakeResponse:
+    def __init__(self, set_cookie):
+        self.set_cookie = set_cookie
+
+    async def header_value(self, name):
+        return self.set_cookie if name == "set-cookie" else None
+
+
+class FakeContext(FakeEmitter):
+    def __init__(self):
+        super().__init__()
+        self.cookie_jar = []
+        self.cookie_checks = 0
+
+    async def cookies(self):
+        self.cookie_checks += 1
+        return list(self.cookie_jar)
+
+
+def make(automation_class):
+    automation = automation_class("platform", "./storage_state.json")
+    automation.page = FakePage()
+    automation.context = FakeContext()
+    automation.saved = 0
+
+    async def save():
+        automation.saved += 1
+
+    automation._save_storage_state = save
+    return automation
+
+
+def test_resolves_on_login_cookie():
+    automation = make(DouyinAutomation)
+
+    async def scenario():
+        detector = asyncio.create_task(automation.detect_login(timeout=5))
+        await asyncio.sleep(0)
+        # 不相关的 Set-Cookie 不触发Cookie检查
+        await automation.context.emit("response", FakeResponse("ttwid=abc; Path=/"))
+        checks_before = automation.context.cookie_checks
+        automation.context.cookie_jar.append({"name": "sessionid", "value": "xyz"})
+        await automation.context.emit("response", FakeResponse("sessionid=xyz; Path=/; HttpOnly"))
+        return await detector, checks_before
+
+    detection, checks_before = asyncio.run(scenario())
+    assert checks_before == 1  # 只有启动时检查一次
+    assert detection.reason == "cookie"
+    assert detection.logged_in is True
+    assert automation.saved == 1
+    assert automation.context.listeners["response"] == []
+    assert automation.page.listeners["close"] == []
+
+
+def test_resolves_on_logged_in_url():
+    automation = make(WeixinAutomation)
+
+    async def scenario():
+        detector = asyncio.create_task(automation.detect_login(timeout=5))
+        await asyncio.sleep(0)
+        frame = automation.page.main_frame
+        frame.url = "https://mp.weixin.qq.com/cgi-bin/home?t=home/index&token=123"
+        await automation.page.emit("framenavigated", frame)
+        return await detector
+
+    detection = asyncio.run(scenario())
+    assert detection.reason == "url"
+    assert detection.logged_in is True
+
+
+def test_page_close_without_cookies_is_not_logged_in():
+    automation = make(DouyinAutomation)
+
+    async def scenario():
+        detector = asyncio.create_task(automation.detect_login(timeout=5))
+        await asyncio.sleep(0)
+        await automation.page.emit("close", automation.page)
+        return await detector
+
+    detection = asyncio.run(scenario())
+    assert detection.reason == "page_closed"
+    assert detection.logged_in is False
+    assert automation.login_detection is detection
+
+
+def test_wait_for_login_completion_returns_detection_and_propagates_timeout():
+    automation = make(DouyinAutomation)
+
+    async def closed():
+        waiter = asyncio.create_task(automation.wait_for_login_completion())
+        await asyncio.sleep(0)
+        await automation.page.emit("close", automation.page)
+        return await waiter
+
+    assert asyncio.run(closed()).logged_in is False
+
+    async def timed_out():
+        # 方法本身不设超时，由调用方（ACTIVATION_TIMEOUT）控制，超时不会被吞掉
+        await asyncio.wait_for(automation.wait_for_login_completion(), timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(timed_out())
+    assert automation.page.listeners["close"] == []
@@ -0,0 +1,121 @@
+"""
+请求指标中间件测试
+
+检查按路由模板聚合、SQL计数、Prometheus导出、多线程累加 Playwright 耗时，以及中间件单请求开销。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.core.config import settings
+from app.core.metrics import MetricsRegistry, RequestMetricsMiddleware, metrics_registry, track_playwright
+from app.database.migrations import run_migrations
+from app.database.session import get_db
+from app.models.models import Task
+
+
+@pytest.fixture()
+def client():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([Task(task_type="publish", status="pending") for _ in range(3)])
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    metrics_registry.reset()
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_requests_are_grouped_by_route_template(client):
+    for task_id in (1, 2, 3):
+        assert client.get(f"{settings.API_PREFIX}/tasks/{task_id}").status_code == 200
+
+    summary = metrics_registry.summary()
+    route = next(r for r in summary["routes"] if r["route"] == f"{settings.API_PREFIX}/tasks/{{task_id}}")
+    assert route["count"] == 3
+    assert route["avg_sql_statements"] >= 1
+
+    text = client.get(f"{settings.API_PREFIX}/system/metrics").text
+    assert f'route="{settings.API_PREFIX}/tasks/{{task_id}}",status="200"}} 3' in text
+    assert "linkmatrix_http_request_duration_seconds_bucket" in text
+
+
+def test_unmatched_paths_share_one_label(client):
+    client.get("/no-such-path-1")
+    client.get("/no-such-path-2")
+
+    routes = {r["route"]: r for r in metrics_registry.summary()["routes"]}
+    assert routes["unmatched"]["count"] == 2
+
+
+def test_playwright_time_is_accumulated_under_lock():
+    metrics_registry.reset()
+
+    async def wait():
+        async with track_playwright():
+            await asyncio.sleep(0.01)
+
+    asyncio.run(wait())
+    assert metrics_registry.summary()["playwright_wait_seconds"] >= 0.01
+
+    metrics_registry.reset()
+    threads = [threading.Thread(target=lambda: [metrics_registry.add_playwright_time(0.5) for _ in range(10000)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics_registry.playwright_time_total == 20000.0
+    assert "linkmatrix_playwright_wait_seconds_total 20000.000000" in metrics_registry.render_prometheus()
+    metrics_registry.reset()
+
+
+def test_middleware_overhead_is_small():
+    async def noop_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def run(asgi_app, n):
+        scope = {"type": "http", "method": "GET", "path": "/"}
+        start = time.perf_counter()
+        for _ in range(n):
+            await asgi_app(scope, None, send)
+        return time.perf_counter() - start
+
+    n = 20000
+    middleware = RequestMetricsMiddleware(noop_app, registry=MetricsRegistry())
+    baseline = asyncio.run(run(noop_app, n))
+    instrumented = asyncio.run(run(middleware, n))
+
+    assert (instrumented - baseline) / n < 50e-6
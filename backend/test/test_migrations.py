@@ -0,0 +1,90 @@
+"""
+数据库迁移测试
+
+检查全新 SQLite 数据库迁移到 LATEST_VERSION、再次执行不做任何事，
+以及写入默认系统设置时不覆盖已有的键。
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.pool import StaticPool
+
+from app.database import migrations
+from app.database.migrations import (
+    DEFAULT_SYSTEM_SETTINGS,
+    LATEST_VERSION,
+    get_schema_version,
+    run_migrations,
+    seed_system_settings,
+)
+from app.models.models import SystemSetting
+
+
+def make_engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def test_fresh_database_reaches_latest_version():
+    engine = make_engine()
+    assert get_schema_version(engine) is None
+
+    assert run_migrations(engine) == LATEST_VERSION
+    assert get_schema_version(engine) == LATEST_VERSION
+    tables = set(inspect(engine).get_table_names())
+    assert {"schema_version", "system_settings", "tasks", "weixin_media_cache",
+            "published_image_hashes"} <= tables
+    with engine.connect() as conn:
+        keys = set(conn.execute(select(SystemSetting.__table__.c.key)).scalars())
+        versions = conn.execute(select(migrations.schema_version_table.c.version)).scalars().all()
+    assert keys == {row["key"] for row in DEFAULT_SYSTEM_SETTINGS}
+    assert versions == [LATEST_VERSION]  # 版本表只保留一行
+
+
+def test_second_run_is_a_no_op(monkeypatch):
+    engine = make_engine()
+    run_migrations(engine)
+
+    executed = []
+    patched = [migrations.Migration(m.version, m.description, lambda conn, v=m.version: executed.append(v))
+               for m in migrations.MIGRATIONS]
+    monkeypatch.setattr(migrations, "MIGRATIONS", patched)
+    assert run_migrations(engine) == LATEST_VERSION
+    assert executed == []
+
+
+def test_partial_database_only_runs_pending_migrations(monkeypatch):
+    engine = make_engine()
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(migrations.schema_version_table.update().values(version=LATEST_VERSION - 1))
+
+    executed = []
+    patched = [migrations.Migration(m.version, m.description, lambda conn, v=m.version: executed.append(v))
+               for m in migrations.MIGRATIONS]
+    monkeypatch.setattr(migrations, "MIGRATIONS", patched)
+    assert run_migrations(engine) == LATEST_VERSION
+    assert executed == [LATEST_VERSION]
+
+
+def test_seed_keeps_existing_settings():
+    engine = make_engine()
+    run_migrations(engine)
+    table = SystemSetting.__table__
+    with engine.begin() as conn:
+        conn.execute(table.update().where(table.c.key == "log_level").values(value="DEBUG"))
+        conn.execute(table.delete().where(table.c.key == "storage_path"))
+
+    with engine.begin() as conn:
+        seed_system_settings(conn)
+
+    with engine.connect() as conn:
+        values = dict(conn.execute(select(table.c.key, table.c.value)).all())
+        count = conn.execute(select(table.c.id)).all()
+    assert values["log_level"] == "DEBUG"
+    assert values["storage_path"] == "./storage"  # 缺失的键重新写入
+    assert len(count) == len(DEFAULT_SYSTEM_SETTINGS)
@@ -0,0 +1,209 @@
+"""
+视频发布任务测试
+
+通过 /publish/video 创建任务，后台依次在各账户上执行 publish()：检查 API 模式直传不启动浏览器、
+浏览器流程失败的账户记为 failed，步骤记录写入任务日志，任务进度和状态随之更新；
+封面与账户已发布视频的封面近似时跳过该账户。
+"""
+
+import io
+import json
+import os
+import random
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.automation.douyin import DouyinAutomation
+from app.automation.factory import AutomationFactory
+from app.core.config import settings
+from app.database.migrations import run_migrations
+from app.database.session import get_db
+from app.models.models import Account, AccountPublishTask, BrowserProfile, PublishedImageHash, Task
+from app.services import automation_task_service, publish_service, task_service
+from app.services.image_hash_service import OWNER_ACCOUNT, published_hash_registry
+
+started = []
+
+
+class ApiPublishAutomation(DouyinAutomation):
+    """API 模式直传成功，不允许启动浏览器"""
+
+    async def start(self, headless=True):
+        started.append(self.platform)
+        raise AssertionError("API 模式发布不应启动浏览器")
+
+    async def publish_video_api(self, video_path, title, description):
+        assert open(video_path, "rb").read() == b"video-bytes"
+        async with self.step("api_upload"):
+            await self.report_progress(50)
+        async with self.step("api_publish"):
+            pass
+        await self.report_progress(100)
+        return True
+
+
+class BrowserPublishAutomation(DouyinAutomation):
+    """浏览器流程，点击发布失败"""
+
+    async def start(self, headless=True):
+        started.append(self.platform)
+
+    async def publish_video(self, video_path, title, description):
+        try:
+            async with self.step("click_publish"):
+                raise TimeoutError("发布按钮不可用")
+        except TimeoutError:
+            return False
+
+
+@pytest.fixture()
+def session(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    for module in (task_service, automation_task_service, publish_service):
+        monkeypatch.setattr(module, "SessionLocal", Session)
+    monkeypatch.setattr(publish_service, "MEDIA_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "API_MODE_PLATFORMS", ["fakeapi"])
+    AutomationFactory.register_platform("fakeapi", ApiPublishAutomation)
+    AutomationFactory.register_platform("fakebrowser", BrowserPublishAutomation)
+    started.clear()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield Session
+    app.dependency_overrides.pop(get_db, None)
+    AutomationFactory._platforms.pop("fakeapi", None)
+    AutomationFactory._platforms.pop("fakebrowser", None)
+
+
+def test_publish_video_runs_each_account_through_the_task_runner(session, tmp_path):
+    db = session()
+    profile = BrowserProfile(name="默认配置", user_agent="Mozilla/5.0")
+    db.add(profile)
+    db.flush()
+    api_account = Account(platform="fakeapi", name="直传账户", username="api",
+                          storage_path=str(tmp_path / "a.json"), browser_profile_id=profile.id)
+    browser_account = Account(platform="fakebrowser", name="浏览器账户", username="browser",
+                              storage_path=str(tmp_path / "b.json"), browser_profile_id=profile.id)
+    db.add_all([api_account, browser_account])
+    db.commit()
+    account_ids = [api_account.id, browser_account.id]
+    db.close()
+
+    client = TestClient(app)
+    response = client.post(
+        f"{settings.API_PREFIX}/publish/video",
+        data={"title": "标题", "description": "描述", "tags": "a,b", "account_ids": [str(i) for i in account_ids]},
+        files={"video": ("clip.mp4", b"video-bytes", "video/mp4")},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["file_path"].endswith("clip.mp4") and body["tags"] == "a,b"
+
+    # API 模式的账户没有启动浏览器，浏览器流程的账户按需启动
+    assert started == ["fakebrowser"]
+
+    db = session()
+    task = db.get(Task, body["task_id"])
+    assert task.status == "failed" and "1/2 个账户发布失败" in task.error_message
+    statuses = {row.account_id: row.status for row in db.query(AccountPublishTask)}
+    assert statuses == {account_ids[0]: "completed", account_ids[1]: "failed"}
+    logs = task_service.get_task_logs(db, task.id)
+    steps = [json.loads(log.message)["step"] for log in logs if log.message.startswith("{")]
+    assert steps == ["api_upload", "api_publish", "click_publish"]
+    assert any("click_publish" in log.message and log.level == "error" and not log.message.startswith("{")
+               for log in logs)
+    # 进度按账户平分写入（写库有节流）
+    assert 0 < task.progress <= 50
+    db.close()
+
+
+def test_publish_video_rejects_unknown_accounts(session):
+    client = TestClient(app)
+    response = client.post(
+        f"{settings.API_PREFIX}/publish/video",
+        data={"title": "标题", "description": "描述", "tags": "a", "account_ids": ["999"]},
+        files={"video": ("clip.mp4", b"video-bytes", "video/mp4")},
+    )
+    assert response.status_code == 404
+    db = session()
+    assert db.query(Task).count() == 0
+    db.close()
+
+
+def png_bytes(seed, fmt="PNG"):
+    """随机色块放大得到的图片，不同 seed 的感知哈希不同"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    small = Image.new("RGB", (6, 5))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(30)])
+    buffer = io.BytesIO()
+    small.resize((160, 90), Image.BILINEAR).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_publish_video_skips_accounts_with_a_similar_published_cover(session, tmp_path):
+    pytest.importorskip("PIL")
+    pytest.importorskip("numpy")
+    published_hash_registry.invalidate()
+    db = session()
+    profile = BrowserProfile(name="默认配置", user_agent="Mozilla/5.0")
+    db.add(profile)
+    db.flush()
+    accounts = [Account(platform="fakeapi", name=f"账户{i}", username=f"user{i}",
+                        storage_path=str(tmp_path / f"{i}.json"), browser_profile_id=profile.id) for i in range(2)]
+    db.add_all(accounts)
+    db.commit()
+    first, second = accounts[0].id, accounts[1].id
+    db.close()
+
+    client = TestClient(app)
+
+    def publish(account_ids, cover, name):
+        response = client.post(
+            f"{settings.API_PREFIX}/publish/video",
+            data={"title": "标题", "description": "描述", "tags": "a", "account_ids": [str(i) for i in account_ids]},
+            files={"video": ("clip.mp4", b"video-bytes", "video/mp4"), "cover_image": (name, cover, "image/png")},
+        )
+        assert response.status_code == 200, response.text
+        db = session()
+        task = db.get(Task, response.json()["task_id"])
+        statuses = {row.account_id: row.status for row in
+                    db.query(AccountPublishTask).filter(AccountPublishTask.publish_task_id == response.json()["id"])}
+        db.close()
+        return task, statuses
+
+    task, statuses = publish([first], png_bytes(1), "cover.png")
+    assert task.status == "completed" and statuses == {first: "completed"}
+
+    # 同一封面重新压缩后再次发布：第一个账户已发布过，跳过；第二个账户正常发布
+    task, statuses = publish([first, second], png_bytes(1, fmt="JPEG"), "cover.jpg")
+    assert statuses == {first: "failed", second: "completed"}
+    assert task.status == "failed" and "封面与已发布的视频近似" in task.error_message
+
+    task, statuses = publish([first], png_bytes(2), "other.png")
+    assert statuses == {first: "completed"}
+
+    db = session()
+    counts = {owner_id: db.query(PublishedImageHash).filter(PublishedImageHash.owner_type == OWNER_ACCOUNT,
+                                                            PublishedImageHash.owner_id == owner_id).count()
+              for owner_id in (first, second)}
+    db.close()
+    assert counts == {first: 2, second: 1}
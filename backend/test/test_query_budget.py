@@ -0,0 +1,108 @@
+"""
+接口SQL查询预算测试
+
+在内存SQLite中造数据，确保列表接口的SQL语句数不随记录数增长（无 N+1 懒加载）。
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.core.config import settings
+from app.database.migrations import run_migrations
+from app.database.query_counter import QueryBudgetExceeded, assert_max_queries
+from app.database.session import get_db
+from app.models.models import Account, BrowserProfile, PublishTask, Task, VideoTranslation
+
+ROWS = 100
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    run_migrations(engine)
+
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    profile = BrowserProfile(name="profile", storage_path="./storage_state.json")
+    db.add(profile)
+    db.flush()
+
+    accounts = [
+        Account(platform="douyin", name=f"account_{i}", username=f"user_{i}",
+                browser_profile_id=profile.id, status="active")
+        for i in range(3)
+    ]
+    db.add_all(accounts)
+
+    for i in range(ROWS):
+        task = Task(task_type="publish", status="pending")
+        db.add(task)
+        db.flush()
+        db.add(PublishTask(task_id=task.id, content_type="video", title=f"video_{i}", accounts=accounts))
+        db.add(VideoTranslation(task_id=task.id, original_video_path=f"video_{i}.mp4", target_language="en"))
+    db.commit()
+    db.close()
+    return engine
+
+
+@pytest.fixture(scope="module")
+def client(engine):
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/accounts/browser/", 1),
+    ("/publish/tasks?limit=100", 2),
+    ("/media-tools/translations?limit=100", 1),
+])
+def test_list_endpoints_stay_within_query_budget(client, engine, path, budget):
+    with assert_max_queries(budget, engine=engine):
+        response = client.get(settings.API_PREFIX + path)
+
+    assert response.status_code == 200
+    assert len(response.json()) > 0
+
+
+def test_publish_task_response_includes_nested_relations(client, engine):
+    response = client.get(settings.API_PREFIX + "/publish/tasks?limit=1")
+
+    body = response.json()[0]
+    assert body["task"]["task_type"] == "publish"
+    assert len(body["accounts"]) == 3
+
+
+def test_budget_exceeded_raises(engine):
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        with pytest.raises(QueryBudgetExceeded):
+            with assert_max_queries(1, engine=engine):
+                for task in db.query(PublishTask).limit(5).all():
+                    task.task.status
+    finally:
+        db.close()
@@ -0,0 +1,106 @@
+"""
+启动阶段与就绪检查测试
+
+检查启动阶段并发执行、全部必需阶段完成后 /system/ready 返回就绪，
+以及必需阶段失败时返回 503 并带上失败原因、可选阶段失败不影响就绪；
+导入 main 时不加载 numpy、Pillow、httpx 等重量级依赖。
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core import init_app
+from app.core.config import settings
+from app.core.init_app import StartupState
+from app.routers import system as system_router
+
+
+@pytest.fixture()
+def state(monkeypatch):
+    state = StartupState()
+    monkeypatch.setattr(init_app, "startup_state", state)
+    monkeypatch.setattr(system_router, "startup_state", state)
+    return state
+
+
+@pytest.fixture()
+def phases(monkeypatch):
+    """用记录调用的假函数替换各启动阶段"""
+    calls = []
+
+    def phase(name, error=None):
+        def run():
+            calls.append((name, threading.current_thread() is not threading.main_thread()))
+            if error:
+                raise RuntimeError(error)
+        return run
+
+    def install(**errors):
+        monkeypatch.setattr(init_app.logger_manager, "setup_file_handlers", phase("logging", errors.get("logging")))
+        monkeypatch.setattr(init_app, "create_directories", phase("directories", errors.get("directories")))
+        monkeypatch.setattr(init_app, "init_database", phase("database", errors.get("database")))
+        monkeypatch.setattr(init_app, "check_supabase", phase("supabase", errors.get("supabase")))
+        return calls
+
+    return install
+
+
+def get_ready():
+    return TestClient(app).get(f"{settings.API_PREFIX}/system/ready")
+
+
+def test_not_ready_before_startup(state):
+    response = get_ready()
+    assert response.status_code == 503
+    assert response.json()["finished"] is False
+
+
+def test_ready_after_all_phases(state, phases):
+    calls = phases(supabase="连接超时")
+    asyncio.run(init_app.run_startup())
+
+    assert sorted(name for name, _ in calls) == ["database", "directories", "logging", "supabase"]
+    assert all(in_thread for _, in_thread in calls)  # 阶段在线程池中执行，不阻塞事件循环
+
+    response = get_ready()
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and body["finished"]
+    assert body["phases"]["database"]["status"] == "ok"
+    assert body["phases"]["database"]["duration_ms"] is not None
+    # 可选阶段失败只记录
+    assert body["phases"]["supabase"]["status"] == "failed"
+    assert body["phases"]["supabase"]["error"] == "连接超时"
+
+
+def test_failed_required_phase_is_reported(state, phases):
+    phases(database="数据库不可用")
+    asyncio.run(init_app.run_startup())
+
+    response = get_ready()
+    assert response.status_code == 503
+    body = response.json()
+    assert body["finished"] and not body["ready"]
+    assert body["phases"]["database"]["status"] == "failed"
+    assert body["phases"]["database"]["error"] == "数据库不可用"
+    assert body["phases"]["directories"]["status"] == "ok"
+
+
+def test_import_main_skips_heavy_dependencies():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys, main; "
+            "print(','.join(m for m in ('numpy', 'PIL', 'httpx', 'playwright', 'supabase') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=backend, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
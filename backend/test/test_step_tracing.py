@@ -0,0 +1,156 @@
+"""
+自动化步骤追踪测试
+
+不启动真实浏览器，使用假页面对象驱动 DouyinAutomation.publish_video，
+检查步骤记录、(平台, 步骤) 汇总、写入 TaskLog 的结构化日志，以及在任务中执行自动化时写入进度、步骤日志和任务状态。
+"""
+
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.automation.douyin import DouyinAutomation
+from app.automation.tracing import StepRecord, StepStats, step_stats
+from app.database.migrations import run_migrations
+from app.models.models import Task
+from app.services import automation_task_service, task_service
+
+
+class FakeElement:
+    async def set_input_files(self, path):
+        pass
+
+    async def fill(self, value):
+        pass
+
+    async def click(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, missing_selector=None):
+        self.missing_selector = missing_selector
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    async def goto(self, url):
+        pass
+
+    async def wait_for_selector(self, selector, timeout=None):
+        if selector == self.missing_selector:
+            raise TimeoutError(f"等待 {selector} 超时")
+        return FakeElement()
+
+
+def make_automation(page):
+    automation = DouyinAutomation("douyin", "./storage_state.json")
+    automation.page = page
+    return automation
+
+
+def make_video(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * 1024)
+    return str(video)
+
+
+def test_publish_video_records_every_step(tmp_path):
+    step_stats.reset()
+    automation = make_automation(FakePage())
+
+    assert asyncio.run(automation.publish_video(make_video(tmp_path), "标题", "描述")) is True
+
+    steps = [record.step for record in automation.step_records]
+    assert steps == [
+        "goto_upload_page", "wait_upload_area", "set_input_files", "wait_upload_progress",
+        "fill_title", "fill_description", "click_publish", "wait_publish_success",
+    ]
+    assert all(record.outcome == "success" for record in automation.step_records)
+    assert {(item["platform"], item["step"]) for item in step_stats.summary()} == {("douyin", s) for s in steps}
+
+
+def test_failed_step_is_recorded_and_written_to_task_logs(tmp_path):
+    automation = make_automation(FakePage(missing_selector='[data-e2e="publish-success"]'))
+
+    assert asyncio.run(automation.publish_video(make_video(tmp_path), "标题", "描述")) is False
+    failed = automation.step_records[-1]
+    assert failed.step == "wait_publish_success"
+    assert failed.outcome == "error"
+    assert "TimeoutError" in failed.error
+
+    engine = create_engine("sqlite://")
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+    task = Task(task_type="publish", status="running")
+    db.add(task)
+    db.commit()
+
+    assert task_service.add_step_logs(db, task.id, automation.step_records) == 8
+    logs = task_service.get_task_logs(db, task.id)
+    assert logs[-1].level == "error"
+    assert json.loads(logs[-1].message)["step"] == "wait_publish_success"
+    db.close()
+
+
+def test_automation_task_writes_progress_step_logs_and_status(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(task_service, "SessionLocal", Session)
+    monkeypatch.setattr(automation_task_service, "SessionLocal", Session)
+    db = Session()
+    ok_task, failed_task = task_service.create_task(db, "publish"), task_service.create_task(db, "publish")
+
+    def run(task_id, page):
+        automation = make_automation(page)
+        events = []
+
+        async def start(headless=True):
+            events.append("start")
+
+        async def close():
+            events.append("close")
+
+        automation.start, automation.close = start, close
+        video = make_video(tmp_path)
+        result = asyncio.run(automation_task_service.run_automation_task(
+            task_id, automation, lambda a: a.publish_video(video, "标题", "描述")))
+        # 运行器不负责启动浏览器，由动作（publish）按需启动；结束时总是关闭
+        assert events == ["close"]
+        return result
+
+    assert run(ok_task.id, FakePage()) is True
+    assert run(failed_task.id, FakePage(missing_selector='[data-e2e="publish-success"]')) is False
+
+    db.expire_all()
+    ok, failed = task_service.get_task(db, ok_task.id), task_service.get_task(db, failed_task.id)
+    assert ok.status == "completed" and ok.progress == 100
+    assert failed.status == "failed" and "wait_publish_success" in failed.error_message
+    assert len(task_service.get_task_logs(db, ok_task.id)) == 8
+    assert json.loads(task_service.get_task_logs(db, failed_task.id)[-1].message)["outcome"] == "error"
+    db.close()
+
+
+def test_step_stats_percentiles():
+    stats = StepStats()
+    now = datetime.utcnow()
+    for duration in range(1, 101):
+        stats.record(StepRecord("douyin", "goto", now, now, float(duration), "success"))
+
+    summary = stats.summary()[0]
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.0
+    assert summary["p95_ms"] == 95.0
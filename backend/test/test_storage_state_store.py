@@ -0,0 +1,104 @@
+"""
+存储状态仓库测试
+
+检查内容不变时跳过写入、历史版本轮转与回滚、文件损坏时回退到历史版本、
+内存缓存，以及 Cookie 有效性检查。
+"""
+
+import json
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automation.storage_state import StorageStateStore, state_hash
+
+
+def make_state(session_value="v1", expires=-1):
+    return {
+        "cookies": [
+            {"name": "ttwid", "value": "t", "domain": ".douyin.com", "path": "/", "expires": -1},
+            {"name": "sessionid", "value": session_value, "domain": ".douyin.com", "path": "/", "expires": expires},
+        ],
+        "origins": [{"origin": "https://www.douyin.com", "localStorage": [{"name": "a", "value": "1"}]}],
+    }
+
+
+def test_hash_ignores_ordering():
+    state = make_state()
+    reordered = {"origins": state["origins"], "cookies": list(reversed(state["cookies"]))}
+    assert state_hash(state) == state_hash(reordered)
+    assert state_hash(state) != state_hash(make_state("v2"))
+
+
+def test_skip_unchanged_rotate_and_rollback(tmp_path):
+    store = StorageStateStore(keep_versions=2)
+    path = str(tmp_path / "profile" / "storage_state.json")
+
+    assert store.save(path, make_state("v1")) is True
+    assert store.save(path, make_state("v1")) is False
+    assert store.skipped_writes == 1
+
+    store.save(path, make_state("v2"))
+    store.save(path, make_state("v3"))
+    store.save(path, make_state("v4"))
+    assert store.versions(path) == [path + ".1", path + ".2"]
+    assert not os.path.exists(path + ".3")
+    # 目录中不残留临时文件
+    assert sorted(os.listdir(tmp_path / "profile")) == ["storage_state.json", "storage_state.json.1",
+                                                        "storage_state.json.2"]
+
+    state = store.rollback(path, 1)
+    assert state["cookies"][1]["value"] == "v3"
+    assert store.load(path)["cookies"][1]["value"] == "v3"
+    with open(path + ".1", encoding="utf-8") as f:
+        assert json.load(f)["cookies"][1]["value"] == "v4"
+
+
+def test_cache_and_corruption_fallback(tmp_path):
+    store = StorageStateStore(keep_versions=2)
+    path = str(tmp_path / "storage_state.json")
+    store.save(path, make_state("v1"))
+    store.save(path, make_state("v2"))
+
+    assert store.load(path) is store.load(path)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"cookies": [')
+    assert store.load(path)["cookies"][1]["value"] == "v1"
+    # 损坏的文件被新内容替换，不进入历史版本
+    assert store.save(path, make_state("v3")) is True
+    assert store.load(path)["cookies"][1]["value"] == "v3"
+
+
+def test_current_file_survives_rotation_and_missing_file_falls_back(tmp_path):
+    store = StorageStateStore(keep_versions=2)
+    path = str(tmp_path / "storage_state.json")
+    store.save(path, make_state("v1"))
+
+    # 轮转后、替换前崩溃：当前文件仍然完整
+    store._rotate(path)
+    store.invalidate()
+    assert store.load(path)["cookies"][1]["value"] == "v1"
+    assert store.versions(path) == [path + ".1"]
+
+    store.save(path, make_state("v2"))
+    with open(path + ".1", encoding="utf-8") as f:
+        assert json.load(f)["cookies"][1]["value"] == "v1"  # 新内容不影响历史版本
+    os.remove(path)
+    store.invalidate()
+    assert store.load(path)["cookies"][1]["value"] == "v1"
+    assert store.load(str(tmp_path / "missing.json")) is None
+
+
+def test_has_cookies(tmp_path):
+    store = StorageStateStore()
+    path = str(tmp_path / "storage_state.json")
+    assert store.has_cookies(path, ["sessionid"]) is False
+
+    store.save(path, make_state(expires=time.time() + 3600))
+    assert store.has_cookies(path, ["sessionid", "ttwid"]) is True
+    assert store.has_cookies(path, ["sessionid"], now=time.time() + 7200) is False
+    assert store.has_cookies(path, ["SESSDATA"]) is False
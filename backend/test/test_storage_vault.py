@@ -0,0 +1,98 @@
+"""
+存储状态保险库测试
+
+检查压缩存储与读取、未变化时跳过写入、导出/导入、从文件迁移，
+以及配置 STORAGE_STATE_BACKEND=vault 后自动化实例按配置键读写保险库。
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.automation import storage_state
+from app.automation.douyin import DouyinAutomation
+from app.automation.storage_vault import StorageStateVault
+from app.core.config import settings
+
+
+def make_state(value="v1"):
+    return {
+        "cookies": [{"name": "sessionid", "value": value, "domain": ".douyin.com", "path": "/", "expires": -1}],
+        "origins": [{
+            "origin": "https://www.douyin.com",
+            "localStorage": [{"name": f"key_{i}", "value": "x" * 200} for i in range(200)],
+        }],
+    }
+
+
+def test_roundtrip_and_skip_unchanged(tmp_path):
+    vault = StorageStateVault(str(tmp_path / "vault.db"))
+    assert vault.save("profile:1", make_state()) is True
+    assert vault.save("profile:1", make_state()) is False
+
+    vault.invalidate()
+    assert vault.load("profile:1") == make_state()
+    assert vault.load("profile:2") is None
+
+    stats = vault.stats()
+    assert stats["states"] == 1
+    assert stats["stored_bytes"] * 10 < stats["raw_bytes"]
+    vault.close()
+
+
+def test_export_import_and_migrate(tmp_path):
+    source = StorageStateVault(str(tmp_path / "source.db"))
+    for profile_id in range(1, 4):
+        source.save(f"profile:{profile_id}", make_state(f"v{profile_id}"))
+    export_path = str(tmp_path / "export.jsonl")
+    assert source.export_file(export_path) == 3
+
+    target = StorageStateVault(str(tmp_path / "target.db"))
+    assert target.import_file(export_path) == 3
+    assert target.keys() == ["profile:1", "profile:2", "profile:3"]
+    assert target.load("profile:2")["cookies"][0]["value"] == "v2"
+
+    state_file = tmp_path / "profile_a" / "storage_state.json"
+    state_file.parent.mkdir()
+    state_file.write_text(json.dumps(make_state("from_file")), encoding="utf-8")
+    assert target.migrate_files([("profile:4", str(state_file)), ("profile:5", str(tmp_path / "missing.json"))]) == 1
+    assert target.load("profile:4")["cookies"][0]["value"] == "from_file"
+
+
+def test_encryption_binds_record_to_key(tmp_path):
+    pytest.importorskip("cryptography")
+    key = StorageStateVault.generate_key()
+    vault = StorageStateVault(str(tmp_path / "vault.db"), key=key)
+    vault.save("profile:1", make_state())
+    assert b"sessionid" not in open(tmp_path / "vault.db", "rb").read()
+
+    # 把记录挪到其他键下，解密失败
+    record = next(vault.export_records())
+    record["key"] = "profile:2"
+    vault.import_records([record])
+    with pytest.raises(Exception):
+        vault.load("profile:2")
+    vault.invalidate()
+    assert vault.load("profile:1") == make_state()
+
+
+def test_automation_uses_vault_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_STATE_BACKEND", "vault")
+    monkeypatch.setattr(settings, "STORAGE_VAULT_PATH", str(tmp_path / "vault.db"))
+    monkeypatch.setattr(storage_state, "_vault", None)
+
+    automation = DouyinAutomation("douyin", str(tmp_path / "unused" / "storage_state.json"))
+    automation.storage_key = "profile:7"
+    assert asyncio.run(automation.has_stored_login_cookies()) is False
+
+    vault = storage_state.get_storage_state_store()
+    vault.save("profile:7", make_state())
+    assert asyncio.run(automation.has_stored_login_cookies()) is True
+    assert not os.path.exists(tmp_path / "unused")
+    vault.close()
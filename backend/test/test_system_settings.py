@@ -0,0 +1,112 @@
+"""
+系统设置缓存测试
+
+检查按 value_type 加载和转换、更新后版本号自增、其他进程的缓存按版本号失效、
+并发更新不会写入相同的版本号，以及 log_level 变更通知。
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import system_settings as system_settings_module
+from app.core.system_settings import VERSION_KEY, SystemSettingsStore, coerce_value
+from app.database.migrations import run_migrations
+from app.models.models import SystemSetting
+
+
+@pytest.fixture()
+def Session(tmp_path):
+    # 文件数据库：每个会话使用独立连接，模拟多个进程
+    engine = create_engine(f"sqlite:///{tmp_path / 'settings.db'}")
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([
+        SystemSetting(key="max_retries", value="3", value_type="int"),
+        SystemSetting(key="auto_publish", value="yes", value_type="bool"),
+        SystemSetting(key="platforms", value='["douyin", "bilibili"]', value_type="json"),
+        SystemSetting(key="broken_int", value="abc", value_type="int"),
+    ])
+    db.commit()
+    db.close()
+    yield Session
+    engine.dispose()
+
+
+def version_of(Session):
+    db = Session()
+    try:
+        return int(db.query(SystemSetting.value).filter(SystemSetting.key == VERSION_KEY).scalar())
+    finally:
+        db.close()
+
+
+def test_load_coerces_values(Session):
+    store = SystemSettingsStore(Session)
+    assert store.get("max_retries") == 3
+    assert store.get("auto_publish") is True
+    assert store.get("platforms") == ["douyin", "bilibili"]
+    assert store.get("broken_int") == "abc"  # 转换失败时按字符串处理
+    assert store.proxy_selection_strategy == "random"
+    assert store.version == 0 and VERSION_KEY not in store.as_dict()
+    assert coerce_value("false", "bool") is False and coerce_value(None, "int") is None
+
+
+def test_update_invalidates_other_processes(Session):
+    writer = SystemSettingsStore(Session, check_interval=0)
+    reader = SystemSettingsStore(Session, check_interval=0)
+    assert reader.get("max_retries") == 3
+
+    db = Session()
+    try:
+        result = writer.update(db, {"max_retries": 5, "new_flag": True, "ffmpeg_path": None})
+    finally:
+        db.close()
+    assert result["max_retries"] == 5 and result["new_flag"] is True
+    assert writer.version == 1
+
+    assert reader.get("max_retries") == 5 and reader.get("new_flag") is True
+    assert reader.version == 1
+
+
+def test_concurrent_updates_get_distinct_versions(Session):
+    first, second = SystemSettingsStore(Session), SystemSettingsStore(Session)
+    db_a, db_b = Session(), Session()
+    try:
+        # 进程 A 已读出版本号行（保留引用，对象留在会话中），随后进程 B 提交了更新
+        loaded = db_a.query(SystemSetting).all()
+        second.update(db_b, {"max_retries": 7})
+        first.update(db_a, {"ffmpeg_path": "/usr/bin/ffmpeg"})
+    finally:
+        db_a.close()
+        db_b.close()
+    assert version_of(Session) == 2
+    assert first.version == 2 and first.get("max_retries") == 7
+
+
+def test_log_level_listener(Session, monkeypatch):
+    levels = []
+    monkeypatch.setattr(system_settings_module.logger_manager, "set_level", levels.append)
+    store = SystemSettingsStore(Session)
+    store.subscribe(system_settings_module._apply_log_level)
+    changes = []
+    store.subscribe(changes.append)
+    store.load()
+    levels.clear()
+    changes.clear()
+
+    db = Session()
+    try:
+        store.update(db, {"log_level": "DEBUG"})
+        store.update(db, {"max_retries": 4})
+    finally:
+        db.close()
+    assert levels == ["DEBUG"]
+    assert changes == [{"log_level": "DEBUG"}, {"max_retries": 4}]
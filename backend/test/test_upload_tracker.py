@@ -0,0 +1,196 @@
+"""
+上传进度追踪测试
+
+用可以手动触发 request / requestfinished / requestfailed 事件的假页面模拟分片上传，
+检查进度百分比、按字节完成、页面完成标志回退（含未识别的最后一小片）、URL规则、动态超时，以及进度写入 Task.progress。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.automation.upload_tracker import UploadTracker
+from app.database.migrations import run_migrations
+from app.models.models import Task
+from app.services import task_service
+
+CHUNK = 256 * 1024
+
+
+class FakeRequest:
+    def __init__(self, size, method="POST", url="https://upload.example.com/chunk"):
+        self.method = method
+        self.url = url
+        self.post_data_buffer = b"\0" * size
+
+
+class FakePage:
+    def __init__(self):
+        self.listeners = {}
+        self.selector_appears = asyncio.Event()
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def emit(self, event, request):
+        for handler in list(self.listeners.get(event, [])):
+            handler(request)
+
+    async def wait_for_selector(self, selector, timeout=None):
+        await self.selector_appears.wait()
+
+
+def test_chunked_upload_reports_progress():
+    async def scenario():
+        page = FakePage()
+        progress = []
+
+        async def on_progress(percent):
+            progress.append(percent)
+
+        tracker = UploadTracker(page, 4 * CHUNK, on_progress=on_progress).start()
+        waiter = asyncio.create_task(tracker.wait(done_selector='[data-e2e="upload-progress"]'))
+        # 页面标志提前出现，但已经观察到上传请求，不能据此结束
+        first = FakeRequest(CHUNK)
+        page.emit("request", first)
+        page.selector_appears.set()
+        page.emit("request", FakeRequest(100, method="GET"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        page.emit("requestfinished", FakeRequest(CHUNK))  # 不是上传中的请求，不计入
+        page.emit("requestfinished", first)
+        await asyncio.sleep(0.01)
+        for _ in range(3):
+            request = FakeRequest(CHUNK)
+            page.emit("request", request)
+            await asyncio.sleep(0.01)
+            page.emit("requestfinished", request)
+            await asyncio.sleep(0.01)
+        stats = await asyncio.wait_for(waiter, 1)
+        return tracker, stats, progress, page
+
+    tracker, stats, progress, page = asyncio.run(scenario())
+    assert stats.completed_by == "bytes"
+    assert stats.bytes_sent == 4 * CHUNK
+    assert stats.throughput_bps > 0
+    assert progress == sorted(progress) and progress[-1] == 100
+    assert 25 in progress and 50 in progress
+    assert all(not handlers for handlers in page.listeners.values())
+
+
+def test_selector_completes_when_no_upload_requests_seen():
+    async def scenario():
+        page = FakePage()
+        tracker = UploadTracker(page, CHUNK).start()
+        waiter = asyncio.create_task(tracker.wait(done_selector="#done"))
+        await asyncio.sleep(0.01)
+        page.selector_appears.set()
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()).completed_by == "selector"
+
+
+def test_selector_completes_after_unrecognized_short_final_chunk():
+    async def scenario():
+        page = FakePage()
+        tracker = UploadTracker(page, 3 * CHUNK + 10 * 1024, stall_timeout=5).start()
+        waiter = asyncio.create_task(tracker.wait(done_selector="#done"))
+        for _ in range(3):
+            request = FakeRequest(CHUNK)
+            page.emit("request", request)
+            await asyncio.sleep(0.01)
+            page.emit("requestfinished", request)
+        # 最后一片 10KB 小于识别阈值且不匹配URL规则，不计入上传
+        last = FakeRequest(10 * 1024)
+        page.emit("request", last)
+        page.emit("requestfinished", last)
+        await asyncio.sleep(0.01)
+        assert not waiter.done() and tracker.percent < 100
+        page.selector_appears.set()
+        return await asyncio.wait_for(waiter, 1)
+
+    stats = asyncio.run(scenario())
+    assert stats.completed_by == "selector"
+    assert stats.requests == 3
+
+
+def test_url_patterns_count_short_chunks():
+    async def scenario():
+        page = FakePage()
+        tracker = UploadTracker(page, CHUNK + 10 * 1024, url_patterns=("/upload/chunk",)).start()
+        waiter = asyncio.create_task(tracker.wait())
+        for size in (CHUNK, 10 * 1024):
+            request = FakeRequest(size, url="https://upload.example.com/upload/chunk?part=1")
+            page.emit("request", request)
+            await asyncio.sleep(0.01)
+            page.emit("requestfinished", request)
+        return await asyncio.wait_for(waiter, 1)
+
+    stats = asyncio.run(scenario())
+    assert stats.completed_by == "bytes" and stats.requests == 2
+
+
+def test_platform_upload_url_patterns_are_defined():
+    from app.automation.bilibili import ExamplePlatformAutomation as BilibiliAutomation
+    from app.automation.douyin import DouyinAutomation
+    from app.automation.weixingongzhonghao import ExamplePlatformAutomation as WeixinAutomation
+
+    for automation_class in (DouyinAutomation, BilibiliAutomation, WeixinAutomation):
+        assert automation_class.UPLOAD_URL_PATTERNS
+
+
+def test_timeout_adapts_to_file_size_and_throughput():
+    page = FakePage()
+    small = UploadTracker(page, 1024 * 1024, min_throughput=1024 * 1024, grace=1)
+    large = UploadTracker(page, 100 * 1024 * 1024, min_throughput=1024 * 1024, grace=1)
+    assert large.deadline() - small.deadline() == pytest.approx(99, abs=0.1)
+
+    async def stalled():
+        tracker = UploadTracker(FakePage(), 4 * CHUNK, min_throughput=1024 * 1024, stall_timeout=0.05, grace=0)
+        tracker.start()
+        request = FakeRequest(CHUNK)
+        tracker.page.emit("request", request)
+        tracker.page.emit("requestfinished", request)
+        # 第一片之后再无请求，超过 stall_timeout 即超时
+        await tracker.wait()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(stalled())
+
+
+def test_task_progress_reporter_throttles_writes(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(Task(task_type="publish", status="running", progress=0))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(task_service, "SessionLocal", Session)
+
+    async def scenario():
+        report = task_service.task_progress_reporter(1, min_interval=60)
+        await report(10)
+        await report(20)  # 间隔不足，跳过
+        db = Session()
+        first = db.query(Task).first().progress
+        db.close()
+        await report(100)
+        return first
+
+    assert asyncio.run(scenario()) == 10
+    db = Session()
+    assert db.query(Task).first().progress == 100
+    db.close()
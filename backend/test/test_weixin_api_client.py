@@ -0,0 +1,112 @@
+"""
+微信公众号 API 客户端测试
+
+用 benchmarks/fake_weixin_api.py 的接口替身检查：
+- 并发请求只触发一次令牌请求（single-flight）
+- 提前刷新窗口内继续使用旧令牌并在后台刷新
+- 令牌被作废（40001）时重新获取并重试
+- 上传图片、新建草稿、发布草稿
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+
+from app.services.weixin_api_service import AccessTokenCache, WeixinApiClient, WeixinApiError
+from benchmarks.fake_weixin_api import FakeWeixinApi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(api, clock=None):
+    cache = AccessTokenCache(refresh_ahead=300, clock=clock or FakeClock())
+    return WeixinApiClient(base_url="http://weixin.test", transport=httpx.ASGITransport(app=api.app),
+                           token_cache=cache)
+
+
+def test_concurrent_requests_share_one_token_fetch():
+    api = FakeWeixinApi(token_delay=0.05)
+
+    async def scenario():
+        client = make_client(api)
+        try:
+            urls = await asyncio.gather(*(
+                client.upload_image("wx_app", "secret", f"image {i}".encode(), f"pid_{i}.jpg") for i in range(20)
+            ))
+        finally:
+            await client.close()
+        return urls
+
+    urls = asyncio.run(scenario())
+    assert len(set(urls)) == 20
+    assert api.token_requests == 1
+    assert len(api.uploads) == 20
+
+
+def test_refresh_ahead_keeps_serving_old_token():
+    api = FakeWeixinApi(expires_in=7200, token_delay=0.05)
+    clock = FakeClock()
+
+    async def scenario():
+        client = make_client(api, clock)
+        try:
+            first = await client.get_access_token("wx_app", "secret")
+            clock.now += 7200 - 100  # 进入提前刷新窗口
+            during = await asyncio.gather(*(client.get_access_token("wx_app", "secret") for _ in range(10)))
+            await asyncio.sleep(0.1)  # 等待后台刷新完成
+            after = await client.get_access_token("wx_app", "secret")
+        finally:
+            await client.close()
+        return first, during, after
+
+    first, during, after = asyncio.run(scenario())
+    assert all(token == first for token in during)
+    assert after != first
+    assert api.token_requests == 2
+
+
+def test_revoked_token_is_refetched_once():
+    api = FakeWeixinApi()
+
+    async def scenario():
+        client = make_client(api)
+        try:
+            await client.get_access_token("wx_app", "secret")
+            api.revoke_tokens()
+            media_id = await client.add_draft("wx_app", "secret", [{"title": "标题", "content": "<p>内容</p>"}])
+            publish_id = await client.submit_publish("wx_app", "secret", media_id)
+        finally:
+            await client.close()
+        return media_id, publish_id
+
+    media_id, publish_id = asyncio.run(scenario())
+    assert api.token_requests == 2
+    assert api.drafts[0]["media_id"] == media_id
+    assert api.published == [media_id] and publish_id == "1"
+
+
+def test_api_errors_are_raised():
+    api = FakeWeixinApi(apps={"wx_app": "secret"})
+
+    async def scenario():
+        client = make_client(api)
+        try:
+            await client.add_draft("wx_app", "wrong", [{"title": "标题"}])
+        finally:
+            await client.close()
+
+    with pytest.raises(WeixinApiError) as exc_info:
+        asyncio.run(scenario())
+    assert exc_info.value.errcode == 40125
@@ -0,0 +1,212 @@
+"""
+公众号图文组装流水线测试
+
+检查流水线各阶段重叠执行、并发不超过上限、单项失败和进度回调异常不影响其他条目、异常退出时不留下 worker、统计信息，
+以及用接口替身完成 下载 -> 去重 -> 压缩 -> 上传 -> 新建草稿 的完整任务（进度和阶段统计写入 Task，
+近似重复的图片被过滤，保留图片的哈希写入 published_image_hashes）。
+"""
+
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.stage_pipeline import Stage, StagePipeline
+from app.database.migrations import run_migrations
+from app.models.models import ApiAccountWx, PublishedImageHash, Task, TaskLog
+from app.services import task_service, weixin_article_service
+from app.services.image_hash_service import published_hash_registry
+from app.services.image_optimize_service import ImageOptimizer, ImageProfile
+from app.services.weixin_api_service import AccessTokenCache, WeixinApiClient
+from app.services.weixin_article_service import ArticleImage, WeixinArticleBuilder, render_article_content
+from benchmarks.fake_weixin_api import FakeWeixinApi
+
+
+def test_stages_overlap_with_bounded_concurrency():
+    events = []
+    active = {"download": 0, "upload": 0}
+    peak = {"download": 0, "upload": 0}
+
+    def stage(name, delay, fail_on=None):
+        async def handler(item):
+            active[name] += 1
+            peak[name] = max(peak[name], active[name])
+            events.append((name, "start", item, time.monotonic()))
+            await asyncio.sleep(delay)
+            active[name] -= 1
+            events.append((name, "end", item, time.monotonic()))
+            if item == fail_on:
+                raise RuntimeError("boom")
+            return item * 10
+        return handler
+
+    done = []
+
+    async def on_item_done(result, count, total):
+        done.append((count, total))
+
+    pipeline = StagePipeline([
+        Stage("download", stage("download", 0.02, fail_on=3), concurrency=2),
+        Stage("upload", stage("upload", 0.02), concurrency=3),
+    ], on_item_done=on_item_done)
+    results = asyncio.run(pipeline.run(range(8)))
+
+    assert [r.value for r in results if r.ok] == [0, 100, 200, 400, 500, 600, 700]
+    assert results[3].stage == "download" and isinstance(results[3].error, RuntimeError)
+    assert peak["download"] == 2 and peak["upload"] <= 3
+    # 第一项上传开始时，还有下载没有结束
+    first_upload = min(t for name, kind, _, t in events if name == "upload" and kind == "start")
+    last_download = max(t for name, kind, _, t in events if name == "download" and kind == "end")
+    assert first_upload < last_download
+    assert done[-1] == (8, 8) and len(done) == 8
+
+    stats = {s["stage"]: s for s in pipeline.stats()}
+    assert stats["download"]["processed"] == 7 and stats["download"]["failed"] == 1
+    assert stats["upload"]["processed"] == 7 and stats["upload"]["queued"] == 0
+    assert stats["upload"]["throughput_per_s"] > 0
+
+
+def test_callback_errors_do_not_stall_the_pipeline():
+    async def double(item):
+        return item * 2
+
+    async def on_item_done(result, count, total):
+        raise RuntimeError("progress write failed")
+
+    pipeline = StagePipeline([Stage("a", double, concurrency=2), Stage("b", double)], on_item_done=on_item_done)
+    results = asyncio.run(asyncio.wait_for(pipeline.run(range(6)), timeout=5))
+    assert [r.value for r in results] == [0, 4, 8, 12, 16, 20]
+
+
+class Abort(BaseException):
+    """不被阶段捕获的异常，使 worker 异常退出"""
+
+
+def test_failed_run_cancels_remaining_stages():
+    async def abort_on_third(item):
+        if item == 2:
+            raise Abort()
+        return item
+
+    async def hang(item):
+        await asyncio.Event().wait()
+
+    async def scenario():
+        pipeline = StagePipeline([Stage("a", abort_on_third), Stage("b", hang, concurrency=2)])
+        with pytest.raises(Abort):
+            await asyncio.wait_for(pipeline.run(range(10)), timeout=5)
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_render_inserts_images_after_anchor():
+    images = [ArticleImage(pid=1, url="http://mmbiz.qpic.cn/a/0"),
+              ArticleImage(pid=2, author_name="作者<b>", url="http://mmbiz.qpic.cn/b/0")]
+    content = render_article_content(images)
+    assert content.index('data-src="http://mmbiz.qpic.cn/a/0"') < content.index('data-src="http://mmbiz.qpic.cn/b/0"')
+    assert "pid_1<br" in content and "@作者&lt;b&gt; pid_2" in content
+    assert content.index("点击蓝字") < content.index("mmbiz.qpic.cn/a/0") < content.index("图片源自网络")
+
+
+def png_bytes(seed, size=(120, 90), fmt="PNG"):
+    """随机色块放大得到的图片，不同 seed 的感知哈希不同"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    small = Image.new("RGB", (6, 5))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(30)])
+    buffer = io.BytesIO()
+    small.resize(size, Image.BILINEAR).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_article_task_end_to_end(tmp_path, monkeypatch):
+    pytest.importorskip("PIL")
+    pytest.importorskip("numpy")
+    published_hash_registry.invalidate()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(task_service, "SessionLocal", Session)
+    monkeypatch.setattr(weixin_article_service, "SessionLocal", Session)
+
+    db = Session()
+    account = ApiAccountWx(name="测试号", appid="wx_app", app_secret="secret", wx_id="gh_test", title="每日萌图",
+                           author="编辑部", thumb_media_id="thumb_1", status="active")
+    db.add(account)
+    db.commit()
+    task_id = task_service.create_task(db, weixin_article_service.TASK_TYPE).id
+    account_id = account.id
+    db.close()
+
+    async def image_source(request):
+        pid = int(request.url.params["pid"])
+        await asyncio.sleep(0.01)
+        if pid == 13:
+            return httpx.Response(404)
+        if pid == 25:  # pid 11 缩小后重新压缩
+            return httpx.Response(200, content=png_bytes(11, size=(60, 45), fmt="JPEG"))
+        return httpx.Response(200, content=png_bytes(pid))
+
+    api = FakeWeixinApi(upload_delay=0.01)
+
+    async def scenario(pids):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            optimizer = ImageOptimizer(cache_dir=str(tmp_path), executor=executor,
+                                       transport=httpx.MockTransport(image_source))
+            client = WeixinApiClient(base_url="http://weixin.test", transport=httpx.ASGITransport(app=api.app),
+                                     token_cache=AccessTokenCache(refresh_ahead=300))
+            builder = WeixinArticleBuilder(client=client, optimizer=optimizer,
+                                           profile=ImageProfile(name="test", max_bytes=200 * 1024),
+                                           source_url="https://img.test/proxy?pid={pid}",
+                                           download_concurrency=4, optimize_concurrency=2, upload_concurrency=3)
+            try:
+                return await weixin_article_service.run_article_task(
+                    task_id, account_id, pids=pids, builder=builder, publish=True)
+            finally:
+                await client.close()
+                await optimizer.close()
+
+    result = asyncio.run(scenario(list(range(10, 30))))
+    assert result is not None
+    assert len(result.pids) == 18 and 13 not in result.pids and 25 not in result.pids
+    assert result.failed[13].startswith("download")
+    assert result.failed[25].startswith("dedupe")
+    assert result.publish_id == "1"
+    assert len(api.uploads) == 18
+    draft = api.drafts[0]["articles"][0]
+    assert draft["thumb_media_id"] == "thumb_1" and draft["title"].startswith("每日萌图 ")
+    assert draft["content"].count("wxw-img\" data-galleryid") == 18
+
+    db = Session()
+    task = db.get(Task, task_id)
+    assert task.status == "completed" and task.progress == 100
+    messages = [json.loads(log.message) for log in db.query(TaskLog).filter_by(task_id=task_id)]
+    stages = [m for m in messages if m["type"] == "pipeline_stage"]
+    assert [s["stage"] for s in stages] == ["download", "dedupe", "optimize", "upload"]
+    assert stages[0]["failed"] == 1 and stages[1]["failed"] == 1 and stages[3]["processed"] == 18
+    assert sorted(int(row.source) for row in db.query(PublishedImageHash).filter_by(owner_id=account_id)) == \
+        sorted(result.pids)
+    task_id = task_service.create_task(db, weixin_article_service.TASK_TYPE).id
+    db.close()
+
+    # 已发布过的图片（含同图的其他版本）不会再次进入文章
+    again = asyncio.run(scenario([11, 25, 30]))
+    assert again is not None and again.pids == [30]
+    assert again.failed[11].startswith("dedupe") and again.failed[25].startswith("dedupe")
+    published_hash_registry.invalidate()
@@ -0,0 +1,110 @@
+"""
+微信公众号媒体缓存测试
+
+检查同一图片在重复发布、并发发布时只上传一次，缓存按 AppID 隔离，临时素材过期后重新上传。
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database.migrations import run_migrations
+from app.models.models import WeixinMediaCache
+from app.services.weixin_api_service import AccessTokenCache, WeixinApiClient, WeixinMediaCacheStore
+from benchmarks.fake_weixin_api import FakeWeixinApi
+
+
+@pytest.fixture()
+def Session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    run_migrations(engine)
+    return sessionmaker(bind=engine)
+
+
+def make_client(api, Session):
+    return WeixinApiClient(base_url="http://weixin.test", transport=httpx.ASGITransport(app=api.app),
+                           token_cache=AccessTokenCache(refresh_ahead=300),
+                           media_cache=WeixinMediaCacheStore(Session))
+
+
+def test_same_image_is_uploaded_once_per_appid(Session):
+    api = FakeWeixinApi(upload_delay=0.02)
+    image = os.urandom(4096)
+
+    async def scenario():
+        client = make_client(api, Session)
+        try:
+            # 并发发布同一图片
+            urls = await asyncio.gather(*(client.upload_image("wx_a", "secret", image, "a.jpg") for _ in range(5)))
+            # 重新发布（新客户端，缓存来自数据库）
+            other = make_client(api, Session)
+            again = await other.upload_image("wx_a", "secret", image, "renamed.jpg")
+            material = await other.add_image_material("wx_a", "secret", image, "a.jpg")
+            material_again = await other.add_image_material("wx_a", "secret", image, "a.jpg")
+            # 另一个公众号需要单独上传
+            other_app = await other.upload_image("wx_b", "secret", image, "a.jpg")
+            await other.close()
+        finally:
+            await client.close()
+        return urls, again, material, material_again, other_app
+
+    urls, again, material, material_again, other_app = asyncio.run(scenario())
+    assert len(set(urls)) == 1 and again == urls[0]
+    assert material == material_again and material["media_id"]
+    assert other_app
+    # uploadimg(wx_a) + add_material(wx_a) + uploadimg(wx_b)
+    assert len(api.uploads) == 3
+
+    db = Session()
+    entry = db.query(WeixinMediaCache).filter_by(appid="wx_a", kind="image_url").one()
+    assert entry.hits == 1 and entry.size == 4096 and entry.expires_at is None
+    db.close()
+
+
+def test_expired_temp_media_is_uploaded_again(Session):
+    api = FakeWeixinApi()
+    image = os.urandom(1024)
+
+    async def upload():
+        client = make_client(api, Session)
+        try:
+            return await client.upload_temp_image("wx_a", "secret", image, "thumb.png")
+        finally:
+            await client.close()
+
+    first = asyncio.run(upload())
+    assert asyncio.run(upload()) == first
+    assert len(api.uploads) == 1
+
+    db = Session()
+    entry = db.query(WeixinMediaCache).filter_by(kind="temp").one()
+    assert entry.expires_at is not None
+    entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+    asyncio.run(upload())
+    assert len(api.uploads) == 2
+
+
+def test_invalidate(Session):
+    store = WeixinMediaCacheStore(Session)
+    store.put("wx_a", "h1", "material", media_id="m1")
+    store.put("wx_a", "h2", "material", media_id="m2")
+    store.put("wx_b", "h1", "material", media_id="m3")
+
+    assert store.get("wx_a", "h1", "material") == {"media_id": "m1", "url": None}
+    assert store.invalidate("wx_a", "h1") == 1
+    assert store.get("wx_a", "h1", "material") is None
+    assert store.invalidate("wx_a") == 1
+    assert store.get("wx_b", "h1", "material") == {"media_id": "m3", "url": None}